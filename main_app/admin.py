@@ -1,16 +1,99 @@
 from django.contrib import admin
-from .models import PropertyInquiry, PropertyEstimate, AIAnalysisLog
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+from .models import PropertyInquiry, PropertyEstimate, AIAnalysisLog, LogSegment, Region, RegionAlias, RegionalStatistic
+from .log_archive import archived_log_ids, find_archived_log
+from .regional_stats import QuantileSketch, refresh_region_statistics
+from .db_router import replica_reads
+from .search import get_search_backend
+from .utils.admin_utils import LargeTableAdminMixin
+from .utils.db_utils import submit_background
+
+
+class ReplicaChangelistMixin:
+    """Serve changelist page views from a read replica when one is configured"""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with replica_reads():
+            response = super().changelist_view(request, extra_context)
+            # Render inside the replica scope so template-time queries use it too
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+
+
+class FullTextSearchMixin:
+    """Answer the changelist search box (and autocomplete) from the full-text index"""
+
+    # Lookup from the admin's model to PropertyInquiry, e.g. 'inquiry' for estimates
+    search_inquiry_path = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        backend = get_search_backend(queryset.db)
+        if self.search_inquiry_path is None:
+            return backend.filter(queryset, search_term), False
+        inquiries = backend.filter(PropertyInquiry.objects.using(queryset.db), search_term)
+        return queryset.filter(**{f'{self.search_inquiry_path}__in': inquiries.values('id')}), False
+
+
+class ChangeFormRelatedMixin:
+    """Load the relations the change form shows with the object rather than on first access"""
+
+    change_form_select_related = ()
+
+    def get_object(self, request, object_id, from_field=None):
+        model = self.model
+        field = model._meta.pk if from_field is None else model._meta.get_field(from_field)
+        try:
+            object_id = field.to_python(object_id)
+            queryset = self.get_queryset(request).select_related(*self.change_form_select_related)
+            return queryset.get(**{field.name: object_id})
+        except (model.DoesNotExist, ValidationError, ValueError):
+            return None
+
+
+class RegionListFilter(admin.SimpleListFilter):
+    """Filter on the canonical region FK; choices come from the small Region table, not the inquiries"""
+    title = 'region'
+    parameter_name = 'region'
+    max_choices = 50
+    unresolved = 'none'
+
+    def lookups(self, request, model_admin):
+        regions = Region.objects.using(model_admin.get_queryset(request).db).values_list('id', 'name')
+        return [(str(pk), name) for pk, name in regions[:self.max_choices]] + [(self.unresolved, 'Unrecognized')]
+
+    def queryset(self, request, queryset):
+        if self.value() == self.unresolved:
+            return queryset.filter(region_ref__isnull=True)
+        if self.value():
+            if not self.value().isdigit():
+                raise IncorrectLookupParameters(f"Unknown region '{self.value()}'")
+            return queryset.filter(region_ref_id=self.value())
+        return queryset
 
 
 @admin.register(PropertyInquiry)
-class PropertyInquiryAdmin(admin.ModelAdmin):
+class PropertyInquiryAdmin(ReplicaChangelistMixin, LargeTableAdminMixin, FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('address', 'lot_size', 'region', 'created_at')
-    list_filter = ('region', 'created_at')
+    list_filter = (RegionListFilter, 'created_at')
+    changelist_defer = ('current_property', 'property_goals', 'investment_capacity', 'preferences_concerns')
     search_fields = ('address', 'region', 'current_property', 'property_goals')
-    readonly_fields = ('created_at',)
+    readonly_fields = ('region_ref', 'geohash', 'created_at')
     fieldsets = (
         ('Basic Information', {
-            'fields': ('address', 'lot_size', 'region')
+            'fields': ('address', 'lot_size', 'region', 'region_ref')
+        }),
+        ('Location', {
+            'fields': ('latitude', 'longitude', 'geohash'),
+            'description': "Leave empty to use the region's centre",
         }),
         ('Property Details', {
             'fields': ('current_property', 'property_goals', 'investment_capacity', 'preferences_concerns')
@@ -23,11 +106,25 @@ class PropertyInquiryAdmin(admin.ModelAdmin):
 
 
 @admin.register(PropertyEstimate)
-class PropertyEstimateAdmin(admin.ModelAdmin):
+class PropertyEstimateAdmin(ReplicaChangelistMixin, LargeTableAdminMixin, FullTextSearchMixin, ChangeFormRelatedMixin,
+                            admin.ModelAdmin):
     list_display = ('project_name', 'inquiry_address', 'confidence_score', 'created_at')
     list_filter = ('confidence_score', 'created_at')
+    list_select_related = ('inquiry',)
     search_fields = ('project_name', 'inquiry__address')
-    readonly_fields = ('created_at', 'processing_time')
+    search_inquiry_path = 'inquiry'
+    autocomplete_fields = ('inquiry',)
+    change_form_select_related = ('payload__response_blob',)
+    changelist_defer = (
+        'project_description', 'factors_considered', 'recommendations', 'risk_assessment',
+        'projection_series', 'projection_overflow',
+        'inquiry__current_property', 'inquiry__property_goals',
+        'inquiry__investment_capacity', 'inquiry__preferences_concerns',
+    )
+    # Projections are stored packed and the raw response in EstimatePayload; shown read-only
+    readonly_fields = (
+        'created_at', 'processing_time', 'cash_flow_projection', 'revenue_breakdown', 'cost_breakdown', 'ai_response_raw',
+    )
     fieldsets = (
         ('Project Information', {
             'fields': ('inquiry', 'project_name', 'project_description')
@@ -49,17 +146,30 @@ class PropertyEstimateAdmin(admin.ModelAdmin):
         })
     )
     
+    def get_queryset(self, request):
+        # The default manager defers the detail lists the change form edits
+        return super().get_queryset(request).with_details()
+
     def inquiry_address(self, obj):
         return obj.inquiry.address if obj.inquiry else 'N/A'
     inquiry_address.short_description = 'Property Address'
 
 
 @admin.register(AIAnalysisLog)
-class AIAnalysisLogAdmin(admin.ModelAdmin):
+class AIAnalysisLogAdmin(ReplicaChangelistMixin, LargeTableAdminMixin, ChangeFormRelatedMixin, admin.ModelAdmin):
     list_display = ('inquiry_address', 'model_used', 'tokens_used', 'processing_time', 'success', 'created_at')
     list_filter = ('success', 'model_used', 'created_at')
+    list_select_related = ('inquiry',)
     search_fields = ('inquiry__address', 'model_used')
-    readonly_fields = ('created_at', 'processing_time')
+    raw_id_fields = ('inquiry',)
+    change_form_select_related = ('request_blob', 'response_blob')
+    changelist_defer = (
+        'error_message',
+        'inquiry__current_property', 'inquiry__property_goals',
+        'inquiry__investment_capacity', 'inquiry__preferences_concerns',
+    )
+    # Payloads are content-addressed blobs, decompressed only on the change form
+    readonly_fields = ('created_at', 'processing_time', 'request_data', 'response_data')
     fieldsets = (
         ('Analysis Details', {
             'fields': ('inquiry', 'model_used', 'tokens_used', 'processing_time', 'success')
@@ -78,6 +188,126 @@ class AIAnalysisLogAdmin(admin.ModelAdmin):
         })
     )
     
+    def get_object(self, request, object_id, from_field=None):
+        # Logs past the retention period are read back from their segment file
+        obj = super().get_object(request, object_id, from_field)
+        if obj is None and from_field is None:
+            try:
+                obj = find_archived_log(int(object_id))
+            except ValueError:
+                pass
+        return obj
+
+    def has_change_permission(self, request, obj=None):
+        return not hasattr(obj, 'archive_segment') and super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return not hasattr(obj, 'archive_segment') and super().has_delete_permission(request, obj)
+
     def inquiry_address(self, obj):
         return obj.inquiry.address if obj.inquiry else 'N/A'
     inquiry_address.short_description = 'Property Address'
+
+
+@admin.register(LogSegment)
+class LogSegmentAdmin(admin.ModelAdmin):
+    """Read-only view of archived log segments (written by archive_ai_logs); their logs open in the log admin"""
+    list_display = ('name', 'first_log_id', 'last_log_id', 'entries', 'size', 'oldest_log_at', 'newest_log_at')
+    search_fields = ('name',)
+    readonly_fields = ('name', 'first_log_id', 'last_log_id', 'entries', 'size', 'oldest_log_at', 'newest_log_at',
+                       'created_at', 'archived_logs')
+    archived_logs_shown = 200
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # Segment files are removed with archive_ai_logs --purge-segments-after
+        return False
+
+    def archived_logs(self, obj):
+        try:
+            ids = archived_log_ids(obj, self.archived_logs_shown)
+        except FileNotFoundError:
+            return 'Segment files missing'
+        links = format_html_join(', ', '<a href="{}">{}</a>', (
+            (reverse('admin:main_app_aianalysislog_change', args=[log_id]), log_id) for log_id in ids
+        ))
+        more = obj.entries - len(ids)
+        return format_html('{} and {} more', links, more) if more > 0 else links
+    archived_logs.short_description = 'Archived Logs'
+
+
+class RegionAliasInline(admin.TabularInline):
+    model = RegionAlias
+    extra = 1
+
+
+@admin.register(Region)
+class RegionAdmin(admin.ModelAdmin):
+    """
+    Canonical regions and their aliases
+
+    Saving or deleting regions here resolves unrecognized inquiries again and
+    rebuilds the regional statistics (keyed by the stored region) on the
+    background pool, once the change is committed.
+    """
+    list_display = ('name', 'key', 'country', 'latitude', 'longitude', 'created_at')
+    list_filter = ('country',)
+    search_fields = ('name', 'key', 'aliases__key')
+    inlines = (RegionAliasInline,)
+
+    def refresh_statistics(self, request):
+        transaction.on_commit(lambda: submit_background(refresh_region_statistics))
+        self.message_user(request, 'Inquiries are being resolved again and regional statistics rebuilt in the background.')
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        self.refresh_statistics(request)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.refresh_statistics(request)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        self.refresh_statistics(request)
+
+
+@admin.register(RegionalStatistic)
+class RegionalStatisticAdmin(admin.ModelAdmin):
+    """Read-only view of the incrementally maintained statistics (rebuild with rebuild_regional_statistics)"""
+    list_display = ('region', 'lot_size_bucket', 'estimate_count', 'median_revenue_per_acre',
+                    'median_cost_per_acre', 'median_confidence', 'p90_processing_time', 'updated_at')
+    list_filter = ('lot_size_bucket',)
+    search_fields = ('region', 'region_key')
+    readonly_fields = ('region', 'region_key', 'lot_size_bucket', 'estimate_count', 'sketches', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def quantile(self, obj, metric, q):
+        value = QuantileSketch.from_dict(obj.sketches.get(metric)).quantile(q)
+        return 'N/A' if value is None else round(value, 2)
+
+    def median_revenue_per_acre(self, obj):
+        return self.quantile(obj, 'revenue_per_acre', 0.5)
+    median_revenue_per_acre.short_description = 'Median Revenue / Acre / Year'
+
+    def median_cost_per_acre(self, obj):
+        return self.quantile(obj, 'cost_per_acre', 0.5)
+    median_cost_per_acre.short_description = 'Median Cost / Acre / Year'
+
+    def median_confidence(self, obj):
+        return self.quantile(obj, 'confidence_score', 0.5)
+    median_confidence.short_description = 'Median Confidence'
+
+    def p90_processing_time(self, obj):
+        return self.quantile(obj, 'processing_time', 0.9)
+    p90_processing_time.short_description = 'P90 Processing Time (s)'
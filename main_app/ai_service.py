@@ -2,7 +2,7 @@ import os
 import json
 import time
 import asyncio
-from typing import Dict, Any
+from typing import Any, Awaitable, Callable, Dict, Optional
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
 from .ai_models import (
@@ -25,12 +25,16 @@ class ValoraEarthAIService:
         # Use GPT-4o-mini for better performance
         self.model = "gpt-4.1-mini"
         
-    async def generate_property_estimate_async(self, inquiry: PropertyInquiryRequest) -> AIAnalysisResult:
+    async def generate_property_estimate_async(
+        self, inquiry: PropertyInquiryRequest, progress: Optional[Callable[[str], Awaitable[Any]]] = None,
+    ) -> AIAnalysisResult:
         """
         Generate AI-powered property estimate using OpenAI API (async version)
         
         Args:
             inquiry: Validated property inquiry request
+            progress: Optional coroutine function called with 'calling_model' and 'parsing'
+                as those stages start (see generation_status.py)
             
         Returns:
             Complete AI analysis result
@@ -47,11 +51,15 @@ class ValoraEarthAIService:
             
             # Make OpenAI API call asynchronously
             print(f"DEBUG: Making async OpenAI API call with model: {self.model}")
+            if progress:
+                await progress('calling_model')
             openai_response = await self._call_openai_api_async(prompt)
             print(f"DEBUG: OpenAI API call successful")
 
             # Parse and validate the response
             print(f"DEBUG: Parsing OpenAI response...")
+            if progress:
+                await progress('parsing')
             estimate_data = self._parse_openai_response(openai_response.choices[0].message.content)
             print(f"DEBUG: Response parsing successful")
 
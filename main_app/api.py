@@ -0,0 +1,196 @@
+"""
+Read-only JSON API for listing property estimates.
+
+Pages are cut with keyset pagination on ``(created_at, id)`` using the
+``estimate_created_id_idx`` index: the cursor carries the last row's key and
+the next page is ``WHERE (created_at, id) < (cursor)``, so every page costs one
+index range scan regardless of depth. ``fields=`` selects columns (heavy JSON
+is opt-in) and responses carry an ETag / Last-Modified derived from the page's
+ids and ``updated_at`` values, which are checked before the row data is read
+(inquiry fields are treated as immutable once submitted).
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+from .models import PropertyEstimate
+from .projections import PROJECTION_GROUPS, ProjectionSeries
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Public field name -> ORM lookup
+ESTIMATE_FIELDS: Dict[str, str] = {
+    'id': 'id',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'project_name': 'project_name',
+    'project_description': 'project_description',
+    'confidence_score': 'confidence_score',
+    'timeline': 'timeline',
+    'risk_assessment': 'risk_assessment',
+    'processing_time': 'processing_time',
+    'factors_considered': 'factors_considered',
+    'recommendations': 'recommendations',
+    # Decoded from the packed series by page_rows
+    'cash_flow_projection': 'projection_series',
+    'revenue_breakdown': 'projection_series',
+    'cost_breakdown': 'projection_series',
+    'inquiry.id': 'inquiry_id',
+    'inquiry.address': 'inquiry__address',
+    'inquiry.region': 'inquiry__region',
+    'inquiry.latitude': 'inquiry__latitude',
+    'inquiry.longitude': 'inquiry__longitude',
+    'inquiry.lot_size': 'inquiry__lot_size',
+    'inquiry.lot_size_unit': 'inquiry__lot_size_unit',
+    'inquiry.current_property': 'inquiry__current_property',
+    'inquiry.property_goals': 'inquiry__property_goals',
+    'inquiry.investment_capacity': 'inquiry__investment_capacity',
+    'inquiry.preferences_concerns': 'inquiry__preferences_concerns',
+    'inquiry.created_at': 'inquiry__created_at',
+}
+
+# Returned when ``fields`` is omitted: everything except the JSON projections and long text
+DEFAULT_FIELDS = (
+    'id', 'created_at', 'updated_at', 'project_name', 'confidence_score', 'timeline',
+    'inquiry.id', 'inquiry.address', 'inquiry.region', 'inquiry.lot_size', 'inquiry.lot_size_unit',
+)
+
+
+class APIError(ValueError):
+    """Invalid request parameters; reported to the client as HTTP 400"""
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Position after which the next page starts"""
+    created_at: Any
+    id: int
+    ascending: bool = False
+
+    def encode(self) -> str:
+        payload = json.dumps([self.created_at.isoformat(), self.id, 'asc' if self.ascending else 'desc'])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    @classmethod
+    def decode(cls, value: str) -> 'Cursor':
+        try:
+            padded = value + '=' * (-len(value) % 4)
+            created_at, pk, order = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            parsed = parse_datetime(created_at)
+            if parsed is None or not isinstance(pk, int) or order not in ('asc', 'desc'):
+                raise ValueError
+        except (binascii.Error, ValueError, TypeError):
+            raise APIError('Invalid cursor')
+        return cls(created_at=parsed, id=pk, ascending=order == 'asc')
+
+
+@dataclass
+class EstimatePageRequest:
+    """Parsed query parameters of a list request"""
+    fields: Tuple[str, ...]
+    limit: int
+    cursor: Optional[Cursor]
+    ascending: bool
+
+    @classmethod
+    def from_query(cls, params) -> 'EstimatePageRequest':
+        fields = tuple(dict.fromkeys(
+            name.strip() for name in params.get('fields', '').split(',') if name.strip()
+        )) or DEFAULT_FIELDS
+        unknown = [name for name in fields if name not in ESTIMATE_FIELDS]
+        if unknown:
+            raise APIError(f"Unknown field(s): {', '.join(unknown)}")
+
+        try:
+            limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise APIError('limit must be an integer')
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise APIError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+
+        cursor = Cursor.decode(params['cursor']) if params.get('cursor') else None
+        order = params.get('order', 'desc')
+        if order not in ('asc', 'desc'):
+            raise APIError("order must be 'asc' or 'desc'")
+        ascending = cursor.ascending if cursor else order == 'asc'
+        return cls(fields=fields, limit=limit, cursor=cursor, ascending=ascending)
+
+
+def page_keys(queryset: QuerySet, page: EstimatePageRequest) -> List[Tuple[int, Any, Any]]:
+    """(id, created_at, updated_at) of the page's rows plus one look-ahead row"""
+    if page.cursor is not None:
+        op = 'gt' if page.ascending else 'lt'
+        queryset = queryset.filter(
+            Q(**{f'created_at__{op}': page.cursor.created_at})
+            | Q(created_at=page.cursor.created_at, **{f'id__{op}': page.cursor.id})
+        )
+    ordering = ('created_at', 'id') if page.ascending else ('-created_at', '-id')
+    return list(queryset.order_by(*ordering).values_list('id', 'created_at', 'updated_at')[:page.limit + 1])
+
+
+def page_validators(keys, page: EstimatePageRequest) -> Tuple[str, Optional[int]]:
+    """ETag and Last-Modified timestamp for a page, computed from its keys only"""
+    digest = hashlib.sha1()
+    digest.update(','.join(page.fields).encode())
+    digest.update(b'asc' if page.ascending else b'desc')
+    for pk, _, updated_at in keys:
+        digest.update(f'{pk}:{updated_at.isoformat()};'.encode())
+    last_modified = max((updated_at for _, _, updated_at in keys), default=None)
+    return f'"{digest.hexdigest()}"', int(last_modified.timestamp()) if last_modified else None
+
+
+def page_rows(queryset: QuerySet, ids: List[int], fields: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """Selected fields of the given estimates, in the order of ``ids``"""
+    lookups = {ESTIMATE_FIELDS[name] for name in fields}
+    projections = any(name in PROJECTION_GROUPS for name in fields)
+    if projections:
+        lookups.add('projection_overflow')
+    rows = {
+        row['id']: row
+        for row in queryset.filter(id__in=ids).values('id', *lookups)
+    }
+    if projections:
+        for row in rows.values():
+            row.update((row['projection_series'] or ProjectionSeries()).to_json(row['projection_overflow']))
+    return [
+        {name: rows[pk][name if name in PROJECTION_GROUPS else ESTIMATE_FIELDS[name]] for name in fields}
+        for pk in ids if pk in rows
+    ]
+
+
+def page_payload(rows, keys, page: EstimatePageRequest) -> Dict[str, Any]:
+    has_more = len(keys) > page.limit
+    next_cursor = None
+    if has_more:
+        pk, created_at, _ = keys[page.limit - 1]
+        next_cursor = Cursor(created_at=created_at, id=pk, ascending=page.ascending).encode()
+    return {'results': rows, 'next_cursor': next_cursor, 'has_more': has_more}
+
+
+def encode_payload(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload, cls=DjangoJSONEncoder).encode()
+
+
+def estimates_queryset() -> QuerySet:
+    return PropertyEstimate.objects.all()
+
+
+def has_api_access(request) -> bool:
+    """Partners presenting a key from ``PARTNER_API_KEYS`` as a Bearer token, or staff users"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token:
+        # Constant-time, so response timing doesn't reveal how much of a key matched
+        token = token.encode()
+        return any(hmac.compare_digest(token, key.encode()) for key in getattr(settings, 'PARTNER_API_KEYS', ()))
+    return request.user.is_authenticated and request.user.is_staff
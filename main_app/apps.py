@@ -4,3 +4,24 @@ from django.apps import AppConfig
 class MainAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "main_app"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save, pre_save
+        from .models import PropertyEstimate, PropertyInquiry, Region, RegionAlias
+        from .regions import assign_region, invalidate_region_index
+        from .generation_status import discard_status
+        from .results_pages import invalidate_page
+        from .utils.query_instrumentation import install_instrumentation
+
+        connection_created.connect(install_instrumentation, dispatch_uid='main_app.query_instrumentation')
+        pre_save.connect(assign_region, sender=PropertyInquiry, dispatch_uid='main_app.assign_region')
+        for model in (Region, RegionAlias):
+            for signal in (post_save, post_delete):
+                signal.connect(invalidate_region_index, sender=model,
+                               dispatch_uid=f'main_app.region_index.{model.__name__}.{signal is post_save}')
+        for model in (PropertyInquiry, PropertyEstimate):
+            for signal in (post_save, post_delete):
+                signal.connect(invalidate_page, sender=model,
+                               dispatch_uid=f'main_app.results_page.{model.__name__}.{signal is post_save}')
+        post_delete.connect(discard_status, sender=PropertyInquiry, dispatch_uid='main_app.generation_status')
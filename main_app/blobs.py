@@ -0,0 +1,152 @@
+"""
+Content-addressed storage for the JSON payloads of AI analyses.
+
+A payload is serialized once to canonical JSON (sorted keys, no whitespace)
+and stored in a PayloadBlob identified by the SHA-256 of that text, so
+identical payloads (the OpenAI output kept by both the estimate and its
+analysis log, the same request retried, every ``{}`` of a failed call) share
+one row. Rows point to blobs by their integer id, which is much smaller than
+the digest in the referencing tables.
+
+Payloads are a few hundred bytes, too short for a compressor to find much
+repetition within one, so they are compressed against a preset dictionary of
+the JSON the application writes: zstd when the optional ``zstandard`` package
+is installed, raw deflate otherwise. The codec is stored per blob so either
+can be read back, and a blob is decompressed only when its value is accessed.
+
+Models reference blobs with a foreign key and expose the JSON value through
+``blob_property``; ``store_pending_blobs`` writes new blobs in one statement
+before the rows that point to them.
+"""
+
+import hashlib
+import json
+import zlib
+from typing import Any, Iterable, Tuple
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+ZSTD = 'zstd'
+DEFLATE = 'deflate'
+RAW = 'none'
+CODECS = (ZSTD, DEFLATE, RAW)
+
+ZSTD_LEVEL = 6
+DEFLATE_LEVEL = 6
+
+
+class BlobCodecError(ValueError):
+    """Raised for a blob whose codec cannot be decoded here"""
+
+
+def canonical_json(value: Any) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def digest(text: bytes) -> bytes:
+    return hashlib.sha256(text).digest()
+
+
+def _dictionary() -> bytes:
+    # Canonical JSON of an AI request, its estimate and the OpenAI response
+    # (whose content is the estimate as the model writes it). Stored blobs
+    # depend on these exact bytes: change them only together with new codecs.
+    request = {
+        'address': '', 'current_property': '', 'investment_capacity': '', 'lot_size': 0.0, 'lot_size_unit': 'acres',
+        'preferences_concerns': '', 'property_goals': '', 'region': '',
+    }
+    estimate = {
+        'project_name': '', 'project_description': '', 'confidence_score': 0.0, 'factors_considered': [],
+        'recommendations': [], 'timeline': '', 'risk_assessment': '', 'cash_flow_projection': [],
+        'revenue_breakdown': {
+            'agricultural_sales': [], 'ecosystem_services': [], 'subsidies_incentives': [], 'carbon_credits': [],
+            'timber_sales': [],
+        },
+        'cost_breakdown': {'operational_costs': [], 'infrastructure': [], 'maintenance': [], 'labor': [], 'equipment': []},
+    }
+    response = {
+        'content': json.dumps(estimate), 'finish_reason': 'stop', 'model': 'gpt-4.1-mini',
+        'usage': {'completion_tokens': 0, 'prompt_tokens': 0, 'total_tokens': 0},
+    }
+    return b''.join(canonical_json(value) for value in (request, estimate, response))
+
+
+DICTIONARY = _dictionary()
+_zstd_dictionary = None
+
+
+def _zstd_dict():
+    global _zstd_dictionary
+    if _zstd_dictionary is None:
+        _zstd_dictionary = zstandard.ZstdCompressionDict(DICTIONARY, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+    return _zstd_dictionary
+
+
+def compress(text: bytes) -> Tuple[str, bytes]:
+    """(codec, data) for canonical JSON; kept raw when compression does not pay"""
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=_zstd_dict(), write_dict_id=False)
+        codec, data = ZSTD, compressor.compress(text)
+    else:
+        compressor = zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=DICTIONARY)
+        codec, data = DEFLATE, compressor.compress(text) + compressor.flush()
+    return (codec, data) if len(data) < len(text) else (RAW, text)
+
+
+def decompress(codec: str, data) -> bytes:
+    data = bytes(data)
+    if codec == RAW:
+        return data
+    if codec == DEFLATE:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=DICTIONARY)
+        return decompressor.decompress(data) + decompressor.flush()
+    if codec == ZSTD:
+        if zstandard is None:
+            raise BlobCodecError("This payload is zstd-compressed; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor(dict_data=_zstd_dict()).decompress(data)
+    raise BlobCodecError(f"Unknown payload codec '{codec}'")
+
+
+def blob_fields(model) -> Tuple[str, ...]:
+    """Names of the foreign keys of ``model`` to PayloadBlob"""
+    return tuple(
+        field.name for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model._meta.label == 'main_app.PayloadBlob'
+    )
+
+
+def pending_blobs(objs: Iterable) -> list:
+    """Blobs assigned to ``objs`` that are not stored yet (without loading any)"""
+    blobs = []
+    for obj in objs:
+        for name in blob_fields(type(obj)):
+            blob = obj._meta.get_field(name).get_cached_value(obj, default=None)
+            if blob is not None and blob._state.adding:
+                blobs.append(blob)
+    return blobs
+
+
+def store_pending_blobs(objs: Iterable, using=None) -> None:
+    from .models import PayloadBlob
+
+    blobs = pending_blobs(objs)
+    if blobs:
+        PayloadBlob.store(*blobs, using=using)
+
+
+def blob_property(field_name: str, doc: str) -> property:
+    """JSON value of the PayloadBlob in ``field_name``; assigning a value makes a new (unsaved) blob"""
+
+    def get(self):
+        blob = getattr(self, field_name)
+        return None if blob is None else blob.value
+
+    def set(self, value):
+        from .models import PayloadBlob
+
+        setattr(self, field_name, PayloadBlob.for_value(value))
+
+    return property(get, set, doc=doc)
@@ -0,0 +1,68 @@
+"""
+Chart data for the estimate results page.
+
+``chart_data`` turns an estimate's projections into the payload the results
+page charts and tables draw from: every revenue and cost category, their
+yearly totals, the net cash flow and the 10-year totals. It is embedded in the
+page with ``json_script`` and served on its own by ``chart_data_api`` for
+mobile clients and partner widgets.
+
+Each series has PROJECTION_YEARS values; a missing series or value counts as
+0, except that a missing cash flow value is the year's revenue minus its cost.
+Values are rounded to cents, and whole numbers are written without a decimal
+point.
+"""
+
+from typing import List, Optional
+
+from .models import PropertyEstimate
+from .projections import CASH_FLOW, COST, COST_CATEGORIES, PROJECTION_YEARS, REVENUE, REVENUE_CATEGORIES
+
+# The only columns chart_data reads
+CHART_FIELDS = ('id', 'inquiry_id', 'updated_at', 'projection_series', 'projection_overflow')
+
+
+def _number(value) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _compact(value: float):
+    value = round(value, 2)
+    return int(value) if value.is_integer() else value
+
+
+def _series(values) -> List[Optional[float]]:
+    """PROJECTION_YEARS numbers (None where missing) from a stored series of any shape"""
+    values = values if isinstance(values, list) else []
+    return [_number(value) for value in values[:PROJECTION_YEARS]] + [None] * (PROJECTION_YEARS - len(values))
+
+
+def _group(breakdown, categories) -> dict:
+    breakdown = breakdown if isinstance(breakdown, dict) else {}
+    group = {category: [value or 0.0 for value in _series(breakdown.get(category))] for category in categories}
+    group['total'] = [sum(values) for values in zip(*group.values())]
+    return group
+
+
+def chart_data(estimate: Optional[PropertyEstimate]) -> Optional[dict]:
+    """Series, yearly totals and 10-year totals of an estimate's projections (None without an estimate)"""
+    if estimate is None:
+        return None
+    projections = estimate.projections
+    revenue = _group(projections[REVENUE], REVENUE_CATEGORIES)
+    cost = _group(projections[COST], COST_CATEGORIES)
+    cash_flow = [
+        stored if stored is not None else revenue_total - cost_total
+        for stored, revenue_total, cost_total in zip(_series(projections[CASH_FLOW]), revenue['total'], cost['total'])
+    ]
+    return {
+        'years': list(range(1, PROJECTION_YEARS + 1)),
+        'revenue': {name: [_compact(value) for value in values] for name, values in revenue.items()},
+        'cost': {name: [_compact(value) for value in values] for name, values in cost.items()},
+        'cash_flow': [_compact(value) for value in cash_flow],
+        'totals': {
+            'revenue': _compact(sum(revenue['total'])),
+            'cost': _compact(sum(cost['total'])),
+            'cash_flow': _compact(sum(cash_flow)),
+        },
+    }
@@ -0,0 +1,123 @@
+"""
+HTTP response compression for Valora Earth Django application.
+
+``negotiate`` picks the content coding for a request's ``Accept-Encoding``:
+brotli (``br``) when the optional ``brotli`` package is installed and the
+client accepts it, else gzip. ``compress`` encodes a whole body, and
+``compress_chunks``/``acompress_chunks`` encode a stream one chunk at a time,
+flushing after each chunk so nothing is held back from the client.
+
+Dynamic responses are compressed by CompressionMiddleware at the fast levels
+below; pre-rendered results pages are compressed once per encoding, at the
+highest levels, and served from files (see results_pages.py).
+"""
+
+import zlib
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+BROTLI = 'br'
+GZIP = 'gzip'
+# Preferred first when the client accepts both equally
+ENCODINGS = (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+# Levels for responses compressed on every request (CPU per response vs bytes
+# saved; see ``python manage.py benchmark_compression``)
+DYNAMIC_LEVELS = {BROTLI: 4, GZIP: 6}
+# Levels for bodies compressed once and served many times
+STORED_LEVELS = {BROTLI: 11, GZIP: 9}
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/x-ndjson',
+    'image/svg+xml',
+)
+
+
+def negotiate(accept_encoding: str, encodings=ENCODINGS) -> Optional[str]:
+    """The accepted encoding with the highest q-value (ties go by ``encodings`` order), or None"""
+    qualities = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    wildcard = qualities.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.split(';', 1)[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) or content_type.endswith(('+json', '+xml'))
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    level = DYNAMIC_LEVELS[encoding] if level is None else level
+    if encoding == BROTLI:
+        return brotli.compress(data, quality=level)
+    # wbits=31 writes a gzip container (no file name or mtime, so equal bodies compress equally)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class StreamCompressor:
+    """Incremental encoder whose output so far is decodable after each ``compress`` call"""
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        level = DYNAMIC_LEVELS[encoding] if level is None else level
+        self.encoding = encoding
+        if encoding == BROTLI:
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if not chunk:
+            return b''
+        if self.encoding == BROTLI:
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == BROTLI:
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_chunks(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_chunks(chunks: AsyncIterable[bytes], encoding: str) -> AsyncIterator[bytes]:
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
@@ -0,0 +1,118 @@
+"""
+Read-replica database router for Valora Earth.
+
+Writes always go to ``default``. Reads go to a replica only inside code that
+opted in with ``read_from_replica`` (read-only views such as estimate_results,
+exports and analytics) and only while the client is not pinned to the primary.
+
+A client is pinned for ``READ_YOUR_WRITES_WINDOW`` seconds after any request of
+theirs performed a write (tracked with a cookie by ReplicaStickinessMiddleware),
+and for the rest of a request once it has written, so a freshly generated
+estimate is always read back from the primary.
+"""
+
+import functools
+import random
+from asyncio import iscoroutinefunction
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+
+PRIMARY_DATABASE = 'default'
+
+
+@dataclass
+class RoutingState:
+    """Per-request routing flags (mutable so changes made in worker threads are visible)"""
+    use_replica: bool = False
+    pinned: bool = False
+    wrote: bool = False
+
+
+_routing_state: ContextVar[Optional[RoutingState]] = ContextVar('db_routing_state', default=None)
+
+
+def get_routing_state() -> Optional[RoutingState]:
+    """Routing state of the current request or replica scope, if any"""
+    return _routing_state.get()
+
+
+def begin_request(pinned: bool = False) -> RoutingState:
+    """Start a fresh routing scope for a request"""
+    state = RoutingState(pinned=pinned)
+    _routing_state.set(state)
+    return state
+
+
+def replica_aliases():
+    """Configured replica database aliases"""
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+@contextmanager
+def replica_reads():
+    """Route reads inside the block to a replica (unless pinned to the primary)"""
+    state = _routing_state.get()
+    token = None
+    if state is None:
+        token = _routing_state.set(RoutingState())
+        state = _routing_state.get()
+    previous = state.use_replica
+    state.use_replica = True
+    try:
+        yield state
+    finally:
+        state.use_replica = previous
+        if token is not None:
+            _routing_state.reset(token)
+
+
+def read_from_replica(view_func):
+    """Decorator for read-only views (sync or async) whose queries may use a replica"""
+    if iscoroutinefunction(view_func):
+        @functools.wraps(view_func)
+        async def async_wrapper(*args, **kwargs):
+            with replica_reads():
+                return await view_func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return view_func(*args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """Send opted-in reads to a random replica and everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if state is None or not state.use_replica or state.pinned or state.wrote:
+            return None
+        replicas = replica_aliases()
+        if not replicas:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary, so relations across them are fine
+        databases = {PRIMARY_DATABASE, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are populated by replication (or sync_sqlite_replicas), never migrated
+        if db in replica_aliases():
+            return False
+        return None
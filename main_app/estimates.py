@@ -0,0 +1,207 @@
+"""
+Estimate generation for Valora Earth Django application.
+
+The single code path that turns a PropertyInquiry into a PropertyEstimate: it
+calls the AI service, then stores the estimate (as an upsert, so regeneration
+replaces it, in one transaction with its regional statistics and, for a
+regeneration, its version history) and the AIAnalysisLog concurrently, then
+the raw response in EstimatePayload (the log and the payload share one stored
+copy of it) and pre-renders its results page. Used by the generate_ai_estimate
+view and for batches of imported inquiries.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .ai_models import AIAnalysisResult, PropertyInquiryRequest
+from .ai_service import ValoraEarthAIService
+from .generation_status import SAVING, arecord_stage
+from .models import AIAnalysisLog, EstimatePayload, PayloadBlob, PropertyEstimate, PropertyInquiry
+from .projections import ProjectionSeries
+from .regional_stats import CANONICAL_FIELDS, apply_samples, estimate_sample, values_sample
+from .results_pages import store_page
+from .utils.db_utils import async_create, async_filter, submit_background, upsert
+from .versions import record_version, stored_state
+
+logger = logging.getLogger(__name__)
+
+
+def inquiry_request_for(inquiry: PropertyInquiry) -> PropertyInquiryRequest:
+    """Validated AI request for a stored inquiry"""
+    return PropertyInquiryRequest(
+        address=inquiry.address,
+        lot_size=float(inquiry.lot_size),
+        lot_size_unit=inquiry.lot_size_unit,
+        current_property=inquiry.current_property,
+        property_goals=inquiry.property_goals,
+        investment_capacity=inquiry.investment_capacity,
+        preferences_concerns=inquiry.preferences_concerns,
+        region=inquiry.region
+    )
+
+
+def estimate_defaults(ai_result: AIAnalysisResult) -> dict:
+    """PropertyEstimate field values for an AI result"""
+    projection_series, projection_overflow = ProjectionSeries.pack(
+        ai_result.estimate.cash_flow_projection, ai_result.estimate.revenue_breakdown, ai_result.estimate.cost_breakdown,
+    )
+    return {
+        'project_name': ai_result.estimate.project_name,
+        'project_description': ai_result.estimate.project_description,
+        'confidence_score': ai_result.estimate.confidence_score,
+        'factors_considered': ai_result.estimate.factors_considered,
+        'recommendations': ai_result.estimate.recommendations,
+        'timeline': ai_result.estimate.timeline,
+        'risk_assessment': ai_result.estimate.risk_assessment,
+        'projection_series': projection_series,
+        'projection_overflow': projection_overflow,
+        'processing_time': ai_result.processing_time,
+    }
+
+
+def replace_estimate(inquiry: PropertyInquiry, defaults: dict) -> Tuple[PropertyEstimate, Optional[dict]]:
+    """
+    Upsert the inquiry's estimate, swap it into the regional statistics and
+    keep the replaced one as a version, in one transaction
+
+    The inquiry row is locked first, so concurrent regenerations of an estimate
+    take turns: each subtracts the estimate the other stored and extends the
+    version chain the other wrote. Returns the estimate and the replaced one's
+    stored_state (None for a first estimate).
+    """
+    with transaction.atomic():
+        # Its stored canonical region keys the statistics (the same for the replaced estimate)
+        canonical = PropertyInquiry.objects.select_for_update(of=('self',)).filter(pk=inquiry.pk).values_list(
+            *CANONICAL_FIELDS
+        ).first()
+        if canonical is None:
+            raise PropertyInquiry.DoesNotExist(f"Inquiry {inquiry.pk} no longer exists")
+        previous = stored_state(inquiry)
+        estimate = upsert(PropertyEstimate, ['inquiry'], defaults, inquiry=inquiry)
+        apply_samples(
+            [estimate_sample(inquiry, canonical, estimate)],
+            [values_sample(inquiry, canonical, previous)] if previous else [],
+        )
+        if previous is not None:
+            record_version(estimate.id, previous, defaults)
+    return estimate, previous
+
+
+async def persist_estimate(inquiry: PropertyInquiry, inquiry_request: PropertyInquiryRequest,
+                           ai_result: AIAnalysisResult) -> Tuple[PropertyEstimate, AIAnalysisLog]:
+    """Store the estimate (insert or replace) and its analysis log concurrently"""
+    defaults = estimate_defaults(ai_result)
+    # The OpenAI output is serialized once and shared by the log and the estimate payload
+    request_blob = PayloadBlob.for_value(inquiry_request.model_dump(mode='json'))
+    response_blob = PayloadBlob.for_value(ai_result.openai_response.model_dump(mode='json'))
+    await sync_to_async(PayloadBlob.store)(request_blob, response_blob)
+    try:
+        (estimate, previous), ai_log = await asyncio.gather(
+            sync_to_async(replace_estimate)(inquiry, defaults),
+            async_create(AIAnalysisLog,
+                inquiry=inquiry,
+                request_blob=request_blob,
+                response_blob=response_blob,
+                model_used=ai_result.openai_response.model,
+                tokens_used=ai_result.openai_response.usage.get('total_tokens', 0),
+                processing_time=ai_result.processing_time,
+                success=True
+            )
+        )
+    except Exception as e:
+        logger.exception(f"Error storing the estimate of inquiry {inquiry.id}")
+        raise Exception(f"Database operation failed: {str(e)}") from e
+
+    if not estimate or not hasattr(estimate, 'id'):
+        raise Exception("Invalid estimate object returned from database")
+    # The raw response goes to the side table, replacing a regenerated estimate's
+    estimate.payload = await sync_to_async(EstimatePayload.store)(estimate, response_blob)
+    # Replaces a regenerated estimate's page
+    await sync_to_async(store_page)(inquiry, estimate)
+    return estimate, ai_log
+
+
+async def generate_estimate(inquiry: PropertyInquiry, ai_service: Optional[ValoraEarthAIService] = None,
+                            report_progress: bool = False) -> Tuple[PropertyEstimate, AIAnalysisLog]:
+    """Run the AI analysis for an inquiry and persist the result
+
+    With ``report_progress`` its stages are recorded for ``estimate_status``
+    (up to ``saving``; the caller records ``done`` or ``failed``).
+    """
+    ai_service = ai_service or ValoraEarthAIService()
+    inquiry_request = inquiry_request_for(inquiry)
+    if not report_progress:
+        ai_result = await ai_service.generate_property_estimate_async(inquiry_request)
+        return await persist_estimate(inquiry, inquiry_request, ai_result)
+
+    async def progress(stage):
+        await arecord_stage(inquiry.id, stage)
+
+    ai_result = await ai_service.generate_property_estimate_async(inquiry_request, progress=progress)
+    await progress(SAVING)
+    return await persist_estimate(inquiry, inquiry_request, ai_result)
+
+
+async def log_failure(inquiry: PropertyInquiry, error: Exception) -> AIAnalysisLog:
+    """Record a failed analysis"""
+    return await async_create(AIAnalysisLog,
+        inquiry=inquiry,
+        request_data={},
+        response_data={},
+        model_used='unknown',
+        tokens_used=0,
+        processing_time=0,
+        success=False,
+        error_message=str(error)
+    )
+
+
+@dataclass
+class GenerationSummary:
+    """Outcome of a batch of estimate generations"""
+    succeeded: List[int] = field(default_factory=list)
+    failed: List[int] = field(default_factory=list)
+
+
+async def generate_estimates(inquiry_ids: Iterable[int], concurrency: Optional[int] = None,
+                             ai_service: Optional[ValoraEarthAIService] = None) -> GenerationSummary:
+    """Generate estimates for many inquiries with at most ``concurrency`` AI calls in flight"""
+    concurrency = concurrency or settings.ESTIMATE_GENERATION_CONCURRENCY
+    semaphore = asyncio.Semaphore(concurrency)
+    ai_service = ai_service or ValoraEarthAIService()
+    summary = GenerationSummary()
+
+    async def generate_one(inquiry):
+        async with semaphore:
+            try:
+                await generate_estimate(inquiry, ai_service)
+                summary.succeeded.append(inquiry.id)
+            except Exception as e:
+                logger.error(f"Estimate generation failed for inquiry {inquiry.id}: {str(e)}")
+                summary.failed.append(inquiry.id)
+                await log_failure(inquiry, e)
+
+    inquiry_ids = list(inquiry_ids)
+    # Load inquiries a chunk at a time so huge imports don't hold every row in memory
+    chunk_size = concurrency * 50
+    for start in range(0, len(inquiry_ids), chunk_size):
+        inquiries = await async_filter(PropertyInquiry, id__in=inquiry_ids[start:start + chunk_size])
+        await asyncio.gather(*(generate_one(inquiry) for inquiry in inquiries))
+    return summary
+
+
+def run_estimates(inquiry_ids: Iterable[int], concurrency: Optional[int] = None) -> GenerationSummary:
+    """Generate estimates from synchronous code; database work runs on the calling thread"""
+    return async_to_sync(generate_estimates)(list(inquiry_ids), concurrency)
+
+
+def enqueue_estimates(inquiry_ids: Iterable[int], concurrency: Optional[int] = None) -> Future:
+    """Generate estimates on the background thread pool, which outlives the request that queued them"""
+    return submit_background(run_estimates, list(inquiry_ids), concurrency)
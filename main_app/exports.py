@@ -0,0 +1,224 @@
+"""
+Streaming CSV/JSONL exports of inquiries, estimates and AI analysis logs.
+
+Rows are read with ``QuerySet.iterator(chunk_size=...)`` (a server-side cursor
+on PostgreSQL, incremental ``fetchmany`` on SQLite) and encoded straight into
+output chunks, optionally gzip-compressed on the fly, so memory use depends on
+the chunk size and never on the table size. Projection series are flattened
+into ``<series>_year1`` .. ``<series>_year10`` columns, all read from the
+row's ``projections`` (decoded once per row).
+"""
+
+import csv
+import json
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+
+from .models import (
+    AIAnalysisLog,
+    COST_CATEGORIES,
+    PROJECTION_YEARS,
+    PropertyEstimate,
+    PropertyInquiry,
+    REVENUE_CATEGORIES,
+)
+from .projections import CASH_FLOW, COST, REVENUE
+
+DEFAULT_CHUNK_SIZE = 2000
+# Flush encoded rows to the client roughly this many bytes at a time
+OUTPUT_BUFFER_SIZE = 64 * 1024
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+Column = Tuple[str, Callable[[Any], Any]]
+
+
+def attribute(name: str) -> Column:
+    return name, lambda obj: getattr(obj, name)
+
+
+def series_columns(prefix: str, getter: Callable[[Any], Any]) -> List[Column]:
+    """``<prefix>_year1`` .. ``<prefix>_yearN`` columns for a 10-year series"""
+    def year_getter(index):
+        def get(obj):
+            series = getter(obj)
+            if isinstance(series, list) and index < len(series):
+                return series[index]
+            return None
+        return get
+    return [(f'{prefix}_year{index + 1}', year_getter(index)) for index in range(PROJECTION_YEARS)]
+
+
+def breakdown_getter(group: str, category: str) -> Callable[[Any], Any]:
+    def get(obj):
+        breakdown = obj.projections[group]
+        return breakdown.get(category) if isinstance(breakdown, dict) else None
+    return get
+
+
+@dataclass(frozen=True)
+class ExportSpec:
+    """A dataset that can be exported: its rows and columns"""
+    queryset: Callable[[], QuerySet]
+    columns: Tuple[Column, ...]
+
+    @property
+    def header(self) -> List[str]:
+        return [name for name, _ in self.columns]
+
+    def row(self, obj) -> List[Any]:
+        return [getter(obj) for _, getter in self.columns]
+
+
+INQUIRY_COLUMNS = tuple(attribute(name) for name in (
+    'id', 'address', 'lot_size', 'lot_size_unit', 'region', 'latitude', 'longitude', 'current_property',
+    'property_goals', 'investment_capacity', 'preferences_concerns', 'created_at',
+))
+
+ESTIMATE_COLUMNS = (
+    *(attribute(name) for name in ('id', 'inquiry_id')),
+    ('inquiry_address', lambda estimate: estimate.inquiry.address),
+    ('inquiry_region', lambda estimate: estimate.inquiry.region),
+    *(attribute(name) for name in (
+        'project_name', 'project_description', 'confidence_score', 'timeline',
+        'risk_assessment', 'factors_considered', 'recommendations', 'processing_time', 'created_at',
+    )),
+    *series_columns('cash_flow', lambda estimate: estimate.projections[CASH_FLOW]),
+    *(column for category in REVENUE_CATEGORIES
+      for column in series_columns(f'revenue_{category}', breakdown_getter(REVENUE, category))),
+    *(column for category in COST_CATEGORIES
+      for column in series_columns(f'cost_{category}', breakdown_getter(COST, category))),
+)
+
+LOG_COLUMNS = tuple(attribute(name) for name in (
+    'id', 'inquiry_id', 'model_used', 'tokens_used', 'processing_time', 'success',
+    'error_message', 'request_data', 'response_data', 'created_at',
+))
+
+EXPORTS: Dict[str, ExportSpec] = {
+    'inquiries': ExportSpec(
+        queryset=lambda: PropertyInquiry.objects.order_by('id'),
+        columns=INQUIRY_COLUMNS,
+    ),
+    'estimates': ExportSpec(
+        # The detail lists are exported; the raw AI response (EstimatePayload) is not
+        queryset=lambda: PropertyEstimate.objects.with_details().select_related('inquiry').order_by('id'),
+        columns=ESTIMATE_COLUMNS,
+    ),
+    'logs': ExportSpec(
+        # Payload blobs are joined, not fetched per row
+        queryset=lambda: AIAnalysisLog.objects.select_related('request_blob', 'response_blob').order_by('id'),
+        columns=LOG_COLUMNS,
+    ),
+}
+
+
+class ExportError(ValueError):
+    """Raised for an unknown dataset or format"""
+
+
+def get_export(dataset: str, fmt: str) -> ExportSpec:
+    if dataset not in EXPORTS:
+        raise ExportError(f"Unknown dataset '{dataset}'. Choose from: {', '.join(EXPORTS)}")
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+    return EXPORTS[dataset]
+
+
+def iter_objects(spec: ExportSpec, chunk_size: int = DEFAULT_CHUNK_SIZE, queryset: Optional[QuerySet] = None) -> Iterator[Any]:
+    """Stream model instances without caching the queryset"""
+    queryset = spec.queryset() if queryset is None else queryset
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+class _LineBuffer:
+    """File-like sink for csv.writer that hands back what was written"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    return value
+
+
+def encode_csv(spec: ExportSpec, objects: Iterable[Any]) -> Iterator[str]:
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(spec.header)
+    for obj in objects:
+        yield writer.writerow([csv_value(value) for value in spec.row(obj)])
+
+
+def encode_jsonl(spec: ExportSpec, objects: Iterable[Any]) -> Iterator[str]:
+    header = spec.header
+    for obj in objects:
+        yield json.dumps(dict(zip(header, spec.row(obj))), cls=DjangoJSONEncoder) + '\n'
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'jsonl': encode_jsonl,
+}
+
+
+def buffered(lines: Iterable[str], size: int = OUTPUT_BUFFER_SIZE) -> Iterator[bytes]:
+    """Join small encoded rows into chunks of about ``size`` bytes"""
+    pending: List[bytes] = []
+    pending_size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        pending.append(data)
+        pending_size += len(data)
+        if pending_size >= size:
+            yield b''.join(pending)
+            pending, pending_size = [], 0
+    if pending:
+        yield b''.join(pending)
+
+
+def gzipped(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Gzip a byte stream incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(dataset: str, fmt: str = 'csv', compress: bool = False,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, queryset: Optional[QuerySet] = None) -> Iterator[bytes]:
+    """Byte chunks of a complete export"""
+    spec = get_export(dataset, fmt)
+    chunks = buffered(ENCODERS[fmt](spec, iter_objects(spec, chunk_size, queryset)))
+    return gzipped(chunks) if compress else chunks
+
+
+async def aiterate(chunks: Iterator[bytes]):
+    """
+    Drive a synchronous export from async code one chunk at a time
+
+    Under ASGI Django would otherwise load a synchronous streaming iterator
+    into memory in full. Each step runs in the thread-sensitive executor, so
+    the database cursor stays on a single connection.
+    """
+    step = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await step(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def export_filename(dataset: str, fmt: str, compress: bool, timestamp: str) -> str:
+    return f"valora_{dataset}_{timestamp}.{fmt}{'.gz' if compress else ''}"
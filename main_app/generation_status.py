@@ -0,0 +1,175 @@
+"""
+Estimate generation status, for the loading screen's progress.
+
+Generating an estimate goes through the stages in STAGES: ``queued`` when the
+questionnaire creates the inquiry, ``calling_model`` and ``parsing`` in the AI
+service, ``saving`` while the estimate is stored, then ``done`` (with the
+results page URL) or ``failed`` (with the error). Each change is recorded with
+its time in ESTIMATE_STATUS_DIR/<inquiry id % 1000>/<inquiry id>.json,
+written to a temporary file and renamed into place like the results pages, so
+any worker process can answer ``estimate_status`` without a query.
+
+``wait_for_change`` is the long-poll: it returns as soon as the status moves
+past the version the client has seen. Changes recorded in the same process
+wake waiters at once; changes recorded by another process are noticed within
+POLL_INTERVAL seconds. Only estimates generated for a visitor report their
+status; batches for imported inquiries don't.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+QUEUED, CALLING_MODEL, PARSING, SAVING, DONE, FAILED = STAGES = (
+    'queued', 'calling_model', 'parsing', 'saving', 'done', 'failed',
+)
+FINAL_STAGES = (DONE, FAILED)
+SHARDS = 1000
+# Seconds between checks for changes recorded by other processes
+POLL_INTERVAL = 0.25
+# Longest wait a client may ask for, below common proxy read timeouts
+MAX_WAIT = 25
+
+# Events of the requests waiting in this process, by inquiry id, with their loops
+_waiters: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+_waiters_lock = threading.Lock()
+
+
+class GenerationStatus(NamedTuple):
+    stages: List[Tuple[str, float]]
+    results_url: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def stage(self) -> str:
+        return self.stages[-1][0]
+
+    @property
+    def version(self) -> int:
+        """Number of stages recorded, which the client sends back to wait for the next one"""
+        return len(self.stages)
+
+    @property
+    def final(self) -> bool:
+        return self.stage in FINAL_STAGES
+
+    def as_json(self, now: Optional[float] = None) -> dict:
+        """The status with each stage's start and duration (the current one's so far) in milliseconds"""
+        now = time.time() if now is None else now
+        started = self.stages[0][1]
+        # A stage ends when the next one starts; the final stage takes no time
+        ends = [start for _, start in self.stages[1:]] + [self.stages[-1][1] if self.final else now]
+        return {
+            'stage': self.stage,
+            'version': self.version,
+            'final': self.final,
+            'elapsed_ms': round((ends[-1] - started) * 1000),
+            'stages': [
+                {'stage': stage, 'started_ms': round((start - started) * 1000), 'duration_ms': round((end - start) * 1000)}
+                for (stage, start), end in zip(self.stages, ends)
+            ],
+            'results_url': self.results_url,
+            'error': self.error,
+        }
+
+
+def status_path(inquiry_id: int) -> Path:
+    return Path(settings.ESTIMATE_STATUS_DIR) / f'{inquiry_id % SHARDS:03d}' / f'{inquiry_id}.json'
+
+
+def read_status(inquiry_id: int) -> Optional[GenerationStatus]:
+    try:
+        data = json.loads(status_path(inquiry_id).read_bytes())
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        logger.error(f"Unreadable estimate status of inquiry {inquiry_id}")
+        return None
+    return GenerationStatus([tuple(stage) for stage in data['stages']], data.get('results_url'), data.get('error'))
+
+
+def record_stage(inquiry_id: int, stage: str, results_url: Optional[str] = None,
+                 error: Optional[str] = None) -> Optional[GenerationStatus]:
+    """Move an inquiry's generation to ``stage``; ``queued`` starts it over. Failures are only logged"""
+    if stage not in STAGES:
+        raise ValueError(f"Unknown generation stage '{stage}'")
+    try:
+        previous = None if stage == QUEUED else read_status(inquiry_id)
+        # A regeneration starts over from its first stage
+        stages = previous.stages if previous is not None and not previous.final else []
+        status = GenerationStatus(stages + [(stage, time.time())], results_url, error)
+        path = status_path(inquiry_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=f'.{inquiry_id}-')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                json.dump(status._asdict(), file)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+    except Exception as e:
+        logger.error(f"Error recording estimate status of inquiry {inquiry_id}: {str(e)}")
+        return None
+    _notify(inquiry_id)
+    return status
+
+
+async def arecord_stage(inquiry_id: int, stage: str, **kwargs) -> Optional[GenerationStatus]:
+    return await sync_to_async(record_stage, thread_sensitive=False)(inquiry_id, stage, **kwargs)
+
+
+def delete_status(inquiry_id: int) -> None:
+    status_path(inquiry_id).unlink(missing_ok=True)
+
+
+def _notify(inquiry_id: int) -> None:
+    with _waiters_lock:
+        waiters = list(_waiters.get(inquiry_id, ()))
+    for loop, event in waiters:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # The waiter's loop closed meanwhile
+            pass
+
+
+async def wait_for_change(inquiry_id: int, since: Optional[int], timeout: float) -> Optional[GenerationStatus]:
+    """The status once its version differs from ``since`` (or is final), or the unchanged one after ``timeout`` seconds"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(timeout, MAX_WAIT)
+    waiter = (loop, asyncio.Event())
+    with _waiters_lock:
+        _waiters.setdefault(inquiry_id, set()).add(waiter)
+    try:
+        while True:
+            waiter[1].clear()
+            status = read_status(inquiry_id)
+            remaining = deadline - loop.time()
+            if status is None or since is None or status.version != since or status.final or remaining <= 0:
+                return status
+            try:
+                await asyncio.wait_for(waiter[1].wait(), min(remaining, POLL_INTERVAL))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        with _waiters_lock:
+            _waiters[inquiry_id].discard(waiter)
+            if not _waiters[inquiry_id]:
+                del _waiters[inquiry_id]
+
+
+def discard_status(sender, instance, **kwargs) -> None:
+    """post_delete receiver for PropertyInquiry"""
+    delete_status(instance.id)
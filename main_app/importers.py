@@ -0,0 +1,192 @@
+"""
+Bulk import of property inquiries from partner lead lists (CSV or JSONL).
+
+Rows are streamed from the file, validated with PropertyInquiryRequest and
+written with ``bulk_create`` one batch per transaction, so a list of tens of
+thousands of properties costs a few hundred statements instead of one INSERT
+per row. Invalid rows are reported with their line number and skipped; they
+never abort the import. Optional ``latitude``/``longitude`` columns place the
+property; without them it is placed at its region's centre.
+"""
+
+import csv
+import io
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import DatabaseError, transaction
+from pydantic import ValidationError
+
+from .ai_models import PropertyInquiryRequest
+from .models import PropertyInquiry
+from .regions import assign_region
+from .utils.geo import valid_coordinates
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+# Errors kept in the report; the total is always counted
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+LOT_SIZE_UNITS = {value for value, _ in PropertyInquiry._meta.get_field('lot_size_unit').choices}
+
+
+class ImportFormatError(ValueError):
+    """The file cannot be read as the requested format"""
+
+
+@dataclass
+class RowError:
+    """A rejected input row"""
+    line: int
+    message: str
+
+
+@dataclass
+class ImportReport:
+    """Outcome of an import"""
+    imported: int = 0
+    failed: int = 0
+    inquiry_ids: List[int] = field(default_factory=list)
+    errors: List[RowError] = field(default_factory=list)
+
+    def add_error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(line, message))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': [{'line': error.line, 'message': error.message} for error in self.errors],
+        }
+
+
+def detect_format(filename: str) -> str:
+    """Import format from a file name (``.gz`` suffix ignored)"""
+    name = filename.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    raise ImportFormatError(f"Cannot tell the format of '{filename}'. Use a .csv or .jsonl file.")
+
+
+def read_rows(stream, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (line number, row) from a binary or text stream"""
+    if fmt not in IMPORT_FORMATS:
+        raise ImportFormatError(f"Unknown format '{fmt}'. Choose from: {', '.join(IMPORT_FORMATS)}")
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, ImportFormatError(f"Invalid JSON: {e.msg}")
+
+
+def validate_row(row: Any) -> PropertyInquiry:
+    """Build an unsaved PropertyInquiry from an input row; raises ValueError if invalid"""
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    data = {key.strip(): value.strip() if isinstance(value, str) else value for key, value in row.items() if key}
+    data['lot_size_unit'] = (data.get('lot_size_unit') or 'acres').lower()
+    if data['lot_size_unit'] not in LOT_SIZE_UNITS:
+        raise ValueError(f"lot_size_unit must be one of: {', '.join(sorted(LOT_SIZE_UNITS))}")
+    coordinates = parse_coordinates(data.pop('latitude', None), data.pop('longitude', None))
+    request = PropertyInquiryRequest.model_validate(data)
+    inquiry = PropertyInquiry(**request.model_dump())
+    inquiry.latitude, inquiry.longitude = coordinates
+    # bulk_create skips the pre_save receiver that normally sets it
+    assign_region(instance=inquiry)
+    return inquiry
+
+
+def parse_coordinates(latitude: Any, longitude: Any) -> Tuple[Optional[float], Optional[float]]:
+    """Optional (latitude, longitude) of a row; both or neither must be given"""
+    if latitude in (None, '') and longitude in (None, ''):
+        return None, None
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("latitude and longitude must both be numbers")
+    if not valid_coordinates(latitude, longitude):
+        raise ValueError("latitude must be between -90 and 90 and longitude between -180 and 180")
+    return latitude, longitude
+
+
+def describe_validation_error(error: ValidationError) -> str:
+    return '; '.join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}" for item in error.errors()
+    )
+
+
+def save_batch(batch: List[Tuple[int, PropertyInquiry]], report: ImportReport) -> None:
+    """Insert a validated batch in one transaction, falling back to row by row if it fails"""
+    try:
+        with transaction.atomic():
+            created = PropertyInquiry.objects.bulk_create([inquiry for _, inquiry in batch])
+        report.imported += len(created)
+        report.inquiry_ids.extend(inquiry.pk for inquiry in created)
+        return
+    except DatabaseError as e:
+        logger.error(f"Error importing batch starting at line {batch[0][0]}, retrying row by row: {str(e)}")
+
+    for line, inquiry in batch:
+        try:
+            with transaction.atomic():
+                inquiry.save(force_insert=True)
+            report.imported += 1
+            report.inquiry_ids.append(inquiry.pk)
+        except DatabaseError as e:
+            report.add_error(line, f"Database error: {str(e)}")
+
+
+def import_inquiries(rows: Iterable[Tuple[int, Any]], batch_size: int = DEFAULT_BATCH_SIZE,
+                     report: Optional[ImportReport] = None) -> ImportReport:
+    """Validate and insert (line number, row) pairs in batches"""
+    report = report or ImportReport()
+    batch: List[Tuple[int, PropertyInquiry]] = []
+    for line, row in rows:
+        try:
+            batch.append((line, validate_row(row)))
+        except ValidationError as e:
+            report.add_error(line, describe_validation_error(e))
+            continue
+        except ValueError as e:
+            report.add_error(line, str(e))
+            continue
+        if len(batch) >= batch_size:
+            save_batch(batch, report)
+            batch = []
+    if batch:
+        save_batch(batch, report)
+    return report
+
+
+def import_file(stream, fmt: str, batch_size: int = DEFAULT_BATCH_SIZE) -> ImportReport:
+    """Import every row of an open CSV/JSONL file"""
+    report = ImportReport()
+    try:
+        return import_inquiries(read_rows(stream, fmt), batch_size, report)
+    except (UnicodeDecodeError, csv.Error) as e:
+        # The file itself is unreadable from here on; keep what was imported
+        report.add_error(0, f"Could not read the rest of the file: {str(e)}")
+        return report
@@ -0,0 +1,266 @@
+"""
+Tiered retention for AIAnalysisLog.
+
+Logs stay in the database for LOG_RETENTION_DAYS, then ``archive_logs`` moves
+them to append-only segment files in LOG_ARCHIVE_DIR, and ``purge_segments``
+finally deletes segments past a second age limit.
+
+A segment ``<name>.jsonl.gz`` is a series of gzip members of up to
+BLOCK_RECORDS JSON lines each, so the whole file is still ordinary gzipped
+JSONL (``zcat`` reads it). Its sidecar ``<name>.idx`` holds one fixed-width
+entry per log (id, member offset, member length, line within the member) in
+id order: ``find_archived_log`` binary-searches the memory-mapped index and
+decompresses only the member holding that log.
+
+Each chunk of logs is written and fsynced before the transaction that
+deletes those rows and advances the segment's committed ``entries`` and
+``size``. After a crash the segment may hold bytes past them, which readers
+ignore; the rows are still in the database and are archived again into a new
+segment on the next run. PayloadBlobs no longer referenced by any log or
+estimate payload are deleted afterwards, also in chunks, unless they were
+stored within BLOB_GRACE_PERIOD: writers upsert a blob (refreshing its
+``stored_at``) before inserting the rows that refer to it, in separate
+transactions.
+"""
+
+import gzip
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .blobs import canonical_json
+from .models import AIAnalysisLog, EstimatePayload, LogSegment, PayloadBlob, PropertyInquiry
+
+# Log id, member offset, member length, line within the member
+INDEX_ENTRY = struct.Struct('<qqII')
+BLOCK_RECORDS = 64
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+GZIP_LEVEL = 6
+# Unreferenced blobs stored (or reused) more recently than this are kept
+BLOB_GRACE_PERIOD = timedelta(hours=1)
+
+# Inquiry columns an archived log does not need (it keeps the address)
+INQUIRY_DEFER = (
+    'inquiry__current_property', 'inquiry__property_goals',
+    'inquiry__investment_capacity', 'inquiry__preferences_concerns',
+)
+
+
+class ArchiveResult(NamedTuple):
+    logs: int
+    segments: int
+    blobs: int
+
+
+def archive_dir() -> Path:
+    return Path(settings.LOG_ARCHIVE_DIR)
+
+
+def segment_paths(name: str):
+    """(segment, index) file paths of a segment"""
+    directory = archive_dir()
+    return directory / f'{name}.jsonl.gz', directory / f'{name}.idx'
+
+
+def log_record(log: AIAnalysisLog) -> dict:
+    return {
+        'id': log.id,
+        'inquiry_id': log.inquiry_id,
+        'inquiry_address': log.inquiry.address,
+        'request_data': log.request_data,
+        'response_data': log.response_data,
+        'model_used': log.model_used,
+        'tokens_used': log.tokens_used,
+        'processing_time': log.processing_time,
+        'success': log.success,
+        'error_message': log.error_message,
+        'created_at': log.created_at.isoformat(),
+    }
+
+
+def log_from_record(record: dict, segment: LogSegment) -> AIAnalysisLog:
+    """An unsaved AIAnalysisLog for an archived record; ``archive_segment`` tells it apart"""
+    log = AIAnalysisLog(
+        id=record['id'], inquiry_id=record['inquiry_id'], model_used=record['model_used'],
+        tokens_used=record['tokens_used'], processing_time=record['processing_time'], success=record['success'],
+        error_message=record['error_message'], created_at=datetime.fromisoformat(record['created_at']),
+    )
+    # The inquiry may have been deleted since; the log only displays its address
+    log.inquiry = PropertyInquiry(id=record['inquiry_id'], address=record['inquiry_address'])
+    log.request_data = record['request_data']
+    log.response_data = record['response_data']
+    log.archive_segment = segment
+    return log
+
+
+class SegmentWriter:
+    """Appends blocks of logs to a new segment; ``commit`` records what was written in the LogSegment row"""
+
+    def __init__(self, first_log_id: int):
+        archive_dir().mkdir(parents=True, exist_ok=True)
+        name = f'aianalysislog-{timezone.now():%Y%m%d%H%M%S}-{first_log_id}'
+        # Saved by the first commit, so a segment row always describes committed logs
+        self.segment = LogSegment(name=name, first_log_id=first_log_id)
+        segment_path, index_path = segment_paths(name)
+        self.data = open(segment_path, 'xb')
+        self.index = open(index_path, 'xb')
+        self.size = 0
+        self.entries = 0
+
+    def write(self, logs: List[AIAnalysisLog]) -> None:
+        for start in range(0, len(logs), BLOCK_RECORDS):
+            block = logs[start:start + BLOCK_RECORDS]
+            member = gzip.compress(
+                b''.join(canonical_json(log_record(log)) + b'\n' for log in block), GZIP_LEVEL, mtime=0,
+            )
+            self.data.write(member)
+            self.index.write(b''.join(
+                INDEX_ENTRY.pack(log.id, self.size, len(member), line) for line, log in enumerate(block)
+            ))
+            self.size += len(member)
+            self.entries += len(block)
+        for file in (self.data, self.index):
+            file.flush()
+            os.fsync(file.fileno())
+
+    def commit(self, logs: List[AIAnalysisLog]) -> None:
+        """Advance the committed extent past ``logs`` (call inside the transaction deleting them)"""
+        segment = self.segment
+        segment.last_log_id = logs[-1].id
+        segment.entries, segment.size = self.entries, self.size
+        created = [log.created_at for log in logs]
+        segment.oldest_log_at = min(created + ([segment.oldest_log_at] if segment.oldest_log_at else []))
+        segment.newest_log_at = max(created + ([segment.newest_log_at] if segment.newest_log_at else []))
+        segment.save()
+
+    def close(self) -> None:
+        self.data.close()
+        self.index.close()
+
+
+def archive_logs(older_than: datetime, chunk_size: int = 500) -> ArchiveResult:
+    """Move logs created before ``older_than`` to segment files, deleting them a chunk per transaction"""
+    queryset = (
+        AIAnalysisLog.objects.filter(created_at__lt=older_than)
+        .select_related('inquiry', 'request_blob', 'response_blob').defer(*INQUIRY_DEFER).order_by('id')
+    )
+    archived = segments = 0
+    blob_ids = set()
+    writer: Optional[SegmentWriter] = None
+    last_id = 0
+    try:
+        while True:
+            logs = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not logs:
+                break
+            last_id = logs[-1].id
+            if writer is not None and writer.size >= SEGMENT_MAX_BYTES:
+                writer.close()
+                writer = None
+            if writer is None:
+                writer = SegmentWriter(logs[0].id)
+                segments += 1
+            writer.write(logs)
+            with transaction.atomic():
+                AIAnalysisLog.objects.filter(id__in=[log.id for log in logs]).delete()
+                writer.commit(logs)
+            archived += len(logs)
+            for log in logs:
+                blob_ids.update((log.request_blob_id, log.response_blob_id))
+    finally:
+        if writer is not None:
+            writer.close()
+    return ArchiveResult(archived, segments, delete_unused_blobs(blob_ids, chunk_size))
+
+
+def delete_unused_blobs(blob_ids, chunk_size: int = 500) -> int:
+    """
+    Delete those of ``blob_ids`` that no log or estimate payload refers to and
+    that were not stored within BLOB_GRACE_PERIOD. Each chunk locks its blobs
+    before looking for references, so a concurrent ``PayloadBlob.store`` of
+    the same digest either waits and inserts it again or refreshes
+    ``stored_at`` first and keeps it
+    """
+    deleted = 0
+    blob_ids = sorted(blob_ids)
+    for start in range(0, len(blob_ids), chunk_size):
+        with transaction.atomic():
+            candidates = list(
+                PayloadBlob.objects.select_for_update()
+                .filter(id__in=blob_ids[start:start + chunk_size], stored_at__lt=timezone.now() - BLOB_GRACE_PERIOD)
+                .order_by('id').values_list('id', flat=True)
+            )
+            unused = PayloadBlob.objects.filter(id__in=candidates).exclude(
+                Exists(AIAnalysisLog.objects.filter(request_blob=OuterRef('pk')))
+            ).exclude(
+                Exists(AIAnalysisLog.objects.filter(response_blob=OuterRef('pk')))
+            ).exclude(
+                Exists(EstimatePayload.objects.filter(response_blob=OuterRef('pk')))
+            )
+            deleted += unused.delete()[0]
+    return deleted
+
+
+def purge_segments(older_than: datetime) -> int:
+    """Delete segments whose newest log was created before ``older_than``"""
+    purged = 0
+    for segment in LogSegment.objects.filter(newest_log_at__lt=older_than):
+        for path in segment_paths(segment.name):
+            path.unlink(missing_ok=True)
+        segment.delete()
+        purged += 1
+    return purged
+
+
+def retention_cutoff(days: int) -> datetime:
+    return timezone.now() - timedelta(days=days)
+
+
+def _find_entry(index_path: Path, entries: int, log_id: int):
+    with open(index_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as index:
+        low, high = 0, min(entries, len(index) // INDEX_ENTRY.size)
+        while low < high:
+            middle = (low + high) // 2
+            entry = INDEX_ENTRY.unpack_from(index, middle * INDEX_ENTRY.size)
+            if entry[0] == log_id:
+                return entry
+            if entry[0] < log_id:
+                low = middle + 1
+            else:
+                high = middle
+    return None
+
+
+def find_archived_log(log_id: int) -> Optional[AIAnalysisLog]:
+    """The archived log with this id, decompressing only its block, or None"""
+    segments = LogSegment.objects.filter(first_log_id__lte=log_id, last_log_id__gte=log_id)
+    for segment in segments:
+        segment_path, index_path = segment_paths(segment.name)
+        try:
+            entry = _find_entry(index_path, segment.entries, log_id)
+            if entry is None:
+                continue
+            _, offset, length, line = entry
+            with open(segment_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                block = gzip.decompress(data[offset:offset + length])
+        except FileNotFoundError:
+            continue
+        return log_from_record(json.loads(block.splitlines()[line]), segment)
+    return None
+
+
+def archived_log_ids(segment: LogSegment, limit: int) -> List[int]:
+    """Ids of the first ``limit`` logs of a segment, read from its index alone"""
+    _, index_path = segment_paths(segment.name)
+    with open(index_path, 'rb') as file:
+        index = file.read(min(segment.entries, limit) * INDEX_ENTRY.size)
+    return [entry[0] for entry in INDEX_ENTRY.iter_unpack(index)]
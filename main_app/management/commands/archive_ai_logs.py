@@ -0,0 +1,49 @@
+"""
+Move old AIAnalysisLog rows to compressed segment files (see main_app/log_archive.py).
+
+    python manage.py archive_ai_logs                          # logs older than LOG_RETENTION_DAYS
+    python manage.py archive_ai_logs --days 30 --chunk-size 200
+    python manage.py archive_ai_logs --purge-segments-after 365
+
+Rows are deleted a chunk per transaction, so the write lock is held only
+briefly; archived logs stay readable in the admin. With
+--purge-segments-after, segments whose newest log is older than that many
+days are deleted too.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.log_archive import archive_logs, purge_segments, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Archive AIAnalysisLog rows past the retention period to compressed segment files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Keep this many days of logs (default LOG_RETENTION_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Logs archived and deleted per transaction')
+        parser.add_argument('--purge-segments-after', type=int, default=None, metavar='DAYS',
+                            help='Also delete segments whose newest log is older than this many days')
+
+    def handle(self, *args, **options):
+        days = settings.LOG_RETENTION_DAYS if options['days'] is None else options['days']
+        if days < 0:
+            raise CommandError('--days cannot be negative')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        purge_days = options['purge_segments_after']
+        if purge_days is not None and purge_days < days:
+            raise CommandError('--purge-segments-after cannot be shorter than the retention period')
+
+        started = time.perf_counter()
+        result = archive_logs(retention_cutoff(days), options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result.logs} logs older than {days} days into {result.segments} segments and deleted "
+            f"{result.blobs} unused payloads in {time.perf_counter() - started:.1f}s"
+        ))
+        if purge_days is not None:
+            purged = purge_segments(retention_cutoff(purge_days))
+            self.stdout.write(self.style.SUCCESS(f"Purged {purged} segments older than {purge_days} days"))
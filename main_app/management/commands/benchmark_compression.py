@@ -0,0 +1,130 @@
+"""
+Benchmark response compression: CPU time per response against bytes saved.
+
+Compresses representative bodies (a results page, the generate_ai_estimate
+JSON, the chart JSON and a 64 KB chunk of the estimates CSV export), built
+from canned estimates without touching the database, at each brotli and gzip
+level of interest, and prints the compressed size, the share saved and the
+CPU time per response.
+
+    python manage.py benchmark_compression
+    python manage.py benchmark_compression --iterations 200 --json
+"""
+
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template.loader import render_to_string
+
+from main_app.ai_models import PropertyInquiryRequest
+from main_app.charts import chart_data
+from main_app.compression import BROTLI, DYNAMIC_LEVELS, ENCODINGS, GZIP, STORED_LEVELS, compress
+from main_app.estimates import estimate_defaults
+from main_app.exports import EXPORTS, OUTPUT_BUFFER_SIZE, buffered, encode_csv
+from main_app.management.commands.benchmark_estimate_flow import canned_analysis_result
+from main_app.models import PropertyEstimate, PropertyInquiry
+from main_app.results_pages import TEMPLATE, page_context
+
+LEVELS = {BROTLI: (1, 4, 6, 11), GZIP: (1, 6, 9)}
+REGIONS = ('Oregon', 'Kenya', 'Queensland', 'Bavaria', 'Minas Gerais', 'Punjab')
+
+
+def sample_estimate(rng: random.Random, inquiry_id: int) -> PropertyEstimate:
+    inquiry = PropertyInquiry(
+        id=inquiry_id, address=f"{rng.randint(1, 9999)} Benchmark Road", lot_size=rng.randint(1, 500),
+        lot_size_unit='acres', region=rng.choice(REGIONS), current_property="Pasture with a small orchard",
+        property_goals="Agroforestry", investment_capacity="$100,000", preferences_concerns="Low maintenance",
+    )
+    ai_result = canned_analysis_result(PropertyInquiryRequest(
+        address=inquiry.address, lot_size=inquiry.lot_size, lot_size_unit=inquiry.lot_size_unit, region=inquiry.region,
+        current_property=inquiry.current_property, property_goals=inquiry.property_goals,
+        investment_capacity=inquiry.investment_capacity, preferences_concerns=inquiry.preferences_concerns,
+    ))
+    # Vary the series so rows are not identical
+    scale = rng.uniform(0.2, 5)
+    estimate = ai_result.estimate
+    estimate.cash_flow_projection = [round(value * scale * rng.uniform(0.8, 1.2), 2) for value in estimate.cash_flow_projection]
+    for breakdown in (estimate.revenue_breakdown, estimate.cost_breakdown):
+        for category, values in breakdown.items():
+            breakdown[category] = [round(value * scale * rng.uniform(0.5, 1.5), 2) for value in values]
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return PropertyEstimate(id=inquiry_id, inquiry=inquiry, created_at=created, updated_at=created,
+                            **estimate_defaults(ai_result))
+
+
+def sample_bodies(seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    estimate = sample_estimate(rng, 1)
+    estimate_json = json.dumps({
+        'success': True,
+        'estimate': {
+            'id': estimate.id,
+            **{name: getattr(estimate, name) for name in (
+                'project_name', 'project_description', 'confidence_score', 'factors_considered', 'recommendations',
+                'timeline', 'risk_assessment', 'cash_flow_projection', 'revenue_breakdown', 'cost_breakdown',
+            )},
+        },
+        'results_url': '/estimate-results/1/?v=0123456789abcdef0123456789abcdef',
+    }, cls=DjangoJSONEncoder)
+    rows = (sample_estimate(rng, inquiry_id) for inquiry_id in range(2, 10 ** 6))
+    return {
+        'results page': render_to_string(TEMPLATE, page_context(estimate.inquiry, estimate)).encode(),
+        'estimate JSON': estimate_json.encode(),
+        'chart JSON': json.dumps({'success': True, 'inquiry_id': 1, 'chart': chart_data(estimate)}).encode(),
+        'export CSV chunk': next(buffered(encode_csv(EXPORTS['estimates'], rows), OUTPUT_BUFFER_SIZE)),
+    }
+
+
+def measure(body: bytes, encoding: str, level: int, iterations: int) -> dict:
+    compressed = compress(body, encoding, level)
+    started = time.process_time()
+    for _ in range(iterations):
+        compress(body, encoding, level)
+    cpu_us = (time.process_time() - started) / iterations * 1e6
+    saved = len(body) - len(compressed)
+    return {
+        'encoding': encoding,
+        'level': level,
+        'bytes': len(compressed),
+        'saved_pct': round(100 * saved / len(body), 1),
+        'cpu_us': round(cpu_us, 1),
+        # CPU spent per kilobyte kept off the wire
+        'us_per_kb_saved': round(cpu_us / (saved / 1024), 1) if saved > 0 else None,
+        'default': level == DYNAMIC_LEVELS[encoding],
+        'stored': level == STORED_LEVELS[encoding],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark brotli and gzip levels: CPU time per response against bytes saved'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Compressions timed per body and level')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        iterations = max(1, options['iterations'])
+        results = []
+        for name, body in sample_bodies().items():
+            for encoding in ENCODINGS:
+                for level in LEVELS[encoding]:
+                    results.append({'body': name, 'original': len(body), **measure(body, encoding, level, iterations)})
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+            return
+        if BROTLI not in ENCODINGS:
+            self.stdout.write("brotli is not installed; gzip only")
+        self.stdout.write(
+            f"{'body':<18}{'original':>9}{'codec':>7}{'level':>7}{'bytes':>8}{'saved':>8}{'cpu us':>9}{'us/KB saved':>13}"
+        )
+        for r in results:
+            marker = ' dynamic' if r['default'] else ' stored' if r['stored'] else ''
+            self.stdout.write(
+                f"{r['body']:<18}{r['original']:>9}{r['encoding']:>7}{r['level']:>7}{r['bytes']:>8}"
+                f"{r['saved_pct']:>7.1f}%{r['cpu_us']:>9.1f}{r['us_per_kb_saved'] or 0:>13.1f}{marker}"
+            )
@@ -0,0 +1,211 @@
+"""
+Benchmark the full estimate flow (landing page -> questionnaire -> loading screen ->
+estimate generation -> results page) against the configured database profile.
+
+The OpenAI call is replaced with a canned response so the numbers reflect Django and
+the database only. Runs against a throw-away test database, never the real one.
+
+    python manage.py benchmark_estimate_flow --flows 200 --concurrency 16
+    python manage.py benchmark_estimate_flow --profiles sqlite,postgres
+"""
+
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import AsyncClient
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main_app.ai_models import AIAnalysisResult, OpenAIResponse, PropertyEstimateResponse
+from main_app.ai_service import ValoraEarthAIService
+
+INQUIRY_ID_PATTERN = re.compile(r'data-inquiry-id="(\d+)"')
+
+QUESTIONNAIRE_ANSWERS = [
+    'Open pasture with a small orchard',
+    'Regenerative grazing and agroforestry',
+    '$100,000 - $250,000 over 5 years',
+    'Prefer low-maintenance perennial systems',
+]
+
+
+def canned_analysis_result(inquiry_request) -> AIAnalysisResult:
+    """A realistic AIAnalysisResult without calling OpenAI"""
+    series = [float(1000 * year) for year in range(1, 11)]
+    estimate = PropertyEstimateResponse(
+        project_name='Benchmark Regeneration Project',
+        project_description='Canned estimate used for throughput benchmarking.',
+        confidence_score=0.8,
+        factors_considered=['Location', 'Lot size', 'Climate'],
+        recommendations=['Start with soil testing', 'Plant windbreaks'],
+        timeline='3-5 years',
+        risk_assessment='Moderate',
+        cash_flow_projection=series,
+        revenue_breakdown={
+            'agricultural_sales': series,
+            'ecosystem_services': series,
+            'subsidies_incentives': series,
+        },
+        cost_breakdown={
+            'operational_costs': series,
+            'infrastructure': series,
+            'maintenance': series,
+        },
+    )
+    return AIAnalysisResult(
+        inquiry=inquiry_request,
+        estimate=estimate,
+        openai_response=OpenAIResponse(
+            content=estimate.model_dump_json(),
+            model='benchmark',
+            usage={'total_tokens': 0},
+            finish_reason='stop',
+        ),
+        analysis_timestamp=time.strftime('%Y-%m-%d %H:%M:%S'),
+        processing_time=0.0,
+    )
+
+
+class Command(BaseCommand):
+    help = 'Benchmark end-to-end estimate flow throughput against the configured database profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flows', type=int, default=100, help='Number of complete estimate flows to run')
+        parser.add_argument('--concurrency', type=int, default=8, help='Flows in flight at once')
+        parser.add_argument('--ai-latency-ms', type=int, default=0, help='Simulated OpenAI latency per estimate')
+        parser.add_argument(
+            '--profiles',
+            help='Comma-separated DB_ENGINE profiles to compare side by side (each runs in a subprocess)',
+        )
+        parser.add_argument('--json', action='store_true', help='Print the result as JSON')
+
+    def handle(self, *args, **options):
+        if options['profiles']:
+            return self.compare_profiles(options)
+
+        result = self.run_benchmark(options['flows'], options['concurrency'], options['ai_latency_ms'])
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+        else:
+            self.write_table([result])
+
+    def compare_profiles(self, options):
+        """Run the benchmark once per profile in a fresh process and print them side by side"""
+        results = []
+        for profile in [p.strip() for p in options['profiles'].split(',') if p.strip()]:
+            env = {**os.environ, 'DB_ENGINE': profile}
+            completed = subprocess.run(
+                [
+                    sys.executable, sys.argv[0], 'benchmark_estimate_flow', '--json',
+                    '--flows', str(options['flows']),
+                    '--concurrency', str(options['concurrency']),
+                    '--ai-latency-ms', str(options['ai_latency_ms']),
+                ],
+                env=env, capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                raise CommandError(f"Profile '{profile}' failed:\n{completed.stderr}")
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        self.write_table(results)
+
+    def write_table(self, results):
+        header = f"{'profile':<12}{'conn_max_age':>13}{'pool':>6}{'flows':>7}{'flows/s':>10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        self.stdout.write(header)
+        for r in results:
+            self.stdout.write(
+                f"{r['profile']:<12}{r['conn_max_age']:>13}{'yes' if r['pooled'] else 'no':>6}{r['flows']:>7}"
+                f"{r['flows_per_second']:>10.1f}{r['requests_per_second']:>9.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+            )
+
+    def run_benchmark(self, flows, concurrency, ai_latency_ms):
+        db_settings = settings.DATABASES['default']
+        if connection.vendor == 'sqlite':
+            # Benchmark against a file, not the in-memory test database
+            db_settings.setdefault('TEST', {})['NAME'] = os.path.join(
+                tempfile.mkdtemp(prefix='valora_bench_'), 'benchmark.sqlite3'
+            )
+
+        setup_test_environment(debug=False)
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            async def fake_generate(service, inquiry_request, progress=None):
+                if ai_latency_ms:
+                    await asyncio.sleep(ai_latency_ms / 1000)
+                return canned_analysis_result(inquiry_request)
+
+            def fake_init(service):
+                service.model = 'benchmark'
+
+            with patch.object(ValoraEarthAIService, '__init__', fake_init), \
+                    patch.object(ValoraEarthAIService, 'generate_property_estimate_async', fake_generate):
+                started = time.perf_counter()
+                durations, requests = asyncio.run(self.run_flows(flows, concurrency))
+                elapsed = time.perf_counter() - started
+        finally:
+            connections.close_all()
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        durations.sort()
+        return {
+            'profile': connection.vendor,
+            'conn_max_age': db_settings.get('CONN_MAX_AGE', 0),
+            'pooled': bool(db_settings.get('OPTIONS', {}).get('pool')),
+            'flows': flows,
+            'flows_per_second': flows / elapsed,
+            'requests_per_second': requests / elapsed,
+            'p50_ms': statistics.median(durations) * 1000,
+            'p95_ms': durations[int(len(durations) * 0.95) - 1 if len(durations) > 1 else 0] * 1000,
+        }
+
+    async def run_flows(self, flows, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(index):
+            async with semaphore:
+                return await self.run_flow(index)
+
+        results = await asyncio.gather(*(bounded(i) for i in range(flows)))
+        return [duration for duration, _ in results], sum(count for _, count in results)
+
+    async def run_flow(self, index):
+        """One user going through the whole funnel; returns (seconds, request count)"""
+        client = AsyncClient()
+        started = time.perf_counter()
+        requests = 0
+
+        async def call(method, path, data=None, expected=(200, 302)):
+            nonlocal requests
+            requests += 1
+            response = await getattr(client, method)(path, data or {})
+            if response.status_code not in expected:
+                raise CommandError(f'{method.upper()} {path} returned {response.status_code}')
+            return response
+
+        await call('get', '/')
+        await call('post', '/', {'lot_size': str(5 + index % 50), 'region': f'Region {index % 20}', 'lot_size_unit': 'acres'})
+        for step, answer in enumerate(QUESTIONNAIRE_ANSWERS, start=1):
+            await call('get', f'/estimate/?step={step}')
+            await call('post', f'/estimate/?step={step}', {'answer': answer})
+
+        loading = await call('get', '/loading-estimate/')
+        match = INQUIRY_ID_PATTERN.search(loading.content.decode())
+        if not match:
+            raise CommandError('Loading screen did not expose an inquiry id')
+        inquiry_id = match.group(1)
+
+        await call('post', f'/api/generate-estimate/{inquiry_id}/')
+        await call('get', f'/estimate-results/{inquiry_id}/')
+        return time.perf_counter() - started, requests
@@ -0,0 +1,20 @@
+"""
+Delete the pre-rendered estimate results pages (see main_app/results_pages.py).
+
+    python manage.py clear_results_pages
+
+Run after deploying changes to the results template or static files: each
+page is rendered again, with the new template, on its next view.
+"""
+
+from django.core.management.base import BaseCommand
+
+from main_app.results_pages import clear_pages
+
+
+class Command(BaseCommand):
+    help = 'Delete the pre-rendered estimate results pages so they are rendered again'
+
+    def handle(self, *args, **options):
+        deleted = clear_pages()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} results pages"))
@@ -0,0 +1,47 @@
+"""
+Export inquiries, estimates or AI analysis logs as CSV or JSONL.
+
+Rows are streamed from the database in chunks, so exports of any size run in
+constant memory:
+
+    python manage.py export_data estimates --output estimates.csv.gz --gzip
+    python manage.py export_data logs --format jsonl > logs.jsonl
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.db_router import replica_reads
+from main_app.exports import DEFAULT_CHUNK_SIZE, EXPORTS, FORMATS, ExportError, export_stream
+
+
+class Command(BaseCommand):
+    help = 'Stream a dataset to a CSV or JSONL file (or stdout)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(EXPORTS))
+        parser.add_argument('--format', dest='fmt', choices=list(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            with replica_reads():
+                for chunk in export_stream(options['dataset'], options['fmt'], compress=options['gzip'],
+                                           chunk_size=options['chunk_size']):
+                    output.write(chunk)
+                    written += len(chunk)
+        except ExportError as e:
+            raise CommandError(str(e))
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
+
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
@@ -0,0 +1,341 @@
+"""
+Generate realistic synthetic inquiries, estimates and AI analysis logs for
+scale and load testing.
+
+    python manage.py generate_synthetic_data --inquiries 1000000 --seed 7
+    python manage.py generate_synthetic_data --inquiries 50000 --regions 300 --region-skew 1.3
+
+Every column is drawn for a whole chunk at once with NumPy and each model is
+written with one multi-row INSERT (``executemany``) per chunk, inside a
+transaction. Primary keys are reserved up front so estimates and logs can
+reference their inquiries without reading them back; the ORM's bulk_create is
+bypassed because compiling SQL value by value was 75% of its run time. Regions
+follow a Zipf-like distribution (``--region-skew`` 0 = uniform) so a few
+regions hold most rows, as in production. Properties are scattered around
+their region's centre (a random centre for names the gazetteer does not
+know), with geohashes computed in bulk. The same ``--seed`` always produces
+the same data. Run it against a database nobody else is writing to.
+"""
+
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from main_app.models import (
+    AIAnalysisLog,
+    COST_CATEGORIES,
+    EstimatePayload,
+    PayloadBlob,
+    PROJECTION_YEARS,
+    PropertyEstimate,
+    PropertyInquiry,
+    REVENUE_CATEGORIES,
+)
+from main_app.regions import resolve_region
+from main_app.utils.geo import GEOHASH_ALPHABET, GEOHASH_PRECISION
+
+BASE_REGIONS = [
+    'Northern California', 'Central Valley, California', 'Oregon', 'Washington', 'Texas Hill Country',
+    'Colorado Front Range', 'Iowa', 'Kansas', 'Vermont', 'Upstate New York', 'North Carolina Piedmont',
+    'Georgia', 'Florida Panhandle', 'Montana', 'Idaho', 'Arizona', 'New Mexico', 'Wisconsin', 'Minnesota',
+    'Kentucky', 'Tennessee', 'Ontario', 'British Columbia', 'Queensland', 'New South Wales', 'Victoria',
+    'Canterbury, New Zealand', 'Andalusia', 'Tuscany', 'Bavaria', 'Normandy', 'Scottish Highlands',
+    'Costa Rica', 'Minas Gerais', 'Kenya Highlands', 'Western Cape', 'Punjab', 'Java', 'Hokkaido', 'Patagonia',
+]
+# Standard deviation, in degrees of latitude, of properties around their region's centre
+LOCATION_SPREAD = 0.3
+STREETS = ['Oak', 'Cedar', 'Willow', 'Ridge', 'Creek', 'Meadow', 'Valley', 'Orchard', 'Prairie', 'River', 'Hill', 'Pine']
+STREET_TYPES = ['Road', 'Lane', 'Way', 'Drive', 'Trail', 'Farm Road']
+CURRENT_PROPERTY = [
+    'Open pasture with some fencing', 'Conventional corn and soy rotation', 'Overgrazed grassland',
+    'Abandoned orchard', 'Mixed hardwood forest', 'Vineyard with bare inter-rows', 'Fallow cropland',
+    'Hay fields with a small creek', 'Degraded rangeland', 'Small vegetable market garden',
+]
+PROPERTY_GOALS = [
+    'Agroforestry with nut trees and grazing', 'Regenerative grazing to restore soil carbon',
+    'Silvopasture and carbon credits', 'Diversified orchard and market garden', 'Native habitat restoration',
+    'Water retention and erosion control', 'Transition to certified organic production',
+    'Food forest for local sales', 'Pollinator corridors and beekeeping', 'Timber and ecosystem services',
+]
+INVESTMENT_CAPACITY = [
+    'Under $50,000 over 3 years', '$50,000 - $100,000 over 5 years', '$100,000 - $250,000 over 5 years',
+    '$250,000 - $1M over 10 years', 'Over $1M, phased over 10 years',
+]
+PREFERENCES = [
+    'Low maintenance, no irrigation', 'Keep existing livestock', 'Prefer perennial systems',
+    'Concerned about drought risk', 'Wants quick cash flow', 'Family labor only', 'Avoid synthetic inputs',
+]
+TIMELINES = ['1-2 years', '2-3 years', '3-5 years', '5-7 years', '7-10 years']
+FACTORS = ['Soil quality', 'Water availability', 'Climate zone', 'Market access', 'Lot size', 'Topography', 'Labor']
+RECOMMENDATIONS = [
+    'Start with soil testing', 'Plant windbreaks first', 'Install keyline water systems', 'Phase in rotational grazing',
+    'Apply for conservation incentives', 'Establish nursery stock on site', 'Diversify revenue streams early',
+]
+MODELS = ['gpt-4.1-mini', 'gpt-4o-mini', 'gpt-4o']
+# Per-acre (start low, start high, yearly growth low, yearly growth high) of each category in
+# REVENUE_CATEGORIES / COST_CATEGORIES order: sales ramp up, infrastructure is front-loaded
+REVENUE_SHAPES = [(50, 400, 0.05, 0.25), (0, 80, 0.10, 0.35), (10, 120, -0.15, 0.05)]
+COST_SHAPES = [(60, 250, 0.0, 0.08), (100, 600, -0.35, -0.10), (10, 60, 0.0, 0.05)]
+RISK_ASSESSMENT = 'Moderate risk; weather and market prices are the main uncertainties.'
+
+# Column order of the rows built in Command.generate_chunk
+INQUIRY_COLUMNS = ['id', 'address', 'lot_size', 'lot_size_unit', 'current_property', 'property_goals',
+                   'investment_capacity', 'preferences_concerns', 'region', 'region_ref', 'latitude', 'longitude',
+                   'geohash', 'created_at']
+ESTIMATE_COLUMNS = ['id', 'inquiry', 'project_name', 'project_description', 'confidence_score', 'factors_considered',
+                    'recommendations', 'timeline', 'risk_assessment', 'projection_series', 'projection_overflow',
+                    'processing_time', 'created_at', 'updated_at']
+PAYLOAD_COLUMNS = ['estimate', 'response_blob']
+LOG_COLUMNS = ['inquiry', 'request_blob', 'response_blob', 'model_used', 'tokens_used', 'processing_time',
+               'success', 'error_message', 'created_at']
+
+
+def region_names(count):
+    """``count`` distinct region names, reusing the base list with numbered variants"""
+    names = []
+    for index in range(count):
+        base = BASE_REGIONS[index % len(BASE_REGIONS)]
+        names.append(base if index < len(BASE_REGIONS) else f'{base} {index // len(BASE_REGIONS) + 1}')
+    return names
+
+
+def region_weights(np, count, skew):
+    """Zipf-like probabilities: region i has weight 1 / (i + 1) ** skew"""
+    weights = 1.0 / np.arange(1, count + 1) ** skew
+    return weights / weights.sum()
+
+
+def region_centres(np, rng, resolved):
+    """(latitudes, longitudes) of each region: its gazetteer centre, else a random inhabited-latitude point"""
+    latitudes = rng.uniform(-45, 60, len(resolved))
+    longitudes = rng.uniform(-180, 180, len(resolved))
+    for index, region in enumerate(resolved):
+        if region is not None and region.latitude is not None:
+            latitudes[index], longitudes[index] = region.latitude, region.longitude
+    return latitudes, longitudes
+
+
+def geohashes(np, latitudes, longitudes):
+    """Vectorized ``geohash_encode``: interleave 30 longitude and 30 latitude bits, 5 bits per character"""
+    half = GEOHASH_PRECISION * 5 // 2
+    scale = 2 ** half
+    lat_bits = np.clip(((latitudes + 90) / 180 * scale).astype(np.int64), 0, scale - 1)
+    lon_bits = np.clip(((longitudes + 180) / 360 * scale).astype(np.int64), 0, scale - 1)
+    value = np.zeros(len(latitudes), dtype=np.int64)
+    for bit in range(half - 1, -1, -1):
+        value = (value << 2) | ((lon_bits >> bit) & 1) << 1 | ((lat_bits >> bit) & 1)
+    alphabet = np.array(list(GEOHASH_ALPHABET))
+    chars = [alphabet[(value >> shift) & 31] for shift in range(GEOHASH_PRECISION * 5 - 5, -1, -5)]
+    return [''.join(row) for row in zip(*(column.tolist() for column in chars))]
+
+
+def reserve_ids(model, count):
+    """The next ``count`` primary keys of ``model`` (call inside the chunk's transaction)"""
+    start = (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    return list(range(start, start + count))
+
+
+def insert_rows(model, fields, rows):
+    """INSERT value tuples (already in database format) for ``fields`` of ``model`` in one executemany"""
+    columns = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({columns}) VALUES ({placeholders})',
+            list(rows),
+        )
+
+
+def ramp(np, rng, size, start_low, start_high, growth_low, growth_high):
+    """(size, 10) array of yearly values starting in [start_low, start_high) and growing yearly"""
+    start = rng.uniform(start_low, start_high, size)[:, None]
+    growth = rng.uniform(growth_low, growth_high, size)[:, None]
+    return start * (1 + growth) ** np.arange(PROJECTION_YEARS)[None, :]
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic inquiries, estimates and AI logs for scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inquiries', type=int, default=10000, help='Number of inquiries to create')
+        parser.add_argument('--estimate-ratio', type=float, default=0.8, help='Share of inquiries with an estimate')
+        parser.add_argument('--logs-per-inquiry', type=float, default=1.3, help='Mean AI log rows per inquiry')
+        parser.add_argument('--regions', type=int, default=len(BASE_REGIONS), help='Number of distinct regions')
+        parser.add_argument('--region-skew', type=float, default=1.1, help='Zipf exponent of the region distribution')
+        parser.add_argument('--days', type=int, default=365, help='Spread created_at over this many past days')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Inquiries per INSERT/transaction')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed, same data)')
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+        except ImportError:
+            raise CommandError('generate_synthetic_data requires NumPy: pip install numpy')
+
+        if options['inquiries'] < 1 or options['chunk_size'] < 1 or options['regions'] < 1:
+            raise CommandError('--inquiries, --chunk-size and --regions must be positive')
+        if not 0 <= options['estimate_ratio'] <= 1:
+            raise CommandError('--estimate-ratio must be between 0 and 1')
+
+        rng = np.random.default_rng(options['seed'])
+        regions = np.array(region_names(options['regions']), dtype=object)
+        # Canonical Region ids, resolved once per distinct name
+        resolved = [resolve_region(name) for name in regions]
+        region_refs = np.array([getattr(region, 'id', None) for region in resolved], dtype=object)
+        centres = region_centres(np, rng, resolved)
+        weights = region_weights(np, options['regions'], options['region_skew'])
+        now = timezone.now()
+
+        totals = {'inquiries': 0, 'estimates': 0, 'logs': 0}
+        started = time.perf_counter()
+        remaining = options['inquiries']
+        while remaining > 0:
+            size = min(options['chunk_size'], remaining)
+            with transaction.atomic():
+                counts = self.generate_chunk(np, rng, size, regions, region_refs, centres, weights, now, options)
+            for key, value in counts.items():
+                totals[key] += value
+            remaining -= size
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{totals['inquiries']}/{options['inquiries']} inquiries, {totals['estimates']} estimates, "
+                f"{totals['logs']} logs ({totals['inquiries'] / elapsed:,.0f} inquiries/s)"
+            )
+
+        # Explicit ids leave PostgreSQL sequences behind; move them past the new rows
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [PropertyInquiry, PropertyEstimate]):
+                cursor.execute(sql)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {totals['inquiries']} inquiries, {totals['estimates']} estimates and "
+            f"{totals['logs']} AI logs in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def generate_chunk(self, np, rng, size, regions, region_refs, centres, weights, now, options):
+        ops = connection.ops
+
+        # --- inquiries ---
+        inquiry_ids = reserve_ids(PropertyInquiry, size)
+        region_index = rng.choice(len(regions), size=size, p=weights)
+        region = regions[region_index].tolist()
+        lot_size = np.clip(rng.lognormal(mean=3.0, sigma=1.1, size=size), 0.5, 5000).round(2)
+        hectares = rng.random(size) >= 0.85
+        unit = np.where(hectares, 'hectares', 'acres').tolist()
+        number = rng.integers(1, 20000, size)
+        street = rng.choice(STREETS, size)
+        street_type = rng.choice(STREET_TYPES, size)
+        answers = [rng.integers(0, len(pool), size) for pool in (CURRENT_PROPERTY, PROPERTY_GOALS, INVESTMENT_CAPACITY, PREFERENCES)]
+        created = [now - timedelta(seconds=age) for age in rng.uniform(0, options['days'] * 86400, size).tolist()]
+        lot_sizes = lot_size.tolist()
+        address = [f'{n} {s} {t}, {r}' for n, s, t, r in zip(number.tolist(), street, street_type, region)]
+        latitude = np.clip(centres[0][region_index] + rng.normal(0, LOCATION_SPREAD, size), -89.9, 89.9)
+        longitude = centres[1][region_index] + rng.normal(0, LOCATION_SPREAD, size) / np.cos(np.radians(latitude))
+        longitude = (longitude + 180) % 360 - 180
+
+        insert_rows(PropertyInquiry, INQUIRY_COLUMNS, zip(
+            inquiry_ids, address, lot_sizes, unit,
+            [CURRENT_PROPERTY[k] for k in answers[0]], [PROPERTY_GOALS[k] for k in answers[1]],
+            [INVESTMENT_CAPACITY[k] for k in answers[2]], [PREFERENCES[k] for k in answers[3]],
+            region, region_refs[region_index].tolist(), latitude.tolist(), longitude.tolist(),
+            geohashes(np, latitude, longitude), [ops.adapt_datetimefield_value(value) for value in created],
+        ))
+
+        # --- estimates (10-year series scale with lot size) ---
+        with_estimate = np.flatnonzero(rng.random(size) < options['estimate_ratio'])
+        count = len(with_estimate)
+        acres = (lot_size * np.where(hectares, 2.471, 1.0))[with_estimate][:, None]
+        revenue = {
+            category: ramp(np, rng, count, *shape) * acres for category, shape in zip(REVENUE_CATEGORIES, REVENUE_SHAPES)
+        }
+        costs = {
+            category: ramp(np, rng, count, *shape) * acres for category, shape in zip(COST_CATEGORIES, COST_SHAPES)
+        }
+        revenue = {key: value.round(2) for key, value in revenue.items()}
+        costs = {key: value.round(2) for key, value in costs.items()}
+        cash_flow = (sum(revenue.values()) - sum(costs.values())).round(2)
+        # Packed blocks in SERIES_LAYOUT order: cash flow, revenue, then cost categories
+        blocks = np.stack([cash_flow, *revenue.values(), *costs.values()], axis=1).astype('<f8')
+        cash_flow = cash_flow.tolist()
+        revenue = {key: value.tolist() for key, value in revenue.items()}
+        costs = {key: value.tolist() for key, value in costs.items()}
+        confidence = rng.beta(8, 3, count).round(3).tolist()
+        timeline = rng.choice(TIMELINES, count).tolist()
+        factors = rng.integers(0, len(FACTORS), (count, 4)).tolist()
+        recommendations = rng.integers(0, len(RECOMMENDATIONS), (count, 3)).tolist()
+        processing = rng.gamma(4.0, 2.5, count).round(3).tolist()
+        tokens = rng.normal(1800, 350, count).clip(600, 4000).astype(int).tolist()
+        model = rng.choice(MODELS, count).tolist()
+
+        estimate_ids = reserve_ids(PropertyEstimate, count)
+        estimates, payloads = [], []
+        # Content-addressed payloads of the chunk; the estimate's raw response is shared with its log
+        blobs, responses = {}, {}
+
+        def blob_for(value):
+            blob = PayloadBlob.for_value(value)
+            return blobs.setdefault(blob.digest, blob)
+
+        for j, i in enumerate(with_estimate.tolist()):
+            goal = PROPERTY_GOALS[answers[1][i]]
+            name = f'{goal.split(" ")[0]} Project {inquiry_ids[i]}'
+            revenue_breakdown = {key: series[j] for key, series in revenue.items()}
+            cost_breakdown = {key: series[j] for key, series in costs.items()}
+            estimate_json = json.dumps({
+                'project_name': name,
+                'cash_flow_projection': cash_flow[j],
+                'revenue_breakdown': revenue_breakdown,
+                'cost_breakdown': cost_breakdown,
+            })
+            stamp = ops.adapt_datetimefield_value(created[i] + timedelta(seconds=processing[j]))
+            estimates.append((
+                estimate_ids[j], inquiry_ids[i], name, f'{goal} on {lot_sizes[i]} {unit[i]} in {region[i]}.', confidence[j],
+                json.dumps([FACTORS[k] for k in dict.fromkeys(factors[j])]),
+                json.dumps([RECOMMENDATIONS[k] for k in dict.fromkeys(recommendations[j])]),
+                timeline[j], RISK_ASSESSMENT, blocks[j].tobytes(), None, processing[j], stamp, stamp,
+            ))
+            responses[i] = blob_for(
+                {'content': estimate_json, 'model': model[j], 'usage': {'total_tokens': tokens[j]}, 'finish_reason': 'stop'}
+            )
+            payloads.append((estimate_ids[j], responses[i]))
+
+        # --- AI logs: every estimate has a successful log, plus retries and failures ---
+        log_counts = rng.poisson(options['logs_per_inquiry'], size)
+        log_counts[with_estimate] = np.maximum(log_counts[with_estimate], 1)
+        owners = np.repeat(np.arange(size), log_counts).tolist()
+        total = len(owners)
+        success = (rng.random(total) < 0.95).tolist()
+        log_tokens = rng.normal(1800, 350, total).clip(600, 4000).astype(int).tolist()
+        log_time = rng.gamma(4.0, 2.5, total).round(3).tolist()
+        log_model = rng.choice(MODELS, total).tolist()
+        delay = rng.uniform(0, 3600, total).tolist()
+
+        logs = []
+        for k, i in enumerate(owners):
+            ok = success[k]
+            request = blob_for({'address': address[i], 'lot_size': lot_sizes[i], 'region': region[i]})
+            if not ok:
+                response = blob_for({})
+            elif i in responses:
+                response = responses.pop(i)
+            else:
+                response = blob_for({'model': log_model[k], 'finish_reason': 'stop'})
+            logs.append((
+                inquiry_ids[i], request, response,
+                log_model[k] if ok else 'unknown', log_tokens[k] if ok else 0, log_time[k] if ok else 0.0,
+                ok, '' if ok else 'OpenAI API error: Request timed out',
+                ops.adapt_datetimefield_value(created[i] + timedelta(seconds=delay[k])),
+            ))
+        # Storing the blobs sets their ids, which the payload and log rows refer to
+        PayloadBlob.store(*blobs.values())
+        insert_rows(PropertyEstimate, ESTIMATE_COLUMNS, estimates)
+        insert_rows(EstimatePayload, PAYLOAD_COLUMNS, [(estimate, blob.id) for estimate, blob in payloads])
+        insert_rows(AIAnalysisLog, LOG_COLUMNS, [(log[0], log[1].id, log[2].id, *log[3:]) for log in logs])
+
+        return {'inquiries': size, 'estimates': len(estimates), 'logs': len(logs)}
@@ -0,0 +1,69 @@
+"""
+Import a partner lead list of property inquiries from CSV or JSONL.
+
+    python manage.py import_inquiries leads.csv
+    python manage.py import_inquiries leads.jsonl.gz --generate-estimates --concurrency 8
+
+CSV files need a header row with the PropertyInquiry field names (address,
+lot_size, lot_size_unit, current_property, property_goals,
+investment_capacity, preferences_concerns, region); JSONL files hold one
+object per line with the same keys. Invalid rows are reported and skipped.
+"""
+
+import asyncio
+import gzip
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.estimates import generate_estimates
+from main_app.importers import DEFAULT_BATCH_SIZE, IMPORT_FORMATS, ImportFormatError, detect_format, import_file
+
+# Errors printed to the console; the full list goes to --errors-file
+PRINTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = 'Bulk import property inquiries from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file, optionally gzip-compressed (.gz)')
+        parser.add_argument('--format', dest='fmt', choices=IMPORT_FORMATS, help='Override format detection')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per INSERT transaction')
+        parser.add_argument('--errors-file', help='Write rejected rows (line and reason) to this JSONL file')
+        parser.add_argument('--generate-estimates', action='store_true', help='Generate AI estimates for imported rows')
+        parser.add_argument('--concurrency', type=int, help='AI estimates generated at once (default ESTIMATE_GENERATION_CONCURRENCY)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = options['fmt'] or detect_format(path)
+        except ImportFormatError as e:
+            raise CommandError(str(e))
+
+        opener = gzip.open if path.endswith('.gz') else open
+        try:
+            with opener(path, 'rb') as stream:
+                report = import_file(stream, fmt, options['batch_size'])
+        except OSError as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {report.imported} inquiries"))
+        if report.failed:
+            self.stdout.write(self.style.WARNING(f"Rejected {report.failed} rows"))
+            for error in report.errors[:PRINTED_ERRORS]:
+                self.stdout.write(f"  line {error.line}: {error.message}")
+            if report.failed > PRINTED_ERRORS:
+                self.stdout.write(f"  ... {report.failed - PRINTED_ERRORS} more")
+
+        if options['errors_file']:
+            with open(options['errors_file'], 'w') as errors_file:
+                for error in report.errors:
+                    errors_file.write(json.dumps({'line': error.line, 'message': error.message}) + '\n')
+
+        if options['generate_estimates'] and report.inquiry_ids:
+            self.stdout.write(f"Generating estimates for {len(report.inquiry_ids)} inquiries...")
+            summary = asyncio.run(generate_estimates(report.inquiry_ids, options['concurrency']))
+            self.stdout.write(self.style.SUCCESS(
+                f"Generated {len(summary.succeeded)} estimates, {len(summary.failed)} failed"
+            ))
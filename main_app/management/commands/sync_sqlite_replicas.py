@@ -0,0 +1,41 @@
+"""
+Copy the primary SQLite database onto every configured replica file.
+
+Local stand-in for replication when testing the read-replica router:
+
+    DB_REPLICAS=replica.sqlite3 python manage.py sync_sqlite_replicas
+
+Uses SQLite's online backup API, so the copy is a consistent snapshot even while
+the primary is being written to.
+"""
+
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database to each replica in DB_REPLICAS'
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        if not primary['ENGINE'].endswith('sqlite3'):
+            raise CommandError('sync_sqlite_replicas only supports the SQLite profile')
+
+        replicas = list(settings.DATABASE_REPLICAS)
+        if not replicas:
+            raise CommandError('No replicas configured. Set DB_REPLICAS to one or more database files.')
+
+        source = sqlite3.connect(str(primary['NAME']))
+        try:
+            for alias in replicas:
+                target_path = str(settings.DATABASES[alias]['NAME'])
+                target = sqlite3.connect(target_path)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(f'Synced {alias} ({target_path})'))
+        finally:
+            source.close()
@@ -0,0 +1,190 @@
+"""
+Middleware for Valora Earth Django application.
+"""
+
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .compression import acompress_chunks, compress, compress_chunks, is_compressible, negotiate
+from .db_router import begin_request, replica_aliases
+from .utils.query_instrumentation import record_queries
+
+logger = logging.getLogger(__name__)
+
+# Cookie holding the unix time until which the client reads from the primary
+PIN_COOKIE_NAME = 'db_pin_until'
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Read-your-writes stickiness for the read-replica router
+
+    A request that wrote to the database sets a short-lived cookie; while it is
+    valid the client's reads bypass the replicas, so replication lag never hides
+    the estimate they just generated.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.process_request(request)
+        response = self.get_response(request)
+        return self.process_response(state, response)
+
+    async def __acall__(self, request):
+        state = self.process_request(request)
+        response = await self.get_response(request)
+        return self.process_response(state, response)
+
+    def process_request(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE_NAME, 0))
+        except ValueError:
+            pinned_until = 0
+        return begin_request(pinned=pinned_until > time.time())
+
+    def process_response(self, state, response):
+        if state.wrote and replica_aliases():
+            window = settings.READ_YOUR_WRITES_WINDOW
+            response.set_cookie(
+                PIN_COOKIE_NAME,
+                str(int(time.time() + window)),
+                max_age=window,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record query count, total SQL time and slowest statements per request
+
+    Requests whose view exceeds its entry in ``QUERY_BUDGETS`` are logged as
+    warnings. With ``QUERY_INSTRUMENTATION_HEADERS`` enabled the numbers are also
+    exposed as ``X-DB-Query-Count`` and ``Server-Timing`` response headers.
+    Queries issued while a streaming response is consumed are not included.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        return self.process_response(request, response, recorder)
+
+    async def __acall__(self, request):
+        with record_queries() as recorder:
+            response = await self.get_response(request)
+        return self.process_response(request, response, recorder)
+
+    def process_response(self, request, response, recorder):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        budget = settings.QUERY_BUDGETS.get(view_name) if view_name else None
+
+        if budget is not None and recorder.count > budget:
+            logger.warning(
+                "Query budget exceeded for %s (%s %s): budget %d, %s",
+                view_name, request.method, request.path, budget, recorder.report(),
+            )
+
+        if settings.QUERY_INSTRUMENTATION_HEADERS:
+            response['X-DB-Query-Count'] = str(recorder.count)
+            response['Server-Timing'] = f'db;dur={recorder.total_time * 1000:.1f};desc="{recorder.count} queries"'
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Brotli or gzip compression of HTML, JSON, CSV and other text responses
+
+    The encoding is negotiated from ``Accept-Encoding`` (see compression.py).
+    Bodies under ``COMPRESSION_MIN_LENGTH`` bytes are sent as they are, and
+    streaming responses are compressed chunk by chunk as they are sent, never
+    buffered. Responses that are already encoded, such as the stored results
+    pages, pass through untouched, as do responses other than 200 (a 206's
+    ``Content-Range`` counts bytes of the uncompressed body) and responses
+    marked ``skip_compression``, such as static files, whose pre-compressed
+    variants are chosen by the static files view.
+
+    Responses that carry a CSRF token are not compressed: a page that holds a
+    secret next to reflected input (the questionnaire's answers) would let an
+    attacker recover the secret from compressed sizes (BREACH). Django already
+    masks the token differently on every response; skipping compression keeps
+    these small form pages safe regardless. (With ``CSRF_USE_SESSIONS`` such
+    pages can't be told apart here; this project keeps the token in a cookie.)
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if (response.status_code != 200 or response.has_header('Content-Range')
+                or getattr(response, 'skip_compression', False)):
+            return response
+        if response.has_header('Content-Encoding') or not is_compressible(response.get('Content-Type', '')):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        # CsrfViewMiddleware sets the cookie on every response that used the token
+        if settings.CSRF_COOKIE_NAME in response.cookies:
+            return response
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_chunks(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_chunks(response.streaming_content, encoding)
+            # The length is unknown until the stream ends
+            del response['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_LENGTH:
+                return response
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The encoded bytes differ from the identity representation's
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
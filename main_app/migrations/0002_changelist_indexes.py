@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aianalysislog',
+            index=models.Index(fields=['-created_at', '-id'], name='ailog_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyestimate',
+            index=models.Index(fields=['-created_at', '-id'], name='estimate_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyinquiry',
+            index=models.Index(fields=['-created_at', '-id'], name='inquiry_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyinquiry',
+            index=models.Index(fields=['region'], name='inquiry_region_idx'),
+        ),
+    ]
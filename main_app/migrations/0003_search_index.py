@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from main_app.search import install_search_index
+    install_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from main_app.search import uninstall_search_index
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """SQLite FTS5 table + triggers, or PostgreSQL GIN tsvector indexes (see main_app.search)"""
+
+    dependencies = [
+        ('main_app', '0002_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall, elidable=False),
+    ]
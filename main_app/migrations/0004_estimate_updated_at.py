@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:13
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    PropertyEstimate = apps.get_model('main_app', 'PropertyEstimate')
+    PropertyEstimate.objects.using(schema_editor.connection.alias).update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyestimate',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Last time the estimate was (re)generated'),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
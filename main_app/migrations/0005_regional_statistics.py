@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:29
+
+from django.db import migrations, models
+
+
+def seed_statistics(apps, schema_editor):
+    """Count the estimates that already exist, keyed by normalized region (canonical regions come in 0006)"""
+    from main_app.projections import ProjectionSeries
+    from main_app.regional_stats import make_sample, write_statistics
+
+    using = schema_editor.connection.alias
+    rows = apps.get_model('main_app', 'PropertyEstimate').objects.using(using).order_by('id').values_list(
+        'inquiry__region', 'inquiry__lot_size', 'inquiry__lot_size_unit', 'cash_flow_projection',
+        'revenue_breakdown', 'cost_breakdown', 'confidence_score', 'processing_time',
+    )
+    samples = (
+        make_sample(region, None, None, lot_size, unit, *ProjectionSeries.pack(cash_flow, revenue, cost), confidence,
+                    seconds)
+        for region, lot_size, unit, cash_flow, revenue, cost, confidence, seconds in rows.iterator(chunk_size=2000)
+    )
+    write_statistics(samples, apps.get_model('main_app', 'RegionalStatistic'), using=using)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0004_estimate_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionalStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region_key', models.CharField(help_text='Normalized region name', max_length=100)),
+                ('region', models.CharField(help_text='Region as first submitted', max_length=100)),
+                ('lot_size_bucket', models.PositiveSmallIntegerField(choices=[(0, '0-5 acres'), (1, '5-20 acres'), (2, '20-100 acres'), (3, '100-500 acres'), (4, '500+ acres')], help_text='Index into LOT_SIZE_BUCKETS')),
+                ('estimate_count', models.IntegerField(default=0)),
+                ('sketches', models.JSONField(default=dict, help_text='Mergeable quantile sketch of each metric')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Regional Statistics',
+                'ordering': ['region_key', 'lot_size_bucket'],
+                'constraints': [models.UniqueConstraint(fields=('region_key', 'lot_size_bucket'), name='regional_statistic_key')],
+            },
+        ),
+        migrations.RunPython(seed_statistics, migrations.RunPython.noop),
+    ]
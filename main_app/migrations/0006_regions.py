@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def load_gazetteer(apps, schema_editor):
+    """Load the gazetteer, resolve the existing inquiries and key their statistics by canonical region"""
+    from main_app.regional_stats import rekey_statistics
+    from main_app.regions import backfill_region_refs, build_index, load_gazetteer as load
+
+    using = schema_editor.connection.alias
+    region_model, alias_model = apps.get_model('main_app', 'Region'), apps.get_model('main_app', 'RegionAlias')
+    load(region_model, alias_model, using=using)
+    index = build_index(using, region_model, alias_model)
+    backfill_region_refs(index, inquiry_model=apps.get_model('main_app', 'PropertyInquiry'), using=using)
+    rekey_statistics(index.resolve, apps.get_model('main_app', 'RegionalStatistic'), using=using)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0005_regional_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Region',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(blank=True, help_text='Normalized name; derived from the name when left empty', max_length=100, unique=True)),
+                ('name', models.CharField(help_text='Display name', max_length=100)),
+                ('country', models.CharField(blank=True, help_text='ISO 3166-1 alpha-2 country code', max_length=2)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='propertyinquiry',
+            name='region_ref',
+            field=models.ForeignKey(blank=True, help_text='Canonical region resolved from region; empty when unrecognized', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inquiries', to='main_app.region'),
+        ),
+        migrations.CreateModel(
+            name='RegionAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Alias; stored normalized', max_length=100, unique=True)),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='main_app.region')),
+            ],
+            options={
+                'verbose_name_plural': 'Region Aliases',
+                'ordering': ['key'],
+            },
+        ),
+        migrations.RunPython(load_gazetteer, migrations.RunPython.noop),
+    ]
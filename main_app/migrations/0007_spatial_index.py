@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:37
+
+from django.db import migrations, models
+
+
+def locate(apps, schema_editor):
+    """Place existing inquiries at their region's centre (resolving any region still missing) and index them"""
+    from main_app.regional_stats import rekey_statistics
+    from main_app.regions import backfill_region_refs, build_index, load_gazetteer
+    from main_app.spatial import install_spatial_index, place_unlocated_inquiries
+
+    using = schema_editor.connection.alias
+    region_model, alias_model = apps.get_model('main_app', 'Region'), apps.get_model('main_app', 'RegionAlias')
+    inquiry_model = apps.get_model('main_app', 'PropertyInquiry')
+    load_gazetteer(region_model, alias_model, using=using)
+    index = build_index(using, region_model, alias_model)
+    backfill_region_refs(index, inquiry_model=inquiry_model, using=using)
+    # Statistics follow the inquiries this resolved
+    rekey_statistics(index.resolve, apps.get_model('main_app', 'RegionalStatistic'), using=using)
+    place_unlocated_inquiries(inquiry_model, region_model, using=using)
+    install_spatial_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from main_app.spatial import uninstall_spatial_index
+    uninstall_spatial_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """Coordinates for regions and inquiries, plus the spatial index (see main_app.spatial)"""
+
+    dependencies = [
+        ('main_app', '0006_regions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyinquiry',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Geohash of the coordinates; prefixes are grid cells', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='propertyinquiry',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text="Submitted coordinates, or the region's centre", null=True),
+        ),
+        migrations.AddField(
+            model_name='propertyinquiry',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='region',
+            name='latitude',
+            field=models.FloatField(blank=True, help_text='Approximate centre, used when an inquiry has no coordinates', null=True),
+        ),
+        migrations.AddField(
+            model_name='region',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(locate, uninstall, elidable=False),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:54
+
+import main_app.projections
+from django.db import migrations, models
+
+CHUNK_SIZE = 2000
+
+
+def convert(apps, schema_editor, source, target, transform):
+    """Rewrite ``target`` columns from ``source`` columns in id-ordered chunks"""
+    PropertyEstimate = apps.get_model('main_app', 'PropertyEstimate')
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    fields = [PropertyEstimate._meta.get_field(name) for name in target]
+    update = 'UPDATE {} SET {} WHERE id = %s'.format(
+        quote(PropertyEstimate._meta.db_table), ', '.join(f'{quote(field.column)} = %s' for field in fields),
+    )
+    rows = PropertyEstimate.objects.using(connection.alias).order_by('id').values_list('id', *source)
+    last_id = 0
+    while True:
+        chunk = list(rows.filter(id__gt=last_id)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        params = []
+        for pk, *values in chunk:
+            params.append([
+                field.get_db_prep_save(value, connection) for field, value in zip(fields, transform(*values))
+            ] + [pk])
+        with connection.cursor() as cursor:
+            cursor.executemany(update, params)
+
+
+def pack_series(apps, schema_editor):
+    from main_app.projections import ProjectionSeries
+
+    convert(apps, schema_editor, ('cash_flow_projection', 'revenue_breakdown', 'cost_breakdown'),
+            ('projection_series', 'projection_overflow'), ProjectionSeries.pack)
+
+
+def unpack_series(apps, schema_editor):
+    from main_app.projections import PROJECTION_GROUPS, ProjectionSeries
+
+    def unpack(series, overflow):
+        groups = (series or ProjectionSeries()).to_json(overflow)
+        return [groups[group] for group in PROJECTION_GROUPS]
+
+    convert(apps, schema_editor, ('projection_series', 'projection_overflow'),
+            ('cash_flow_projection', 'revenue_breakdown', 'cost_breakdown'), unpack)
+
+
+def drop_indexes(apps, schema_editor):
+    # SQLite rebuilds a table to drop a column: the triggers on it are lost and
+    # triggers of other tables that refer to it make the rename fail
+    from main_app.search import uninstall_search_index
+    from main_app.spatial import uninstall_spatial_index
+
+    uninstall_search_index(schema_editor.connection)
+    uninstall_spatial_index(schema_editor.connection)
+
+
+def reinstall_indexes(apps, schema_editor):
+    # The search triggers were already lost to the rebuilds of 0004 and 0006,
+    # so the full-text index is rebuilt from the tables, not only re-attached
+    from main_app.search import install_search_index
+    from main_app.spatial import install_spatial_index
+
+    install_search_index(schema_editor.connection)
+    install_spatial_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """Replace the three projection JSON columns with one packed float64 block (see main_app.projections)"""
+
+    dependencies = [
+        ('main_app', '0007_spatial_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_indexes, reinstall_indexes, elidable=False),
+        migrations.AddField(
+            model_name='propertyestimate',
+            name='projection_overflow',
+            field=models.JSONField(blank=True, help_text='Projection values that do not fit the packed layout', null=True),
+        ),
+        migrations.AddField(
+            model_name='propertyestimate',
+            name='projection_series',
+            field=main_app.projections.ProjectionSeriesField(default=b'', help_text='Net cash flow, revenue and cost series as packed float64'),
+        ),
+        migrations.RunPython(pack_series, unpack_series, elidable=False),
+        migrations.RemoveField(
+            model_name='propertyestimate',
+            name='cash_flow_projection',
+        ),
+        migrations.RemoveField(
+            model_name='propertyestimate',
+            name='cost_breakdown',
+        ),
+        migrations.RemoveField(
+            model_name='propertyestimate',
+            name='revenue_breakdown',
+        ),
+        migrations.RunPython(reinstall_indexes, drop_indexes, elidable=False),
+    ]
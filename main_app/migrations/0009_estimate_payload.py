@@ -0,0 +1,71 @@
+# Generated by Django 5.2.5 on 2026-10-18 22:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_payloads(apps, schema_editor):
+    PropertyEstimate = apps.get_model('main_app', 'PropertyEstimate')
+    EstimatePayload = apps.get_model('main_app', 'EstimatePayload')
+    quote = schema_editor.connection.ops.quote_name
+    # One set-based copy: the raw responses are never decoded in Python
+    schema_editor.execute('INSERT INTO {} ({}, {}) SELECT {}, {} FROM {}'.format(
+        quote(EstimatePayload._meta.db_table), quote('estimate_id'), quote('ai_response_raw'),
+        quote('id'), quote('ai_response_raw'), quote(PropertyEstimate._meta.db_table),
+    ))
+
+
+def restore_payloads(apps, schema_editor):
+    PropertyEstimate = apps.get_model('main_app', 'PropertyEstimate')
+    EstimatePayload = apps.get_model('main_app', 'EstimatePayload')
+    quote = schema_editor.connection.ops.quote_name
+    estimates, payloads = quote(PropertyEstimate._meta.db_table), quote(EstimatePayload._meta.db_table)
+    schema_editor.execute(
+        f'UPDATE {estimates} SET {quote("ai_response_raw")} = '
+        f'(SELECT {quote("ai_response_raw")} FROM {payloads} WHERE {quote("estimate_id")} = {estimates}.{quote("id")})'
+    )
+
+
+def drop_column(apps, schema_editor):
+    PropertyEstimate = apps.get_model('main_app', 'PropertyEstimate')
+    schema_editor.remove_field(PropertyEstimate, PropertyEstimate._meta.get_field('ai_response_raw'))
+
+
+def add_column(apps, schema_editor):
+    # Added nullable: a NOT NULL column needs a value for every existing row
+    # (and a table rebuild on SQLite) before restore_payloads can fill it in
+    PropertyEstimate = apps.get_model('main_app', 'PropertyEstimate')
+    field = models.JSONField(null=True)
+    field.set_attributes_from_name('ai_response_raw')
+    schema_editor.add_field(PropertyEstimate, field)
+
+
+class Migration(migrations.Migration):
+    """Move the raw AI response of estimates to the EstimatePayload side table"""
+
+    dependencies = [
+        ('main_app', '0008_packed_projection_series'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstimatePayload',
+            fields=[
+                ('estimate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='main_app.propertyestimate')),
+                ('ai_response_raw', models.JSONField(help_text='Raw AI response data')),
+            ],
+            options={
+                'verbose_name_plural': 'Estimate Payloads',
+            },
+        ),
+        migrations.RunPython(copy_payloads, restore_payloads, elidable=False),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(drop_column, add_column, elidable=False)],
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='propertyestimate',
+                    name='ai_response_raw',
+                ),
+            ],
+        ),
+    ]
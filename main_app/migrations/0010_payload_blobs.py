@@ -0,0 +1,141 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CHUNK_SIZE = 2000
+
+# (model, JSON column, blob foreign key) pairs converted by this migration
+PAYLOAD_COLUMNS = (
+    ('AIAnalysisLog', 'request_data', 'request_blob'),
+    ('AIAnalysisLog', 'response_data', 'response_blob'),
+    ('EstimatePayload', 'ai_response_raw', 'response_blob'),
+)
+
+
+def chunks(queryset, key):
+    """values_list rows of ``queryset`` in ``key``-ordered chunks"""
+    last = None
+    while True:
+        rows = queryset.order_by(key)
+        if last is not None:
+            rows = rows.filter(**{f'{key}__gt': last})
+        rows = list(rows[:CHUNK_SIZE])
+        if not rows:
+            break
+        last = rows[-1][0]
+        yield rows
+
+
+def store_blobs(apps, schema_editor):
+    from main_app.blobs import canonical_json, compress, digest
+
+    PayloadBlob = apps.get_model('main_app', 'PayloadBlob')
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    stored = {}  # digest -> id
+    for model_name in ('AIAnalysisLog', 'EstimatePayload'):
+        model = apps.get_model('main_app', model_name)
+        pairs = [(json_name, blob_name) for name, json_name, blob_name in PAYLOAD_COLUMNS if name == model_name]
+        pk = model._meta.pk
+        update = 'UPDATE {} SET {} WHERE {} = %s'.format(
+            quote(model._meta.db_table),
+            ', '.join(f'{quote(model._meta.get_field(blob_name).column)} = %s' for _, blob_name in pairs),
+            quote(pk.column),
+        )
+        queryset = model.objects.using(connection.alias).values_list(pk.attname, *(json_name for json_name, _ in pairs))
+        for rows in chunks(queryset, pk.attname):
+            blobs, keys = {}, []
+            for row_pk, *values in rows:
+                row_keys = []
+                for value in values:
+                    text = canonical_json(value)
+                    key = digest(text)
+                    if key not in stored and key not in blobs:
+                        codec, data = compress(text)
+                        blobs[key] = PayloadBlob(digest=key, codec=codec, size=len(text), data=data)
+                    row_keys.append(key)
+                keys.append((row_pk, row_keys))
+            # The new blobs get their ids back from the insert
+            for blob in PayloadBlob.objects.using(connection.alias).bulk_create(blobs.values()):
+                stored[blob.digest] = blob.id
+            with connection.cursor() as cursor:
+                cursor.executemany(update, [[stored[key] for key in row_keys] + [row_pk] for row_pk, row_keys in keys])
+
+
+def restore_json(apps, schema_editor):
+    from main_app.blobs import decompress
+
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    PayloadBlob = apps.get_model('main_app', 'PayloadBlob')
+    for model_name, json_name, blob_name in PAYLOAD_COLUMNS:
+        model = apps.get_model('main_app', model_name)
+        pk = model._meta.pk
+        update = 'UPDATE {} SET {} = %s WHERE {} = %s'.format(
+            quote(model._meta.db_table), quote(json_name), quote(pk.column),
+        )
+        queryset = model.objects.using(connection.alias).values_list(pk.attname, f'{blob_name}_id')
+        for rows in chunks(queryset, pk.attname):
+            blobs = PayloadBlob.objects.using(connection.alias).in_bulk({key for _, key in rows})
+            # The canonical JSON text is stored as is
+            params = [[decompress(blobs[key].codec, blobs[key].data).decode('utf-8'), row_pk] for row_pk, key in rows]
+            with connection.cursor() as cursor:
+                cursor.executemany(update, params)
+
+
+def drop_columns(apps, schema_editor):
+    for model_name, json_name, _ in PAYLOAD_COLUMNS:
+        model = apps.get_model('main_app', model_name)
+        schema_editor.remove_field(model, model._meta.get_field(json_name))
+
+
+def add_columns(apps, schema_editor):
+    # Nullable, as in 0009: restore_json fills them in
+    for model_name, json_name, _ in PAYLOAD_COLUMNS:
+        field = models.JSONField(null=True)
+        field.set_attributes_from_name(json_name)
+        schema_editor.add_field(apps.get_model('main_app', model_name), field)
+
+
+def blob_key(null):
+    return models.ForeignKey(
+        db_index=False, null=null, on_delete=django.db.models.deletion.PROTECT, related_name='+',
+        to='main_app.payloadblob',
+    )
+
+
+class Migration(migrations.Migration):
+    """Store log and estimate payloads once each, compressed, in PayloadBlob (see main_app.blobs)"""
+
+    dependencies = [
+        ('main_app', '0009_estimate_payload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayloadBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.BinaryField(help_text='SHA-256 of the canonical JSON', max_length=32, unique=True)),
+                ('codec', models.CharField(choices=[('zstd', 'zstd'), ('deflate', 'deflate'), ('none', 'none')], max_length=8)),
+                ('size', models.IntegerField(help_text='Length of the canonical JSON in bytes')),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AddField(model_name='aianalysislog', name='request_blob', field=blob_key(null=True)),
+        migrations.AddField(model_name='aianalysislog', name='response_blob', field=blob_key(null=True)),
+        migrations.AddField(model_name='estimatepayload', name='response_blob', field=blob_key(null=True)),
+        migrations.RunPython(store_blobs, restore_json, elidable=False),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(drop_columns, add_columns, elidable=False)],
+            state_operations=[
+                migrations.RemoveField(model_name='aianalysislog', name='request_data'),
+                migrations.RemoveField(model_name='aianalysislog', name='response_data'),
+                migrations.RemoveField(model_name='estimatepayload', name='ai_response_raw'),
+            ],
+        ),
+        migrations.AlterField(model_name='aianalysislog', name='request_blob', field=blob_key(null=False)),
+        migrations.AlterField(model_name='aianalysislog', name='response_blob', field=blob_key(null=False)),
+        migrations.AlterField(model_name='estimatepayload', name='response_blob', field=blob_key(null=False)),
+    ]
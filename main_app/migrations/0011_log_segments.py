@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Index the payload blob keys (archiving logs deletes the blobs left unused) and add LogSegment"""
+
+    dependencies = [
+        ('main_app', '0010_payload_blobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aianalysislog',
+            name='request_blob',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='main_app.payloadblob'),
+        ),
+        migrations.AlterField(
+            model_name='aianalysislog',
+            name='response_blob',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='main_app.payloadblob'),
+        ),
+        migrations.AlterField(
+            model_name='estimatepayload',
+            name='response_blob',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='main_app.payloadblob'),
+        ),
+        migrations.CreateModel(
+            name='LogSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='File name in LOG_ARCHIVE_DIR, without extension', max_length=100, unique=True)),
+                ('first_log_id', models.BigIntegerField()),
+                ('last_log_id', models.BigIntegerField()),
+                ('entries', models.IntegerField(default=0, help_text='Committed entries; bytes past them are ignored')),
+                ('size', models.BigIntegerField(default=0, help_text='Committed bytes of the segment file')),
+                ('oldest_log_at', models.DateTimeField(null=True)),
+                ('newest_log_at', models.DateTimeField(null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['first_log_id', 'last_log_id'], name='logsegment_id_range_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0011_log_segments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstimateVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(help_text='1 for the first generation, then one up per regeneration')),
+                ('snapshot', models.BooleanField(default=False, help_text='Whether data holds the full version rather than a delta')),
+                ('data', models.BinaryField(help_text='zlib-compressed snapshot or delta')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('estimate', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='main_app.propertyestimate')),
+            ],
+            options={
+                'ordering': ['estimate', 'number'],
+                'constraints': [models.UniqueConstraint(fields=('estimate', 'number'), name='estimate_version_number_unique')],
+            },
+        ),
+    ]
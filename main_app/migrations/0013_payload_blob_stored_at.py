@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Record when each payload blob was last stored, so archiving keeps blobs a writer is about to refer to"""
+
+    dependencies = [
+        ('main_app', '0012_estimate_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payloadblob',
+            name='stored_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Last time the blob was stored or reused; archiving keeps recent ones'),
+        ),
+    ]
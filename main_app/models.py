@@ -1,6 +1,81 @@
+import json
+
 from django.db import models
 from django.utils import timezone
 
+from .blobs import CODECS, blob_property, canonical_json, compress, decompress, digest, store_pending_blobs
+from .projections import (
+    CASH_FLOW,
+    COST,
+    COST_CATEGORIES,
+    PROJECTION_YEARS,
+    REVENUE,
+    REVENUE_CATEGORIES,
+    ProjectionSeries,
+    ProjectionSeriesField,
+)
+from .regions import normalize_region
+
+# Lot-size buckets of RegionalStatistic: (upper bound in acres, label); the last has no bound
+LOT_SIZE_BUCKETS = [(5, '0-5'), (20, '5-20'), (100, '20-100'), (500, '100-500'), (None, '500+')]
+
+# PropertyEstimate fields the decoded projections are built from
+PROJECTION_FIELDS = ('projection_series', 'projection_overflow')
+
+
+class Region(models.Model):
+    """Canonical region that free-text inquiry regions resolve to"""
+    key = models.CharField(max_length=100, unique=True, blank=True,
+                           help_text="Normalized name; derived from the name when left empty")
+    name = models.CharField(max_length=100, help_text="Display name")
+    country = models.CharField(max_length=2, blank=True, help_text="ISO 3166-1 alpha-2 country code")
+    latitude = models.FloatField(null=True, blank=True, help_text="Approximate centre, used when an inquiry has no coordinates")
+    longitude = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        self.key = normalize_region(self.key or self.name)
+
+    def save(self, *args, **kwargs):
+        # Also here, for rows that never go through a form (create(), fixtures)
+        self.key = normalize_region(self.key or self.name)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        ordering = ['name']
+
+
+class RegionAlias(models.Model):
+    """Alternative spelling of a region, matched after normalization"""
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='aliases')
+    key = models.CharField(max_length=100, unique=True, help_text="Alias; stored normalized")
+
+    def __str__(self):
+        return f"{self.key} -> {self.region.name}"
+
+    def clean(self):
+        self.key = normalize_region(self.key)
+
+    def save(self, *args, **kwargs):
+        self.key = normalize_region(self.key)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name_plural = "Region Aliases"
+        ordering = ['key']
+
+
+class InquiryQuerySet(models.QuerySet):
+    def delete(self):
+        # Cascades to the estimates, which leave the regional statistics in one batch
+        from .regional_stats import removing_estimates
+
+        with removing_estimates(PropertyEstimate.objects.filter(inquiry__in=self.values('pk'))):
+            return super().delete()
+
 
 class PropertyInquiry(models.Model):
     """Model to store property inquiry details"""
@@ -12,14 +87,60 @@ class PropertyInquiry(models.Model):
     investment_capacity = models.TextField(help_text="Investment capacity and timeline")
     preferences_concerns = models.TextField(help_text="Preferences and concerns")
     region = models.CharField(max_length=100, help_text="Geographic region")
+    region_ref = models.ForeignKey(
+        Region, on_delete=models.SET_NULL, null=True, blank=True, related_name='inquiries',
+        help_text="Canonical region resolved from region; empty when unrecognized"
+    )
+    latitude = models.FloatField(null=True, blank=True, help_text="Submitted coordinates, or the region's centre")
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True,
+                               help_text="Geohash of the coordinates; prefixes are grid cells")
     created_at = models.DateTimeField(default=timezone.now)
+
+    objects = InquiryQuerySet.as_manager()
     
     def __str__(self):
         return f"Property Inquiry - {self.address} ({self.lot_size} {self.lot_size_unit})"
+
+    def delete(self, *args, **kwargs):
+        from .regional_stats import removing_estimates
+
+        with removing_estimates(PropertyEstimate.objects.filter(inquiry_id=self.pk)):
+            return super().delete(*args, **kwargs)
     
     class Meta:
         verbose_name_plural = "Property Inquiries"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='inquiry_created_id_idx'),
+            models.Index(fields=['region'], name='inquiry_region_idx'),
+        ]
+
+
+# Estimate columns the results page never shows; the default manager defers them
+ESTIMATE_DETAIL_FIELDS = ('factors_considered', 'recommendations')
+
+
+class EstimateQuerySet(models.QuerySet):
+    def with_details(self):
+        """Also load ESTIMATE_DETAIL_FIELDS (clears deferrals, so call before defer/only)"""
+        return self.defer(None)
+
+    def with_payload(self):
+        """Every column, plus the EstimatePayload and its blob in the same query"""
+        return self.with_details().select_related('payload__response_blob')
+
+    def delete(self):
+        # Subtracted from the regional statistics in one batch, not row by row
+        from .regional_stats import removing_estimates
+
+        with removing_estimates(self):
+            return super().delete()
+
+
+class EstimateManager(models.Manager.from_queryset(EstimateQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().defer(*ESTIMATE_DETAIL_FIELDS)
 
 
 class PropertyEstimate(models.Model):
@@ -33,34 +154,235 @@ class PropertyEstimate(models.Model):
     timeline = models.CharField(max_length=200, help_text="Recommended project timeline")
     risk_assessment = models.TextField(help_text="Risk assessment and mitigation strategies")
     
-    # 10-year financial projections
-    cash_flow_projection = models.JSONField(help_text="10-year net cash flow projection in USD", default=list)
-    revenue_breakdown = models.JSONField(help_text="10-year revenue breakdown by category", default=dict)
-    cost_breakdown = models.JSONField(help_text="10-year cost breakdown by category", default=dict)
-    
-    ai_response_raw = models.JSONField(help_text="Raw AI response data")
+    # 10-year financial projections, packed (see main_app.projections); read and
+    # written through cash_flow_projection / revenue_breakdown / cost_breakdown
+    projection_series = ProjectionSeriesField(help_text="Net cash flow, revenue and cost series as packed float64")
+    projection_overflow = models.JSONField(
+        null=True, blank=True, help_text="Projection values that do not fit the packed layout"
+    )
+
+    # The raw AI response lives in EstimatePayload, read and written through ai_response_raw
     processing_time = models.FloatField(help_text="Processing time in seconds")
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, help_text="Last time the estimate was (re)generated")
+
+    objects = EstimateManager()
     
     def __str__(self):
         return f"Estimate for {self.inquiry.address} - {self.project_name}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if '_ai_response_raw' in self.__dict__:
+            self.payload = EstimatePayload.store(self, self.__dict__.pop('_ai_response_raw'))
+
+    def delete(self, *args, **kwargs):
+        from .regional_stats import removing_estimates
+
+        with removing_estimates(PropertyEstimate.objects.filter(pk=self.pk)):
+            return super().delete(*args, **kwargs)
+
+    @property
+    def ai_response_raw(self):
+        """Raw AI response data, from EstimatePayload (one query unless loaded with_payload)"""
+        if '_ai_response_raw' in self.__dict__:
+            return self.__dict__['_ai_response_raw']
+        if self.pk is None:
+            return None
+        if not PropertyEstimate.payload.is_cached(self):
+            payload = EstimatePayload.objects.select_related('response_blob').filter(estimate=self).first()
+            if payload is None:
+                return None
+            self.payload = payload
+        try:
+            return self.payload.ai_response_raw
+        except EstimatePayload.DoesNotExist:
+            return None
+
+    @ai_response_raw.setter
+    def ai_response_raw(self, value):
+        # Written to EstimatePayload by save()
+        self.__dict__['_ai_response_raw'] = value
+
+    def __setattr__(self, name, value):
+        # Assigning either stored field (including loading and refresh_from_db) drops the decoded groups
+        if name in PROJECTION_FIELDS:
+            self.__dict__.pop('_projections', None)
+        super().__setattr__(name, value)
+
+    @property
+    def projections(self) -> dict:
+        """
+        The three projection groups as JSON-shaped values, decoded once per
+        assignment of projection_series / projection_overflow. Shared, not
+        copied: treat as read-only and assign a changed group back (or
+        set_projections) to store it
+        """
+        if '_projections' not in self.__dict__:
+            self.__dict__['_projections'] = (self.projection_series or ProjectionSeries()).to_json(self.projection_overflow)
+        return self.__dict__['_projections']
+
+    def set_projections(self, **groups) -> None:
+        """Replace some of cash_flow_projection / revenue_breakdown / cost_breakdown"""
+        current = {**self.projections, **groups}
+        self.projection_series, self.projection_overflow = ProjectionSeries.pack(
+            current[CASH_FLOW], current[REVENUE], current[COST]
+        )
+
+    cash_flow_projection = property(
+        lambda self: self.projections[CASH_FLOW],
+        lambda self, value: self.set_projections(cash_flow_projection=value),
+        doc="10-year net cash flow projection in USD (read-only; assign to change it)",
+    )
+    revenue_breakdown = property(
+        lambda self: self.projections[REVENUE],
+        lambda self, value: self.set_projections(revenue_breakdown=value),
+        doc="10-year revenue breakdown by category (read-only; assign to change it)",
+    )
+    cost_breakdown = property(
+        lambda self: self.projections[COST],
+        lambda self, value: self.set_projections(cost_breakdown=value),
+        doc="10-year cost breakdown by category (read-only; assign to change it)",
+    )
     
     class Meta:
         verbose_name_plural = "Property Estimates"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='estimate_created_id_idx'),
+        ]
+
+
+class PayloadBlob(models.Model):
+    """A JSON payload stored once per distinct content, compressed (see main_app.blobs)"""
+    digest = models.BinaryField(max_length=32, unique=True, help_text="SHA-256 of the canonical JSON")
+    codec = models.CharField(max_length=8, choices=[(codec, codec) for codec in CODECS])
+    size = models.IntegerField(help_text="Length of the canonical JSON in bytes")
+    data = models.BinaryField()
+    stored_at = models.DateTimeField(
+        default=timezone.now, help_text="Last time the blob was stored or reused; archiving keeps recent ones"
+    )
+
+    def __str__(self):
+        return f"Payload {bytes(self.digest).hex()[:12]} ({self.size} bytes)"
+
+    @classmethod
+    def for_value(cls, value) -> 'PayloadBlob':
+        """An unsaved blob for a JSON value (save it with ``store``)"""
+        text = canonical_json(value)
+        codec, data = compress(text)
+        blob = cls(digest=digest(text), codec=codec, size=len(text), data=data)
+        blob._value = value
+        return blob
+
+    @classmethod
+    def store(cls, *blobs: 'PayloadBlob', using=None) -> None:
+        """Insert the blobs that are not stored yet and set the ids of all of them, in one statement"""
+        unsaved = {}
+        for blob in blobs:
+            if blob._state.adding:
+                unsaved.setdefault(blob.digest, blob)
+        if unsaved:
+            now = timezone.now()
+            for blob in unsaved.values():
+                blob.stored_at = now
+            # A conflict refreshes the existing row's stored_at (see log_archive.delete_unused_blobs) and returns its id
+            cls.objects.using(using).bulk_create(
+                unsaved.values(), update_conflicts=True, unique_fields=['digest'], update_fields=['stored_at'],
+            )
+        for blob in blobs:
+            if blob._state.adding:
+                blob.id = unsaved[blob.digest].id
+                blob._state.adding = False
+
+    @property
+    def value(self):
+        """The decoded JSON value (decompressed on first access)"""
+        if not hasattr(self, '_value'):
+            self._value = json.loads(decompress(self.codec, self.data))
+        return self._value
+
+
+class BlobQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        store_pending_blobs(objs, using=self.db)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class BlobModel(models.Model):
+    """Stores the new PayloadBlobs an instance points to before the instance itself"""
+
+    objects = BlobQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        store_pending_blobs([self], using=kwargs.get('using'))
+        super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+
+class EstimatePayload(BlobModel):
+    """Large, rarely read data of an estimate, kept out of PropertyEstimate rows"""
+    estimate = models.OneToOneField(
+        PropertyEstimate, on_delete=models.CASCADE, primary_key=True, related_name='payload'
+    )
+    response_blob = models.ForeignKey(PayloadBlob, on_delete=models.PROTECT, related_name='+')
+
+    ai_response_raw = blob_property('response_blob', doc="Raw AI response data")
+
+    def __str__(self):
+        return f"Payload of estimate {self.estimate_id}"
+
+    @classmethod
+    def store(cls, estimate: PropertyEstimate, ai_response_raw) -> 'EstimatePayload':
+        """Insert or replace the payload of an estimate (a PayloadBlob or a JSON value)"""
+        if not isinstance(ai_response_raw, PayloadBlob):
+            ai_response_raw = PayloadBlob.for_value(ai_response_raw)
+        payload = cls(estimate=estimate, response_blob=ai_response_raw)
+        cls.objects.bulk_create(
+            [payload], update_conflicts=True, unique_fields=['estimate'], update_fields=['response_blob'],
+        )
+        return payload
 
+    class Meta:
+        verbose_name_plural = "Estimate Payloads"
+
+
+class EstimateVersion(models.Model):
+    """One generated version of an estimate, a snapshot or a delta against the version before (see main_app.versions)"""
+    # Looked up through the (estimate, number) constraint's index
+    estimate = models.ForeignKey(PropertyEstimate, on_delete=models.CASCADE, related_name='versions', db_index=False)
+    number = models.PositiveIntegerField(help_text="1 for the first generation, then one up per regeneration")
+    snapshot = models.BooleanField(default=False, help_text="Whether data holds the full version rather than a delta")
+    data = models.BinaryField(help_text="zlib-compressed snapshot or delta")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Version {self.number} of estimate {self.estimate_id}"
 
-class AIAnalysisLog(models.Model):
+    class Meta:
+        ordering = ['estimate', 'number']
+        constraints = [
+            models.UniqueConstraint(fields=['estimate', 'number'], name='estimate_version_number_unique'),
+        ]
+
+
+class AIAnalysisLog(BlobModel):
     """Model to log AI analysis requests and responses for monitoring"""
     inquiry = models.ForeignKey(PropertyInquiry, on_delete=models.CASCADE, related_name='ai_logs')
-    request_data = models.JSONField(help_text="Request data sent to AI")
-    response_data = models.JSONField(help_text="Response data from AI")
+    request_blob = models.ForeignKey(PayloadBlob, on_delete=models.PROTECT, related_name='+')
+    response_blob = models.ForeignKey(PayloadBlob, on_delete=models.PROTECT, related_name='+')
     model_used = models.CharField(max_length=100, help_text="AI model used")
     tokens_used = models.IntegerField(help_text="Tokens consumed")
     processing_time = models.FloatField(help_text="Processing time in seconds")
     success = models.BooleanField(default=True, help_text="Whether the analysis was successful")
     error_message = models.TextField(blank=True, help_text="Error message if analysis failed")
     created_at = models.DateTimeField(default=timezone.now)
+
+    request_data = blob_property('request_blob', doc="Request data sent to AI")
+    response_data = blob_property('response_blob', doc="Response data from AI")
     
     def __str__(self):
         return f"AI Analysis Log - {self.inquiry.address} ({self.created_at})"
@@ -68,3 +390,50 @@ class AIAnalysisLog(models.Model):
     class Meta:
         verbose_name_plural = "AI Analysis Logs"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='ailog_created_id_idx'),
+        ]
+
+
+class LogSegment(models.Model):
+    """AIAnalysisLog rows archived to a compressed JSONL segment file (see main_app.log_archive)"""
+    name = models.CharField(max_length=100, unique=True, help_text="File name in LOG_ARCHIVE_DIR, without extension")
+    first_log_id = models.BigIntegerField()
+    last_log_id = models.BigIntegerField()
+    entries = models.IntegerField(default=0, help_text="Committed entries; bytes past them are ignored")
+    size = models.BigIntegerField(default=0, help_text="Committed bytes of the segment file")
+    oldest_log_at = models.DateTimeField(null=True)
+    newest_log_at = models.DateTimeField(null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} (logs {self.first_log_id}-{self.last_log_id})"
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['first_log_id', 'last_log_id'], name='logsegment_id_range_idx'),
+        ]
+
+
+class RegionalStatistic(models.Model):
+    """Estimate statistics per normalized region and lot-size bucket, maintained incrementally"""
+    region_key = models.CharField(max_length=100, help_text="Normalized region name")
+    region = models.CharField(max_length=100, help_text="Region as first submitted")
+    lot_size_bucket = models.PositiveSmallIntegerField(
+        choices=[(index, f"{label} acres") for index, (_, label) in enumerate(LOT_SIZE_BUCKETS)],
+        help_text="Index into LOT_SIZE_BUCKETS"
+    )
+    estimate_count = models.IntegerField(default=0)
+    sketches = models.JSONField(default=dict, help_text="Mergeable quantile sketch of each metric")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Regional Statistic - {self.region} ({self.get_lot_size_bucket_display()})"
+
+    class Meta:
+        verbose_name_plural = "Regional Statistics"
+        ordering = ['region_key', 'lot_size_bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['region_key', 'lot_size_bucket'], name='regional_statistic_key'),
+        ]
@@ -0,0 +1,214 @@
+"""
+Packed storage for the 10-year projection series of an estimate.
+
+The seven series (net cash flow, three revenue and three cost categories) are
+stored in one fixed-layout block of little-endian float64 values, in
+``SERIES_LAYOUT`` order, PROJECTION_YEARS values each: 560 bytes instead of
+about 750 of JSON text, and reading a value needs no parsing. ``values()`` is a
+zero-copy ``memoryview`` of the block (a byte-swapped ``array('d')`` copy on
+big-endian hosts) and ``numpy()`` a zero-copy (series, years) array.
+
+A missing series is stored as all NaN and a missing value (JSON null) as NaN.
+Anything the layout cannot hold (other categories, series of another length,
+non-numeric values) is kept as JSON in ``PropertyEstimate.projection_overflow``
+so the JSON-shaped accessors (``cash_flow_projection``, ``revenue_breakdown``,
+``cost_breakdown``) return exactly what was stored.
+"""
+
+import math
+import struct
+import sys
+from array import array
+from base64 import b64encode
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import models
+
+# Shape of the financial projections returned by the AI service
+PROJECTION_YEARS = 10
+REVENUE_CATEGORIES = ('agricultural_sales', 'ecosystem_services', 'subsidies_incentives')
+COST_CATEGORIES = ('operational_costs', 'infrastructure', 'maintenance')
+
+CASH_FLOW = 'cash_flow_projection'
+REVENUE = 'revenue_breakdown'
+COST = 'cost_breakdown'
+PROJECTION_GROUPS = (CASH_FLOW, REVENUE, COST)
+
+# (group, category) of each packed series; the cash flow has no category
+SERIES_LAYOUT: Tuple[Tuple[str, Optional[str]], ...] = (
+    (CASH_FLOW, None),
+    *((REVENUE, category) for category in REVENUE_CATEGORIES),
+    *((COST, category) for category in COST_CATEGORIES),
+)
+SERIES_COUNT = len(SERIES_LAYOUT)
+BLOCK_FORMAT = f'<{SERIES_COUNT * PROJECTION_YEARS}d'
+BLOCK_SIZE = struct.calcsize(BLOCK_FORMAT)
+
+_MISSING = [math.nan] * PROJECTION_YEARS
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+_NUMBER_TYPES = (float, int)
+
+
+def _number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _packable(series: Any) -> bool:
+    """A list of PROJECTION_YEARS numbers, some possibly null (all null would read back as missing)"""
+    if not isinstance(series, list) or len(series) != PROJECTION_YEARS:
+        return False
+    # Exact types first: the common case of a plain float/int series needs no per-value call
+    numbers = sum(type(value) in _NUMBER_TYPES or _number(value) for value in series)
+    return numbers > 0 and numbers + series.count(None) == PROJECTION_YEARS
+
+
+class ProjectionSeries:
+    """An immutable packed block of projection series"""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data=b''):
+        data = bytes(data or b'')
+        if data and len(data) != BLOCK_SIZE:
+            raise ValueError(f"Projection block must be {BLOCK_SIZE} bytes, got {len(data)}")
+        # An empty block stands for "no series at all"
+        self.data = data
+
+    def __bytes__(self) -> bytes:
+        return self.data
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ProjectionSeries) and self.data == other.data
+
+    def __hash__(self) -> int:
+        return hash(self.data)
+
+    def __repr__(self) -> str:
+        return f'<ProjectionSeries {len(self.data)} bytes>'
+
+    @classmethod
+    def pack(cls, cash_flow=None, revenue=None, cost=None) -> Tuple['ProjectionSeries', Optional[dict]]:
+        """Block and overflow JSON (None when everything fits) for JSON-shaped series"""
+        groups = {CASH_FLOW: cash_flow, REVENUE: revenue, COST: cost}
+        values: List[float] = []
+        packed = set()
+        for group, category in SERIES_LAYOUT:
+            series = groups[group]
+            if category is not None:
+                series = series.get(category) if isinstance(series, dict) else None
+            if _packable(series):
+                values.extend([math.nan if value is None else float(value) for value in series])
+                packed.add((group, category))
+            else:
+                values.extend(_MISSING)
+
+        overflow: Dict[str, Any] = {}
+        if cash_flow not in (None, []) and (CASH_FLOW, None) not in packed:
+            overflow[CASH_FLOW] = cash_flow
+        for group, breakdown in ((REVENUE, revenue), (COST, cost)):
+            if breakdown is not None and not isinstance(breakdown, dict):
+                overflow[group] = breakdown
+            elif breakdown:
+                extra = {category: series for category, series in breakdown.items() if (group, category) not in packed}
+                if extra:
+                    overflow[group] = extra
+
+        if not packed:
+            return cls(), overflow or None
+        return cls(struct.pack(BLOCK_FORMAT, *values)), overflow or None
+
+    def values(self):
+        """All values, series after series, as float64 (no copy on little-endian hosts)"""
+        if not self.data:
+            return memoryview(struct.pack(BLOCK_FORMAT, *(_MISSING * SERIES_COUNT))).cast('d')
+        if _LITTLE_ENDIAN:
+            return memoryview(self.data).cast('d')
+        swapped = array('d', self.data)
+        swapped.byteswap()
+        return swapped
+
+    def numpy(self):
+        """(series, years) read-only NumPy view of the block"""
+        import numpy as np
+
+        data = self.data or bytes(self.values())
+        return np.frombuffer(data, dtype='<f8').reshape(SERIES_COUNT, PROJECTION_YEARS)
+
+    def series(self, index: int) -> Optional[List[Optional[float]]]:
+        """Series ``index`` of SERIES_LAYOUT as a list (None for a missing value), or None if missing"""
+        if not self.data:
+            return None
+        start = index * PROJECTION_YEARS
+        values = self.values()[start:start + PROJECTION_YEARS]
+        if all(math.isnan(value) for value in values):
+            return None
+        return [None if math.isnan(value) else value for value in values]
+
+    def group_total(self, group: str) -> float:
+        """Sum of every packed value of a group (overflow not included)"""
+        if not self.data:
+            return 0.0
+        values = self.values()
+        total = 0.0
+        for index, (series_group, _) in enumerate(SERIES_LAYOUT):
+            if series_group == group:
+                start = index * PROJECTION_YEARS
+                total += math.fsum(value for value in values[start:start + PROJECTION_YEARS] if value == value)
+        return total
+
+    def to_json(self, overflow: Optional[dict] = None) -> Dict[str, Any]:
+        """{cash_flow_projection: [...], revenue_breakdown: {...}, cost_breakdown: {...}} as stored"""
+        result: Dict[str, Any] = {CASH_FLOW: [], REVENUE: {}, COST: {}}
+        for index, (group, category) in enumerate(SERIES_LAYOUT):
+            series = self.series(index)
+            if series is None:
+                continue
+            if category is None:
+                result[group] = series
+            else:
+                result[group][category] = series
+        for group, value in (overflow or {}).items():
+            if group == CASH_FLOW or not isinstance(value, dict):
+                result[group] = value
+            else:
+                result[group].update(value)
+        return result
+
+
+def projection_total(series: Optional[ProjectionSeries], overflow: Optional[dict], group: str) -> float:
+    """Sum of every yearly value of a revenue/cost group, overflow included"""
+    total = series.group_total(group) if series is not None else 0.0
+    extra = (overflow or {}).get(group)
+    if isinstance(extra, dict):
+        total += sum(
+            float(value) for values in extra.values() if isinstance(values, list)
+            for value in values if _number(value)
+        )
+    return total
+
+
+class ProjectionSeriesField(models.BinaryField):
+    """BinaryField holding a ProjectionSeries block"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default', b'')
+        super().__init__(*args, **kwargs)
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else ProjectionSeries(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, ProjectionSeries):
+            return value
+        return ProjectionSeries(super().to_python(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, ProjectionSeries):
+            value = value.data
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def get_default(self):
+        return ProjectionSeries(super().get_default())
+
+    def value_to_string(self, obj):
+        return b64encode(bytes(self.value_from_object(obj) or b'')).decode('ascii')
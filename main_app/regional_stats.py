@@ -0,0 +1,369 @@
+"""
+Per-region estimate statistics for Valora Earth Django application.
+
+RegionalStatistic rows hold, for each canonical region (the inquiry's stored
+``region_ref``, see regions.py; the normalized text when it has none) and
+lot-size bucket,
+a mergeable quantile sketch of revenue per acre, cost per acre, confidence
+score and processing time. Generating an estimate adds its values to one row
+(and subtracts the values it replaced) in the transaction that stores it, and
+deleting estimates or inquiries subtracts them in the transaction of the
+delete, so reading percentiles never decodes the estimates' JSON projections.
+Sketches of several buckets merge exactly, which gives the per-region totals.
+``rebuild_regional_statistics`` recomputes every row from PropertyEstimate;
+run it after writes that bypass these paths (bulk loads, raw SQL, admin edits
+of an estimate or of an inquiry's region or lot size). Changing which region
+inquiries resolve to (``backfill_regions``, region edits in the admin) goes
+through ``refresh_region_statistics``, which rebuilds them.
+"""
+
+import logging
+import math
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import router, transaction
+from django.db.models import QuerySet
+
+from .models import LOT_SIZE_BUCKETS, PROJECTION_YEARS, PropertyEstimate, PropertyInquiry, RegionalStatistic
+from .projections import COST, REVENUE, projection_total
+from .regions import ResolvedRegion, backfill_region_refs, build_index, normalize_region, resolve_region
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('revenue_per_acre', 'cost_per_acre', 'confidence_score', 'processing_time')
+# Estimate columns a sample is made from
+SAMPLE_FIELDS = ('projection_series', 'projection_overflow', 'confidence_score', 'processing_time')
+# An inquiry's stored canonical region (None for both when it has none)
+CANONICAL_FIELDS = ('region_ref__key', 'region_ref__name')
+# make_sample()'s arguments, read from an estimate queryset in one query
+SAMPLE_ROW_FIELDS = (
+    ('inquiry__region',) + tuple(f'inquiry__{name}' for name in CANONICAL_FIELDS)
+    + ('inquiry__lot_size', 'inquiry__lot_size_unit') + SAMPLE_FIELDS
+)
+DEFAULT_PERCENTILES = (25, 50, 75, 90)
+HECTARE_IN_ACRES = 2.47105
+# Quantiles are returned within 1% of the true value
+RELATIVE_ACCURACY = 0.01
+
+
+class QuantileSketch:
+    """
+    Log-bucketed histogram (DDSketch): values are counted in buckets whose
+    bounds grow geometrically, so any quantile is answered within
+    RELATIVE_ACCURACY. Counts can be added and subtracted, and two sketches
+    merge by adding their bucket counts.
+    """
+
+    gamma = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    log_gamma = math.log(gamma)
+    # Magnitudes below this are counted as zero
+    min_value = 1e-9
+
+    def __init__(self, positive=None, negative=None, zero=0, count=0, total=0.0):
+        self.positive: Dict[int, int] = positive or {}
+        self.negative: Dict[int, int] = negative or {}
+        self.zero = zero
+        self.count = count
+        self.total = total
+
+    def _key(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self.log_gamma)
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1) -> None:
+        """Count ``value`` ``count`` times; a negative count removes it"""
+        if abs(value) < self.min_value:
+            self.zero += count
+        else:
+            store = self.positive if value > 0 else self.negative
+            key = self._key(abs(value))
+            store[key] = store.get(key, 0) + count
+            if store[key] == 0:
+                del store[key]
+        self.count += count
+        self.total += value * count
+
+    def merge(self, other: 'QuantileSketch', sign: int = 1) -> None:
+        """Add (or with ``sign=-1`` subtract) another sketch's counts"""
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + sign * count
+                if mine[key] == 0:
+                    del mine[key]
+        self.zero += sign * other.zero
+        self.count += sign * other.count
+        self.total += sign * other.total
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at quantile ``q`` (0-1), None when empty"""
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count > 0 else None
+
+    def to_dict(self) -> dict:
+        return {
+            'p': {str(key): count for key, count in self.positive.items()},
+            'n': {str(key): count for key, count in self.negative.items()},
+            'z': self.zero,
+            'c': self.count,
+            's': self.total,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> 'QuantileSketch':
+        data = data or {}
+        return cls(
+            positive={int(key): count for key, count in data.get('p', {}).items()},
+            negative={int(key): count for key, count in data.get('n', {}).items()},
+            zero=data.get('z', 0),
+            count=data.get('c', 0),
+            total=data.get('s', 0.0),
+        )
+
+
+@dataclass(frozen=True)
+class Sample:
+    """One estimate's contribution to the statistics"""
+    region_key: str
+    region: str
+    lot_size_bucket: int
+    metrics: Tuple[Tuple[str, float], ...]
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return self.region_key, self.lot_size_bucket
+
+
+def lot_size_in_acres(lot_size, unit: str) -> float:
+    return float(lot_size) * (HECTARE_IN_ACRES if unit == 'hectares' else 1.0)
+
+
+def lot_size_bucket(acres: float) -> int:
+    """Index into LOT_SIZE_BUCKETS"""
+    for index, (upper, _) in enumerate(LOT_SIZE_BUCKETS):
+        if upper is None or acres < upper:
+            return index
+    return len(LOT_SIZE_BUCKETS) - 1
+
+
+def make_sample(region: str, region_key: Optional[str], region_name: Optional[str], lot_size, lot_size_unit: str,
+                projection_series, projection_overflow, confidence_score: float, processing_time: float) -> Sample:
+    """
+    Sample from an estimate's values; per-acre figures are yearly averages over the projection
+
+    ``region_key`` and ``region_name`` are those of the inquiry's stored
+    canonical region (CANONICAL_FIELDS), not resolved again from ``region``,
+    so a sample is removed from the row it was added to.
+    """
+    acres = lot_size_in_acres(lot_size, lot_size_unit)
+    metrics = [('confidence_score', float(confidence_score)), ('processing_time', float(processing_time))]
+    if acres > 0:
+        metrics += [
+            ('revenue_per_acre', projection_total(projection_series, projection_overflow, REVENUE) / PROJECTION_YEARS / acres),
+            ('cost_per_acre', projection_total(projection_series, projection_overflow, COST) / PROJECTION_YEARS / acres),
+        ]
+    if region_key is not None:
+        return Sample(region_key, region_name, lot_size_bucket(acres), tuple(metrics))
+    return Sample(normalize_region(region), region[:100], lot_size_bucket(acres), tuple(metrics))
+
+
+def estimate_sample(inquiry: PropertyInquiry, canonical: Tuple[Optional[str], Optional[str]],
+                    estimate: PropertyEstimate) -> Sample:
+    """Sample of an estimate; ``canonical`` is the inquiry's stored CANONICAL_FIELDS"""
+    return make_sample(inquiry.region, *canonical, inquiry.lot_size, inquiry.lot_size_unit, estimate.projection_series,
+                       estimate.projection_overflow, estimate.confidence_score, estimate.processing_time)
+
+
+def values_sample(inquiry: PropertyInquiry, canonical: Tuple[Optional[str], Optional[str]], values: dict) -> Sample:
+    """Sample from a dict holding (at least) an estimate's SAMPLE_FIELDS"""
+    return make_sample(inquiry.region, *canonical, inquiry.lot_size, inquiry.lot_size_unit,
+                       **{name: values[name] for name in SAMPLE_FIELDS})
+
+
+def apply_samples(added: Iterable[Sample] = (), removed: Iterable[Sample] = (), using: Optional[str] = None) -> None:
+    """Add and subtract samples, locking each affected row; rows left empty are deleted"""
+    changes: Dict[Tuple[str, int], List[Tuple[Sample, int]]] = defaultdict(list)
+    for sample in added:
+        changes[sample.key].append((sample, 1))
+    for sample in removed:
+        changes[sample.key].append((sample, -1))
+
+    # No savepoint of its own: callers run it inside their transaction
+    with transaction.atomic(using=using, savepoint=False):
+        # Sorted keys give every writer the same lock order
+        for (region_key, bucket), items in sorted(changes.items()):
+            stat, _ = RegionalStatistic.objects.using(using).select_for_update().get_or_create(
+                region_key=region_key, lot_size_bucket=bucket, defaults={'region': items[0][0].region}
+            )
+            sketches = {name: QuantileSketch.from_dict(stat.sketches.get(name)) for name in METRICS}
+            for sample, sign in items:
+                stat.estimate_count += sign
+                for name, value in sample.metrics:
+                    sketches[name].add(value, sign)
+            if stat.estimate_count <= 0:
+                stat.delete()
+                continue
+            stat.sketches = {name: sketch.to_dict() for name, sketch in sketches.items() if sketch.count > 0}
+            stat.save()
+
+
+@contextmanager
+def removing_estimates(estimates: QuerySet) -> Iterator[None]:
+    """
+    Wrap the deletion of ``estimates`` (or of their inquiries): their samples
+    are read up front in one query and subtracted after the delete, in the
+    same transaction, with one locked update per region and lot-size bucket
+    """
+    using = router.db_for_write(estimates.model)
+    with transaction.atomic(using=using):
+        # Only the estimate rows: the region join may be empty, which PostgreSQL cannot lock
+        rows = estimates.using(using).select_for_update(of=('self',)).values_list(*SAMPLE_ROW_FIELDS)
+        samples = [make_sample(*row) for row in rows]
+        yield
+        apply_samples(removed=samples, using=using)
+
+
+def write_statistics(samples: Iterable[Sample], statistic_model=None, using: Optional[str] = None) -> int:
+    """Replace every RegionalStatistic with the totals of ``samples``; returns the number of rows written"""
+    statistic_model = statistic_model or RegionalStatistic
+    counts: Dict[Tuple[str, int], int] = defaultdict(int)
+    labels: Dict[Tuple[str, int], str] = {}
+    sketches: Dict[Tuple[str, int], Dict[str, QuantileSketch]] = defaultdict(
+        lambda: {name: QuantileSketch() for name in METRICS}
+    )
+    for sample in samples:
+        counts[sample.key] += 1
+        labels.setdefault(sample.key, sample.region)
+        for name, value in sample.metrics:
+            sketches[sample.key][name].add(value)
+
+    stats = [
+        statistic_model(
+            region_key=region_key, lot_size_bucket=bucket, region=labels[region_key, bucket],
+            estimate_count=counts[region_key, bucket],
+            sketches={name: sketch.to_dict() for name, sketch in sketches[region_key, bucket].items() if sketch.count},
+        )
+        for region_key, bucket in counts
+    ]
+    with transaction.atomic(using=using):
+        statistic_model.objects.using(using).all().delete()
+        statistic_model.objects.using(using).bulk_create(stats, batch_size=500)
+    return len(stats)
+
+
+def rekey_statistics(resolve: Callable[[str], Optional[ResolvedRegion]] = resolve_region,
+                     statistic_model=None, using: Optional[str] = None) -> int:
+    """
+    Move rows keyed by normalized text to the canonical region it now resolves to,
+    merging rows that meet. Exact after ``backfill_region_refs`` with the same
+    ``resolve``: every inquiry of such a row has no region_ref and its text
+    normalizes to the row's key, so it was resolved alike. Used by migrations;
+    returns the number of rows left.
+    """
+    statistic_model = statistic_model or RegionalStatistic
+    merged: Dict[Tuple[str, int], object] = {}
+    for stat in statistic_model.objects.using(using).order_by('id'):
+        resolved = resolve(stat.region_key)
+        key = (resolved.key if resolved else stat.region_key, stat.lot_size_bucket)
+        sketches = {name: QuantileSketch.from_dict(data) for name, data in stat.sketches.items()}
+        target = merged.get(key)
+        if target is None:
+            merged[key] = statistic_model(
+                region_key=key[0], lot_size_bucket=stat.lot_size_bucket,
+                region=resolved.name if resolved else stat.region, estimate_count=stat.estimate_count,
+                sketches=sketches,
+            )
+            continue
+        target.estimate_count += stat.estimate_count
+        for name, sketch in sketches.items():
+            target.sketches.setdefault(name, QuantileSketch()).merge(sketch)
+    for stat in merged.values():
+        stat.sketches = {name: sketch.to_dict() for name, sketch in stat.sketches.items()}
+    with transaction.atomic(using=using):
+        statistic_model.objects.using(using).all().delete()
+        statistic_model.objects.using(using).bulk_create(merged.values(), batch_size=500)
+    return len(merged)
+
+
+def rebuild_statistics(chunk_size: int = 2000) -> int:
+    """Recompute every RegionalStatistic from the estimates; returns the number of rows written"""
+    rows = PropertyEstimate.objects.order_by('id').values_list(*SAMPLE_ROW_FIELDS)
+    return write_statistics(make_sample(*row) for row in rows.iterator(chunk_size=chunk_size))
+
+
+def refresh_region_statistics(every: bool = False, chunk_size: int = 5000) -> Tuple[int, int]:
+    """
+    Resolve inquiries' regions again with a fresh index (those without a
+    region_ref, or ``every`` one) and rebuild the statistics keyed by them;
+    returns (resolved, unrecognized) as ``backfill_region_refs`` does
+    """
+    resolved, unresolved = backfill_region_refs(build_index(), every, chunk_size)
+    rebuild_statistics()
+    return resolved, unresolved
+
+
+def summarize(sketches: Dict[str, QuantileSketch], percentiles: Iterable[int]) -> Dict[str, dict]:
+    """{metric: {'mean': ..., 'p50': ...}} with values rounded for display"""
+    summary = {}
+    for name in METRICS:
+        sketch = sketches.get(name)
+        if sketch is None or sketch.count <= 0:
+            continue
+        summary[name] = {'mean': round(sketch.mean, 4)}
+        for percentile in percentiles:
+            summary[name][f'p{percentile}'] = round(sketch.quantile(percentile / 100), 4)
+    return summary
+
+
+def regional_statistics(region: Optional[str] = None, percentiles: Iterable[int] = DEFAULT_PERCENTILES,
+                        using: Optional[str] = None) -> List[dict]:
+    """Statistics per region, each with its lot-size buckets and the merged region totals"""
+    percentiles = tuple(percentiles)
+    queryset = RegionalStatistic.objects.using(using).order_by('region_key', 'lot_size_bucket')
+    if region:
+        resolved = resolve_region(region)
+        queryset = queryset.filter(region_key=resolved.key if resolved else normalize_region(region))
+
+    regions: Dict[str, dict] = {}
+    merged: Dict[str, Dict[str, QuantileSketch]] = {}
+    for stat in queryset:
+        sketches = {name: QuantileSketch.from_dict(data) for name, data in stat.sketches.items()}
+        entry = regions.setdefault(stat.region_key, {
+            'region': stat.region, 'region_key': stat.region_key, 'estimate_count': 0, 'buckets': [],
+        })
+        entry['estimate_count'] += stat.estimate_count
+        entry['buckets'].append({
+            'lot_size_bucket': LOT_SIZE_BUCKETS[stat.lot_size_bucket][1],
+            'estimate_count': stat.estimate_count,
+            'metrics': summarize(sketches, percentiles),
+        })
+        totals = merged.setdefault(stat.region_key, {name: QuantileSketch() for name in METRICS})
+        for name, sketch in sketches.items():
+            if name in totals:
+                totals[name].merge(sketch)
+
+    for region_key, entry in regions.items():
+        entry['metrics'] = summarize(merged[region_key], percentiles)
+    return list(regions.values())
@@ -0,0 +1,307 @@
+"""
+Canonical regions for Valora Earth Django application.
+
+``PropertyInquiry.region`` is free text ("Sonoma, CA", "sonoma county
+california", ...). It is resolved to a Region row in three steps:
+
+1. fold case, accents, punctuation and whitespace (``normalize_region``);
+2. look the folded tokens up in a token trie of every Region key and
+   RegionAlias, taking the longest alias found anywhere in the text (so
+   "123 Farm Road, Sonoma County, California" finds "sonoma county");
+3. leave ``region_ref`` empty when nothing matches. Staff add an alias in the
+   admin, which resolves such rows again (as ``backfill_regions`` does).
+
+Regions carry an approximate centre; an inquiry saved without coordinates is
+placed there (see ``main_app.spatial``).
+
+Regions and aliases come from the bundled gazetteer (``data/regions.csv``,
+loaded by a migration) plus whatever staff add. The trie lives in process
+memory: it is built on first use, rebuilt when this process saves a Region or
+alias, and otherwise refreshed every REGION_INDEX_TTL seconds, so resolving a
+region costs microseconds and no queries.
+"""
+
+import csv
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'regions.csv'
+# Seconds before another process's Region/alias changes are picked up
+REGION_INDEX_TTL = 300
+# Aliases this short (state and country codes such as "CA" or "OR") are common
+# words too, so they only match as the last token: "Portland, OR" but not "in Sonoma"
+QUALIFIER_MAX_LENGTH = 2
+RESOLVE_CACHE_SIZE = 10000
+
+_TERMINAL = '$'
+
+
+def normalize_region(region: str) -> str:
+    """Case-, accent- and punctuation-insensitive region key ("  Northern California." -> "northern california")"""
+    text = unicodedata.normalize('NFKD', region or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    return ' '.join(re.sub(r'[^\w]+', ' ', text).split())[:100]
+
+
+@dataclass(frozen=True)
+class ResolvedRegion:
+    id: int
+    key: str
+    name: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+class RegionIndex:
+    """Token trie of region keys and aliases"""
+
+    def __init__(self, regions: Dict[int, ResolvedRegion], aliases: Iterable[Tuple[str, int]]):
+        self.regions = regions
+        self.root: dict = {}
+        self.size = 0
+        for region in regions.values():
+            self.add(region.key, region.id)
+        for alias, region_id in aliases:
+            if region_id in regions:
+                self.add(alias, region_id)
+        self.built_at = time.monotonic()
+        self._cache: Dict[str, Optional[ResolvedRegion]] = {}
+
+    def add(self, key: str, region_id: int) -> None:
+        tokens = key.split()
+        if not tokens:
+            return
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node.setdefault(_TERMINAL, region_id)
+        self.size += 1
+
+    def _longest_at(self, tokens: List[str], start: int) -> Tuple[int, Optional[int]]:
+        """(token count, region id) of the longest alias starting at ``tokens[start]``"""
+        node, best = self.root, (0, None)
+        for position in range(start, len(tokens)):
+            node = node.get(tokens[position])
+            if node is None:
+                break
+            if _TERMINAL in node:
+                best = (position - start + 1, node[_TERMINAL])
+        return best
+
+    def match(self, tokens: List[str]) -> Optional[int]:
+        """Region id of the best alias in ``tokens``: longest, then not a short code, then leftmost"""
+        best_score, best_id = None, None
+        for start in range(len(tokens)):
+            length, region_id = self._longest_at(tokens, start)
+            if region_id is None:
+                continue
+            qualifier = length == 1 and len(tokens[start]) <= QUALIFIER_MAX_LENGTH
+            if qualifier and start != len(tokens) - 1:
+                continue
+            score = (length, not qualifier, -start)
+            if best_score is None or score > best_score:
+                best_score, best_id = score, region_id
+        return best_id
+
+    def resolve(self, region: str) -> Optional[ResolvedRegion]:
+        """Canonical region for free text, or None"""
+        key = normalize_region(region)
+        if key in self._cache:
+            return self._cache[key]
+        region_id = self.match(key.split())
+        resolved = self.regions.get(region_id) if region_id is not None else None
+        if len(self._cache) >= RESOLVE_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[key] = resolved
+        return resolved
+
+
+_index: Optional[RegionIndex] = None
+_index_lock = threading.Lock()
+
+
+def _located(model) -> bool:
+    # Historical models in migrations before 0007 have no coordinates
+    return {field.name for field in model._meta.get_fields()} >= {'latitude', 'longitude'}
+
+
+def build_index(using: Optional[str] = None, region_model=None, alias_model=None) -> RegionIndex:
+    if region_model is None:
+        from .models import Region as region_model, RegionAlias as alias_model
+
+    fields = ('id', 'key', 'name', 'latitude', 'longitude') if _located(region_model) else ('id', 'key', 'name')
+    regions = {row[0]: ResolvedRegion(*row) for row in region_model.objects.using(using).values_list(*fields)}
+    return RegionIndex(regions, alias_model.objects.using(using).values_list('key', 'region_id'))
+
+
+def region_index() -> RegionIndex:
+    """The process-wide index, built on first use and refreshed after REGION_INDEX_TTL"""
+    global _index
+    index = _index
+    if index is None or time.monotonic() - index.built_at > REGION_INDEX_TTL:
+        with _index_lock:
+            if _index is None or _index is index:
+                _index = build_index()
+            index = _index
+    return index
+
+
+def invalidate_region_index(**kwargs) -> None:
+    """Signal receiver dropping the index after Region/RegionAlias writes"""
+    global _index
+    _index = None
+
+
+def resolve_region(region: str) -> Optional[ResolvedRegion]:
+    return region_index().resolve(region)
+
+
+def assign_region(sender=None, instance=None, **kwargs) -> None:
+    """pre_save receiver (and helper for bulk inserts) deriving ``region_ref`` from ``region``"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'region' not in update_fields:
+        return
+    try:
+        index = region_index()
+        previous = index.regions.get(instance.region_ref_id) if instance.region_ref_id else None
+        resolved = index.resolve(instance.region)
+    except Exception as e:
+        # Never block saving an inquiry; backfill_regions fills the gap later
+        logger.error(f"Error resolving region '{instance.region}': {str(e)}")
+        return
+    instance.region_ref_id = resolved.id if resolved else None
+    place_at_region(instance, previous, resolved)
+
+
+def place_at_region(instance, previous: Optional[ResolvedRegion], resolved: Optional[ResolvedRegion]) -> None:
+    """
+    Give an inquiry without its own coordinates its region's centre, and keep
+    ``geohash`` in step with the coordinates
+    """
+    from .utils.geo import geohash_encode, valid_coordinates
+
+    coordinates = (instance.latitude, instance.longitude)
+    at_previous_centre = previous is not None and coordinates == (previous.latitude, previous.longitude)
+    if coordinates == (None, None) or at_previous_centre:
+        if resolved is not None and resolved.latitude is not None:
+            instance.latitude, instance.longitude = resolved.latitude, resolved.longitude
+        elif at_previous_centre:
+            instance.latitude = instance.longitude = None
+    if valid_coordinates(instance.latitude, instance.longitude):
+        instance.geohash = geohash_encode(instance.latitude, instance.longitude)
+    else:
+        instance.geohash = ''
+
+
+def _coordinate(value: str) -> Optional[float]:
+    return float(value) if value and value.strip() else None
+
+
+def read_gazetteer(path: Path = GAZETTEER_PATH) -> List[Tuple[str, str, List[str], Optional[float], Optional[float]]]:
+    """(name, country, aliases, latitude, longitude) rows of the bundled gazetteer"""
+    with open(path, newline='', encoding='utf-8') as gazetteer:
+        return [
+            (
+                row['name'].strip(), row['country'].strip(),
+                [alias for alias in row['aliases'].split('|') if alias.strip()],
+                _coordinate(row.get('latitude')), _coordinate(row.get('longitude')),
+            )
+            for row in csv.DictReader(gazetteer)
+        ]
+
+
+def load_gazetteer(region_model=None, alias_model=None, using: str = 'default') -> Tuple[int, int]:
+    """
+    Insert gazetteer regions and aliases that are missing, and fill in centres
+    of regions that have none; returns (regions, aliases) created
+    """
+    if region_model is None:
+        from .models import Region as region_model, RegionAlias as alias_model
+
+    rows = read_gazetteer()
+    located = _located(region_model)
+    existing = dict(region_model.objects.using(using).values_list('key', 'id'))
+    new_regions = []
+    for name, country, _, latitude, longitude in rows:
+        if normalize_region(name) not in existing:
+            region = region_model(key=normalize_region(name), name=name, country=country)
+            if located:
+                region.latitude, region.longitude = latitude, longitude
+            new_regions.append(region)
+    region_model.objects.using(using).bulk_create(new_regions, ignore_conflicts=True)
+    if located:
+        centres = {normalize_region(name): (latitude, longitude) for name, _, _, latitude, longitude in rows}
+        unlocated = list(region_model.objects.using(using).filter(latitude__isnull=True, key__in=list(centres)))
+        for region in unlocated:
+            region.latitude, region.longitude = centres[region.key]
+        region_model.objects.using(using).bulk_update(unlocated, ['latitude', 'longitude'])
+    ids = dict(region_model.objects.using(using).values_list('key', 'id'))
+
+    taken = set(alias_model.objects.using(using).values_list('key', flat=True)) | set(ids)
+    new_aliases = []
+    for name, _, aliases, _, _ in rows:
+        for alias in aliases:
+            key = normalize_region(alias)
+            if key and key not in taken:
+                taken.add(key)
+                new_aliases.append(alias_model(key=key, region_id=ids[normalize_region(name)]))
+    alias_model.objects.using(using).bulk_create(new_aliases, ignore_conflicts=True)
+    invalidate_region_index()
+    return len(new_regions), len(new_aliases)
+
+
+def backfill_region_refs(index: RegionIndex, every: bool = False, chunk_size: int = 5000,
+                         inquiry_model=None, using: str = 'default') -> Tuple[int, int]:
+    """
+    Set ``region_ref`` of inquiries without one (or of ``every`` inquiry) from
+    their free-text region; returns (resolved, unrecognized)
+
+    Inquiries are read in id order a chunk at a time and updated with one
+    UPDATE per canonical region per chunk. Inquiries still at the centre of
+    the region they moved away from lose their coordinates, so
+    ``place_unlocated_inquiries`` places them at the new one.
+    """
+    if inquiry_model is None:
+        from .models import PropertyInquiry as inquiry_model
+
+    located = _located(inquiry_model)
+    queryset = inquiry_model.objects.using(using).order_by('id')
+    if not every:
+        queryset = queryset.filter(region_ref__isnull=True)
+    fields = ('id', 'region', 'region_ref_id') + (('latitude', 'longitude') if located else ())
+
+    resolved = unresolved = 0
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).values_list(*fields)[:chunk_size])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        changes = defaultdict(list)
+        for pk, region, current, *coordinates in rows:
+            match = index.resolve(region)
+            region_id = match.id if match else None
+            resolved += match is not None
+            unresolved += match is None
+            if region_id != current:
+                previous = index.regions.get(current)
+                # Still at the old region's centre: re-placed at the new one
+                moved = (located and previous is not None
+                         and tuple(coordinates) == (previous.latitude, previous.longitude))
+                changes[region_id, moved].append(pk)
+        with transaction.atomic(using=using):
+            for (region_id, moved), ids in changes.items():
+                fields_to_clear = {'latitude': None, 'longitude': None, 'geohash': ''} if moved else {}
+                inquiry_model.objects.using(using).filter(id__in=ids).update(region_ref_id=region_id, **fields_to_clear)
+    return resolved, unresolved
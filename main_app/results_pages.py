@@ -0,0 +1,195 @@
+"""
+Pre-rendered estimate results pages.
+
+An estimate only changes when it is regenerated, so its results page is
+rendered once, when the estimate is stored, and kept gzipped in
+RESULTS_PAGE_DIR/<inquiry id % 1000>/<inquiry id>.html.gz (about 6 KB
+instead of 36). ``estimate_results`` then serves the file without touching
+the database or the template engine, sending the gzip member as is to
+clients that accept it.
+
+A stored page is one header line holding its strong ETag (a hash of the HTML)
+followed by the gzip member; the file's mtime is the estimate's ``updated_at``
+and serves as Last-Modified. Pages are written to a temporary file and renamed
+into place, so readers see the old page or the new one, never part of one.
+The brotli variant is compressed once, on its first request, and kept beside
+the page as <inquiry id>.html.br, headed by the ETag of the page it encodes.
+
+Regenerating an estimate replaces its page. Saving or deleting an inquiry or
+estimate any other way (the admin) deletes it, and the next view renders and
+stores it again; ``QuerySet.update`` sends no signals, so code using it must
+call ``delete_page`` itself. Pages are rendered without a request, so they
+carry no flash messages (those stay queued for the next page) and must be
+cleared with ``python manage.py clear_results_pages`` after deploying
+template or static file changes.
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .charts import chart_data
+from .compression import BROTLI, GZIP, STORED_LEVELS, compress
+from .models import PropertyEstimate, PropertyInquiry
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE = 'main_app/estimate_results.html'
+SHARDS = 1000
+GZIP_LEVEL = STORED_LEVELS[GZIP]
+
+
+class StoredPage(NamedTuple):
+    etag: str
+    last_modified: float
+    compressed: bytes
+
+    def encoded_etag(self, encoding: Optional[str]) -> str:
+        """Strong ETag of an encoded representation (it differs from the HTML's)"""
+        return self.etag[:-1] + f'-{encoding}"' if encoding else self.etag
+
+    @property
+    def gzip_etag(self) -> str:
+        return self.encoded_etag(GZIP)
+
+    @property
+    def version(self) -> str:
+        """The ``?v=`` value pinning a results URL to this page"""
+        return self.etag.strip('"')
+
+    def html(self) -> bytes:
+        return gzip.decompress(self.compressed)
+
+
+def page_dir() -> Path:
+    return Path(settings.RESULTS_PAGE_DIR)
+
+
+def page_path(inquiry_id: int) -> Path:
+    return page_dir() / f'{inquiry_id % SHARDS:03d}' / f'{inquiry_id}.html.gz'
+
+
+def variant_path(inquiry_id: int) -> Path:
+    return page_path(inquiry_id).with_suffix('.br')
+
+
+def page_context(inquiry: PropertyInquiry, estimate: Optional[PropertyEstimate]) -> dict:
+    return {
+        'inquiry': inquiry,
+        'estimate': estimate,
+        'has_estimate': estimate is not None,
+        'chart_data': chart_data(estimate),
+    }
+
+
+def render_page(inquiry: PropertyInquiry, estimate: PropertyEstimate) -> StoredPage:
+    html = render_to_string(TEMPLATE, page_context(inquiry, estimate)).encode('utf-8')
+    etag = '"%s"' % hashlib.blake2b(html, digest_size=16).hexdigest()
+    return StoredPage(etag, estimate.updated_at.timestamp(), gzip.compress(html, GZIP_LEVEL, mtime=0))
+
+
+def store_page(inquiry: PropertyInquiry, estimate: PropertyEstimate, replace: bool = True) -> Optional[StoredPage]:
+    """Render and store the results page of an estimate; failures are only logged
+
+    With ``replace=False`` a page stored meanwhile (by a regeneration) is kept
+    and returned instead.
+    """
+    try:
+        page = render_page(inquiry, estimate)
+        path = page_path(inquiry.id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=f'.{inquiry.id}-')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(page.etag.encode('ascii') + b'\n' + page.compressed)
+            os.utime(temporary, (page.last_modified, page.last_modified))
+            if replace:
+                os.replace(temporary, path)
+            else:
+                try:
+                    os.link(temporary, path)
+                except FileExistsError:
+                    return read_page(inquiry.id) or page
+        finally:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+        return page
+    except Exception as e:
+        logger.error(f"Error storing results page of inquiry {inquiry.id}: {str(e)}")
+        return None
+
+
+def read_page(inquiry_id: int) -> Optional[StoredPage]:
+    """The stored results page of an inquiry, if there is one"""
+    try:
+        file = open(page_path(inquiry_id), 'rb')
+    except FileNotFoundError:
+        return None
+    with file:
+        etag = file.readline().rstrip(b'\n').decode('ascii')
+        return StoredPage(etag, os.fstat(file.fileno()).st_mtime, file.read())
+
+
+def encoded_page(inquiry_id: int, page: StoredPage, encoding: Optional[str]) -> bytes:
+    """The page's body in ``encoding`` (None for the HTML), compressing and storing the brotli variant once"""
+    if encoding is None:
+        return page.html()
+    if encoding == GZIP:
+        return page.compressed
+    path = variant_path(inquiry_id)
+    try:
+        with open(path, 'rb') as file:
+            if file.readline().rstrip(b'\n').decode('ascii') == page.etag:
+                return file.read()
+    except FileNotFoundError:
+        pass
+    body = compress(page.html(), BROTLI, STORED_LEVELS[BROTLI])
+    try:
+        fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=f'.{inquiry_id}-')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(page.etag.encode('ascii') + b'\n' + body)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+    except Exception as e:
+        logger.error(f"Error storing the brotli results page of inquiry {inquiry_id}: {str(e)}")
+    return body
+
+
+def delete_page(inquiry_id: int) -> None:
+    page_path(inquiry_id).unlink(missing_ok=True)
+    variant_path(inquiry_id).unlink(missing_ok=True)
+
+
+def clear_pages() -> int:
+    """Delete every stored page; they are rendered again on their next view"""
+    deleted = 0
+    for path in page_dir().glob('*/*.html.gz'):
+        path.unlink(missing_ok=True)
+        deleted += 1
+    for path in page_dir().glob('*/*.html.br'):
+        path.unlink(missing_ok=True)
+    return deleted
+
+
+def results_url(inquiry_id: int) -> str:
+    """The results page URL, pinned to the stored page (which is then served as immutable) if there is one"""
+    url = reverse('main_app:estimate_results', args=[inquiry_id])
+    page = read_page(inquiry_id)
+    return f"{url}?{urlencode({'v': page.version})}" if page else url
+
+
+def invalidate_page(sender, instance, **kwargs) -> None:
+    """post_save/post_delete receiver for PropertyInquiry and PropertyEstimate"""
+    delete_page(instance.id if sender is PropertyInquiry else instance.inquiry_id)
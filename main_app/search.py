@@ -0,0 +1,300 @@
+"""
+Full-text search over property inquiries and their estimates.
+
+The index covers the inquiry address, region and the four questionnaire
+answers, plus the estimate's project name and description.
+
+- SQLite: an FTS5 table (``main_app_inquiry_fts``, rowid = inquiry id) kept in
+  sync by triggers on both tables and ranked with bm25.
+- PostgreSQL: GIN indexes on ``to_tsvector`` expressions of both tables,
+  ranked with ``ts_rank``. The query repeats the indexed expressions verbatim
+  so the planner can use the indexes.
+- Anything else, or a database without the index: ``icontains`` scan.
+
+``install_search_index`` creates the index (used by the migration and tests).
+"""
+
+import re
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
+
+from .models import PropertyEstimate, PropertyInquiry
+
+INQUIRY_SEARCH_FIELDS = (
+    'address', 'region', 'current_property', 'property_goals',
+    'investment_capacity', 'preferences_concerns',
+)
+ESTIMATE_SEARCH_FIELDS = ('project_name', 'project_description')
+
+FTS_TABLE = 'main_app_inquiry_fts'
+INQUIRY_TABLE = PropertyInquiry._meta.db_table
+ESTIMATE_TABLE = PropertyEstimate._meta.db_table
+
+# Words only; everything else in the user's input is dropped before it reaches MATCH/to_tsquery
+TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Shorter terms match whole words only; a one-letter prefix would match (and rank) most of the table
+MIN_PREFIX_LENGTH = 3
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# --- SQLite FTS5 -------------------------------------------------------------
+
+_inquiry_columns = ', '.join(INQUIRY_SEARCH_FIELDS)
+_new_inquiry_values = ', '.join(f'new.{field}' for field in INQUIRY_SEARCH_FIELDS)
+_inquiry_assignments = ', '.join(f'{field} = new.{field}' for field in INQUIRY_SEARCH_FIELDS)
+
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {_inquiry_columns}, project_name, project_description,
+        tokenize = 'porter unicode61 remove_diacritics 2',
+        prefix = '3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_inquiry_insert AFTER INSERT ON {INQUIRY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_inquiry_columns}, project_name, project_description)
+        VALUES (new.id, {_new_inquiry_values}, '', '');
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_inquiry_update AFTER UPDATE ON {INQUIRY_TABLE} BEGIN
+        UPDATE {FTS_TABLE} SET {_inquiry_assignments} WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_inquiry_delete AFTER DELETE ON {INQUIRY_TABLE} BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_estimate_insert AFTER INSERT ON {ESTIMATE_TABLE} BEGIN
+        UPDATE {FTS_TABLE} SET project_name = new.project_name, project_description = new.project_description
+        WHERE rowid = new.inquiry_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_estimate_update AFTER UPDATE ON {ESTIMATE_TABLE} BEGIN
+        UPDATE {FTS_TABLE} SET project_name = '', project_description = '' WHERE rowid = old.inquiry_id;
+        UPDATE {FTS_TABLE} SET project_name = new.project_name, project_description = new.project_description
+        WHERE rowid = new.inquiry_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_estimate_delete AFTER DELETE ON {ESTIMATE_TABLE} BEGIN
+        UPDATE {FTS_TABLE} SET project_name = '', project_description = '' WHERE rowid = old.inquiry_id;
+    END""",
+    # Backfill rows that existed before the index
+    f"""INSERT INTO {FTS_TABLE}(rowid, {_inquiry_columns}, project_name, project_description)
+        SELECT i.id, {', '.join(f'i.{field}' for field in INQUIRY_SEARCH_FIELDS)},
+               COALESCE(e.project_name, ''), COALESCE(e.project_description, '')
+        FROM {INQUIRY_TABLE} i LEFT JOIN {ESTIMATE_TABLE} e ON e.inquiry_id = i.id
+        WHERE i.id NOT IN (SELECT rowid FROM {FTS_TABLE})""",
+]
+
+SQLITE_UNINSTALL = [
+    *(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{name}" for name in (
+        'inquiry_insert', 'inquiry_update', 'inquiry_delete',
+        'estimate_insert', 'estimate_update', 'estimate_delete',
+    )),
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+# Column weights for bm25, in FTS table column order (address, region, answers..., project)
+SQLITE_BM25_WEIGHTS = (4.0, 3.0, 1.0, 1.0, 1.0, 1.0, 2.0, 1.0)
+
+# --- PostgreSQL tsvector ------------------------------------------------------
+
+POSTGRES_CONFIG = 'english'
+
+
+def _tsvector(fields, alias: str = '') -> str:
+    prefix = f'{alias}.' if alias else ''
+    document = " || ' ' || ".join(f"coalesce({prefix}{field}, '')" for field in fields)
+    return f"to_tsvector('{POSTGRES_CONFIG}', {document})"
+
+
+POSTGRES_INQUIRY_VECTOR = _tsvector(INQUIRY_SEARCH_FIELDS)
+POSTGRES_ESTIMATE_VECTOR = _tsvector(ESTIMATE_SEARCH_FIELDS)
+
+POSTGRES_INSTALL = [
+    f"CREATE INDEX IF NOT EXISTS main_app_inquiry_search_gin ON {INQUIRY_TABLE} USING GIN ({POSTGRES_INQUIRY_VECTOR})",
+    f"CREATE INDEX IF NOT EXISTS main_app_estimate_search_gin ON {ESTIMATE_TABLE} USING GIN ({POSTGRES_ESTIMATE_VECTOR})",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS main_app_inquiry_search_gin",
+    "DROP INDEX IF EXISTS main_app_estimate_search_gin",
+]
+
+
+def install_search_index(connection) -> None:
+    """Create the full-text index for the connection's database (no-op on other vendors)"""
+    statements = {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def uninstall_search_index(connection) -> None:
+    statements = {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def search_terms(query: str) -> List[str]:
+    """Split user input into plain words"""
+    return TERM_PATTERN.findall(query.lower())
+
+
+def is_prefix_term(term: str) -> bool:
+    return len(term) >= MIN_PREFIX_LENGTH
+
+
+@dataclass
+class SearchHit:
+    """A ranked search result (higher rank is better)"""
+    inquiry_id: int
+    rank: float
+
+
+class SearchBackend:
+    """icontains fallback: scans every row, results ordered by recency"""
+
+    name = 'icontains'
+
+    def __init__(self, using: str = 'default'):
+        self.using = using
+
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        """Restrict an inquiry queryset to matches"""
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+        fields = [*INQUIRY_SEARCH_FIELDS, *(f'estimate__{field}' for field in ESTIMATE_SEARCH_FIELDS)]
+        for term in terms:
+            match = Q()
+            for field in fields:
+                match |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(match)
+        return queryset
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[SearchHit]:
+        if not search_terms(query):
+            return []
+        queryset = self.filter(PropertyInquiry.objects.using(self.using), query)
+        ids = queryset.order_by('-created_at').values_list('id', flat=True)[:limit]
+        return [SearchHit(inquiry_id=inquiry_id, rank=0.0) for inquiry_id in ids]
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """FTS5 MATCH with prefix matching on longer terms, ranked by bm25"""
+
+    name = 'sqlite_fts5'
+
+    @staticmethod
+    def match_expression(query: str) -> str:
+        # Each term becomes a quoted (prefix) query; terms are ANDed
+        return ' '.join(f'"{term}"*' if is_prefix_term(term) else f'"{term}"' for term in search_terms(query))
+
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset
+        return queryset.filter(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression]))
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[SearchHit]:
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        weights = ', '.join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, bm25({FTS_TABLE}, {weights}) AS score FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s ORDER BY score LIMIT %s",
+                [expression, limit],
+            )
+            # bm25 is lower-is-better; flip it so every backend ranks higher-is-better
+            return [SearchHit(inquiry_id=row[0], rank=-row[1]) for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """tsvector/GIN search with prefix matching on longer terms, ranked by ts_rank"""
+
+    name = 'postgres_tsvector'
+
+    @staticmethod
+    def tsquery(query: str) -> str:
+        return ' & '.join(f'{term}:*' if is_prefix_term(term) else term for term in search_terms(query))
+
+    def matching_ids_sql(self):
+        return (
+            f"SELECT id FROM {INQUIRY_TABLE} WHERE {POSTGRES_INQUIRY_VECTOR} @@ to_tsquery('{POSTGRES_CONFIG}', %s) "
+            f"UNION SELECT inquiry_id FROM {ESTIMATE_TABLE} WHERE {POSTGRES_ESTIMATE_VECTOR} @@ to_tsquery('{POSTGRES_CONFIG}', %s)"
+        )
+
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return queryset
+        return queryset.filter(id__in=RawSQL(self.matching_ids_sql(), [tsquery, tsquery]))
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[SearchHit]:
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return []
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH q AS (SELECT to_tsquery('{POSTGRES_CONFIG}', %s) AS query)
+                SELECT i.id,
+                       ts_rank({_tsvector(INQUIRY_SEARCH_FIELDS, 'i')}, q.query)
+                       + coalesce(ts_rank({_tsvector(ESTIMATE_SEARCH_FIELDS, 'e')}, q.query), 0) AS score
+                FROM {INQUIRY_TABLE} i
+                LEFT JOIN {ESTIMATE_TABLE} e ON e.inquiry_id = i.id
+                CROSS JOIN q
+                WHERE i.id IN ({self.matching_ids_sql()})
+                ORDER BY score DESC
+                LIMIT %s
+                """,
+                [tsquery, tsquery, tsquery, limit],
+            )
+            return [SearchHit(inquiry_id=row[0], rank=float(row[1])) for row in cursor.fetchall()]
+
+
+def fts_table_exists(connection) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def get_search_backend(using: Optional[str] = None) -> SearchBackend:
+    """The best search backend available on a database"""
+    using = using or PropertyInquiry.objects.db
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and fts_table_exists(connection):
+        return SQLiteFTSBackend(using)
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend(using)
+    return SearchBackend(using)
+
+
+def search_inquiries(query: str, limit: int = DEFAULT_LIMIT, using: Optional[str] = None):
+    """Ranked search returning (result dicts, backend name, milliseconds taken)"""
+    started = time.perf_counter()
+    backend = get_search_backend(using)
+    hits = backend.search(query, max(1, min(limit, MAX_LIMIT)))
+    rows = {
+        row['id']: row
+        for row in PropertyInquiry.objects.using(backend.using)
+        .filter(id__in=[hit.inquiry_id for hit in hits])
+        .values('id', 'address', 'region', 'created_at', 'estimate__project_name')
+    }
+    results = []
+    for hit in hits:
+        row = rows.get(hit.inquiry_id)
+        if row is not None:
+            results.append({
+                'id': row['id'],
+                'address': row['address'],
+                'region': row['region'],
+                'project_name': row['estimate__project_name'],
+                'created_at': row['created_at'].isoformat(),
+                'rank': round(hit.rank, 6),
+            })
+    return results, backend.name, (time.perf_counter() - started) * 1000
@@ -0,0 +1,374 @@
+"""
+Comparable-property lookup: the k estimated properties nearest an estimate,
+optionally restricted to a lot-size band.
+
+Inquiries carry coordinates (submitted, or their region's centre; see
+``main_app.regions``) and the geohash of those coordinates.
+
+- SQLite: an R*Tree (``main_app_estimate_rtree``, id = inquiry id) over
+  latitude, longitude and lot size in acres, holding only inquiries that have
+  an estimate and kept in sync by triggers. Search boxes grow until k points
+  fall inside the search circle; the database orders each box's points by
+  (equirectangular) distance and the nearest are re-ranked by haversine.
+- PostgreSQL: a partial GiST index on ``point(longitude, latitude)`` answers
+  ``ORDER BY <->`` KNN queries. Degrees are not kilometres away from the
+  equator, so the query overfetches and re-ranks by haversine.
+- Anything else, or a database without the index: the same growing circle,
+  with candidates read from the 3x3 block of geohash cells around the target
+  (range scans on the ``geohash`` index), nearest first.
+
+``install_spatial_index`` creates the index (used by the migration and tests).
+"""
+
+import math
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from django.db import connections
+from django.db.models import Case, Exists, ExpressionWrapper, F, FloatField, OuterRef, Q, Value, When
+from django.db.models.functions import Abs, Least
+
+from .models import PropertyEstimate, PropertyInquiry, Region
+from .regional_stats import HECTARE_IN_ACRES, lot_size_in_acres
+from .utils.geo import (
+    EARTH_RADIUS_KM,
+    KM_PER_DEGREE_LATITUDE,
+    bounding_boxes,
+    geohash_encode,
+    haversine_km,
+    valid_coordinates,
+)
+
+RTREE_TABLE = 'main_app_estimate_rtree'
+INQUIRY_TABLE = PropertyInquiry._meta.db_table
+ESTIMATE_TABLE = PropertyEstimate._meta.db_table
+
+DEFAULT_K = 10
+MAX_K = 50
+# Comparables are between acres / band and acres * band
+DEFAULT_BAND = 2.0
+
+# The search circle starts at INITIAL_RADIUS_KM and grows by RADIUS_GROWTH until k points fall inside it
+INITIAL_RADIUS_KM = 1.0
+RADIUS_GROWTH = 8
+MAX_RADIUS_KM = math.pi * EARTH_RADIUS_KM
+# Circles a search tries at most, each one query (6: 1, 8, 64, 512 and 4,096 km, then the whole globe)
+MAX_SEARCHES = math.ceil(math.log(MAX_RADIUS_KM / INITIAL_RADIUS_KM, RADIUS_GROWTH)) + 1
+# Rows fetched per k before re-ranking by haversine
+OVERFETCH = 4
+
+# --- SQLite R*Tree -----------------------------------------------------------
+
+_ACRES = f"CASE {{row}}.lot_size_unit WHEN 'hectares' THEN {{row}}.lot_size * {HECTARE_IN_ACRES} ELSE {{row}}.lot_size END"
+# The tree stores hundreds of acres. With raw acres (0.5 to 10,000+) the lot-size axis dwarfs the
+# degree axes, nodes split by lot size instead of location and box queries get 10-20x slower.
+RTREE_ACRES_SCALE = 0.01
+
+
+def _rtree_row(row: str) -> str:
+    size = f"({_ACRES.format(row=row)}) * {RTREE_ACRES_SCALE}"
+    return f"{row}.id, {row}.latitude, {row}.latitude, {row}.longitude, {row}.longitude, {size}, {size}"
+
+
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} USING rtree(
+        id, min_lat, max_lat, min_lon, max_lon, min_size, max_size
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_estimate_insert AFTER INSERT ON {ESTIMATE_TABLE} BEGIN
+        INSERT OR REPLACE INTO {RTREE_TABLE}
+        SELECT {_rtree_row('i')} FROM {INQUIRY_TABLE} i
+        WHERE i.id = new.inquiry_id AND i.latitude IS NOT NULL AND i.longitude IS NOT NULL;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_estimate_delete AFTER DELETE ON {ESTIMATE_TABLE} BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = old.inquiry_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_inquiry_update
+        AFTER UPDATE OF latitude, longitude, lot_size, lot_size_unit ON {INQUIRY_TABLE} BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = new.id;
+        INSERT INTO {RTREE_TABLE}
+        SELECT {_rtree_row('new')}
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+          AND EXISTS (SELECT 1 FROM {ESTIMATE_TABLE} WHERE inquiry_id = new.id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_inquiry_delete AFTER DELETE ON {INQUIRY_TABLE} BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = old.id;
+    END""",
+    # Backfill rows that existed before the index
+    f"""INSERT INTO {RTREE_TABLE}
+        SELECT {_rtree_row('i')} FROM {INQUIRY_TABLE} i JOIN {ESTIMATE_TABLE} e ON e.inquiry_id = i.id
+        WHERE i.latitude IS NOT NULL AND i.longitude IS NOT NULL
+          AND i.id NOT IN (SELECT id FROM {RTREE_TABLE})""",
+]
+
+SQLITE_UNINSTALL = [
+    *(f"DROP TRIGGER IF EXISTS {RTREE_TABLE}_{name}" for name in (
+        'estimate_insert', 'estimate_delete', 'inquiry_update', 'inquiry_delete',
+    )),
+    f"DROP TABLE IF EXISTS {RTREE_TABLE}",
+]
+
+# --- PostgreSQL GiST ---------------------------------------------------------
+
+POSTGRES_POINT = 'point(longitude, latitude)'
+
+POSTGRES_INSTALL = [
+    f"CREATE INDEX IF NOT EXISTS main_app_inquiry_point_gist ON {INQUIRY_TABLE} USING GIST ({POSTGRES_POINT}) "
+    f"WHERE latitude IS NOT NULL AND longitude IS NOT NULL",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS main_app_inquiry_point_gist",
+]
+
+
+def install_spatial_index(connection) -> None:
+    """Create the spatial index for the connection's database (no-op on other vendors)"""
+    statements = {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def uninstall_spatial_index(connection) -> None:
+    statements = {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def place_unlocated_inquiries(inquiry_model=None, region_model=None, using: str = 'default') -> int:
+    """Put inquiries without coordinates at their region's centre, one UPDATE per region; returns rows placed"""
+    if inquiry_model is None:
+        inquiry_model, region_model = PropertyInquiry, Region
+    placed = 0
+    centres = region_model.objects.using(using).filter(latitude__isnull=False, longitude__isnull=False)
+    for region_id, latitude, longitude in centres.values_list('id', 'latitude', 'longitude'):
+        placed += inquiry_model.objects.using(using).filter(region_ref_id=region_id, latitude__isnull=True).update(
+            latitude=latitude, longitude=longitude, geohash=geohash_encode(latitude, longitude),
+        )
+    return placed
+
+
+@dataclass
+class Comparable:
+    """A nearby estimated property"""
+    inquiry_id: int
+    distance_km: float
+
+
+@dataclass
+class Target:
+    """The property comparables are found for, and the lot sizes that count as comparable"""
+    inquiry_id: int
+    latitude: float
+    longitude: float
+    min_acres: float = 0.0
+    max_acres: float = math.inf
+
+
+def nearest(target: Target, points, k: int, radius_km: float = MAX_RADIUS_KM) -> List[Comparable]:
+    """The k (inquiry id, latitude, longitude) points nearest the target within ``radius_km``"""
+    ranked = []
+    for inquiry_id, latitude, longitude in points:
+        distance = haversine_km(target.latitude, target.longitude, latitude, longitude)
+        if distance <= radius_km:
+            ranked.append(Comparable(inquiry_id, distance))
+    ranked.sort(key=lambda comparable: (comparable.distance_km, comparable.inquiry_id))
+    return ranked[:k]
+
+
+class SpatialBackend:
+    """Geohash fallback: grows a search circle and reads the geohash cells around it"""
+
+    name = 'geohash'
+
+    def __init__(self, using: str = 'default'):
+        self.using = using
+
+    def search(self, target: Target, k: int) -> List[Comparable]:
+        radius = INITIAL_RADIUS_KM
+        while True:
+            comparables = nearest(target, self.candidates(target, radius, k), k, radius)
+            if len(comparables) >= k or radius >= MAX_RADIUS_KM:
+                return comparables
+            radius = min(radius * RADIUS_GROWTH, MAX_RADIUS_KM)
+
+    def candidates(self, target: Target, radius_km: float, k: int):
+        """(inquiry id, latitude, longitude) of every estimated property that may lie within ``radius_km``"""
+        cells = Q()
+        for cell in covering_cells(target.latitude, target.longitude, radius_km):
+            cells |= Q(geohash__gte=cell, geohash__lt=cell + '~')
+        return (
+            PropertyInquiry.objects.using(self.using)
+            .filter(cells, Exists(PropertyEstimate.objects.filter(inquiry=OuterRef('pk'))),
+                    latitude__isnull=False, longitude__isnull=False)
+            .alias(acres=_acres_expression(), distance=_distance_expression(target))
+            .filter(acres__gte=target.min_acres, acres__lte=target.max_acres)
+            .exclude(id=target.inquiry_id)
+            .order_by('distance')
+            .values_list('id', 'latitude', 'longitude')[:k * OVERFETCH]
+        )
+
+
+class SQLiteRTreeBackend(SpatialBackend):
+    """R*Tree box queries, nearest first within each box"""
+
+    name = 'sqlite_rtree'
+
+    def candidates(self, target: Target, radius_km: float, k: int):
+        # The tree holds 32-bit floats rounded outwards, so lot sizes are checked again exactly.
+        # Squared equirectangular distance is exact enough to pick the rows haversine then re-ranks.
+        # The two boxes of a circle across the antimeridian are read in one statement.
+        scale = math.cos(math.radians(target.latitude))
+        selects, params = [], []
+        for min_lat, max_lat, min_lon, max_lon in bounding_boxes(target.latitude, target.longitude, radius_km):
+            selects.append(f"""
+                SELECT * FROM (
+                    SELECT i.id, i.latitude, i.longitude FROM {RTREE_TABLE} r
+                    JOIN {INQUIRY_TABLE} i ON i.id = r.id
+                    WHERE r.max_lat >= %s AND r.min_lat <= %s AND r.max_lon >= %s AND r.min_lon <= %s
+                      AND r.max_size >= %s AND r.min_size <= %s AND r.id != %s
+                      AND {_ACRES.format(row='i')} BETWEEN %s AND %s
+                    ORDER BY (i.latitude - %s) * (i.latitude - %s)
+                           + %s * min(abs(i.longitude - %s), 360 - abs(i.longitude - %s))
+                                * min(abs(i.longitude - %s), 360 - abs(i.longitude - %s))
+                    LIMIT %s
+                )
+            """)
+            params += [min_lat, max_lat, min_lon, max_lon, target.min_acres * RTREE_ACRES_SCALE,
+                       target.max_acres * RTREE_ACRES_SCALE, target.inquiry_id, target.min_acres, target.max_acres,
+                       target.latitude, target.latitude, scale * scale, *[target.longitude] * 4, k * OVERFETCH]
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(' UNION ALL '.join(selects), params)
+            return cursor.fetchall()
+
+
+class PostgresGistBackend(SpatialBackend):
+    """GiST KNN on point(longitude, latitude), re-ranked by haversine"""
+
+    name = 'postgres_gist'
+
+    def search(self, target: Target, k: int) -> List[Comparable]:
+        acres = _ACRES.format(row='i')
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT i.id, i.latitude, i.longitude FROM {INQUIRY_TABLE} i
+                WHERE i.latitude IS NOT NULL AND i.longitude IS NOT NULL AND i.id != %s
+                  AND {acres} BETWEEN %s AND %s
+                  AND EXISTS (SELECT 1 FROM {ESTIMATE_TABLE} e WHERE e.inquiry_id = i.id)
+                ORDER BY {POSTGRES_POINT} <-> point(%s, %s)
+                LIMIT %s
+                """,
+                [target.inquiry_id, target.min_acres, target.max_acres, target.longitude, target.latitude, k * OVERFETCH],
+            )
+            return nearest(target, cursor.fetchall(), k)
+
+
+def _acres_expression():
+    return Case(
+        When(lot_size_unit='hectares', then=F('lot_size') * Value(HECTARE_IN_ACRES)),
+        default=F('lot_size'),
+        output_field=FloatField(),
+    )
+
+
+def _distance_expression(target: Target):
+    """Squared equirectangular distance in degrees of latitude, as in SQLiteRTreeBackend"""
+    scale = math.cos(math.radians(target.latitude))
+    d_lon = Abs(F('longitude') - Value(target.longitude))
+    d_lon = Least(d_lon, Value(360.0) - d_lon)
+    d_lat = F('latitude') - Value(target.latitude)
+    return ExpressionWrapper(d_lat * d_lat + Value(scale * scale) * d_lon * d_lon, output_field=FloatField())
+
+
+def _cell_size(precision: int) -> Tuple[float, float]:
+    """(height, width) in degrees of a geohash cell"""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** (bits - bits // 2)
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> List[str]:
+    """
+    Geohash cells whose union contains the circle: the target's cell and its
+    eight neighbours, at the finest precision whose cells are at least
+    ``radius_km`` across. A single empty prefix (every row) for huge circles.
+    """
+    precision = 0
+    for candidate in range(1, 13):
+        height, width = _cell_size(candidate)
+        width_km = width * KM_PER_DEGREE_LATITUDE * math.cos(math.radians(min(abs(latitude) + height, 90)))
+        if height * KM_PER_DEGREE_LATITUDE < radius_km or width_km < radius_km:
+            break
+        precision = candidate
+    if precision == 0:
+        return ['']
+    height, width = _cell_size(precision)
+    cells = set()
+    for d_lat in (-1, 0, 1):
+        for d_lon in (-1, 0, 1):
+            cell_lat = max(-90.0, min(90.0, latitude + d_lat * height))
+            cell_lon = (longitude + d_lon * width + 180) % 360 - 180
+            cells.add(geohash_encode(cell_lat, cell_lon, precision))
+    return sorted(cells)
+
+
+def rtree_exists(connection) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [RTREE_TABLE])
+        return cursor.fetchone() is not None
+
+
+def get_spatial_backend(using: Optional[str] = None) -> SpatialBackend:
+    """The best spatial backend available on a database"""
+    using = using or PropertyInquiry.objects.db
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and rtree_exists(connection):
+        return SQLiteRTreeBackend(using)
+    if connection.vendor == 'postgresql':
+        return PostgresGistBackend(using)
+    return SpatialBackend(using)
+
+
+def find_comparables(inquiry: PropertyInquiry, k: int = DEFAULT_K, band: Optional[float] = DEFAULT_BAND,
+                     using: Optional[str] = None):
+    """
+    Nearest estimated properties to an inquiry, as (result dicts, backend name,
+    milliseconds taken). ``band`` None disables the lot-size filter. An
+    inquiry without coordinates has no comparables.
+    """
+    started = time.perf_counter()
+    backend = get_spatial_backend(using)
+    if not valid_coordinates(inquiry.latitude, inquiry.longitude):
+        return [], backend.name, (time.perf_counter() - started) * 1000
+
+    target = Target(inquiry_id=inquiry.id, latitude=inquiry.latitude, longitude=inquiry.longitude)
+    if band:
+        acres = lot_size_in_acres(inquiry.lot_size, inquiry.lot_size_unit)
+        target.min_acres, target.max_acres = acres / band, acres * band
+    comparables = backend.search(target, max(1, min(k, MAX_K)))
+    rows = {
+        row['id']: row
+        for row in PropertyInquiry.objects.using(backend.using)
+        .filter(id__in=[comparable.inquiry_id for comparable in comparables])
+        .values('id', 'address', 'region', 'lot_size', 'lot_size_unit', 'latitude', 'longitude',
+                'estimate__id', 'estimate__project_name', 'estimate__confidence_score')
+    }
+    results = []
+    for comparable in comparables:
+        row = rows.get(comparable.inquiry_id)
+        if row is not None:
+            results.append({
+                'estimate_id': row['estimate__id'],
+                'inquiry_id': row['id'],
+                'address': row['address'],
+                'region': row['region'],
+                'lot_size_acres': round(lot_size_in_acres(row['lot_size'], row['lot_size_unit']), 2),
+                'latitude': row['latitude'],
+                'longitude': row['longitude'],
+                'project_name': row['estimate__project_name'],
+                'confidence_score': row['estimate__confidence_score'],
+                'distance_km': round(comparable.distance_km, 3),
+            })
+    return results, backend.name, (time.perf_counter() - started) * 1000
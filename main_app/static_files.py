@@ -0,0 +1,249 @@
+"""
+Production static files: content-hashed names, pre-compressed variants and
+far-future caching, served by the application itself.
+
+``collectstatic`` with CompressedManifestStaticFilesStorage (the
+``staticfiles`` storage when DEBUG is off) copies every file under a
+content-hashed name as well (``base.css`` -> ``base.5af66c1b1797.css``,
+listed in staticfiles.json, which ``{% static %}`` reads), then writes
+``.br`` and ``.gz`` variants beside each text file (CSS, JS, SVG, ...) at the
+highest levels, once per build, keeping them only when they are smaller.
+
+StaticFilesApplication wraps the ASGI application (see valora_earth/asgi.py)
+and answers STATIC_URL requests from STATIC_ROOT before Django's middleware
+runs. ``serve`` does the same as a view, for WSGI servers. Either way:
+
+- the brotli or gzip variant is sent when the client accepts it;
+- hashed names never change, so they are cached for STATIC_MAX_AGE seconds
+  as immutable; other names are revalidated (ETag/Last-Modified) on each use;
+- ``Range`` requests get the requested bytes of the uncompressed file (one
+  range per request), and ``If-Range`` is honoured;
+- files are sent in STATIC_CHUNK_SIZE chunks, never read whole.
+"""
+
+import asyncio
+import logging
+import mimetypes
+import re
+from pathlib import Path
+from typing import Iterator, List, Mapping, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import Http404, StreamingHttpResponse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+from .compression import BROTLI, ENCODINGS, GZIP, STORED_LEVELS, compress, is_compressible, negotiate
+
+logger = logging.getLogger(__name__)
+
+VARIANT_SUFFIXES = {BROTLI: '.br', GZIP: '.gz'}
+STATIC_CHUNK_SIZE = 64 * 1024
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Names ManifestStaticFilesStorage gives its copies: base.5af66c1b1797.css
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes brotli and gzip variants of text files"""
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not collected: the page keeps rendering and only the file itself 404s
+            logger.warning(f"Static file '{name}' is missing from {self.manifest_name}; run collectstatic")
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted({*paths, *self.hashed_files.values()}):
+            self.compress_file(name)
+
+    def compress_file(self, name: str) -> None:
+        content_type, _ = mimetypes.guess_type(name)
+        if name.endswith(tuple(VARIANT_SUFFIXES.values())) or not is_compressible(content_type or ''):
+            return
+        path = Path(self.path(name))
+        data = None
+        for encoding in ENCODINGS:
+            variant = path.with_name(path.name + VARIANT_SUFFIXES[encoding])
+            # collectstatic runs on every deploy; unchanged files keep their variants
+            if variant.exists() and variant.stat().st_mtime >= path.stat().st_mtime:
+                continue
+            data = path.read_bytes() if data is None else data
+            compressed = compress(data, encoding, STORED_LEVELS[encoding])
+            if len(data) < settings.COMPRESSION_MIN_LENGTH or len(compressed) >= len(data):
+                variant.unlink(missing_ok=True)
+                continue
+            variant.write_bytes(compressed)
+
+
+class StaticResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[str, str]]
+    # The file to send and the bytes of it; no body for None (304, 416, HEAD)
+    path: Optional[Path] = None
+    start: int = 0
+    length: int = 0
+
+
+def static_prefix() -> str:
+    """The URL path static files are served under (``/static/``)"""
+    return '/' + urlparse(settings.STATIC_URL).path.strip('/') + '/'
+
+
+def static_path(name: str) -> Optional[Path]:
+    """The file under STATIC_ROOT for a (decoded) URL path, or None (also for paths that escape it)"""
+    root = Path(settings.STATIC_ROOT).resolve()
+    path = (root / name.lstrip('/')).resolve()
+    if root not in path.parents or not path.is_file():
+        return None
+    return path
+
+
+def static_response(name: str, method: str, headers: Mapping[str, str]) -> Optional[StaticResponse]:
+    """How to answer a GET or HEAD for a static file (None when there is no such file)
+
+    ``headers`` are the request headers with lowercase names.
+    """
+    path = static_path(name)
+    if path is None:
+        return None
+    content_type, file_encoding = mimetypes.guess_type(path.name)
+    # A variant asked for by name (base.css.gz) is just bytes
+    content_type = 'application/octet-stream' if file_encoding or not content_type else content_type
+    if content_type.startswith('text/'):
+        content_type += '; charset=utf-8'
+    variants = {
+        encoding: path.with_name(path.name + VARIANT_SUFFIXES[encoding])
+        for encoding in ENCODINGS if path.with_name(path.name + VARIANT_SUFFIXES[encoding]).is_file()
+    }
+    range_header = headers.get('range', '')
+    # Ranges are served from the uncompressed file
+    encoding = None if range_header else negotiate(headers.get('accept-encoding', ''), tuple(variants))
+    served = variants[encoding] if encoding else path
+    stat = served.stat()
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+    last_modified = int(stat.st_mtime)
+
+    response_headers = [
+        ('Content-Type', content_type),
+        ('ETag', etag),
+        ('Last-Modified', http_date(last_modified)),
+        ('Cache-Control', f'public, max-age={settings.STATIC_MAX_AGE}, immutable' if HASHED_NAME.search(path.name)
+         else 'public, no-cache'),
+        ('Accept-Ranges', 'bytes'),
+    ]
+    if variants:
+        response_headers.append(('Vary', 'Accept-Encoding'))
+    if encoding:
+        response_headers.append(('Content-Encoding', encoding))
+
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        not_modified = etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+    else:
+        since = parse_http_date_safe(headers.get('if-modified-since', ''))
+        not_modified = since is not None and last_modified <= since
+    if not_modified:
+        return StaticResponse(304, response_headers)
+
+    size = stat.st_size
+    status, start, length = 200, 0, size
+    if range_header and if_range_matches(headers.get('if-range'), etag, last_modified):
+        match = RANGE.match(range_header.replace(' ', ''))
+        if match and match.group(1) + match.group(2):
+            first, last = match.group(1), match.group(2)
+            if first:
+                start, end = int(first), min(int(last) if last else size - 1, size - 1)
+            else:
+                start, end = max(size - int(last), 0), size - 1
+            if start >= size or end < start:
+                return StaticResponse(416, response_headers + [('Content-Range', f'bytes */{size}')])
+            status, length = 206, end - start + 1
+            response_headers.append(('Content-Range', f'bytes {start}-{end}/{size}'))
+        # Other forms (several ranges) get the whole file
+    response_headers.append(('Content-Length', str(length)))
+    return StaticResponse(status, response_headers, None if method == 'HEAD' else served, start, length)
+
+
+def if_range_matches(if_range: Optional[str], etag: str, last_modified: int) -> bool:
+    if if_range is None:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def file_chunks(path: Path, start: int, length: int) -> Iterator[bytes]:
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(STATIC_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve(request, path):
+    """Static file view for WSGI servers (ASGI servers go through StaticFilesApplication)"""
+    if request.method not in ('GET', 'HEAD'):
+        raise Http404
+    headers = {name.lower(): value for name, value in request.headers.items()}
+    static = static_response(path, request.method, headers)
+    if static is None:
+        raise Http404(f"'{path}' could not be found")
+    response = StreamingHttpResponse(
+        file_chunks(static.path, static.start, static.length) if static.path else (), status=static.status,
+    )
+    for name, value in static.headers:
+        response[name] = value
+    # Sent as stored: the variant (if any) was picked above, and ranges count uncompressed bytes
+    response.skip_compression = True
+    return response
+
+
+class StaticFilesApplication:
+    """ASGI application serving STATIC_URL from STATIC_ROOT and passing every other request on"""
+
+    def __init__(self, application):
+        self.application = application
+        self.prefix = static_prefix()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(self.prefix) or scope['method'] not in ('GET', 'HEAD'):
+            return await self.application(scope, receive, send)
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        static = await asyncio.to_thread(static_response, scope['path'][len(self.prefix):], scope['method'], headers)
+        if static is None:
+            # Django answers with its 404 page
+            return await self.application(scope, receive, send)
+
+        await send({
+            'type': 'http.response.start',
+            'status': static.status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in static.headers],
+        })
+        if static.path is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        file = await asyncio.to_thread(open, static.path, 'rb')
+        try:
+            await asyncio.to_thread(file.seek, static.start)
+            remaining = static.length
+            while remaining > 0:
+                chunk = await asyncio.to_thread(file.read, min(STATIC_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+            if remaining > 0:
+                # The file shrank while being sent
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            await asyncio.to_thread(file.close)
@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def results_page_dir(settings, tmp_path_factory):
+    """Keep pre-rendered results pages out of the project directory"""
+    settings.RESULTS_PAGE_DIR = str(tmp_path_factory.mktemp('results_pages'))
+    return settings.RESULTS_PAGE_DIR
+
+
+@pytest.fixture(autouse=True)
+def estimate_status_dir(settings, tmp_path_factory):
+    """Keep estimate generation status files out of the project directory"""
+    settings.ESTIMATE_STATUS_DIR = str(tmp_path_factory.mktemp('estimate_status'))
+    return settings.ESTIMATE_STATUS_DIR
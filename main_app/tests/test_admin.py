@@ -0,0 +1,178 @@
+"""
+Tests for the admin changelist optimizations on large tables.
+"""
+
+import re
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from main_app.admin import RegionListFilter
+from main_app.models import AIAnalysisLog, PropertyEstimate, PropertyInquiry, Region
+from main_app.utils.admin_utils import EstimatedCountPaginator, decode_cursor, encode_cursor
+from main_app.utils.query_instrumentation import record_queries
+
+NEXT_LINK = re.compile(r'<a href="(\?[^"]*cursor=[^"]*)" class="end">')
+
+
+@pytest.fixture
+def logs():
+    """150 logs for 15 inquiries, several sharing a timestamp to exercise the pk tie-breaker"""
+    now = timezone.now()
+    inquiries = PropertyInquiry.objects.bulk_create([
+        PropertyInquiry(
+            address=f"{i} Admin Road",
+            lot_size=10,
+            current_property="Pasture",
+            property_goals="Agroforestry",
+            investment_capacity="$50,000",
+            preferences_concerns="None",
+            region=f"Region {i % 3}",
+            created_at=now - timedelta(minutes=i),
+        )
+        for i in range(15)
+    ])
+    return AIAnalysisLog.objects.bulk_create([
+        AIAnalysisLog(
+            inquiry=inquiries[i % 15],
+            request_data={"prompt": "x" * 100},
+            response_data={"content": "y" * 100},
+            model_used="gpt-4o",
+            tokens_used=100,
+            processing_time=1.0,
+            created_at=now - timedelta(seconds=i // 3),
+        )
+        for i in range(150)
+    ])
+
+
+def changelist_url(model):
+    return reverse(f'admin:main_app_{model._meta.model_name}_changelist')
+
+
+@pytest.mark.django_db
+class TestKeysetChangelist:
+    """Test cases for keyset pagination on admin changelists"""
+
+    def test_pages_cover_every_row_once(self, admin_client, logs):
+        first = admin_client.get(changelist_url(AIAnalysisLog))
+        assert first.status_code == 200
+        page_one = [obj.pk for obj in first.context['cl'].result_list]
+        assert len(page_one) == 100
+
+        next_url = NEXT_LINK.search(first.content.decode()).group(1).replace('&amp;', '&')
+        second = admin_client.get(changelist_url(AIAnalysisLog) + next_url)
+        page_two = [obj.pk for obj in second.context['cl'].result_list]
+
+        expected = list(AIAnalysisLog.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        assert page_one + page_two == expected
+        assert second.context['cl'].next_page_url is None
+        assert 'First page' in second.content.decode()
+
+    def test_changelist_defers_json_and_avoids_n_plus_one(self, admin_client, logs):
+        with record_queries() as recorder:
+            response = admin_client.get(changelist_url(AIAnalysisLog))
+        assert response.status_code == 200
+        assert not any('request_data' in query.sql or 'response_data' in query.sql for query in recorder.queries)
+        inquiry_queries = [
+            query for query in recorder.queries
+            if query.sql.startswith('SELECT') and 'FROM "main_app_propertyinquiry"' in query.sql
+        ]
+        assert inquiry_queries == []
+        assert recorder.count <= 8
+
+    def test_sorting_falls_back_to_offset_pagination(self, admin_client, logs):
+        response = admin_client.get(changelist_url(AIAnalysisLog) + '?o=3')
+        cl = response.context['cl']
+        assert cl.keyset is False
+        assert cl.multi_page is True
+
+    def test_invalid_cursor_redirects_with_error_flag(self, admin_client, logs):
+        response = admin_client.get(changelist_url(AIAnalysisLog) + '?cursor=garbage')
+        assert response.status_code == 302
+        assert response['Location'].endswith('?e=1')
+
+    def test_cursor_round_trip(self):
+        now = timezone.now()
+        assert decode_cursor(encode_cursor(now, 42)) == (now, 42)
+
+    def test_region_filter(self, admin_client, logs):
+        region = Region.objects.create(key='region 1', name='Region 1')
+        PropertyInquiry.objects.filter(region='Region 1').update(region_ref=region)
+        response = admin_client.get(changelist_url(PropertyInquiry) + f'?region={region.id}')
+        results = response.context['cl'].result_list
+        assert len(results) == 5
+        assert {inquiry.region for inquiry in results} == {'Region 1'}
+
+        response = admin_client.get(changelist_url(PropertyInquiry) + '?region=none')
+        assert len(response.context['cl'].result_list) == 10
+        assert admin_client.get(changelist_url(PropertyInquiry) + '?region=Region+1').status_code == 302
+
+    def test_region_filter_choices_are_capped(self, admin_client, logs):
+        Region.objects.bulk_create(
+            Region(key=f'capped {i:03}', name=f'Capped {i:03}') for i in range(RegionListFilter.max_choices + 1)
+        )
+        response = admin_client.get(changelist_url(PropertyInquiry))
+        spec = next(spec for spec in response.context['cl'].filter_specs if isinstance(spec, RegionListFilter))
+        names = [name for _, name in spec.lookup_choices]
+        assert len(names) == RegionListFilter.max_choices + 1
+        assert names[-1] == 'Unrecognized'
+        assert names[:-1] == list(Region.objects.values_list('name', flat=True)[:RegionListFilter.max_choices])
+
+
+@pytest.mark.django_db
+class TestEstimatedCount:
+    """Test cases for EstimatedCountPaginator"""
+
+    def test_unfiltered_large_table_uses_estimate(self, logs, monkeypatch):
+        monkeypatch.setattr(EstimatedCountPaginator, 'estimate_threshold', 1)
+        AIAnalysisLog.objects.filter(pk=logs[0].pk).delete()
+        paginator = EstimatedCountPaginator(AIAnalysisLog.objects.all(), 100)
+        # MAX(rowid) is an upper bound: it still counts the deleted row
+        assert paginator.count == 150
+        assert paginator.count_is_estimate
+
+    def test_filtered_queryset_counts_exactly(self, logs, monkeypatch):
+        monkeypatch.setattr(EstimatedCountPaginator, 'estimate_threshold', 1)
+        paginator = EstimatedCountPaginator(AIAnalysisLog.objects.filter(inquiry=logs[0].inquiry), 100)
+        assert paginator.count == 10
+        assert not paginator.count_is_estimate
+
+    def test_small_table_counts_exactly(self, logs):
+        paginator = EstimatedCountPaginator(AIAnalysisLog.objects.all(), 100)
+        assert paginator.count == 150
+        assert not paginator.count_is_estimate
+
+
+@pytest.mark.django_db
+class TestInquiryWidgets:
+    """Change forms must not render every inquiry into a <select>"""
+
+    def test_estimate_form_uses_autocomplete(self, admin_client, logs):
+        response = admin_client.get(reverse('admin:main_app_propertyestimate_add'))
+        content = response.content.decode()
+        assert 'admin-autocomplete' in content
+        assert '14 Admin Road' not in content
+
+    def test_log_form_uses_raw_id(self, admin_client, logs):
+        response = admin_client.get(reverse('admin:main_app_aianalysislog_change', args=[logs[0].pk]))
+        content = response.content.decode()
+        assert 'vForeignKeyRawIdAdminField' in content
+        assert '14 Admin Road' not in content
+
+
+@pytest.mark.django_db
+def test_estimate_changelist_renders(admin_client, logs):
+    for inquiry in PropertyInquiry.objects.all()[:3]:
+        PropertyEstimate.objects.create(
+            inquiry=inquiry, project_name=f"Project {inquiry.pk}", project_description="d",
+            confidence_score=0.5, factors_considered=[], recommendations=[], timeline="1 year",
+            risk_assessment="Low", ai_response_raw={}, processing_time=1.0,
+        )
+    with record_queries() as recorder:
+        response = admin_client.get(changelist_url(PropertyEstimate))
+    assert response.status_code == 200
+    assert len(response.context['cl'].result_list) == 3
+    assert not any('ai_response_raw' in query.sql for query in recorder.queries)
@@ -0,0 +1,133 @@
+"""
+Tests for the keyset-paginated estimates API.
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from main_app.api import Cursor, DEFAULT_FIELDS
+from main_app.models import PropertyEstimate, PropertyInquiry
+from main_app.utils.query_instrumentation import record_queries
+
+API_KEY = 'partner-test-key'
+
+
+@pytest.fixture(autouse=True)
+def partner_keys(settings):
+    settings.PARTNER_API_KEYS = [API_KEY]
+
+
+@pytest.fixture
+def client():
+    return Client(HTTP_AUTHORIZATION=f'Bearer {API_KEY}')
+
+
+@pytest.fixture
+def estimates():
+    """25 estimates; pairs share a created_at so the id tie-breaker matters"""
+    now = timezone.now()
+    created = []
+    for index in range(25):
+        inquiry = PropertyInquiry.objects.create(
+            address=f"{index} API Street", lot_size=10, current_property="Pasture",
+            property_goals="Trees", investment_capacity="$10,000", preferences_concerns="None",
+            region="API Region",
+        )
+        created.append(PropertyEstimate.objects.create(
+            inquiry=inquiry, project_name=f"API Project {index}", project_description="Description",
+            confidence_score=0.5, factors_considered=["Soil"], recommendations=["Trees"],
+            timeline="2 years", risk_assessment="Low", ai_response_raw={"raw": True},
+            processing_time=1.0, cash_flow_projection=[1] * 10,
+            created_at=now - timedelta(minutes=index // 2),
+        ))
+    return created
+
+
+def url(**params):
+    from django.utils.http import urlencode
+    return f"{reverse('main_app:estimates_api')}?{urlencode(params)}" if params else reverse('main_app:estimates_api')
+
+
+@pytest.mark.django_db
+class TestEstimatesAPI:
+    """Test cases for /api/estimates/"""
+
+    def test_requires_key_or_staff(self, estimates, admin_client):
+        assert Client().get(url()).status_code == 401
+        assert Client(HTTP_AUTHORIZATION='Bearer wrong').get(url()).status_code == 401
+        assert Client(HTTP_AUTHORIZATION=f'Bearer {API_KEY}x').get(url()).status_code == 401
+        assert Client(HTTP_AUTHORIZATION='Bearer clé').get(url()).status_code == 401
+        assert admin_client.get(url()).status_code == 200
+
+    def test_walks_every_row_once_in_both_orders(self, client, estimates):
+        expected = list(PropertyEstimate.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        for order, ordering in (('desc', expected), ('asc', expected[::-1])):
+            seen, cursor = [], None
+            while True:
+                params = {'limit': 7, 'order': order, 'fields': 'id'}
+                if cursor:
+                    params['cursor'] = cursor
+                data = client.get(url(**params)).json()
+                seen.extend(row['id'] for row in data['results'])
+                cursor = data['next_cursor']
+                if not data['has_more']:
+                    break
+            assert seen == ordering
+
+    def test_default_fields_skip_heavy_json(self, client, estimates):
+        row = client.get(url(limit=1)).json()['results'][0]
+        assert tuple(row) == DEFAULT_FIELDS
+        assert row['inquiry.region'] == "API Region"
+
+    def test_field_selection(self, client, estimates):
+        newest = PropertyEstimate.objects.order_by('-created_at', '-id').select_related('inquiry').first()
+        row = client.get(url(limit=1, fields='id,cash_flow_projection,inquiry.address')).json()['results'][0]
+        assert row == {'id': newest.id, 'cash_flow_projection': [1] * 10, 'inquiry.address': newest.inquiry.address}
+
+    def test_every_page_costs_two_queries(self, client, estimates):
+        cursor = Cursor(created_at=estimates[20].created_at, id=estimates[20].id).encode()
+        with record_queries() as recorder:
+            response = client.get(url(limit=3, cursor=cursor))
+        assert response.status_code == 200
+        assert recorder.count == 2
+        assert 'LIMIT 4' in recorder.queries[0].sql
+        assert 'OFFSET' not in recorder.queries[0].sql
+
+    def test_conditional_get(self, client, estimates):
+        first = client.get(url(limit=5))
+        assert first['Cache-Control'] == 'private, no-cache'
+        with record_queries() as recorder:
+            cached = client.get(url(limit=5), HTTP_IF_NONE_MATCH=first['ETag'])
+        assert cached.status_code == 304
+        assert recorder.count == 1  # only the page keys were read
+
+        not_modified = client.get(url(limit=5), HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        assert not_modified.status_code == 304
+
+        newest = PropertyEstimate.objects.order_by('-created_at', '-id').first()
+        newest.project_name = "Regenerated"
+        newest.save()
+        refreshed = client.get(url(limit=5), HTTP_IF_NONE_MATCH=first['ETag'])
+        assert refreshed.status_code == 200
+        assert refreshed.json()['results'][0]['project_name'] == "Regenerated"
+
+    def test_link_header(self, client, estimates):
+        response = client.get(url(limit=5))
+        assert response['Link'].endswith('>; rel="next"')
+        assert 'cursor=' in response['Link']
+
+    @pytest.mark.parametrize('params', [
+        {'fields': 'id,ai_response_raw'},
+        {'limit': 0},
+        {'limit': 'many'},
+        {'order': 'sideways'},
+        {'cursor': 'not-a-cursor'},
+    ])
+    def test_invalid_parameters(self, client, params):
+        response = client.get(url(**params))
+        assert response.status_code == 400
+        assert response.json()['success'] is False
@@ -5,7 +5,7 @@ This file tests the async views and database operations.
 
 import pytest
 import asyncio
-from asgiref.sync import sync_to_async
+from asgiref.sync import async_to_sync, sync_to_async
 
 
 @pytest.mark.django_db
@@ -137,3 +137,124 @@ async def test_async_views():
     except Exception as e:
         print(f"❌ Async views test failed: {str(e)}")
         return False
+
+
+def _inquiry_data(**overrides):
+    """Minimal valid PropertyInquiry field values"""
+    data = {
+        'address': 'Bulk Property',
+        'lot_size': 5.0,
+        'lot_size_unit': 'acres',
+        'current_property': 'Pasture',
+        'property_goals': 'Regeneration',
+        'investment_capacity': '$50,000',
+        'preferences_concerns': 'None',
+        'region': 'Bulk Region',
+    }
+    data.update(overrides)
+    return data
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_bulk_operations_async_set_based():
+    """Updates and deletes are merged into set-based statements"""
+    from django.db import connection
+    from main_app.models import PropertyInquiry
+    from main_app.utils.async_db_utils import bulk_operations_async
+
+    created = await bulk_operations_async(PropertyInquiry, [
+        {'type': 'create', 'data': _inquiry_data(address=f'Bulk {i}')} for i in range(6)
+    ])
+    ids = [obj.id for obj in created]
+    assert len(ids) == 6
+
+    executed = []
+
+    def record(execute, sql, params, many, context):
+        executed.append(sql)
+        return execute(sql, params, many, context)
+
+    def run_with_counter(operations):
+        with connection.execute_wrapper(record):
+            return async_to_sync(bulk_operations_async)(PropertyInquiry, operations, batch_size=2)
+
+    results = await sync_to_async(run_with_counter)(
+        [{'type': 'update', 'filters': {'id': pk}, 'data': {'region': 'Same'}} for pk in ids[:4]]
+        + [{'type': 'update', 'filters': {'id': ids[4]}, 'data': {'address': 'Only A'}},
+           {'type': 'update', 'filters': {'id': ids[5]}, 'data': {'address': 'Only B'}},
+           {'type': 'update', 'filters': {'address': 'Bulk 0'}, 'data': {'region': 'Same'}}]
+    )
+    updates = [sql for sql in executed if sql.startswith('UPDATE')]
+    # 2 pk__in batches + 1 OR-ed filter batch + 1 bulk_update for the distinct payloads
+    assert len(updates) == 4
+    assert sum(results) == 7
+
+    regions = await sync_to_async(lambda: set(PropertyInquiry.objects.filter(id__in=ids[:4]).values_list('region', flat=True)))()
+    assert regions == {'Same'}
+    addresses = await sync_to_async(lambda: dict(PropertyInquiry.objects.filter(id__in=ids[4:]).values_list('id', 'address')))()
+    assert addresses == {ids[4]: 'Only A', ids[5]: 'Only B'}
+
+    executed.clear()
+    await sync_to_async(run_with_counter)([{'type': 'delete', 'filters': {'pk': pk}} for pk in ids])
+    deletes = [sql for sql in executed if sql.startswith('DELETE') and 'main_app_propertyinquiry' in sql]
+    assert len(deletes) == 3
+    assert await sync_to_async(PropertyInquiry.objects.count)() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_bulk_updates_of_one_row_apply_in_order():
+    """A later update of the same primary key wins, and updates of other fields are kept"""
+    from main_app.models import PropertyInquiry
+    from main_app.utils.async_db_utils import bulk_operations_async
+
+    created = await bulk_operations_async(PropertyInquiry, [{'type': 'create', 'data': _inquiry_data()} for _ in range(3)])
+    first, second, other = (obj.id for obj in created)
+    await bulk_operations_async(PropertyInquiry, [
+        {'type': 'update', 'filters': {'id': first}, 'data': {'address': 'first'}},
+        {'type': 'update', 'filters': {'id': first}, 'data': {'address': 'second'}},
+        {'type': 'update', 'filters': {'id': second}, 'data': {'address': 'early'}},
+        {'type': 'update', 'filters': {'pk': second}, 'data': {'address': 'later', 'region': 'Later'}},
+        {'type': 'update', 'filters': {'id': second}, 'data': {'region': 'Last'}},
+        {'type': 'update', 'filters': {'id': other}, 'data': {'address': 'other'}},
+    ])
+
+    rows = await sync_to_async(lambda: dict(
+        (pk, (address, region)) for pk, address, region in PropertyInquiry.objects.values_list('id', 'address', 'region')
+    ))()
+    assert rows == {first: ('second', 'Bulk Region'), second: ('later', 'Last'), other: ('other', 'Bulk Region')}
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_async_update_or_create_upsert():
+    """Upsert mode inserts then updates the same row without a prior SELECT"""
+    from main_app.models import PropertyInquiry, PropertyEstimate
+    from main_app.utils.db_utils import async_create, async_update_or_create
+
+    inquiry = await async_create(PropertyInquiry, **_inquiry_data())
+    defaults = {
+        'project_name': 'First',
+        'project_description': 'Description',
+        'confidence_score': 0.5,
+        'factors_considered': ['Soil'],
+        'recommendations': ['Test'],
+        'timeline': '1 year',
+        'risk_assessment': 'Low',
+        'processing_time': 1.0,
+    }
+
+    first, created = await async_update_or_create(PropertyEstimate, inquiry=inquiry, defaults=defaults, upsert=True)
+    assert created is None
+    assert first.pk is not None
+
+    second, _ = await async_update_or_create(
+        PropertyEstimate, inquiry=inquiry, defaults={**defaults, 'project_name': 'Second'}, upsert=True
+    )
+    assert second.pk == first.pk
+    stored = await sync_to_async(PropertyEstimate.objects.get)(inquiry=inquiry)
+    assert stored.project_name == 'Second'
+    # auto_now fields are refreshed on the conflict update too
+    assert stored.updated_at > stored.created_at
+    assert await sync_to_async(PropertyEstimate.objects.count)() == 1
@@ -0,0 +1,100 @@
+"""
+Tests for the content-addressed payload blobs.
+"""
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from main_app import blobs
+from main_app.estimates import inquiry_request_for, persist_estimate
+from main_app.exports import export_stream
+from main_app.management.commands.benchmark_estimate_flow import canned_analysis_result
+from main_app.models import AIAnalysisLog, EstimatePayload, PayloadBlob, PropertyInquiry
+from main_app.utils.query_instrumentation import record_queries
+
+LARGE = {"content": "The projected revenue grows every year. " * 50, "model": "gpt-4"}
+
+
+@pytest.fixture
+def inquiry():
+    return PropertyInquiry.objects.create(
+        address="1 Blob Street", lot_size=10, lot_size_unit='acres', current_property="Pasture",
+        property_goals="Trees", investment_capacity="$10,000", preferences_concerns="None", region="Oregon",
+    )
+
+
+def make_log(inquiry, request_data, response_data):
+    return AIAnalysisLog.objects.create(
+        inquiry=inquiry, request_data=request_data, response_data=response_data,
+        model_used="gpt-4", tokens_used=10, processing_time=1.0,
+    )
+
+
+class TestEncoding:
+    """Test cases for canonical JSON and compression"""
+
+    def test_digest_ignores_key_order(self):
+        assert PayloadBlob.for_value({"a": 1, "b": [1, 2]}).digest == PayloadBlob.for_value({"b": [1, 2], "a": 1}).digest
+        assert PayloadBlob.for_value({"a": 1}).digest != PayloadBlob.for_value({"a": 2}).digest
+
+    def test_compression(self):
+        blob = PayloadBlob.for_value(LARGE)
+        assert blob.codec in (blobs.ZSTD, blobs.DEFLATE)
+        assert len(blob.data) < blob.size / 5
+        tiny = PayloadBlob.for_value({})
+        assert (tiny.codec, bytes(tiny.data)) == (blobs.RAW, b'{}')
+
+    def test_zstd_needs_the_package(self, monkeypatch):
+        monkeypatch.setattr(blobs, 'zstandard', None)
+        with pytest.raises(blobs.BlobCodecError):
+            blobs.decompress(blobs.ZSTD, b'')
+        assert blobs.decompress(blobs.DEFLATE, blobs.compress(b'{"a":1}' * 20)[1]) == b'{"a":1}' * 20
+
+
+@pytest.mark.django_db
+class TestPayloadBlobs:
+    """Test cases for storing and reading payloads"""
+
+    def test_identical_payloads_are_stored_once(self, inquiry):
+        first = make_log(inquiry, {"address": "1 Blob Street"}, LARGE)
+        second = make_log(inquiry, {"address": "1 Blob Street"}, {})
+        make_log(inquiry, {"address": "1 Blob Street"}, {})
+        assert PayloadBlob.objects.count() == 3
+        assert first.request_blob_id == second.request_blob_id
+
+        stored = AIAnalysisLog.objects.get(id=first.id)
+        assert (stored.request_data, stored.response_data) == ({"address": "1 Blob Street"}, LARGE)
+
+    def test_decompressed_only_when_read(self, inquiry):
+        log = make_log(inquiry, {}, LARGE)
+        with record_queries() as recorder:
+            stored = AIAnalysisLog.objects.select_related('response_blob').get(id=log.id)
+            blob = stored.response_blob
+            assert '_value' not in blob.__dict__
+            assert stored.response_data == LARGE
+        assert recorder.count == 1
+
+    def test_bulk_create_stores_blobs(self, inquiry):
+        AIAnalysisLog.objects.bulk_create([
+            AIAnalysisLog(inquiry=inquiry, request_data={"n": n % 2}, response_data={}, model_used="gpt-4",
+                          tokens_used=0, processing_time=0)
+            for n in range(4)
+        ])
+        assert PayloadBlob.objects.count() == 3
+        assert sorted(log.request_data["n"] for log in AIAnalysisLog.objects.all()) == [0, 0, 1, 1]
+
+    def test_log_and_estimate_share_the_response(self, inquiry):
+        request = inquiry_request_for(inquiry)
+        estimate, log = async_to_sync(persist_estimate)(inquiry, request, canned_analysis_result(request))
+        payload = EstimatePayload.objects.get(estimate=estimate)
+        assert payload.response_blob_id == log.response_blob_id
+        assert PayloadBlob.objects.count() == 2
+        assert log.response_data['model'] == 'benchmark'
+
+    def test_export_joins_blobs(self, inquiry):
+        for n in range(3):
+            make_log(inquiry, {"n": n}, LARGE)
+        with record_queries() as recorder:
+            lines = b''.join(export_stream('logs', 'jsonl')).decode().splitlines()
+        assert len(lines) == 3 and 'projected revenue' in lines[0]
+        assert sum(query.sql.startswith('SELECT') for query in recorder.queries) == 1
@@ -0,0 +1,112 @@
+"""
+Tests for the results page chart data and its endpoint.
+"""
+
+import json
+import re
+
+import pytest
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+
+from main_app.charts import chart_data
+from main_app.models import PropertyEstimate, PropertyInquiry
+from main_app.utils.query_instrumentation import assert_query_budget
+
+REVENUE = {
+    'agricultural_sales': [1000.0] * 10,
+    'ecosystem_services': [250.5] * 10,
+    'subsidies_incentives': [100] * 10,
+}
+COST = {
+    'operational_costs': [400] * 10,
+    'infrastructure': [2000] + [0] * 9,
+    'maintenance': [50.25] * 10,
+}
+
+
+@pytest.fixture
+def inquiry():
+    return PropertyInquiry.objects.create(
+        address="1 Chart Court", lot_size=10, lot_size_unit='acres', current_property="Pasture",
+        property_goals="Trees", investment_capacity="$10,000", preferences_concerns="None", region="Oregon",
+    )
+
+
+@pytest.fixture
+def estimate(inquiry):
+    return PropertyEstimate.objects.create(
+        inquiry=inquiry, project_name="Chart Project", project_description="Plan", confidence_score=0.8,
+        factors_considered=[], recommendations=[], timeline="1 year", risk_assessment="Low", processing_time=1.0,
+        cash_flow_projection=[-1000] + [900] * 9, revenue_breakdown=REVENUE, cost_breakdown=COST,
+    )
+
+
+def chart_url(inquiry_id):
+    return reverse('main_app:chart_data', args=[inquiry_id])
+
+
+@pytest.mark.django_db
+class TestChartData:
+    """Test cases for the chart payload"""
+
+    def test_series_and_totals(self, estimate):
+        chart = chart_data(estimate)
+        assert chart['years'] == list(range(1, 11))
+        assert chart['revenue']['ecosystem_services'] == [250.5] * 10
+        assert chart['revenue']['total'] == [1350.5] * 10
+        assert chart['cost']['total'] == [2450.25] + [450.25] * 9
+        assert chart['cash_flow'] == [-1000] + [900] * 9
+        assert chart['totals'] == {'revenue': 13505, 'cost': 6502.5, 'cash_flow': 7100}
+        # Whole numbers are written as integers
+        assert isinstance(chart['revenue']['subsidies_incentives'][0], int)
+
+    def test_missing_values(self, estimate):
+        estimate.cash_flow_projection = [None, 5] + [None] * 8
+        estimate.cost_breakdown = {'operational_costs': [400] * 5}
+        chart = chart_data(estimate)
+        assert chart['cost']['operational_costs'] == [400] * 5 + [0] * 5
+        assert chart['cost']['maintenance'] == [0] * 10
+        # Missing cash flow values are revenue minus cost
+        assert chart['cash_flow'][:3] == [950.5, 5, 950.5]
+        assert chart['cash_flow'][9] == 1350.5
+
+        estimate.cash_flow_projection = []
+        assert chart_data(estimate)['cash_flow'] == [950.5] * 5 + [1350.5] * 5
+        assert chart_data(None) is None
+
+
+@pytest.mark.django_db
+class TestChartDataAPI:
+    """Test cases for the chart endpoint"""
+
+    def test_chart(self, estimate):
+        with assert_query_budget(settings.QUERY_BUDGETS['main_app:chart_data']):
+            response = Client().get(chart_url(estimate.inquiry_id))
+        assert response.status_code == 200
+        assert response.json()['chart'] == chart_data(estimate)
+        assert 'no-cache' in response['Cache-Control']
+        assert Client().get(chart_url(10 ** 6)).status_code == 404
+
+    def test_conditional_get(self, estimate):
+        first = Client().get(chart_url(estimate.inquiry_id))
+        response = Client().get(chart_url(estimate.inquiry_id), HTTP_IF_NONE_MATCH=first['ETag'])
+        assert response.status_code == 304
+
+        estimate.cost_breakdown = {**COST, 'maintenance': [60] * 10}
+        estimate.save()
+        response = Client().get(chart_url(estimate.inquiry_id), HTTP_IF_NONE_MATCH=first['ETag'])
+        assert response.status_code == 200
+        assert response.json()['chart']['cost']['maintenance'] == [60] * 10
+
+    def test_results_page_embeds_chart(self, estimate):
+        content = Client().get(reverse('main_app:estimate_results', args=[estimate.inquiry_id])).content.decode()
+        embedded = re.search(r'<script id="chart-data" type="application/json">(.*?)</script>', content).group(1)
+        assert json.loads(embedded) == chart_data(estimate)
+        # No sample data or inline series are left in the page
+        assert '55500' not in content and '|safe' not in content
+
+    def test_results_page_without_estimate(self, inquiry):
+        content = Client().get(reverse('main_app:estimate_results', args=[inquiry.id])).content.decode()
+        assert '<script id="chart-data" type="application/json">null</script>' in content
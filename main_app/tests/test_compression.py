@@ -0,0 +1,132 @@
+"""
+Tests for content-coding negotiation and the compression middleware.
+"""
+
+import gzip
+import zlib
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from main_app.compression import BROTLI, GZIP, compress_chunks, negotiate
+from main_app.middleware import CompressionMiddleware
+
+BODY = {'rows': [{'year': year, 'revenue': 1000 * year, 'cost': 400 * year} for year in range(1, 60)]}
+
+
+def respond(response, accept_encoding='gzip'):
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+class TestNegotiate:
+    """Test cases for Accept-Encoding negotiation"""
+
+    def test_preference(self):
+        both = (BROTLI, GZIP)
+        assert negotiate('gzip, deflate, br', both) == BROTLI
+        assert negotiate('gzip, deflate, br', (GZIP,)) == GZIP
+        assert negotiate('br;q=0.5, gzip', both) == GZIP
+        assert negotiate('GZIP;Q=0.8', both) == GZIP
+        assert negotiate('*', both) == BROTLI
+        assert negotiate('*;q=0.1, br;q=0', both) == GZIP
+
+    def test_refused(self):
+        assert negotiate('', (BROTLI, GZIP)) is None
+        assert negotiate('identity', (BROTLI, GZIP)) is None
+        assert negotiate('gzip;q=0, br;q=0', (BROTLI, GZIP)) is None
+        assert negotiate('gzip;q=bad', (GZIP,)) is None
+
+
+class TestCompressionMiddleware:
+    """Test cases for on-the-fly response compression"""
+
+    def test_json(self):
+        response = JsonResponse(BODY)
+        original = response.content
+        response['ETag'] = '"abc"'
+        response = respond(response)
+        assert response['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(response.content) == original
+        assert int(response['Content-Length']) == len(response.content) < len(original)
+        assert response['ETag'] == 'W/"abc"'
+        assert 'Accept-Encoding' in response['Vary']
+
+    def test_skipped(self):
+        small = respond(JsonResponse({'success': True}))
+        assert not small.has_header('Content-Encoding')
+        assert 'Accept-Encoding' in small['Vary']
+
+        refused = respond(JsonResponse(BODY), 'identity')
+        assert not refused.has_header('Content-Encoding')
+
+        image = respond(HttpResponse(b'\x89PNG' * 1000, content_type='image/png'))
+        assert not image.has_header('Content-Encoding') and not image.has_header('Vary')
+
+        encoded = HttpResponse(gzip.compress(b'x' * 5000))
+        encoded['Content-Encoding'] = 'gzip'
+        assert respond(encoded).content == encoded.content
+
+        # Content-Range counts bytes of the body as it is
+        partial = HttpResponse(b'x' * 5000, status=206, content_type='text/plain')
+        partial['Content-Range'] = 'bytes 0-4999/22120'
+        assert respond(partial).content == b'x' * 5000
+        not_found = HttpResponse(b'<p>missing</p>' * 500, status=404)
+        assert not respond(not_found).has_header('Content-Encoding')
+
+        marked = HttpResponse(b'x' * 5000, content_type='text/plain')
+        marked.skip_compression = True
+        assert respond(marked).content == b'x' * 5000
+
+    def test_streaming(self):
+        chunks = [f'{index},{"row" * 200}\n'.encode() for index in range(5)]
+        sent = []
+
+        def stream():
+            for chunk in chunks:
+                sent.append(chunk)
+                yield chunk
+
+        response = respond(StreamingHttpResponse(stream(), content_type='text/csv'))
+        assert response['Content-Encoding'] == 'gzip'
+        assert not response.has_header('Content-Length')
+        # Each chunk is compressed and flushed as it is produced, not buffered
+        decompressor = zlib.decompressobj(31)
+        output = iter(response.streaming_content)
+        assert decompressor.decompress(next(output)) == chunks[0]
+        assert len(sent) == 1
+        rest = b''.join(decompressor.decompress(data) for data in output) + decompressor.flush()
+        assert rest == b''.join(chunks[1:])
+
+    def test_async_streaming(self):
+        async def stream():
+            for index in range(3):
+                yield f'{{"row": {index}}}\n'.encode() * 50
+
+        response = respond(StreamingHttpResponse(stream(), content_type='application/x-ndjson'))
+        assert response.is_async
+
+        async def read():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        assert gzip.decompress(async_to_sync(read)()).count(b'"row"') == 150
+
+    def test_brotli(self):
+        brotli = pytest.importorskip('brotli')
+        response = JsonResponse(BODY)
+        original = response.content
+        response = respond(response, 'gzip, br')
+        assert response['Content-Encoding'] == 'br'
+        assert brotli.decompress(response.content) == original
+        assert brotli.decompress(b''.join(compress_chunks([original[:100], original[100:]], BROTLI))) == original
+
+    @pytest.mark.django_db
+    def test_csrf_pages_not_compressed(self):
+        # The questionnaire page holds a CSRF token next to the visitor's answers (BREACH)
+        client = Client()
+        client.post(reverse('main_app:index'), {'lot_size': '12', 'region': 'Oregon', 'lot_size_unit': 'acres'})
+        response = client.get(reverse('main_app:estimate_questionnaire'), HTTP_ACCEPT_ENCODING='gzip')
+        assert b'csrfmiddlewaretoken' in response.content
+        assert not response.has_header('Content-Encoding')
@@ -0,0 +1,85 @@
+"""
+Tests for the environment-driven database profiles in valora_earth.db_config.
+"""
+
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from django.db import connection
+
+from main_app.utils.db_utils import submit_background
+from valora_earth.db_config import database_config
+
+
+class TestDatabaseConfig:
+    """Test cases for database_config"""
+
+    def test_sqlite_is_default_with_persistent_connections(self):
+        """SQLite honours DB_CONN_MAX_AGE and enables health checks"""
+        config = database_config({'DB_CONN_MAX_AGE': '300'}, base_dir=Path('/app'))['default']
+
+        assert config['ENGINE'] == 'django.db.backends.sqlite3'
+        assert config['NAME'] == Path('/app') / 'db.sqlite3'
+        assert config['CONN_MAX_AGE'] == 300
+        assert config['CONN_HEALTH_CHECKS'] is True
+        assert config['OPTIONS']['transaction_mode'] == 'IMMEDIATE'
+
+    def test_asgi_disables_persistent_connections(self):
+        """Per-thread persistent connections would leak under ASGI"""
+        config = database_config({'DJANGO_ASGI': '1', 'DB_CONN_MAX_AGE': '300'}, base_dir=Path('/app'))['default']
+        assert config['CONN_MAX_AGE'] == 0
+
+    def test_postgres_uses_connection_pool(self):
+        """PostgreSQL profile configures psycopg's pool and no persistent connections"""
+        config = database_config({
+            'DB_ENGINE': 'postgres',
+            'DB_NAME': 'valora',
+            'DB_HOST': 'db',
+            'DB_POOL_MAX_SIZE': '20',
+        })['default']
+
+        assert config['ENGINE'] == 'django.db.backends.postgresql'
+        assert config['NAME'] == 'valora'
+        assert config['HOST'] == 'db'
+        assert config['OPTIONS']['pool']['max_size'] == 20
+        assert config['CONN_MAX_AGE'] == 0
+
+    def test_postgres_without_pool_uses_persistent_connections(self):
+        """Disabling the pool falls back to CONN_MAX_AGE"""
+        config = database_config({'DB_ENGINE': 'postgres', 'DB_POOL': 'false'})['default']
+        assert 'pool' not in config['OPTIONS']
+        assert config['CONN_MAX_AGE'] == 600
+
+    def test_unknown_engine_is_rejected(self):
+        """Typos in DB_ENGINE fail loudly"""
+        with pytest.raises(ValueError):
+            database_config({'DB_ENGINE': 'oracle'})
+
+
+def test_background_workers_close_their_connections():
+    """Pool threads release their connections after each task, even a failed one"""
+    def task(fail):
+        if fail:
+            raise RuntimeError('task failed')
+        return threading.current_thread().name
+
+    with patch('main_app.utils.db_utils.connections') as connections:
+        assert submit_background(task, False).result(timeout=5).startswith('valora-background')
+        with pytest.raises(RuntimeError):
+            submit_background(task, True).result(timeout=5)
+    assert connections.close_all.call_count == 2
+
+
+@pytest.mark.integration
+@pytest.mark.django_db
+def test_postgres_pool_is_active():
+    """Run with DB_ENGINE=postgres against a local PostgreSQL to exercise the pool"""
+    if connection.vendor != 'postgresql':
+        pytest.skip('PostgreSQL profile not active (set DB_ENGINE=postgres)')
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        assert cursor.fetchone() == (1,)
+    assert connection.pool is not None
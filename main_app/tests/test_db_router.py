@@ -0,0 +1,95 @@
+"""
+Tests for the read-replica router and read-your-writes stickiness.
+"""
+
+import time
+
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from main_app.db_router import ReadReplicaRouter, begin_request, get_routing_state, replica_reads
+from main_app.middleware import PIN_COOKIE_NAME, ReplicaStickinessMiddleware
+from main_app.models import PropertyEstimate
+
+
+class TestReadReplicaRouter:
+    """Test cases for ReadReplicaRouter"""
+
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        settings.DATABASE_REPLICAS = ['replica_1']
+
+    @pytest.fixture
+    def router(self):
+        return ReadReplicaRouter()
+
+    def test_reads_use_primary_outside_replica_scope(self, router):
+        """Views that did not opt in always read from the primary"""
+        begin_request()
+        assert router.db_for_read(PropertyEstimate) is None
+
+    def test_reads_use_replica_inside_scope(self, router):
+        """Opted-in reads go to a replica"""
+        begin_request()
+        with replica_reads():
+            assert router.db_for_read(PropertyEstimate) == 'replica_1'
+
+    def test_pinned_client_reads_primary(self, router):
+        """A client inside its read-your-writes window bypasses replicas"""
+        begin_request(pinned=True)
+        with replica_reads():
+            assert router.db_for_read(PropertyEstimate) is None
+
+    def test_write_pins_rest_of_request(self, router):
+        """Reads after a write in the same request hit the primary"""
+        begin_request()
+        with replica_reads():
+            assert router.db_for_write(PropertyEstimate) == 'default'
+            assert router.db_for_read(PropertyEstimate) is None
+
+    def test_replicas_are_never_migrated(self, router):
+        """Replicas are filled by replication, not migrations"""
+        assert router.allow_migrate('replica_1', 'main_app') is False
+        assert router.allow_migrate('default', 'main_app') is None
+
+    def test_no_replicas_configured(self, router, settings):
+        """Without replicas every read uses the primary"""
+        settings.DATABASE_REPLICAS = []
+        with replica_reads():
+            assert router.db_for_read(PropertyEstimate) is None
+
+
+class TestReplicaStickinessMiddleware:
+    """Test cases for ReplicaStickinessMiddleware"""
+
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        settings.DATABASE_REPLICAS = ['replica_1']
+        settings.READ_YOUR_WRITES_WINDOW = 10
+
+    def test_write_sets_pin_cookie(self):
+        """A writing request pins the client for the configured window"""
+        def view(request):
+            ReadReplicaRouter().db_for_write(PropertyEstimate)
+            return HttpResponse()
+
+        response = ReplicaStickinessMiddleware(view)(RequestFactory().post('/'))
+        assert PIN_COOKIE_NAME in response.cookies
+        assert response.cookies[PIN_COOKIE_NAME]['max-age'] == 10
+
+    def test_read_only_request_sets_no_cookie(self):
+        """Pure reads leave the client unpinned"""
+        response = ReplicaStickinessMiddleware(lambda request: HttpResponse())(RequestFactory().get('/'))
+        assert PIN_COOKIE_NAME not in response.cookies
+
+    def test_pin_cookie_pins_following_request(self):
+        """The cookie routes the next request's reads to the primary"""
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE_NAME] = str(time.time() + 5)
+
+        def view(request):
+            assert get_routing_state().pinned
+            return HttpResponse()
+
+        ReplicaStickinessMiddleware(view)(request)
@@ -0,0 +1,95 @@
+"""
+Tests for the EstimatePayload side table and the deferred estimate columns.
+"""
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import Client
+from django.urls import reverse
+
+from main_app.estimates import inquiry_request_for, persist_estimate
+from main_app.management.commands.benchmark_estimate_flow import canned_analysis_result
+from main_app.models import EstimatePayload, PropertyEstimate, PropertyInquiry
+from main_app.utils.query_instrumentation import record_queries
+
+RAW = {"content": "x" * 2000, "model": "gpt-4"}
+
+
+@pytest.fixture
+def inquiry():
+    return PropertyInquiry.objects.create(
+        address="1 Payload Road", lot_size=10, lot_size_unit='acres', current_property="Pasture",
+        property_goals="Trees", investment_capacity="$10,000", preferences_concerns="None", region="Oregon",
+    )
+
+
+@pytest.fixture
+def estimate(inquiry):
+    return PropertyEstimate.objects.create(
+        inquiry=inquiry, project_name="Payload Project", project_description="Plan", confidence_score=0.8,
+        factors_considered=["Soil"], recommendations=["Plant trees"], timeline="3 years",
+        risk_assessment="Low", ai_response_raw=RAW, processing_time=1.0,
+    )
+
+
+@pytest.mark.django_db
+class TestEstimatePayload:
+    """Test cases for reading and writing the raw response"""
+
+    def test_stored_in_side_table(self, estimate):
+        assert EstimatePayload.objects.get(estimate=estimate).ai_response_raw == RAW
+        stored = PropertyEstimate.objects.get(id=estimate.id)
+        with record_queries() as recorder:
+            assert stored.ai_response_raw == RAW
+        assert recorder.count == 1
+
+        stored.ai_response_raw = {"content": "regenerated"}
+        stored.save()
+        assert EstimatePayload.objects.get(estimate=estimate).ai_response_raw == {"content": "regenerated"}
+        assert EstimatePayload.objects.count() == 1
+
+    def test_missing_payload(self, inquiry):
+        estimate = PropertyEstimate.objects.create(
+            inquiry=inquiry, project_name="No payload", project_description="Plan", confidence_score=0.5,
+            factors_considered=[], recommendations=[], timeline="1 year", risk_assessment="Low", processing_time=1.0,
+        )
+        assert PropertyEstimate.objects.get(id=estimate.id).ai_response_raw is None
+        assert not EstimatePayload.objects.exists()
+
+    def test_default_manager_defers_details(self, estimate):
+        assert PropertyEstimate.objects.get(id=estimate.id).get_deferred_fields() == {
+            'factors_considered', 'recommendations',
+        }
+        with record_queries() as recorder:
+            loaded = PropertyEstimate.objects.with_payload().get(id=estimate.id)
+            assert (loaded.factors_considered, loaded.ai_response_raw) == (["Soil"], RAW)
+        assert recorder.count == 1
+
+    def test_generation_stores_payload(self, inquiry):
+        result = canned_analysis_result(inquiry_request_for(inquiry))
+        estimate, _ = async_to_sync(persist_estimate)(inquiry, inquiry_request_for(inquiry), result)
+        assert EstimatePayload.objects.get(estimate=estimate).ai_response_raw['model'] == 'benchmark'
+
+        async_to_sync(persist_estimate)(inquiry, inquiry_request_for(inquiry), result)
+        assert EstimatePayload.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestReaders:
+    """Test cases for the pages that do or do not need the heavy columns"""
+
+    def test_results_page_skips_heavy_columns(self, estimate):
+        with record_queries() as recorder:
+            response = Client().get(reverse('main_app:estimate_results', args=[estimate.inquiry_id]))
+        assert response.status_code == 200
+        assert b"Payload Project" in response.content
+        sql = ' '.join(query.sql for query in recorder.queries)
+        for column in ('ai_response_raw', 'factors_considered', 'recommendations', 'preferences_concerns'):
+            assert column not in sql
+
+    def test_admin_change_form(self, admin_client, estimate):
+        with record_queries() as recorder:
+            response = admin_client.get(reverse('admin:main_app_propertyestimate_change', args=[estimate.id]))
+        assert response.status_code == 200
+        assert 'x' * 100 in response.content.decode()
+        assert sum('main_app_estimatepayload' in query.sql for query in recorder.queries) == 1
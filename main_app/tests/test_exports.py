@@ -0,0 +1,137 @@
+"""
+Tests for the streaming CSV/JSONL exports.
+"""
+
+import csv
+import gzip
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from main_app.exports import ESTIMATE_COLUMNS, export_stream
+from main_app.models import PropertyEstimate, PropertyInquiry
+from main_app.utils.query_instrumentation import record_queries
+
+SERIES = [float(1000 * year) for year in range(1, 11)]
+
+
+@pytest.fixture
+def estimates():
+    created = []
+    for index in range(5):
+        inquiry = PropertyInquiry.objects.create(
+            address=f'{index} Export Lane, "Quoted", Town',
+            lot_size=10 + index,
+            current_property="Pasture",
+            property_goals="Agroforestry",
+            investment_capacity="$50,000",
+            preferences_concerns="Line one\nline two",
+            region="Export Region",
+        )
+        created.append(PropertyEstimate.objects.create(
+            inquiry=inquiry,
+            project_name=f"Export Project {index}",
+            project_description="Description",
+            confidence_score=0.75,
+            factors_considered=["Soil", "Water"],
+            recommendations=["Plant trees"],
+            timeline="3 years",
+            risk_assessment="Low",
+            ai_response_raw={"content": "raw"},
+            processing_time=1.5,
+            cash_flow_projection=SERIES,
+            revenue_breakdown={"agricultural_sales": SERIES},
+            cost_breakdown={"maintenance": SERIES},
+        ))
+    return created
+
+
+@pytest.mark.django_db
+class TestExportStream:
+    """Test cases for export_stream"""
+
+    def test_estimates_csv_flattens_projections(self, estimates):
+        content = b''.join(export_stream('estimates', 'csv')).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        assert len(rows) == 5
+        assert list(rows[0]) == [name for name, _ in ESTIMATE_COLUMNS]
+        assert rows[0]['inquiry_address'] == '0 Export Lane, "Quoted", Town'
+        assert rows[0]['cash_flow_year10'] == '10000.0'
+        assert rows[0]['revenue_agricultural_sales_year3'] == '3000.0'
+        assert rows[0]['revenue_ecosystem_services_year1'] == ''
+        assert json.loads(rows[0]['factors_considered']) == ["Soil", "Water"]
+
+    def test_jsonl_rows(self, estimates):
+        lines = b''.join(export_stream('inquiries', 'jsonl')).decode().splitlines()
+        assert len(lines) == 5
+        record = json.loads(lines[0])
+        assert record['preferences_concerns'] == "Line one\nline two"
+        assert record['lot_size'] == '10.00'
+
+    def test_gzip_stream(self, estimates):
+        compressed = b''.join(export_stream('estimates', 'jsonl', compress=True))
+        assert len(gzip.decompress(compressed).decode().splitlines()) == 5
+
+    def test_rows_are_fetched_in_chunks(self, estimates):
+        with record_queries() as recorder:
+            chunks = export_stream('estimates', 'csv', chunk_size=2)
+            assert recorder.count == 0  # nothing is read until the stream is consumed
+            b''.join(chunks)
+        selects = [query.sql for query in recorder.queries if query.sql.startswith('SELECT')]
+        assert len(selects) == 1
+        assert 'ai_response_raw' not in selects[0]
+
+
+@pytest.mark.django_db
+class TestExportView:
+    """Test cases for the export endpoint"""
+
+    def test_requires_staff(self, estimates):
+        response = Client().get(reverse('main_app:export_data', args=['estimates']))
+        assert response.status_code == 302
+        assert '/admin/login/' in response['Location']
+
+    def test_streams_csv_attachment(self, admin_client, estimates):
+        response = admin_client.get(reverse('main_app:export_data', args=['estimates']))
+        assert response.status_code == 200
+        assert response.streaming
+        assert response['Content-Type'] == 'text/csv; charset=utf-8'
+        assert 'valora_estimates_' in response['Content-Disposition']
+        assert len(list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))) == 6
+
+    def test_gzip_download(self, admin_client, estimates):
+        response = admin_client.get(reverse('main_app:export_data', args=['logs']), {'format': 'jsonl', 'gzip': '1'})
+        assert response['Content-Type'] == 'application/gzip'
+        assert response['Content-Disposition'].endswith('.jsonl.gz"')
+        assert gzip.decompress(b''.join(response.streaming_content)) == b''
+
+    def test_unknown_dataset_or_format(self, admin_client):
+        assert admin_client.get(reverse('main_app:export_data', args=['users'])).status_code == 404
+        assert admin_client.get(reverse('main_app:export_data', args=['logs']), {'format': 'xml'}).status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_export_streams_asynchronously_under_asgi(admin_user):
+    await PropertyInquiry.objects.acreate(
+        address="Async Export", lot_size=5, current_property="Pasture", property_goals="Trees",
+        investment_capacity="$10,000", preferences_concerns="None", region="Async Region",
+    )
+    client = AsyncClient()
+    await client.aforce_login(admin_user)
+    response = await client.get(reverse('main_app:export_data', args=['inquiries']))
+    assert response.is_async
+    content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+    assert 'Async Export' in content
+
+
+@pytest.mark.django_db
+def test_export_data_command(tmp_path, estimates):
+    output = tmp_path / 'estimates.csv.gz'
+    call_command('export_data', 'estimates', '--gzip', '--output', str(output), '--chunk-size', '2')
+    rows = list(csv.reader(io.StringIO(gzip.decompress(output.read_bytes()).decode())))
+    assert len(rows) == 6
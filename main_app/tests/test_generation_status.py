@@ -0,0 +1,152 @@
+"""
+Tests for estimate generation status reporting and its long-polling endpoint.
+"""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+
+from main_app.ai_service import ValoraEarthAIService
+from main_app.generation_status import GenerationStatus, read_status, record_stage, wait_for_change
+from main_app.management.commands.benchmark_estimate_flow import canned_analysis_result
+from main_app.models import PropertyInquiry
+from main_app.utils.query_instrumentation import assert_query_budget
+from main_app.views import ESTIMATE_FAILED_MESSAGE, STATUS_SESSION_KEY
+
+
+@pytest.fixture
+def inquiry():
+    return PropertyInquiry.objects.create(
+        address="1 Status Street", lot_size=10, lot_size_unit='acres', current_property="Pasture",
+        property_goals="Trees", investment_capacity="$10,000", preferences_concerns="None", region="Oregon",
+    )
+
+
+def session_client(*inquiry_ids):
+    """A client whose session started the given inquiries"""
+    client = Client()
+    session = client.session
+    session[STATUS_SESSION_KEY] = list(inquiry_ids)
+    session.save()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+    return client
+
+
+def get_status(inquiry_id, client=None, **params):
+    client = client or session_client(inquiry_id)
+    return client.get(reverse('main_app:estimate_status', args=[inquiry_id]), params)
+
+
+class TestGenerationStatus:
+    """Test cases for the recorded stages"""
+
+    def test_timings(self):
+        status = GenerationStatus([('queued', 100.0), ('calling_model', 100.5), ('parsing', 103.0)])
+        data = status.as_json(now=103.25)
+        assert (data['stage'], data['version'], data['final'], data['elapsed_ms']) == ('parsing', 3, False, 3250)
+        assert [(stage['started_ms'], stage['duration_ms']) for stage in data['stages']] == [(0, 500), (500, 2500), (3000, 250)]
+
+        done = GenerationStatus(status.stages + [('done', 104.0)], results_url='/estimate-results/1/')
+        assert done.as_json(now=500)['elapsed_ms'] == 4000
+        assert done.as_json()['stages'][-1]['duration_ms'] == 0
+
+    def test_regeneration_starts_over(self):
+        record_stage(7, 'queued')
+        record_stage(7, 'calling_model')
+        assert [stage for stage, _ in read_status(7).stages] == ['queued', 'calling_model']
+        record_stage(7, 'failed', error="Timed out")
+        assert read_status(7).error == "Timed out"
+        record_stage(7, 'calling_model')
+        assert read_status(7).version == 1
+        with pytest.raises(ValueError):
+            record_stage(7, 'thinking')
+
+
+@pytest.mark.django_db
+class TestEstimateStatusAPI:
+    """Test cases for the status endpoint"""
+
+    def test_flow_reports_stages(self, inquiry):
+        assert get_status(inquiry.id).status_code == 404
+        record_stage(inquiry.id, 'queued')
+
+        async def fake_generate(service, inquiry_request, progress=None):
+            await progress('calling_model')
+            await progress('parsing')
+            return canned_analysis_result(inquiry_request)
+
+        with patch.object(ValoraEarthAIService, '__init__', lambda service: None), \
+                patch.object(ValoraEarthAIService, 'generate_property_estimate_async', fake_generate):
+            result = Client().post(reverse('main_app:generate_ai_estimate', args=[inquiry.id])).json()
+
+        with assert_query_budget(settings.QUERY_BUDGETS['main_app:estimate_status']):
+            response = get_status(inquiry.id)
+        data = response.json()
+        assert [stage['stage'] for stage in data['stages']] == ['queued', 'calling_model', 'parsing', 'saving', 'done']
+        assert data['final'] and data['results_url'] == result['results_url']
+        assert 'no-store' in response['Cache-Control']
+
+    def test_failure(self, inquiry):
+        async def fake_generate(service, inquiry_request, progress=None):
+            await progress('calling_model')
+            raise ValueError("model unavailable")
+
+        with patch.object(ValoraEarthAIService, '__init__', lambda service: None), \
+                patch.object(ValoraEarthAIService, 'generate_property_estimate_async', fake_generate):
+            response = Client().post(reverse('main_app:generate_ai_estimate', args=[inquiry.id]))
+        assert response.status_code == 500
+        data = get_status(inquiry.id).json()
+        # The exception is logged, not shown
+        assert data['stage'] == 'failed'
+        assert data['error'] == response.json()['error'] == ESTIMATE_FAILED_MESSAGE
+
+    def test_other_sessions_inquiries_are_hidden(self, inquiry):
+        record_stage(inquiry.id, 'queued')
+        assert get_status(inquiry.id, client=Client()).status_code == 404
+        assert get_status(inquiry.id, client=session_client(inquiry.id + 1)).status_code == 404
+        assert get_status(inquiry.id).status_code == 200
+
+    def test_long_poll_timeout(self, inquiry):
+        record_stage(inquiry.id, 'queued')
+        # A different version answers at once
+        assert get_status(inquiry.id, since=0, wait=20).json()['version'] == 1
+
+        started = time.monotonic()
+        data = get_status(inquiry.id, since=1, wait=0.3).json()
+        assert data['stage'] == 'queued'
+        assert 0.3 <= time.monotonic() - started < 2
+
+    def test_invalid_parameters(self, inquiry):
+        record_stage(inquiry.id, 'queued')
+        assert get_status(inquiry.id, since='x').status_code == 400
+        assert get_status(inquiry.id, wait=600).status_code == 400
+
+    def test_questionnaire_queues(self):
+        client = Client()
+        client.post(reverse('main_app:index'), {'lot_size': '12', 'region': 'Oregon', 'lot_size_unit': 'acres'})
+        response = client.post(reverse('main_app:submit_questionnaire'), {
+            'current_property': "Pasture", 'property_goals': "Trees",
+            'investment_capacity': "$10,000", 'preferences_concerns': "None",
+        })
+        inquiry_id = response.json()['inquiry_id']
+        assert get_status(inquiry_id, client=client).json()['stage'] == 'queued'
+        # Deleting the inquiry drops its status
+        PropertyInquiry.objects.filter(id=inquiry_id).first().delete()
+        assert read_status(inquiry_id) is None
+
+
+@pytest.mark.asyncio
+async def test_waiters_wake_on_change():
+    record_stage(11, 'queued')
+    started = time.monotonic()
+    waiting = asyncio.ensure_future(wait_for_change(11, 1, 10))
+    await asyncio.sleep(0.05)
+    await asyncio.to_thread(record_stage, 11, 'calling_model')
+    status = await waiting
+    assert status.stage == 'calling_model'
+    assert time.monotonic() - started < 1
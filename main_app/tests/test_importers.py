@@ -0,0 +1,185 @@
+"""
+Tests for the bulk inquiry import pipeline and batched estimate generation.
+"""
+
+import asyncio
+import gzip
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import Client
+from django.urls import reverse
+
+from main_app.ai_service import ValoraEarthAIService
+from main_app.estimates import generate_estimates
+from main_app.importers import ImportReport, import_file, import_inquiries, read_rows
+from main_app.management.commands.benchmark_estimate_flow import canned_analysis_result
+from main_app.models import AIAnalysisLog, PropertyEstimate, PropertyInquiry
+from main_app.utils.db_utils import submit_background
+from main_app.utils.query_instrumentation import record_queries
+
+HEADER = "address,lot_size,lot_size_unit,current_property,property_goals,investment_capacity,preferences_concerns,region\n"
+
+
+def csv_row(index, lot_size="12.5", unit="acres"):
+    return f'"{index} Import Road, Town",{lot_size},{unit},Pasture,Agroforestry,"$50,000",None,Import Region\n'
+
+
+def csv_file(rows):
+    return io.BytesIO((HEADER + ''.join(rows)).encode())
+
+
+@pytest.mark.django_db
+class TestImportInquiries:
+    """Test cases for validating and inserting rows"""
+
+    def test_imports_valid_rows_and_reports_bad_ones(self):
+        rows = [csv_row(0), csv_row(1, lot_size="-3"), csv_row(2, unit="furlongs"), csv_row(3), csv_row(4, lot_size="")]
+        report = import_file(csv_file(rows), 'csv', batch_size=2)
+
+        assert report.imported == 2
+        assert report.failed == 3
+        assert [error.line for error in report.errors] == [3, 4, 6]
+        assert 'lot_size' in report.errors[0].message
+        assert 'lot_size_unit' in report.errors[1].message
+        assert set(PropertyInquiry.objects.values_list('id', flat=True)) == set(report.inquiry_ids)
+        assert PropertyInquiry.objects.get(address="0 Import Road, Town").lot_size == 12.5
+
+    def test_jsonl_rows(self):
+        lines = [
+            json.dumps({'address': 'JSON Farm', 'lot_size': 40, 'lot_size_unit': 'hectares', 'current_property': 'Forest',
+                        'property_goals': 'Carbon', 'investment_capacity': '$1M', 'preferences_concerns': 'None',
+                        'region': 'Oregon'}),
+            '',
+            '{not json',
+            json.dumps(['a', 'list']),
+        ]
+        report = import_file(io.BytesIO('\n'.join(lines).encode()), 'jsonl')
+        assert report.imported == 1
+        assert [(error.line, error.message.split(':')[0]) for error in report.errors] == [
+            (3, 'Invalid JSON'), (4, 'Row must be an object'),
+        ]
+        assert PropertyInquiry.objects.get().lot_size_unit == 'hectares'
+
+    def test_one_insert_per_batch(self):
+        with record_queries() as recorder:
+            report = import_file(csv_file([csv_row(i) for i in range(10)]), 'csv', batch_size=5)
+        assert report.imported == 10
+        assert sum(query.sql.startswith('INSERT') for query in recorder.queries) == 2
+
+    def test_failed_batch_retried_row_by_row(self):
+        rows = list(read_rows(csv_file([csv_row(i) for i in range(3)]), 'csv'))
+        with patch.object(PropertyInquiry.objects, 'bulk_create', side_effect=DatabaseError('batch failed')):
+            report = import_inquiries(rows, batch_size=10)
+        assert report.imported == 3
+        assert PropertyInquiry.objects.count() == 3
+
+    def test_error_list_is_capped(self, monkeypatch):
+        monkeypatch.setattr('main_app.importers.MAX_REPORTED_ERRORS', 2)
+        report = ImportReport()
+        for line in range(5):
+            report.add_error(line, 'bad')
+        assert report.failed == 5
+        assert len(report.errors) == 2
+
+
+@pytest.mark.django_db
+def test_import_command(tmp_path):
+    path = tmp_path / 'leads.csv.gz'
+    path.write_bytes(gzip.compress((HEADER + csv_row(0) + csv_row(1, lot_size="zero")).encode()))
+    errors_path = tmp_path / 'errors.jsonl'
+    out = io.StringIO()
+
+    call_command('import_inquiries', str(path), '--errors-file', str(errors_path), stdout=out)
+
+    assert 'Imported 1 inquiries' in out.getvalue()
+    assert 'line 3' in out.getvalue()
+    assert json.loads(errors_path.read_text())['line'] == 3
+
+
+@pytest.mark.django_db
+class TestImportEndpoint:
+    """Test cases for the upload endpoint"""
+
+    def upload(self, name='leads.csv', rows=None):
+        content = (HEADER + ''.join(rows or [csv_row(0), csv_row(1)])).encode()
+        return SimpleUploadedFile(name, content, content_type='text/csv')
+
+    def test_requires_staff(self):
+        response = Client().post(reverse('main_app:import_inquiries'), {'file': self.upload()})
+        assert response.status_code == 302
+
+    def test_upload_csv(self, admin_client):
+        response = admin_client.post(reverse('main_app:import_inquiries'), {'file': self.upload()})
+        assert response.status_code == 200
+        assert response.json() == {'success': True, 'imported': 2, 'failed': 0, 'errors': [], 'estimates_queued': 0}
+
+    def test_upload_queues_estimates(self, admin_client):
+        with patch('main_app.views.enqueue_estimates') as enqueue:
+            response = admin_client.post(
+                reverse('main_app:import_inquiries'), {'file': self.upload(), 'generate_estimates': '1'}
+            )
+        assert response.status_code == 202
+        assert response.json()['estimates_queued'] == 2
+        assert sorted(enqueue.call_args[0][0]) == sorted(PropertyInquiry.objects.values_list('id', flat=True))
+
+    @pytest.mark.django_db(transaction=True)
+    def test_queued_estimates_are_generated_after_the_response(self, admin_client):
+        """The request's event loop is gone by then; generation runs on the background pool"""
+        futures = []
+
+        def submit(*args, **kwargs):
+            futures.append(submit_background(*args, **kwargs))
+            return futures[-1]
+
+        async def fake_generate(service, inquiry_request):
+            return canned_analysis_result(inquiry_request)
+
+        with patch('main_app.estimates.submit_background', side_effect=submit), \
+                patch.object(ValoraEarthAIService, '__init__', lambda service: None), \
+                patch.object(ValoraEarthAIService, 'generate_property_estimate_async', fake_generate):
+            response = admin_client.post(
+                reverse('main_app:import_inquiries'), {'file': self.upload(), 'generate_estimates': '1'}
+            )
+            assert response.status_code == 202
+            summary = futures[0].result(timeout=30)
+
+        assert len(summary.succeeded) == 2
+        assert PropertyEstimate.objects.count() == 2
+
+    def test_rejects_unknown_format(self, admin_client):
+        response = admin_client.post(reverse('main_app:import_inquiries'), {'file': self.upload('leads.xlsx')})
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_generate_estimates_bounded_concurrency():
+    report = await asyncio.to_thread(import_file, csv_file([csv_row(i) for i in range(6)]), 'csv')
+    in_flight = 0
+    peak = 0
+
+    async def fake_generate(service, inquiry_request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if inquiry_request.address.startswith('5 '):
+            raise RuntimeError('AI unavailable')
+        return canned_analysis_result(inquiry_request)
+
+    with patch.object(ValoraEarthAIService, '__init__', lambda service: None), \
+            patch.object(ValoraEarthAIService, 'generate_property_estimate_async', fake_generate):
+        summary = await generate_estimates(report.inquiry_ids, concurrency=2)
+
+    assert peak == 2
+    assert len(summary.succeeded) == 5
+    assert len(summary.failed) == 1
+    assert await PropertyEstimate.objects.acount() == 5
+    assert await AIAnalysisLog.objects.filter(success=False).acount() == 1
@@ -0,0 +1,162 @@
+"""
+Tests for archiving AIAnalysisLog rows to segment files.
+"""
+
+import gzip
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from main_app import log_archive
+from main_app.log_archive import archive_logs, find_archived_log, purge_segments, segment_paths
+from main_app.models import AIAnalysisLog, EstimatePayload, LogSegment, PayloadBlob, PropertyEstimate, PropertyInquiry
+from main_app.utils.query_instrumentation import record_queries
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(settings, tmp_path):
+    settings.LOG_ARCHIVE_DIR = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def inquiry():
+    return PropertyInquiry.objects.create(
+        address="1 Archive Lane", lot_size=10, lot_size_unit='acres', current_property="Pasture",
+        property_goals="Trees", investment_capacity="$10,000", preferences_concerns="None", region="Oregon",
+    )
+
+
+@pytest.fixture
+def logs(inquiry):
+    """150 logs 100 days old and 10 from today"""
+    now = timezone.now()
+    return AIAnalysisLog.objects.bulk_create([
+        AIAnalysisLog(
+            inquiry=inquiry, request_data={"attempt": i}, response_data={"content": f"answer {i}"} if i % 3 else {},
+            model_used="gpt-4o", tokens_used=i, processing_time=1.5, success=bool(i % 3),
+            error_message='' if i % 3 else 'Timed out',
+            created_at=now - timedelta(days=100 if i < 150 else 0, seconds=i),
+        )
+        for i in range(160)
+    ])
+
+
+def cutoff():
+    return timezone.now() - timedelta(days=90)
+
+
+@pytest.mark.django_db
+class TestArchiveLogs:
+    """Test cases for moving logs to segments"""
+
+    def test_moves_old_logs(self, logs):
+        with record_queries() as recorder:
+            result = archive_logs(cutoff(), chunk_size=40)
+        assert (result.logs, result.segments) == (150, 1)
+        assert AIAnalysisLog.objects.count() == 10
+        deletes = [query for query in recorder.queries if query.sql.startswith('DELETE FROM "main_app_aianalysislog"')]
+        assert len(deletes) == 4
+
+        segment = LogSegment.objects.get()
+        assert (segment.first_log_id, segment.last_log_id, segment.entries) == (logs[0].id, logs[149].id, 150)
+        segment_path, _ = segment_paths(segment.name)
+        assert segment_path.stat().st_size == segment.size
+        # Ordinary gzipped JSONL as a whole
+        records = [json.loads(line) for line in gzip.decompress(segment_path.read_bytes()).splitlines()]
+        assert [record['id'] for record in records] == [log.id for log in logs[:150]]
+        assert records[1]['request_data'] == {"attempt": 1} and records[1]['inquiry_address'] == "1 Archive Lane"
+
+    def test_find_archived_log(self, logs):
+        archive_logs(cutoff())
+        archived = find_archived_log(logs[100].id)
+        assert (archived.request_data, archived.response_data) == ({"attempt": 100}, {"content": "answer 100"})
+        assert archived.created_at == logs[100].created_at
+        assert archived.inquiry.address == "1 Archive Lane"
+        assert find_archived_log(logs[155].id) is None
+        assert find_archived_log(10 ** 9) is None
+
+    def test_uncommitted_tail_is_ignored(self, logs):
+        archive_logs(cutoff())
+        segment = LogSegment.objects.get()
+        LogSegment.objects.filter(id=segment.id).update(entries=100)
+        assert find_archived_log(logs[99].id) is not None
+        assert find_archived_log(logs[120].id) is None
+
+    def test_unused_blobs_are_deleted(self, inquiry, logs):
+        estimate = PropertyEstimate.objects.create(
+            inquiry=inquiry, project_name="Kept", project_description="Plan", confidence_score=0.8,
+            factors_considered=[], recommendations=[], timeline="1 year", risk_assessment="Low", processing_time=1.0,
+        )
+        EstimatePayload.store(estimate, {"content": "answer 1"})
+        PayloadBlob.objects.update(stored_at=timezone.now() - log_archive.BLOB_GRACE_PERIOD)
+        result = archive_logs(cutoff())
+        # 150 requests and 99 distinct successful responses go; {} and the estimate's response stay
+        assert result.blobs == 150 + 99
+        assert PayloadBlob.objects.filter(id=EstimatePayload.objects.get().response_blob_id).exists()
+        assert all(log.response_data is not None for log in AIAnalysisLog.objects.all())
+
+    def test_recently_stored_blobs_are_kept(self, inquiry, logs):
+        PayloadBlob.objects.update(stored_at=timezone.now() - log_archive.BLOB_GRACE_PERIOD)
+        # A writer reusing an archived log's request, about to insert the log that refers to it
+        reused = PayloadBlob.for_value({"attempt": 0})
+        PayloadBlob.store(reused)
+        assert reused.id == logs[0].request_blob_id
+        result = archive_logs(cutoff())
+        assert result.blobs == 150 + 100 - 1
+        assert PayloadBlob.objects.filter(id=reused.id).exists()
+        AIAnalysisLog.objects.create(
+            inquiry=inquiry, request_blob=reused, response_blob=reused, model_used="unknown",
+            tokens_used=0, processing_time=0, success=False,
+        )
+
+    def test_later_runs_add_segments(self, logs):
+        archive_logs(cutoff())
+        AIAnalysisLog.objects.update(created_at=timezone.now() - timedelta(days=95))
+        assert archive_logs(cutoff()).logs == 10
+        assert LogSegment.objects.count() == 2
+        assert find_archived_log(logs[159].id).tokens_used == 159
+
+    def test_purge_segments(self, logs, archive_dir):
+        archive_logs(cutoff())
+        assert purge_segments(timezone.now() - timedelta(days=365)) == 0
+        assert purge_segments(cutoff()) == 1
+        assert not LogSegment.objects.exists()
+        assert not any(archive_dir.iterdir())
+
+    def test_segments_roll_over(self, logs, monkeypatch):
+        monkeypatch.setattr(log_archive, 'SEGMENT_MAX_BYTES', 1)
+        assert archive_logs(cutoff(), chunk_size=50).segments == 3
+        assert find_archived_log(logs[120].id).tokens_used == 120
+
+    def test_command(self, logs):
+        call_command('archive_ai_logs', '--days', '30', '--purge-segments-after', '365')
+        assert AIAnalysisLog.objects.count() == 10
+        assert LogSegment.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestArchiveAdmin:
+    """Test cases for reading archived logs in the admin"""
+
+    def test_archived_log_change_form(self, admin_client, logs):
+        archive_logs(cutoff())
+        response = admin_client.get(reverse('admin:main_app_aianalysislog_change', args=[logs[4].id]))
+        assert response.status_code == 200
+        content = response.content.decode()
+        assert 'answer 4' in content and '1 Archive Lane' in content
+        assert 'name="_save"' not in content
+
+        live = admin_client.get(reverse('admin:main_app_aianalysislog_change', args=[logs[155].id]))
+        assert 'name="_save"' in live.content.decode()
+
+    def test_segment_lists_its_logs(self, admin_client, logs):
+        archive_logs(cutoff())
+        segment = LogSegment.objects.get()
+        response = admin_client.get(reverse('admin:main_app_logsegment_change', args=[segment.id]))
+        assert response.status_code == 200
+        assert reverse('admin:main_app_aianalysislog_change', args=[logs[0].id]) in response.content.decode()
@@ -1,6 +1,7 @@
 import pytest
 import json
 from unittest.mock import Mock, patch, MagicMock
+from django.conf import settings
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
@@ -343,6 +344,7 @@ class TestPropertyEstimateViews:
         session = client.session
         session['initial_data'] = {'lot_size': 10.0, 'region': 'Test Region', 'lot_size_unit': 'acres'}
         session.save()
+        client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
         
         response = client.get(reverse('main_app:estimate_questionnaire'))
         assert response.status_code == 200
@@ -362,6 +364,7 @@ class TestPropertyEstimateViews:
         session = client.session
         session['initial_data'] = {'lot_size': 12.0, 'region': 'Test Region', 'lot_size_unit': 'acres'}
         session.save()
+        client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
         
         data = {'answer': 'Vacant agricultural land'}
         response = client.post(f"{reverse('main_app:estimate_questionnaire')}?step=1", data)
@@ -386,6 +389,7 @@ class TestPropertyEstimateViews:
             'investment_capacity': '$100,000 - $200,000'
         }
         session.save()
+        client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
         
         data = {'answer': 'Organic certification'}
         response = client.post(f"{reverse('main_app:estimate_questionnaire')}?step=4", data)
@@ -394,10 +398,10 @@ class TestPropertyEstimateViews:
         assert response.status_code == 302
         assert response.url == reverse('main_app:loading_screen')
         
-        # Check that complete estimate data was stored
+        # The answers are stored with the inquiry, not in the session
         session = client.session
-        assert 'questionnaire_data' in session
-        assert session['questionnaire_data']['preferences_concerns'] == 'Organic certification'
+        assert PropertyInquiry.objects.get(id=session['current_inquiry_id']).preferences_concerns == 'Organic certification'
+        assert 'questionnaire_answers' not in session
     
     def test_loading_screen_get(self, client):
         """Test GET request to loading screen"""
@@ -405,6 +409,7 @@ class TestPropertyEstimateViews:
         session = client.session
         session['current_inquiry_id'] = 1
         session.save()
+        client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
         
         response = client.get(reverse('main_app:loading_screen'))
         assert response.status_code == 200
@@ -614,6 +619,7 @@ class TestPropertyEstimateIntegration:
         session = client.session
         session['initial_data'] = initial_data
         session.save()
+        client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
         
         step1_data = {'answer': 'Vacant agricultural land'}
         response = client.post(f"{reverse('main_app:estimate_questionnaire')}?step=1", step1_data)
@@ -635,13 +641,12 @@ class TestPropertyEstimateIntegration:
         assert response.status_code == 302
         assert response.url == reverse('main_app:loading_screen')
         
-        # Verify all data was stored in session
-        session = client.session
-        assert 'questionnaire_data' in session
-        assert session['questionnaire_data']['current_property'] == 'Vacant agricultural land'
-        assert session['questionnaire_data']['property_goals'] == 'Sustainable farming and carbon sequestration'
-        assert session['questionnaire_data']['investment_capacity'] == '$200,000 - $500,000'
-        assert session['questionnaire_data']['preferences_concerns'] == 'Organic certification and wildlife preservation'
+        # Verify all data was stored with the inquiry
+        inquiry = PropertyInquiry.objects.get(id=client.session['current_inquiry_id'])
+        assert inquiry.current_property == 'Vacant agricultural land'
+        assert inquiry.property_goals == 'Sustainable farming and carbon sequestration'
+        assert inquiry.investment_capacity == '$200,000 - $500,000'
+        assert inquiry.preferences_concerns == 'Organic certification and wildlife preservation'
 
 
 # ============================================================================
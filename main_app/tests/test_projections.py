@@ -0,0 +1,146 @@
+"""
+Tests for the packed projection series.
+"""
+
+import json
+import math
+
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from main_app.models import PropertyEstimate, PropertyInquiry
+from main_app.projections import (
+    BLOCK_SIZE,
+    COST_CATEGORIES,
+    PROJECTION_YEARS,
+    REVENUE_CATEGORIES,
+    SERIES_COUNT,
+    ProjectionSeries,
+    projection_total,
+)
+
+SERIES = [1000.5 * year for year in range(1, PROJECTION_YEARS + 1)]
+REVENUE = {category: [value * (index + 2) for value in SERIES] for index, category in enumerate(REVENUE_CATEGORIES)}
+COST = {category: [value / (index + 2) for value in SERIES] for index, category in enumerate(COST_CATEGORIES)}
+
+
+def make_estimate(**projections):
+    inquiry = PropertyInquiry.objects.create(
+        address="1 Packed Lane", lot_size=10, lot_size_unit='acres', current_property="Pasture",
+        property_goals="Trees", investment_capacity="$10,000", preferences_concerns="None", region="Oregon",
+    )
+    return PropertyEstimate.objects.create(
+        inquiry=inquiry, project_name="Packed", project_description="Plan", confidence_score=0.8,
+        factors_considered=[], recommendations=[], timeline="3 years", risk_assessment="Low",
+        ai_response_raw={}, processing_time=1.0, **projections,
+    )
+
+
+class TestProjectionSeries:
+    """Test cases for packing and decoding"""
+
+    def test_round_trip(self):
+        block, overflow = ProjectionSeries.pack(SERIES, REVENUE, COST)
+        assert overflow is None
+        assert len(block.data) == BLOCK_SIZE
+        assert block.to_json() == {'cash_flow_projection': SERIES, 'revenue_breakdown': REVENUE, 'cost_breakdown': COST}
+        assert BLOCK_SIZE < len(json.dumps([SERIES, REVENUE, COST]))
+
+    def test_zero_copy_views(self):
+        block, _ = ProjectionSeries.pack(SERIES, REVENUE, COST)
+        values = block.values()
+        assert isinstance(values, memoryview) and values.obj is block.data
+        assert list(values[:PROJECTION_YEARS]) == SERIES
+        array = block.numpy()
+        assert array.shape == (SERIES_COUNT, PROJECTION_YEARS)
+        assert not array.flags.writeable and not array.flags.owndata
+        assert array[1].tolist() == REVENUE[REVENUE_CATEGORIES[0]]
+
+    def test_missing_values_and_series(self):
+        partial = [None, *SERIES[1:]]
+        block, overflow = ProjectionSeries.pack(partial, {REVENUE_CATEGORIES[1]: SERIES}, None)
+        assert overflow is None
+        assert block.to_json() == {
+            'cash_flow_projection': partial, 'revenue_breakdown': {REVENUE_CATEGORIES[1]: SERIES}, 'cost_breakdown': {},
+        }
+        assert math.isnan(block.numpy()[0, 0])
+        assert ProjectionSeries.pack([], {}, {}) == (ProjectionSeries(), None)
+        assert ProjectionSeries().to_json() == {'cash_flow_projection': [], 'revenue_breakdown': {}, 'cost_breakdown': {}}
+
+    def test_overflow_keeps_other_shapes(self):
+        revenue = {**REVENUE, 'carbon_credits': SERIES, REVENUE_CATEGORIES[0]: SERIES[:3]}
+        cost = {"Year 1": 5000, "Year 2": 5000}
+        block, overflow = ProjectionSeries.pack(SERIES[:5], revenue, cost)
+        assert overflow == {
+            'cash_flow_projection': SERIES[:5],
+            'revenue_breakdown': {'carbon_credits': SERIES, REVENUE_CATEGORIES[0]: SERIES[:3]},
+            'cost_breakdown': cost,
+        }
+        assert block.to_json(overflow) == {'cash_flow_projection': SERIES[:5], 'revenue_breakdown': revenue,
+                                           'cost_breakdown': cost}
+        assert projection_total(block, overflow, 'revenue_breakdown') == pytest.approx(
+            sum(sum(values) for values in revenue.values())
+        )
+        # Like the per-category series, flat {"Year N": value} breakdowns carry no yearly series
+        assert projection_total(block, overflow, 'cost_breakdown') == 0
+
+    def test_rejects_bad_blocks(self):
+        with pytest.raises(ValueError):
+            ProjectionSeries(b'\x00' * 8)
+
+
+@pytest.mark.django_db
+class TestPackedEstimate:
+    """Test cases for the model accessors and the API"""
+
+    def test_accessors_round_trip_through_the_database(self):
+        estimate = make_estimate(cash_flow_projection=SERIES, revenue_breakdown=REVENUE, cost_breakdown=COST)
+        stored = PropertyEstimate.objects.get(id=estimate.id)
+        assert isinstance(stored.projection_series, ProjectionSeries)
+        assert stored.projection_overflow is None
+        assert (stored.cash_flow_projection, stored.revenue_breakdown, stored.cost_breakdown) == (SERIES, REVENUE, COST)
+
+        stored.cost_breakdown = {"Year 1": 10}
+        stored.save()
+        stored = PropertyEstimate.objects.get(id=estimate.id)
+        assert stored.cost_breakdown == {"Year 1": 10}
+        assert stored.revenue_breakdown == REVENUE
+
+    def test_accessors_share_one_decode(self):
+        estimate = make_estimate(cash_flow_projection=SERIES, revenue_breakdown=REVENUE, cost_breakdown=COST)
+        projections = estimate.projections
+        assert estimate.cash_flow_projection is projections['cash_flow_projection']
+        assert estimate.revenue_breakdown is estimate.projections['revenue_breakdown']
+
+        series = list(estimate.cash_flow_projection)
+        series[0] = -1
+        estimate.cash_flow_projection = series
+        assert estimate.projections is not projections
+        assert estimate.cash_flow_projection[0] == -1
+        estimate.save()
+        assert PropertyEstimate.objects.get(id=estimate.id).cash_flow_projection[0] == -1
+
+    def test_cache_follows_stored_values(self):
+        estimate = make_estimate(cost_breakdown={'Year 1': 10})
+        assert estimate.cost_breakdown == {'Year 1': 10}
+        estimate.projection_overflow = {'cost_breakdown': {'Year 1': 20}}
+        assert estimate.cost_breakdown == {'Year 1': 20}
+
+        PropertyEstimate.objects.filter(id=estimate.id).update(projection_overflow={'cost_breakdown': {'Year 1': 30}})
+        estimate.refresh_from_db()
+        assert estimate.cost_breakdown == {'Year 1': 30}
+
+    def test_defaults(self):
+        estimate = PropertyEstimate.objects.get(id=make_estimate().id)
+        assert estimate.projection_series == ProjectionSeries()
+        assert (estimate.cash_flow_projection, estimate.revenue_breakdown, estimate.cost_breakdown) == ([], {}, {})
+
+    def test_api_decodes_series(self, settings):
+        settings.PARTNER_API_KEYS = ['partner-test-key']
+        estimate = make_estimate(cash_flow_projection=SERIES, revenue_breakdown=REVENUE, cost_breakdown={"Year 1": 1})
+        client = Client(HTTP_AUTHORIZATION='Bearer partner-test-key')
+        response = client.get(reverse('main_app:estimates_api'), {'fields': 'id,revenue_breakdown,cost_breakdown'})
+        assert response.json()['results'] == [
+            {'id': estimate.id, 'revenue_breakdown': REVENUE, 'cost_breakdown': {"Year 1": 1}},
+        ]
@@ -0,0 +1,139 @@
+"""
+Per-view query budgets (settings.QUERY_BUDGETS) enforced against the real views.
+"""
+
+import pytest
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+from unittest.mock import patch
+
+from main_app.ai_service import ValoraEarthAIService
+from main_app.management.commands.benchmark_estimate_flow import canned_analysis_result
+from main_app.models import PropertyInquiry, PropertyEstimate
+from main_app.utils.query_instrumentation import (
+    QueryBudgetExceeded,
+    assert_query_budget,
+    record_queries,
+)
+
+
+def view_budget(view_name):
+    return assert_query_budget(settings.QUERY_BUDGETS[view_name], label=view_name)
+
+
+@pytest.fixture
+def inquiry():
+    return PropertyInquiry.objects.create(
+        address="Budget Property",
+        lot_size=12.0,
+        lot_size_unit="acres",
+        current_property="Pasture",
+        property_goals="Agroforestry",
+        investment_capacity="$100,000",
+        preferences_concerns="Water use",
+        region="Budget Region",
+    )
+
+
+@pytest.fixture
+def estimate(inquiry):
+    return PropertyEstimate.objects.create(
+        inquiry=inquiry,
+        project_name="Budget Project",
+        project_description="Description",
+        confidence_score=0.8,
+        factors_considered=["Soil"],
+        recommendations=["Plant trees"],
+        timeline="3 years",
+        risk_assessment="Low",
+        ai_response_raw={},
+        processing_time=1.0,
+        cash_flow_projection=[1000] * 10,
+    )
+
+
+@pytest.fixture
+def questionnaire_client():
+    client = Client()
+    session = client.session
+    session['initial_data'] = {'lot_size': 12.0, 'region': 'Budget Region', 'lot_size_unit': 'acres'}
+    session['current_inquiry_id'] = 1
+    session.save()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+    return client
+
+
+@pytest.mark.django_db
+class TestViewQueryBudgets:
+    """Every main view stays within its configured query budget"""
+
+    def test_index_budget(self):
+        with view_budget('main_app:index'):
+            response = Client().get(reverse('main_app:index'))
+        assert response.status_code == 200
+
+    def test_estimate_questionnaire_budget(self, questionnaire_client):
+        with view_budget('main_app:estimate_questionnaire'):
+            response = questionnaire_client.post(
+                f"{reverse('main_app:estimate_questionnaire')}?step=1", {'answer': 'Pasture'}
+            )
+        assert response.status_code == 302
+
+    def test_loading_screen_budget(self, questionnaire_client):
+        with view_budget('main_app:loading_screen'):
+            response = questionnaire_client.get(reverse('main_app:loading_screen'))
+        assert response.status_code == 200
+
+    def test_estimate_results_budget(self, estimate):
+        url = reverse('main_app:estimate_results', args=[estimate.inquiry_id])
+        with view_budget('main_app:estimate_results') as recorder:
+            response = Client().get(url)
+        assert response.status_code == 200
+        assert b"Budget Project" in response.content
+        # Inquiry and estimate come back in a single joined query
+        assert sum('main_app_propertyestimate' in q.sql for q in recorder.queries) == 1
+
+    def test_estimate_results_without_estimate_budget(self, inquiry):
+        with view_budget('main_app:estimate_results'):
+            response = Client().get(reverse('main_app:estimate_results', args=[inquiry.id]))
+        assert response.status_code == 200
+
+    def test_generate_ai_estimate_budget(self, inquiry):
+        async def fake_generate(service, inquiry_request, progress=None):
+            return canned_analysis_result(inquiry_request)
+
+        with patch.object(ValoraEarthAIService, '__init__', lambda service: None), \
+                patch.object(ValoraEarthAIService, 'generate_property_estimate_async', fake_generate), \
+                view_budget('main_app:generate_ai_estimate'):
+            response = Client().post(reverse('main_app:generate_ai_estimate', args=[inquiry.id]))
+        assert response.status_code == 200
+        assert PropertyEstimate.objects.filter(inquiry=inquiry).exists()
+
+
+@pytest.mark.django_db
+class TestQueryInstrumentation:
+    """Test cases for the recorder, budget helper and middleware"""
+
+    def test_budget_helper_reports_slowest_queries(self, inquiry):
+        with pytest.raises(QueryBudgetExceeded) as exc_info:
+            with assert_query_budget(1, label='two lookups'):
+                PropertyInquiry.objects.get(id=inquiry.id)
+                PropertyInquiry.objects.filter(region='Budget Region').count()
+        assert 'two lookups exceeded its query budget of 1' in str(exc_info.value)
+        assert 'main_app_propertyinquiry' in str(exc_info.value)
+
+    def test_middleware_headers(self, settings, estimate):
+        settings.QUERY_INSTRUMENTATION_HEADERS = True
+        response = Client().get(reverse('main_app:estimate_results', args=[estimate.inquiry_id]))
+        assert int(response['X-DB-Query-Count']) >= 1
+        assert response['Server-Timing'].startswith('db;dur=')
+
+    def test_slow_queries_logged_with_plan(self, settings, inquiry):
+        settings.SLOW_QUERY_THRESHOLD_MS = 0
+        with patch('main_app.utils.query_instrumentation.slow_query_logger') as slow_logger, record_queries():
+            list(PropertyInquiry.objects.filter(region='Budget Region'))
+        args = slow_logger.warning.call_args[0]
+        assert 'main_app_propertyinquiry' in args[3]
+        # SQLite's EXPLAIN QUERY PLAN output names the scanned table
+        assert 'main_app_propertyinquiry' in args[5]
@@ -0,0 +1,103 @@
+"""
+Tests for the single-request questionnaire submission and the per-step fallback.
+"""
+
+import json
+
+import pytest
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+
+from main_app.models import PropertyInquiry
+from main_app.utils.query_instrumentation import assert_query_budget
+
+ANSWERS = {
+    'current_property': "Pasture with some oaks",
+    'property_goals': "Agroforestry",
+    'investment_capacity': "$100,000",
+    'preferences_concerns': "Keep the pond",
+}
+
+
+@pytest.fixture
+def client():
+    client = Client()
+    client.post(reverse('main_app:index'), {'lot_size': '12', 'region': 'Oregon', 'lot_size_unit': 'acres'})
+    return client
+
+
+def submit(client, data, **extra):
+    return client.post(reverse('main_app:submit_questionnaire'), json.dumps(data),
+                       content_type='application/json', **extra)
+
+
+@pytest.mark.django_db
+class TestSubmitQuestionnaire:
+    """Test cases for submitting every answer in one request"""
+
+    def test_submit(self, client):
+        with assert_query_budget(settings.QUERY_BUDGETS['main_app:submit_questionnaire']):
+            response = submit(client, ANSWERS)
+        assert response.status_code == 201
+        body = response.json()
+        assert body['loading_url'] == reverse('main_app:loading_screen')
+        inquiry = PropertyInquiry.objects.get(id=body['inquiry_id'])
+        assert (inquiry.address, inquiry.lot_size, inquiry.region) == ("Property in Oregon", 12, 'Oregon')
+        assert inquiry.preferences_concerns == ANSWERS['preferences_concerns']
+        assert client.session['current_inquiry_id'] == inquiry.id
+        assert client.get(body['loading_url']).status_code == 200
+
+    def test_form_body_with_landing_fields(self):
+        data = {**ANSWERS, 'lot_size': '3', 'lot_size_unit': 'hectares', 'region': 'Kenya'}
+        response = Client().post(reverse('main_app:submit_questionnaire'), data)
+        assert response.status_code == 201
+        inquiry = PropertyInquiry.objects.get()
+        assert (inquiry.lot_size, inquiry.lot_size_unit, inquiry.region) == (3, 'hectares', 'Kenya')
+
+    def test_invalid(self, client):
+        response = submit(client, {**ANSWERS, 'property_goals': '  '})
+        assert response.status_code == 400
+        assert 'property_goals' in response.json()['error']
+
+        response = submit(client, {**ANSWERS, 'current_property': 'x' * 1001})
+        assert response.status_code == 400
+        assert '1000' in response.json()['error']
+
+        assert submit(Client(), ANSWERS).status_code == 400
+        assert submit(client, [ANSWERS]).status_code == 400
+        assert client.get(reverse('main_app:submit_questionnaire')).status_code == 405
+        assert not PropertyInquiry.objects.exists()
+
+    def test_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        token = client.get(reverse('main_app:index')).cookies[settings.CSRF_COOKIE_NAME].value
+        client.post(reverse('main_app:index'), {
+            'lot_size': '12', 'region': 'Oregon', 'lot_size_unit': 'acres', 'csrfmiddlewaretoken': token,
+        })
+        assert submit(client, ANSWERS).status_code == 403
+        assert submit(client, ANSWERS, HTTP_X_CSRFTOKEN=token).status_code == 201
+
+
+@pytest.mark.django_db
+class TestPerStepFallback:
+    """Test cases for the questionnaire without JavaScript"""
+
+    def test_steps(self, client):
+        url = reverse('main_app:estimate_questionnaire')
+        for step, (field, answer) in enumerate(ANSWERS.items(), start=1):
+            page = client.get(url, {'step': step})
+            assert json.loads(page.content.decode().split('id="questionnaire-steps" type="application/json">')[1]
+                              .split('</script>')[0])[step - 1]['field'] == field
+            response = client.post(f"{url}?step={step}", {'answer': answer})
+        assert response.url == reverse('main_app:loading_screen')
+        inquiry = PropertyInquiry.objects.get()
+        assert inquiry.investment_capacity == ANSWERS['investment_capacity']
+        assert client.session['current_inquiry_id'] == inquiry.id
+
+    def test_page_embeds_answers_safely(self, client):
+        url = reverse('main_app:estimate_questionnaire')
+        client.post(f"{url}?step=1", {'answer': '</script><script>alert(1)</script>'})
+        content = client.get(url, {'step': 2}).content.decode()
+        assert '<script>alert(1)' not in content
+        assert "What&#x27;s your goal with your property?" in content
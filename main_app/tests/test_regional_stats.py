@@ -0,0 +1,279 @@
+"""
+Tests for the incrementally maintained regional statistics.
+"""
+
+import io
+import random
+from unittest.mock import patch
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+
+from main_app.ai_service import ValoraEarthAIService
+from main_app.estimates import generate_estimate
+from main_app.management.commands.benchmark_estimate_flow import canned_analysis_result
+from main_app.models import PropertyEstimate, PropertyInquiry, Region, RegionAlias, RegionalStatistic
+from main_app.regional_stats import (
+    RELATIVE_ACCURACY,
+    QuantileSketch,
+    lot_size_bucket,
+    regional_statistics,
+    rekey_statistics,
+)
+from main_app.regions import invalidate_region_index, load_gazetteer, normalize_region
+from main_app.utils.query_instrumentation import assert_query_budget, record_queries
+
+API_KEY = 'partner-test-key'
+
+
+def make_inquiry(region='Northern California', lot_size=10, unit='acres'):
+    return PropertyInquiry.objects.create(
+        address="1 Stats Road", lot_size=lot_size, lot_size_unit=unit, current_property="Pasture",
+        property_goals="Trees", investment_capacity="$10,000", preferences_concerns="None", region=region,
+    )
+
+
+def generate(inquiry, scale=1.0, confidence=0.8):
+    """Run the estimate flow with a canned AI result whose series are multiplied by ``scale``"""
+    async def fake_generate(service, inquiry_request):
+        result = canned_analysis_result(inquiry_request)
+        for breakdown in (result.estimate.revenue_breakdown, result.estimate.cost_breakdown):
+            for category, series in breakdown.items():
+                breakdown[category] = [value * scale for value in series]
+        result.estimate.confidence_score = confidence
+        return result
+
+    with patch.object(ValoraEarthAIService, '__init__', lambda service: None), \
+            patch.object(ValoraEarthAIService, 'generate_property_estimate_async', fake_generate):
+        return async_to_sync(generate_estimate)(inquiry, ValoraEarthAIService())
+
+
+def median(stat, metric):
+    return QuantileSketch.from_dict(stat.sketches[metric]).quantile(0.5)
+
+
+class TestQuantileSketch:
+    """Test cases for the mergeable sketch"""
+
+    def test_quantiles_within_relative_accuracy(self):
+        rng = random.Random(3)
+        values = sorted(rng.lognormvariate(5, 1.5) for _ in range(5000))
+        sketch = QuantileSketch()
+        for value in values:
+            sketch.add(value)
+        for q in (0.1, 0.5, 0.9, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            assert sketch.quantile(q) == pytest.approx(exact, rel=RELATIVE_ACCURACY * 1.01)
+
+    def test_negative_and_zero_values(self):
+        sketch = QuantileSketch()
+        for value in (-500, -20, 0, 0, 30):
+            sketch.add(value)
+        assert sketch.quantile(0) == pytest.approx(-500, rel=RELATIVE_ACCURACY)
+        assert sketch.quantile(0.5) == 0
+        assert sketch.quantile(1) == pytest.approx(30, rel=RELATIVE_ACCURACY)
+
+    def test_merge_and_subtract(self):
+        left, right, combined = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for value in range(1, 101):
+            (left if value % 2 else right).add(value)
+            combined.add(value)
+        left.merge(right)
+        assert left.to_dict() == combined.to_dict()
+
+        left.merge(right, sign=-1)
+        for value in range(2, 101, 2):
+            combined.add(value, -1)
+        assert left.to_dict()['p'] == combined.to_dict()['p']
+        assert left.count == 50
+
+    def test_round_trip(self):
+        sketch = QuantileSketch()
+        for value in (0.5, 1.5, -2, 0):
+            sketch.add(value)
+        restored = QuantileSketch.from_dict(sketch.to_dict())
+        assert restored.to_dict() == sketch.to_dict()
+        assert restored.quantile(0.5) == sketch.quantile(0.5)
+        assert QuantileSketch().quantile(0.5) is None
+
+    def test_normalization_and_buckets(self):
+        assert normalize_region('  Northern  California. ') == 'northern california'
+        assert normalize_region('Île-de-France') == 'ile de france'
+        assert [lot_size_bucket(acres) for acres in (1, 5, 50, 499.9, 10000)] == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestIncrementalUpdates:
+    """Test cases for statistics maintained as estimates are saved"""
+
+    def test_new_estimate_is_counted(self):
+        generate(make_inquiry())
+        stat = RegionalStatistic.objects.get()
+        assert (stat.region_key, stat.lot_size_bucket, stat.estimate_count) == ('northern california', 1, 1)
+        # Canned revenue: 3 categories x 55,000 over 10 years on 10 acres
+        assert median(stat, 'revenue_per_acre') == pytest.approx(1650, rel=RELATIVE_ACCURACY)
+        assert median(stat, 'confidence_score') == pytest.approx(0.8, rel=RELATIVE_ACCURACY)
+
+    def test_regeneration_replaces_previous_values(self):
+        inquiry = make_inquiry()
+        generate(inquiry)
+        generate(inquiry, scale=2, confidence=0.5)
+        stat = RegionalStatistic.objects.get()
+        assert stat.estimate_count == 1
+        assert median(stat, 'revenue_per_acre') == pytest.approx(3300, rel=RELATIVE_ACCURACY)
+        assert QuantileSketch.from_dict(stat.sketches['confidence_score']).count == 1
+
+    def test_regions_are_normalized_and_bucketed(self):
+        generate(make_inquiry('Northern California'))
+        generate(make_inquiry('northern california '))
+        generate(make_inquiry('Northern California', lot_size=10, unit='hectares'))
+        counts = dict(RegionalStatistic.objects.values_list('lot_size_bucket', 'estimate_count'))
+        assert counts == {1: 2, 2: 1}
+
+    def test_deleting_estimates_subtracts_them(self):
+        first, second = make_inquiry(), make_inquiry()
+        generate(first)
+        generate(second)
+        PropertyEstimate.objects.filter(inquiry=first).delete()
+        assert RegionalStatistic.objects.get().estimate_count == 1
+        second.delete()
+        assert not RegionalStatistic.objects.exists()
+
+    def test_bulk_deletes_update_each_row_once(self):
+        inquiries = [make_inquiry(region=f'Region {index % 2}') for index in range(6)]
+        for inquiry in inquiries:
+            generate(inquiry)
+        with record_queries() as recorder:
+            PropertyEstimate.objects.filter(inquiry__in=inquiries[:2]).delete()
+        assert sum(query.sql.startswith('SELECT "main_app_regionalstatistic"') for query in recorder.queries) == 2
+        assert sorted(RegionalStatistic.objects.values_list('estimate_count', flat=True)) == [2, 2]
+
+        with record_queries() as recorder:
+            PropertyInquiry.objects.all().delete()
+        assert sum(query.sql.startswith('SELECT "main_app_regionalstatistic"') for query in recorder.queries) == 2
+        assert not RegionalStatistic.objects.exists()
+
+    def test_failed_statistics_update_rolls_back_the_estimate(self):
+        inquiry = make_inquiry()
+        with patch('main_app.estimates.apply_samples', side_effect=RuntimeError('stats unavailable')):
+            with pytest.raises(Exception):
+                generate(inquiry)
+        assert not PropertyEstimate.objects.exists()
+        assert not RegionalStatistic.objects.exists()
+
+    def test_rekey_merges_rows_of_one_canonical_region(self):
+        # Before the gazetteer is loaded rows are keyed by normalized text
+        generate(make_inquiry('Sonoma, CA'))
+        generate(make_inquiry('Sonoma County'), scale=2)
+        generate(make_inquiry('Nowhere'))
+        assert RegionalStatistic.objects.count() == 3
+
+        load_gazetteer()
+        try:
+            assert rekey_statistics() == 2
+        finally:
+            invalidate_region_index()
+        stat = RegionalStatistic.objects.get(region_key='sonoma county')
+        assert (stat.region, stat.estimate_count) == ('Sonoma County', 2)
+        assert QuantileSketch.from_dict(stat.sketches['revenue_per_acre']).count == 2
+
+    def test_samples_follow_the_stored_region(self):
+        """A later alias does not move counted estimates; backfill_regions moves them with their inquiries"""
+        flats, kept = make_inquiry('Zzyzx Flats'), make_inquiry('Zzyzx Flats')
+        generate(flats)
+        generate(kept)
+        region = Region.objects.create(name='Zzyzx Valley')
+        RegionAlias.objects.create(region=region, key='zzyzx flats')
+        try:
+            PropertyEstimate.objects.filter(inquiry=flats).delete()
+            assert list(RegionalStatistic.objects.values_list('region_key', 'estimate_count')) == [('zzyzx flats', 1)]
+
+            call_command('backfill_regions', '--skip-gazetteer', stdout=io.StringIO())
+            assert list(RegionalStatistic.objects.values_list('region_key', 'estimate_count')) == [('zzyzx valley', 1)]
+            kept.delete()
+            assert not RegionalStatistic.objects.exists()
+        finally:
+            invalidate_region_index()
+
+    def test_region_admin_refreshes_statistics(self, admin_client):
+        generate(make_inquiry('Zzyzx Flats'))
+        region = Region.objects.create(name='Zzyzx Valley')
+        with patch('main_app.admin.submit_background', side_effect=lambda func: func()):
+            response = admin_client.post(reverse('admin:main_app_region_change', args=[region.id]), {
+                'key': region.key, 'name': region.name, 'country': '', 'latitude': '', 'longitude': '',
+                'created_at_0': '2026-01-01', 'created_at_1': '00:00:00',
+                'aliases-TOTAL_FORMS': '1', 'aliases-INITIAL_FORMS': '0',
+                'aliases-0-key': 'Zzyzx Flats', 'aliases-0-region': region.id,
+            })
+        invalidate_region_index()
+        assert response.status_code == 302
+        assert PropertyInquiry.objects.get().region_ref == region
+        assert list(RegionalStatistic.objects.values_list('region_key', 'estimate_count')) == [('zzyzx valley', 1)]
+
+    def test_rebuild_matches_incremental(self):
+        for index in range(6):
+            inquiry = make_inquiry(region=f'Region {index % 2}', lot_size=3 + index * 40)
+            generate(inquiry, scale=1 + index)
+        generate(inquiry, scale=10)
+        incremental = {
+            (stat.region_key, stat.lot_size_bucket): (stat.estimate_count, stat.sketches)
+            for stat in RegionalStatistic.objects.all()
+        }
+
+        call_command('rebuild_regional_statistics', stdout=io.StringIO())
+        rebuilt = {
+            (stat.region_key, stat.lot_size_bucket): (stat.estimate_count, stat.sketches)
+            for stat in RegionalStatistic.objects.all()
+        }
+        assert rebuilt.keys() == incremental.keys()
+        for key, (count, sketches) in rebuilt.items():
+            assert count == incremental[key][0]
+            for metric, sketch in sketches.items():
+                assert sketch['p'] == incremental[key][1][metric]['p']
+
+
+@pytest.mark.django_db(transaction=True)
+class TestRegionalStatisticsAPI:
+    """Test cases for the read-only endpoint and admin"""
+
+    @pytest.fixture(autouse=True)
+    def data(self, settings):
+        settings.PARTNER_API_KEYS = [API_KEY]
+        generate(make_inquiry('Oregon', lot_size=10))
+        generate(make_inquiry('Oregon', lot_size=200), scale=3)
+        generate(make_inquiry('Texas', lot_size=10))
+
+    def get(self, **params):
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {API_KEY}')
+        return client.get(reverse('main_app:regional_statistics'), params)
+
+    def test_requires_access(self):
+        assert Client().get(reverse('main_app:regional_statistics')).status_code == 401
+
+    def test_regions_with_buckets_and_merged_totals(self, settings):
+        with assert_query_budget(settings.QUERY_BUDGETS['main_app:regional_statistics']):
+            response = self.get()
+        assert response.status_code == 200
+        assert 'max-age=60' in response['Cache-Control']
+        results = {entry['region_key']: entry for entry in response.json()['results']}
+        oregon = results['oregon']
+        assert oregon['estimate_count'] == 2
+        assert [bucket['lot_size_bucket'] for bucket in oregon['buckets']] == ['5-20', '100-500']
+        assert set(oregon['metrics']) == {'revenue_per_acre', 'cost_per_acre', 'confidence_score', 'processing_time'}
+        assert set(oregon['metrics']['confidence_score']) == {'mean', 'p25', 'p50', 'p75', 'p90'}
+
+    def test_region_and_percentile_parameters(self):
+        results = self.get(region=' TEXAS', percentiles='50,99').json()['results']
+        assert [entry['region'] for entry in results] == ['Texas']
+        assert set(results[0]['metrics']['revenue_per_acre']) == {'mean', 'p50', 'p99'}
+        assert self.get(percentiles='x').status_code == 400
+        assert self.get(percentiles='120').status_code == 400
+
+    def test_admin_changelist(self, admin_client):
+        response = admin_client.get(reverse('admin:main_app_regionalstatistic_changelist'))
+        assert response.status_code == 200
+        assert b'Oregon' in response.content
+        assert regional_statistics('oregon')[0]['estimate_count'] == 2
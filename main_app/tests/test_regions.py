@@ -0,0 +1,135 @@
+"""
+Tests for canonical region resolution and the region backfill.
+"""
+
+import io
+import time
+
+import pytest
+from django.core.management import call_command
+
+from main_app.importers import import_inquiries
+from main_app.models import PropertyInquiry, Region, RegionAlias
+from main_app.regions import (
+    RegionIndex,
+    ResolvedRegion,
+    invalidate_region_index,
+    load_gazetteer,
+    normalize_region,
+    read_gazetteer,
+    resolve_region,
+)
+
+
+@pytest.fixture(scope='module')
+def gazetteer_index():
+    """Index over the bundled gazetteer without touching the database"""
+    rows = read_gazetteer()
+    regions = {pk: ResolvedRegion(pk, normalize_region(name), name) for pk, (name, *_) in enumerate(rows)}
+    aliases = [(normalize_region(alias), pk) for pk, (_, _, names, *_) in enumerate(rows) for alias in names]
+    return RegionIndex(regions, aliases)
+
+
+@pytest.fixture
+def gazetteer(db):
+    load_gazetteer()
+    yield
+    # Rolled-back regions must not linger in the process-wide index
+    invalidate_region_index()
+
+
+def inquiry_data(region):
+    return {
+        'address': '1 Region Road', 'lot_size': 10, 'lot_size_unit': 'acres', 'current_property': 'Pasture',
+        'property_goals': 'Trees', 'investment_capacity': '$10,000', 'preferences_concerns': 'None',
+        'region': region,
+    }
+
+
+class TestRegionIndex:
+    """Test cases for normalization and trie lookups"""
+
+    @pytest.mark.parametrize('text, expected', [
+        ('Sonoma, CA', 'Sonoma County'),
+        ('sonoma county california', 'Sonoma County'),
+        ('  SONOMA   County. ', 'Sonoma County'),
+        ('Portland, OR', 'Oregon'),
+        ('Property in Sonoma', 'Sonoma County'),
+        ('123 Farm Road, Napa, CA', 'Napa Valley'),
+        ('New York', 'New York'),
+        ('upstate ny', 'Upstate New York'),
+        ('Île-de-France', 'Île-de-France'),
+        ('Northern California', 'Northern California'),
+        ('NorCal', 'Northern California'),
+        ('NSW', 'New South Wales'),
+    ])
+    def test_resolves_variants(self, gazetteer_index, text, expected):
+        assert gazetteer_index.resolve(text).name == expected
+
+    @pytest.mark.parametrize('text', ['', 'Unknown Region', 'in or near the farm', 'Region 1'])
+    def test_unrecognized(self, gazetteer_index, text):
+        assert gazetteer_index.resolve(text) is None
+
+    def test_lookup_costs_microseconds(self, gazetteer_index):
+        texts = [f'{number} Orchard Lane, Sonoma County, California' for number in range(2000)]
+        started = time.perf_counter()
+        for text in texts:
+            gazetteer_index.resolve(text)
+        assert (time.perf_counter() - started) / len(texts) < 200e-6
+
+
+@pytest.mark.django_db
+class TestRegionAssignment:
+    """Test cases for region_ref on saved and imported inquiries"""
+
+    def test_gazetteer_load_is_idempotent(self, gazetteer):
+        assert Region.objects.filter(name='Sonoma County', country='US').exists()
+        assert RegionAlias.objects.get(key='sonoma ca').region.name == 'Sonoma County'
+        assert load_gazetteer() == (0, 0)
+
+    def test_keys_are_normalized_on_save(self, gazetteer):
+        region = Region.objects.create(name="Ngā Puna", key="  Ngā  PUNA's ")
+        alias = RegionAlias.objects.create(region=region, key='Nga-Puna, NZ')
+        assert (region.key, alias.key) == ('nga puna s', 'nga puna nz')
+        assert Region.objects.create(name='Côte Fictive').key == 'cote fictive'
+        assert resolve_region('nga puna, nz').name == 'Ngā Puna'
+
+    def test_saved_inquiries_get_region_ref(self, gazetteer):
+        inquiry = PropertyInquiry.objects.create(**inquiry_data('sonoma, ca'))
+        assert inquiry.region_ref.name == 'Sonoma County'
+        unknown = PropertyInquiry.objects.create(**inquiry_data('Somewhere Else'))
+        assert unknown.region_ref is None
+
+        inquiry.region = 'Napa'
+        inquiry.save()
+        assert PropertyInquiry.objects.get(id=inquiry.id).region_ref.name == 'Napa Valley'
+
+    def test_imported_inquiries_get_region_ref(self, gazetteer):
+        report = import_inquiries([(1, inquiry_data('Willamette Valley, OR')), (2, inquiry_data('Nowhere'))])
+        refs = dict(PropertyInquiry.objects.filter(id__in=report.inquiry_ids).values_list('region', 'region_ref__name'))
+        assert refs == {'Willamette Valley, OR': 'Willamette Valley', 'Nowhere': None}
+
+    def test_new_alias_is_used_immediately(self, gazetteer):
+        assert resolve_region('Wine Country') is None
+        region = Region.objects.get(name='Napa Valley')
+        alias = RegionAlias(region=region, key='  Wine-Country ')
+        alias.full_clean()
+        alias.save()
+        assert resolve_region('wine country').name == 'Napa Valley'
+
+    def test_backfill(self, gazetteer):
+        PropertyInquiry.objects.bulk_create([
+            PropertyInquiry(**inquiry_data(region)) for region in ('Sonoma, CA', 'Hill Country', 'Wine Country')
+        ])
+        call_command('backfill_regions', stdout=io.StringIO())
+        refs = dict(PropertyInquiry.objects.values_list('region', 'region_ref__name'))
+        assert refs == {'Sonoma, CA': 'Sonoma County', 'Hill Country': 'Texas Hill Country', 'Wine Country': None}
+
+        RegionAlias.objects.create(region=Region.objects.get(name='Napa Valley'), key='wine country')
+        call_command('backfill_regions', '--chunk-size', '1', stdout=io.StringIO())
+        assert PropertyInquiry.objects.get(region='Wine Country').region_ref.name == 'Napa Valley'
+
+        # --all re-resolves rows whose alias now points elsewhere
+        RegionAlias.objects.filter(key='hill country').update(region=Region.objects.get(name='Texas'))
+        call_command('backfill_regions', '--all', '--skip-gazetteer', stdout=io.StringIO())
+        assert PropertyInquiry.objects.get(region='Hill Country').region_ref.name == 'Texas'
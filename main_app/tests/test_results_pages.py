@@ -0,0 +1,164 @@
+"""
+Tests for the pre-rendered estimate results pages.
+"""
+
+import gzip
+import os
+from unittest.mock import patch
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from django.utils.http import http_date
+
+from main_app.ai_service import ValoraEarthAIService
+from main_app.estimates import inquiry_request_for, persist_estimate
+from main_app.management.commands.benchmark_estimate_flow import canned_analysis_result
+from main_app.models import PropertyEstimate, PropertyInquiry
+from main_app.compression import compress
+from main_app.results_pages import page_path, read_page, variant_path
+from main_app.utils.query_instrumentation import assert_query_budget
+
+
+@pytest.fixture
+def inquiry():
+    return PropertyInquiry.objects.create(
+        address="1 Static Street", lot_size=10, lot_size_unit='acres', current_property="Pasture",
+        property_goals="Trees", investment_capacity="$10,000", preferences_concerns="None", region="Oregon",
+    )
+
+
+def generate(inquiry, project_name):
+    request = inquiry_request_for(inquiry)
+    result = canned_analysis_result(request)
+    result.estimate.project_name = project_name
+    estimate, _ = async_to_sync(persist_estimate)(inquiry, request, result)
+    return estimate
+
+
+def results_url(inquiry):
+    return reverse('main_app:estimate_results', args=[inquiry.id])
+
+
+@pytest.mark.django_db
+class TestResultsPages:
+    """Test cases for storing and serving pre-rendered results pages"""
+
+    def test_generation_stores_page(self, inquiry):
+        estimate = generate(inquiry, "Stored Project")
+        page = read_page(inquiry.id)
+        assert b"Stored Project" in page.html()
+        assert page.last_modified == estimate.updated_at.timestamp()
+
+        with assert_query_budget(0):
+            response = Client().get(results_url(inquiry))
+        assert response.status_code == 200
+        assert b"Stored Project" in response.content
+        assert response['ETag'] == page.etag
+        assert response['Last-Modified'] == http_date(page.last_modified)
+        assert 'no-cache' in response['Cache-Control']
+
+    def test_gzip_representation(self, inquiry):
+        generate(inquiry, "Gzipped Project")
+        page = read_page(inquiry.id)
+        response = Client().get(results_url(inquiry), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        assert response['Content-Encoding'] == 'gzip'
+        assert b"Gzipped Project" in gzip.decompress(response.content)
+        assert response['ETag'] == page.gzip_etag != page.etag
+        assert 'Accept-Encoding' in response['Vary']
+
+    def test_brotli_variant_compressed_once(self, inquiry):
+        brotli = pytest.importorskip('brotli')
+        generate(inquiry, "Brotli Project")
+        page = read_page(inquiry.id)
+        with patch('main_app.results_pages.compress', wraps=compress) as compressor:
+            for _ in range(3):
+                response = Client().get(results_url(inquiry), HTTP_ACCEPT_ENCODING='gzip, br')
+                assert response['Content-Encoding'] == 'br'
+                assert brotli.decompress(response.content) == page.html()
+        assert compressor.call_count == 1
+        assert response['ETag'] == page.encoded_etag('br')
+        # Refused encodings are not sent
+        response = Client().get(results_url(inquiry), HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0')
+        assert not response.has_header('Content-Encoding')
+
+        # A regenerated page gets a new variant
+        generate(inquiry, "Brotli Project 2")
+        response = Client().get(results_url(inquiry), HTTP_ACCEPT_ENCODING='br')
+        assert b"Brotli Project 2" in brotli.decompress(response.content)
+        call_command('clear_results_pages', stdout=open(os.devnull, 'w'))
+        assert not variant_path(inquiry.id).exists()
+
+    def test_conditional_get(self, inquiry):
+        generate(inquiry, "Cached Project")
+        first = Client().get(results_url(inquiry))
+        response = Client().get(results_url(inquiry), HTTP_IF_NONE_MATCH=first['ETag'])
+        assert response.status_code == 304
+        assert response.content == b''
+        assert response['ETag'] == first['ETag']
+
+        response = Client().get(results_url(inquiry), HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        assert response.status_code == 304
+        # The other representation's ETag does not match
+        response = Client().get(results_url(inquiry), HTTP_IF_NONE_MATCH=first['ETag'], HTTP_ACCEPT_ENCODING='gzip')
+        assert response.status_code == 200
+
+    def test_pinned_url_is_immutable(self, inquiry):
+        generate(inquiry, "Pinned Project")
+        page = read_page(inquiry.id)
+        response = Client().get(results_url(inquiry), {'v': page.version})
+        assert 'immutable' in response['Cache-Control']
+        assert f"max-age={settings.RESULTS_PAGE_MAX_AGE}" in response['Cache-Control']
+        # A stale version is served the current page, revalidated
+        response = Client().get(results_url(inquiry), {'v': 'stale'})
+        assert 'immutable' not in response['Cache-Control']
+
+    def test_regeneration_replaces_page(self, inquiry):
+        generate(inquiry, "First Project")
+        old = read_page(inquiry.id)
+        generate(inquiry, "Second Project")
+        page = read_page(inquiry.id)
+        assert page.etag != old.etag
+        response = Client().get(results_url(inquiry), HTTP_IF_NONE_MATCH=old.etag)
+        assert response.status_code == 200
+        assert b"Second Project" in response.content
+
+    def test_edits_delete_page(self, inquiry):
+        estimate = generate(inquiry, "Edited Project")
+        estimate = PropertyEstimate.objects.get(id=estimate.id)
+        estimate.project_name = "Renamed Project"
+        estimate.save()
+        assert read_page(inquiry.id) is None
+
+        # The next view renders and stores the page again
+        response = Client().get(results_url(inquiry))
+        assert b"Renamed Project" in response.content
+        assert b"Renamed Project" in read_page(inquiry.id).html()
+
+        path = page_path(inquiry.id)
+        inquiry.delete()
+        assert not path.exists()
+
+    def test_page_without_estimate_not_stored(self, inquiry):
+        response = Client().get(results_url(inquiry))
+        assert response.status_code == 200
+        assert read_page(inquiry.id) is None
+        assert 'ETag' not in response
+
+    def test_generate_response_links_pinned_page(self, inquiry):
+        async def fake_generate(service, inquiry_request, progress=None):
+            return canned_analysis_result(inquiry_request)
+
+        with patch.object(ValoraEarthAIService, '__init__', lambda service: None), \
+                patch.object(ValoraEarthAIService, 'generate_property_estimate_async', fake_generate):
+            response = Client().post(reverse('main_app:generate_ai_estimate', args=[inquiry.id]))
+        assert response.json()['results_url'] == f"{results_url(inquiry)}?v={read_page(inquiry.id).version}"
+
+    def test_clear_command(self, inquiry):
+        generate(inquiry, "Cleared Project")
+        call_command('clear_results_pages')
+        assert read_page(inquiry.id) is None
+        assert b"Cleared Project" in Client().get(results_url(inquiry)).content
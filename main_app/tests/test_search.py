@@ -0,0 +1,147 @@
+"""
+Tests for the full-text search index, backends, admin integration and API.
+"""
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from main_app.models import PropertyEstimate, PropertyInquiry
+from main_app.search import (
+    SearchBackend,
+    SQLiteFTSBackend,
+    get_search_backend,
+    install_search_index,
+    search_inquiries,
+)
+
+
+def make_inquiry(address, region="Northern California", goals="Grow vegetables", **kwargs):
+    return PropertyInquiry.objects.create(
+        address=address,
+        lot_size=10,
+        current_property=kwargs.get('current_property', "Open pasture"),
+        property_goals=goals,
+        investment_capacity="$50,000",
+        preferences_concerns="Low water use",
+        region=region,
+    )
+
+
+def make_estimate(inquiry, project_name, description="Regenerative plan"):
+    return PropertyEstimate.objects.create(
+        inquiry=inquiry, project_name=project_name, project_description=description,
+        confidence_score=0.8, factors_considered=[], recommendations=[], timeline="3 years",
+        risk_assessment="Low", ai_response_raw={}, processing_time=1.0,
+    )
+
+
+@pytest.fixture
+def fts():
+    install_search_index(connection)
+
+
+@pytest.fixture
+def inquiries(fts):
+    orchard = make_inquiry("1 Orchard Way", goals="Plant a walnut orchard with agroforestry alleys")
+    vineyard = make_inquiry("2 Vine Street", region="Oregon", goals="Convert the vineyard to silvopasture")
+    pasture = make_inquiry("3 Meadow Road", region="Texas", goals="Rotational grazing")
+    make_estimate(pasture, "Texas Carbon Ranch", "Soil carbon sequestration through adaptive grazing")
+    return orchard, vineyard, pasture
+
+
+@pytest.mark.django_db
+class TestSQLiteFTSBackend:
+    """Test cases for the FTS5 index and its triggers"""
+
+    def test_backend_selected_when_index_exists(self, fts):
+        assert isinstance(get_search_backend(), SQLiteFTSBackend)
+
+    def test_fallback_without_index(self):
+        assert type(get_search_backend()) is SearchBackend
+
+    def test_matches_answers_with_prefixes_and_stemming(self, inquiries):
+        orchard, vineyard, _ = inquiries
+        backend = get_search_backend()
+        assert [hit.inquiry_id for hit in backend.search("agrofor")] == [orchard.id]
+        assert [hit.inquiry_id for hit in backend.search("orchards")] == [orchard.id]
+        assert [hit.inquiry_id for hit in backend.search("oregon silvopasture")] == [vineyard.id]
+
+    def test_estimate_fields_indexed_by_trigger(self, inquiries):
+        _, _, pasture = inquiries
+        backend = get_search_backend()
+        assert [hit.inquiry_id for hit in backend.search("sequestration")] == [pasture.id]
+
+        estimate = pasture.estimate
+        estimate.project_name = "Prairie Restoration"
+        estimate.save()
+        assert [hit.inquiry_id for hit in backend.search("prairie")] == [pasture.id]
+        assert backend.search("ranch") == []
+
+        estimate.delete()
+        assert backend.search("prairie") == []
+
+    def test_update_and_delete_triggers(self, inquiries):
+        orchard, _, _ = inquiries
+        backend = get_search_backend()
+        orchard.property_goals = "Pollinator meadow"
+        orchard.save()
+        assert backend.search("walnut") == []
+        assert [hit.inquiry_id for hit in backend.search("pollinator")] == [orchard.id]
+
+        orchard.delete()
+        assert backend.search("pollinator") == []
+
+    def test_ranking_prefers_address_matches(self, fts):
+        in_answer = make_inquiry("9 Other Lane", goals="Something about a meadow")
+        in_address = make_inquiry("5 Meadow Lane")
+        hits = get_search_backend().search("meadow")
+        assert [hit.inquiry_id for hit in hits] == [in_address.id, in_answer.id]
+
+    def test_operators_in_input_are_neutralised(self, inquiries):
+        assert get_search_backend().search('"walnut" OR NEAR(* -') == get_search_backend().search('walnut near')
+
+    def test_backfills_existing_rows(self):
+        existing = make_inquiry("7 Backfill Court")
+        install_search_index(connection)
+        assert [hit.inquiry_id for hit in get_search_backend().search("backfill")] == [existing.id]
+
+
+@pytest.mark.django_db
+def test_icontains_fallback_matches_estimate_fields():
+    pasture = make_inquiry("3 Meadow Road")
+    make_estimate(pasture, "Texas Carbon Ranch")
+    make_inquiry("4 Elsewhere")
+    assert [hit.inquiry_id for hit in SearchBackend().search("carbon meadow")] == [pasture.id]
+
+
+@pytest.mark.django_db
+class TestSearchIntegration:
+    """Test cases for the admin search box and the search API"""
+
+    def test_admin_changelist_uses_index(self, admin_client, inquiries):
+        orchard, _, pasture = inquiries
+        response = admin_client.get(reverse('admin:main_app_propertyinquiry_changelist'), {'q': 'walnut'})
+        assert [obj.pk for obj in response.context['cl'].result_list] == [orchard.pk]
+
+        response = admin_client.get(reverse('admin:main_app_propertyestimate_changelist'), {'q': 'meadow'})
+        assert [obj.inquiry_id for obj in response.context['cl'].result_list] == [pasture.pk]
+
+    def test_search_api(self, admin_client, inquiries):
+        _, _, pasture = inquiries
+        response = admin_client.get(reverse('main_app:search_api'), {'q': 'texas'})
+        data = response.json()
+        assert data['backend'] == 'sqlite_fts5'
+        assert [result['id'] for result in data['results']] == [pasture.id]
+        assert data['results'][0]['project_name'] == "Texas Carbon Ranch"
+
+    def test_search_api_requires_staff(self, inquiries):
+        assert Client().get(reverse('main_app:search_api'), {'q': 'texas'}).status_code == 302
+
+    def test_search_api_invalid_limit(self, admin_client):
+        assert admin_client.get(reverse('main_app:search_api'), {'q': 'x', 'limit': 'ten'}).status_code == 400
+
+    def test_empty_query(self, inquiries):
+        results, _, _ = search_inquiries('  ')
+        assert results == []
@@ -0,0 +1,123 @@
+"""
+Tests for the session store profiles and the questionnaire flow's database writes.
+"""
+
+import random
+from unittest.mock import patch
+
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from main_app.ai_service import ValoraEarthAIService
+from main_app.management.commands.benchmark_estimate_flow import canned_analysis_result
+from main_app.models import PropertyEstimate, PropertyInquiry
+from main_app.utils.query_instrumentation import record_queries
+from django.conf import settings as django_settings
+
+from valora_earth.session_config import SESSION_COOKIE_MAX_BYTES, SESSION_ENGINES, cache_config, session_engine
+
+ANSWERS = ["Pasture with some oaks", "Agroforestry", "$100,000", "Keep the pond"]
+
+
+class TestSessionConfig:
+    """Test cases for SESSION_STORE and SESSION_CACHE_URL"""
+
+    def test_default_is_cookie(self):
+        assert session_engine({}) == 'django.contrib.sessions.backends.signed_cookies'
+
+    def test_stores(self):
+        assert session_engine({'SESSION_STORE': 'Cache'}) == 'django.contrib.sessions.backends.cache'
+        assert session_engine({'SESSION_STORE': 'db'}) == 'django.contrib.sessions.backends.db'
+        with pytest.raises(ValueError):
+            session_engine({'SESSION_STORE': 'file'})
+
+    def test_session_cache(self):
+        assert cache_config({})['sessions']['BACKEND'].endswith('LocMemCache')
+        sessions = cache_config({'SESSION_CACHE_URL': 'redis://cache:6379/1'})['sessions']
+        assert sessions == {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/1'}
+
+
+def complete_questionnaire(client):
+    """Landing page, the four steps, the loading screen and the estimate; the inquiry created"""
+    client.post(reverse('main_app:index'), {'lot_size': '12', 'region': 'Oregon', 'lot_size_unit': 'acres'})
+    url = reverse('main_app:estimate_questionnaire')
+    for step, answer in enumerate(ANSWERS, start=1):
+        client.get(url, {'step': step})
+        client.post(f"{url}?step={step}", {'answer': answer})
+    assert client.get(reverse('main_app:loading_screen')).status_code == 200
+    inquiry = PropertyInquiry.objects.get()
+
+    async def fake_generate(service, inquiry_request, progress=None):
+        return canned_analysis_result(inquiry_request)
+
+    with patch.object(ValoraEarthAIService, '__init__', lambda service: None), \
+            patch.object(ValoraEarthAIService, 'generate_property_estimate_async', fake_generate):
+        assert client.post(reverse('main_app:generate_ai_estimate', args=[inquiry.id])).status_code == 200
+    return inquiry
+
+
+def session_writes(queries):
+    return [
+        query for query in queries
+        if 'django_session' in query.sql and query.sql.split(None, 1)[0] in ('INSERT', 'UPDATE', 'DELETE')
+    ]
+
+
+@pytest.mark.django_db
+class TestQuestionnaireSessions:
+    """Test cases for the questionnaire flow with each session store"""
+
+    @pytest.mark.parametrize('store', ['cookie', 'cache'])
+    def test_flow_writes_no_sessions(self, settings, store):
+        settings.SESSION_ENGINE = SESSION_ENGINES[store]
+        client = Client()
+        with record_queries() as recorder:
+            inquiry = complete_questionnaire(client)
+        assert not any('django_session' in query.sql for query in recorder.queries)
+        assert PropertyEstimate.objects.filter(inquiry=inquiry).exists()
+        assert inquiry.preferences_concerns == ANSWERS[3]
+        # The flow's keys are cleared once the estimate exists
+        assert 'initial_data' not in client.session
+
+    def test_db_store_saves_once_per_request(self, settings):
+        settings.SESSION_ENGINE = SESSION_ENGINES['db']
+        with record_queries() as recorder:
+            complete_questionnaire(Client())
+        # Landing page, four steps and the estimate's clean-up (its four pops in one save)
+        assert len(session_writes(recorder.queries)) == 6
+
+    def test_long_answers_rejected(self, settings):
+        client = Client()
+        client.post(reverse('main_app:index'), {'lot_size': '12', 'region': 'Oregon', 'lot_size_unit': 'acres'})
+        url = reverse('main_app:estimate_questionnaire')
+        response = client.post(f"{url}?step=1", {'answer': 'x' * 1001})
+        assert response.status_code == 200
+        assert 'questionnaire_answers' not in client.session
+        assert b'maxlength="1000"' in response.content
+
+    def test_cookie_stays_under_the_limit(self):
+        """Answers at the length cap in CJK text, which the cookie's JSON escapes to six bytes a character"""
+        generator = random.Random(0)
+        answers = [''.join(chr(0x4e00 + generator.randrange(20000)) for _ in range(1000)) for _ in range(4)]
+        client = Client()
+        client.post(reverse('main_app:index'), {'lot_size': '12', 'region': 'Oregon', 'lot_size_unit': 'acres'})
+        url = reverse('main_app:estimate_questionnaire')
+        for step, answer in enumerate(answers, start=1):
+            response = client.post(f"{url}?step={step}", {'answer': answer})
+            if response.status_code == 200:
+                break
+            assert len(response.cookies[django_settings.SESSION_COOKIE_NAME].value) <= SESSION_COOKIE_MAX_BYTES
+        # Refused with a message instead of a cookie the browser would drop; earlier answers are kept
+        assert response.status_code == 200 and b'too long to keep between steps' in response.content
+        assert len(client.session.get('questionnaire_answers', {})) == step - 1
+        short = client.post(f"{url}?step={step}", {'answer': answers[step - 1][:100]})
+        assert short.status_code == 302
+
+        # All four at once go straight to the inquiry
+        response = client.post(reverse('main_app:submit_questionnaire'), dict(zip(
+            ('current_property', 'property_goals', 'investment_capacity', 'preferences_concerns'), answers
+        )))
+        assert response.status_code == 201
+        assert len(response.cookies[django_settings.SESSION_COOKIE_NAME].value) <= SESSION_COOKIE_MAX_BYTES
+        assert 'questionnaire_answers' not in client.session
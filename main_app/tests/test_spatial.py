@@ -0,0 +1,262 @@
+"""
+Tests for coordinates, geohashes and the comparable-property index.
+"""
+
+import io
+import math
+import random
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from main_app.importers import import_inquiries
+from main_app.models import PropertyEstimate, PropertyInquiry, Region
+from main_app.regions import invalidate_region_index, load_gazetteer
+from main_app.spatial import (
+    SQLiteRTreeBackend,
+    SpatialBackend,
+    Target,
+    covering_cells,
+    find_comparables,
+    get_spatial_backend,
+    install_spatial_index,
+)
+from main_app.utils.geo import EARTH_RADIUS_KM, bounding_boxes, geohash_decode, geohash_encode, haversine_km
+from main_app.utils.query_instrumentation import assert_query_budget
+
+API_KEY = 'partner-test-key'
+
+
+def make_inquiry(latitude=None, longitude=None, lot_size=10, unit='acres', region='Somewhere'):
+    return PropertyInquiry.objects.create(
+        address="1 Map Road", lot_size=lot_size, lot_size_unit=unit, current_property="Pasture",
+        property_goals="Trees", investment_capacity="$10,000", preferences_concerns="None",
+        region=region, latitude=latitude, longitude=longitude,
+    )
+
+
+def make_estimate(inquiry):
+    return PropertyEstimate.objects.create(
+        inquiry=inquiry, project_name=f"Project {inquiry.id}", project_description="Plan",
+        confidence_score=0.8, factors_considered=[], recommendations=[], timeline="3 years",
+        risk_assessment="Low", ai_response_raw={}, processing_time=1.0,
+    )
+
+
+def destination(latitude, longitude, bearing, distance_km):
+    """The point ``distance_km`` from a start point along a great circle"""
+    phi, lam, theta = math.radians(latitude), math.radians(longitude), math.radians(bearing)
+    delta = distance_km / EARTH_RADIUS_KM
+    phi2 = math.asin(math.sin(phi) * math.cos(delta) + math.cos(phi) * math.sin(delta) * math.cos(theta))
+    lam2 = lam + math.atan2(math.sin(theta) * math.sin(delta) * math.cos(phi),
+                            math.cos(delta) - math.sin(phi) * math.sin(phi2))
+    return math.degrees(phi2), (math.degrees(lam2) + 180) % 360 - 180
+
+
+def brute_force(target, points, k):
+    """Exact answer: every (id, latitude, longitude, acres) point ranked by haversine"""
+    ranked = sorted(
+        (haversine_km(target.latitude, target.longitude, lat, lon), pk)
+        for pk, lat, lon, acres in points
+        if pk != target.inquiry_id and target.min_acres <= acres <= target.max_acres
+    )
+    return [pk for _, pk in ranked[:k]]
+
+
+@pytest.fixture
+def rtree():
+    install_spatial_index(connection)
+
+
+@pytest.fixture
+def gazetteer(db):
+    load_gazetteer()
+    yield
+    invalidate_region_index()
+
+
+class TestGeo:
+    """Test cases for the pure geographic helpers"""
+
+    def test_geohash_round_trip(self):
+        assert geohash_encode(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+        latitude, longitude = geohash_decode(geohash_encode(-33.8688, 151.2093))
+        assert haversine_km(latitude, longitude, -33.8688, 151.2093) < 0.001
+
+    def test_haversine(self):
+        # Paris to London
+        assert haversine_km(48.8566, 2.3522, 51.5074, -0.1278) == pytest.approx(343.5, abs=1)
+
+    def test_bounding_boxes_wrap_the_antimeridian_and_poles(self):
+        assert len(bounding_boxes(0, 179.9, 50)) == 2
+        assert bounding_boxes(89.9, 0, 50) == [(pytest.approx(89.45, abs=0.01), 90.0, -180.0, 180.0)]
+
+    def test_covering_cells_contain_the_circle(self):
+        rng = random.Random(5)
+        for _ in range(500):
+            latitude, longitude, radius = rng.uniform(-70, 70), rng.uniform(-180, 180), rng.choice([1, 20, 300])
+            cells = covering_cells(latitude, longitude, radius)
+            point = destination(latitude, longitude, rng.uniform(0, 360), radius * 0.999)
+            assert any(geohash_encode(*point).startswith(cell) for cell in cells)
+
+
+@pytest.mark.django_db
+class TestPlacement:
+    """Test cases for coordinates derived from regions"""
+
+    def test_inquiry_without_coordinates_uses_region_centre(self, gazetteer):
+        oregon = Region.objects.get(name='Oregon')
+        inquiry = make_inquiry(region='Portland, OR')
+        assert (inquiry.latitude, inquiry.longitude) == (oregon.latitude, oregon.longitude)
+        assert inquiry.geohash == geohash_encode(oregon.latitude, oregon.longitude)
+
+        inquiry.region = 'Texas'
+        inquiry.save()
+        texas = Region.objects.get(name='Texas')
+        assert (inquiry.latitude, inquiry.longitude) == (texas.latitude, texas.longitude)
+
+    def test_submitted_coordinates_are_kept(self, gazetteer):
+        inquiry = make_inquiry(45.5, -122.6, region='Oregon')
+        inquiry.region = 'Texas'
+        inquiry.save()
+        assert (inquiry.latitude, inquiry.longitude) == (45.5, -122.6)
+        assert inquiry.geohash == geohash_encode(45.5, -122.6)
+        assert make_inquiry(region='Nowhere Known').geohash == ''
+
+    def test_import_and_backfill(self, gazetteer):
+        row = {'address': '1 Import Way', 'lot_size': 10, 'current_property': 'Pasture', 'property_goals': 'Trees',
+               'investment_capacity': '$1', 'preferences_concerns': 'None', 'region': 'Oregon'}
+        report = import_inquiries([
+            (1, {**row, 'latitude': '44.1', 'longitude': '-121.3'}), (2, row), (3, {**row, 'latitude': '91', 'longitude': '0'}),
+        ])
+        assert report.imported == 2 and report.errors[0].line == 3
+        located = PropertyInquiry.objects.filter(id__in=report.inquiry_ids).order_by('id')
+        assert [(inquiry.latitude, inquiry.geohash[:3]) for inquiry in located] == [
+            (44.1, geohash_encode(44.1, -121.3)[:3]), (Region.objects.get(name='Oregon').latitude, located[1].geohash[:3]),
+        ]
+
+        PropertyInquiry.objects.update(latitude=None, longitude=None, geohash='', region_ref=None)
+        call_command('backfill_regions', '--skip-gazetteer', stdout=io.StringIO())
+        assert not PropertyInquiry.objects.filter(latitude__isnull=True).exists()
+        assert PropertyInquiry.objects.filter(geohash='').count() == 0
+
+
+@pytest.mark.django_db
+class TestComparables:
+    """Test cases for the backends, checked against brute force"""
+
+    @pytest.fixture
+    def points(self, rtree):
+        rng = random.Random(11)
+        points = []
+        for _ in range(300):
+            # Clusters in California, near the antimeridian (Fiji) and in Norway
+            centre = rng.choice([(38.5, -122.5), (-17.8, 179.9), (69.0, 18.0)])
+            inquiry = make_inquiry(centre[0] + rng.gauss(0, 0.5), ((centre[1] + rng.gauss(0, 0.5) + 180) % 360) - 180,
+                                   lot_size=round(rng.lognormvariate(2.5, 1), 2), unit=rng.choice(['acres', 'hectares']))
+            make_estimate(inquiry)
+            acres = float(inquiry.lot_size) * (2.47105 if inquiry.lot_size_unit == 'hectares' else 1)
+            points.append((inquiry.id, inquiry.latitude, inquiry.longitude, acres))
+        return points
+
+    @pytest.mark.parametrize('backend_class', [SQLiteRTreeBackend, SpatialBackend])
+    def test_matches_brute_force(self, points, backend_class):
+        backend = backend_class()
+        for pk, latitude, longitude, acres in points[:40]:
+            for k, band in ((1, None), (10, 2.0), (25, 1.5)):
+                target = Target(pk, latitude, longitude)
+                if band:
+                    target.min_acres, target.max_acres = acres / band, acres * band
+                assert [comparable.inquiry_id for comparable in backend.search(target, k)] == brute_force(target, points, k)
+
+    def test_rtree_follows_writes(self, rtree):
+        target = make_inquiry(10.0, 10.0)
+        nearby = make_inquiry(10.01, 10.01)
+        backend = get_spatial_backend()
+        assert isinstance(backend, SQLiteRTreeBackend)
+        search = lambda: [comparable.inquiry_id for comparable in backend.search(Target(target.id, 10.0, 10.0), 5)]
+        assert search() == []
+
+        make_estimate(nearby)
+        assert search() == [nearby.id]
+        nearby.latitude = 50.0
+        nearby.save()
+        assert backend.search(Target(target.id, 50.0, 10.01), 1)[0].distance_km < 1
+        PropertyEstimate.objects.filter(inquiry=nearby).delete()
+        assert search() == []
+
+    def test_backfills_existing_rows(self):
+        existing = make_inquiry(1.0, 1.0)
+        make_estimate(existing)
+        install_spatial_index(connection)
+        assert [comparable.inquiry_id for comparable in get_spatial_backend().search(Target(0, 1.0, 1.0), 1)] == [existing.id]
+
+    def test_fallback_without_index(self):
+        assert type(get_spatial_backend()) is SpatialBackend
+
+    def test_find_comparables(self, rtree):
+        target = make_inquiry(40.0, -100.0, lot_size=10)
+        close_but_large = make_inquiry(40.001, -100.0, lot_size=100)
+        farther_similar = make_inquiry(40.1, -100.0, lot_size=4, unit='hectares')
+        for inquiry in (target, close_but_large, farther_similar):
+            make_estimate(inquiry)
+
+        results, backend, _ = find_comparables(target, k=5)
+        assert backend == 'sqlite_rtree'
+        assert [result['inquiry_id'] for result in results] == [farther_similar.id]
+        assert results[0]['lot_size_acres'] == pytest.approx(9.88)
+        assert results[0]['distance_km'] == pytest.approx(11.1, abs=0.1)
+        results, _, _ = find_comparables(target, k=5, band=None)
+        assert [result['inquiry_id'] for result in results] == [close_but_large.id, farther_similar.id]
+        assert find_comparables(make_inquiry(), k=5)[0] == []
+
+
+@pytest.mark.django_db
+class TestComparablesAPI:
+    """Test cases for the comparables endpoint"""
+
+    @pytest.fixture(autouse=True)
+    def data(self, settings, rtree):
+        settings.PARTNER_API_KEYS = [API_KEY]
+        self.target = make_estimate(make_inquiry(45.0, -120.0))
+        for offset in range(1, 13):
+            make_estimate(make_inquiry(45.0 + offset * 0.01, -120.0))
+
+    def get(self, estimate_id, **params):
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {API_KEY}')
+        return client.get(reverse('main_app:comparables', args=[estimate_id]), params)
+
+    def test_requires_access(self):
+        assert Client().get(reverse('main_app:comparables', args=[self.target.id])).status_code == 401
+
+    def test_nearest_first_within_budget(self, settings):
+        with assert_query_budget(settings.QUERY_BUDGETS['main_app:comparables']):
+            response = self.get(self.target.id, k=5)
+        assert response.status_code == 200
+        body = response.json()
+        assert body['backend'] == 'sqlite_rtree'
+        distances = [result['distance_km'] for result in body['results']]
+        assert len(distances) == 5 and distances == sorted(distances)
+        assert distances[0] == pytest.approx(1.11, abs=0.01)
+        assert 'max-age=60' in response['Cache-Control']
+
+    def test_widest_search_within_budget(self, settings):
+        """A lone property across the antimeridian: every radius is tried, two boxes from 512 km on"""
+        lonely = make_estimate(make_inquiry(0.0, 179.99))
+        across = make_estimate(make_inquiry(-30.0, -150.0))
+        with assert_query_budget(settings.QUERY_BUDGETS['main_app:comparables']):
+            response = self.get(lonely.id, k=5, band=0)
+        results = response.json()['results']
+        assert len(results) == 5
+        assert results[0]['estimate_id'] == across.id
+
+    def test_parameters(self):
+        assert len(self.get(self.target.id, k=500).json()['results']) == 12
+        assert len(self.get(self.target.id, band=0).json()['results']) == 10
+        assert self.get(self.target.id, k='x').status_code == 400
+        assert self.get(self.target.id, band='0.5').status_code == 400
+        assert self.get(self.target.id, band='nan').status_code == 400
+        assert self.get(999999).status_code == 404
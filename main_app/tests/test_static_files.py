@@ -0,0 +1,178 @@
+"""
+Tests for the production static files pipeline: hashed names, pre-compressed
+variants and serving from STATIC_ROOT.
+"""
+
+import gzip
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.files.storage import FileSystemStorage
+from django.http import Http404
+from django.test import RequestFactory
+
+from main_app.compression import ENCODINGS
+from main_app.middleware import CompressionMiddleware
+from main_app.static_files import CompressedManifestStaticFilesStorage, StaticFilesApplication, serve
+
+CSS = b'body { background: url("pattern.svg"); }\n' + b'.card { margin: 0 auto; padding: 1rem; }\n' * 200
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg">' + b'<path d="M0 0L10 10"/>' * 100 + b'</svg>'
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 20
+
+
+@pytest.fixture
+def collected(settings, tmp_path):
+    """collectstatic's post-processing of a few files into a temporary STATIC_ROOT"""
+    source_dir, root = tmp_path / 'static', tmp_path / 'staticfiles'
+    source_dir.mkdir()
+    for name, data in (('site.css', CSS), ('pattern.svg', SVG), ('logo.png', PNG), ('tiny.css', b'a{}')):
+        (source_dir / name).write_bytes(data)
+    settings.STATIC_ROOT = str(root)
+    storage = CompressedManifestStaticFilesStorage(location=str(root), base_url='/static/')
+    source = FileSystemStorage(location=str(source_dir))
+    paths = {}
+    for name in source.listdir('')[1]:
+        with source.open(name) as file:
+            storage.save(name, file)
+        paths[name] = (source, name)
+    processed = list(storage.post_process(paths))
+    assert not [error for _, _, error in processed if isinstance(error, Exception)]
+    return storage
+
+
+def get(path, **headers):
+    request = RequestFactory().get(f'/static/{path}', **{f'HTTP_{name.upper()}': value for name, value in headers.items()})
+    response = serve(request, path)
+    return response, b''.join(response.streaming_content)
+
+
+class TestCompressedManifestStorage:
+    """Test cases for collectstatic output"""
+
+    def test_hashed_names_and_variants(self, collected):
+        manifest = json.loads(open(collected.path('staticfiles.json')).read())
+        css = manifest['paths']['site.css']
+        assert css != 'site.css' and collected.exists(css)
+        # References inside CSS point at the hashed names
+        assert manifest['paths']['pattern.svg'].encode() in open(collected.path(css), 'rb').read()
+        assert collected.url('site.css') == f'/static/{css}'
+
+        assert gzip.decompress(open(collected.path(css + '.gz'), 'rb').read()) == open(collected.path(css), 'rb').read()
+        assert collected.exists(manifest['paths']['pattern.svg'] + '.gz')
+        if 'br' in ENCODINGS:
+            assert collected.exists(css + '.br')
+        # Binary and tiny files are not compressed
+        assert not collected.exists(manifest['paths']['logo.png'] + '.gz')
+        assert not collected.exists(manifest['paths']['tiny.css'] + '.gz')
+
+    def test_missing_file_keeps_its_name(self, collected):
+        # The page still renders; only the file 404s
+        assert collected.url('missing.jpg') == '/static/missing.jpg'
+
+
+class TestServe:
+    """Test cases for serving STATIC_ROOT"""
+
+    def test_hashed_file_is_immutable(self, collected):
+        css = collected.stored_name('site.css')
+        response, body = get(css, accept_encoding='gzip')
+        assert response.status_code == 200
+        assert response['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(body) == open(collected.path(css), 'rb').read()
+        assert response['Content-Type'] == 'text/css; charset=utf-8'
+        assert response['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert response['Vary'] == 'Accept-Encoding'
+        assert int(response['Content-Length']) == len(body)
+
+        response, body = get(css)
+        assert not response.has_header('Content-Encoding') and body == open(collected.path(css), 'rb').read()
+        # Unhashed names are revalidated
+        assert get('site.css')[0]['Cache-Control'] == 'public, no-cache'
+
+    def test_conditional_get(self, collected):
+        first, _ = get('site.css', accept_encoding='gzip')
+        response, body = get('site.css', accept_encoding='gzip', if_none_match=first['ETag'])
+        assert response.status_code == 304 and body == b''
+        # The gzip variant's ETag does not match the uncompressed file
+        assert get('site.css', if_none_match=first['ETag'])[0].status_code == 200
+        assert get('site.css', if_modified_since=first['Last-Modified'])[0].status_code == 304
+
+    def test_ranges(self, collected):
+        data = open(collected.path('logo.png'), 'rb').read()
+        response, body = get('logo.png', range='bytes=10-19')
+        assert response.status_code == 206 and body == data[10:20]
+        assert response['Content-Range'] == f'bytes 10-19/{len(data)}'
+        assert get('logo.png', range='bytes=-5')[1] == data[-5:]
+        assert get('logo.png', range=f'bytes=100-{len(data) * 2}')[1] == data[100:]
+
+        response, body = get('logo.png', range=f'bytes={len(data)}-')
+        assert response.status_code == 416 and response['Content-Range'] == f'bytes */{len(data)}'
+        # Ranges refer to the uncompressed file
+        response, body = get('site.css', range='bytes=0-3', accept_encoding='gzip')
+        assert response.status_code == 206 and body == b'body'
+        # A changed file (If-Range mismatch) is sent whole
+        response, body = get('logo.png', range='bytes=0-3', if_range='"stale"')
+        assert response.status_code == 200 and body == data
+
+    def test_not_compressed_again(self, collected):
+        def through_middleware(path, **headers):
+            request = RequestFactory().get(f'/static/{path}', **{f'HTTP_{name.upper()}': value for name, value in headers.items()})
+            response = CompressionMiddleware(lambda request: serve(request, path))(request)
+            return response, b''.join(response.streaming_content)
+
+        data = open(collected.path('site.css'), 'rb').read()
+        response, body = through_middleware('site.css', range='bytes=0-99', accept_encoding='gzip')
+        assert response.status_code == 206 and body == data[:100]
+        assert not response.has_header('Content-Encoding')
+        # Sent as stored: the pre-compressed variant, or the file itself when it has none
+        response, body = through_middleware('site.css', accept_encoding='gzip')
+        assert gzip.decompress(body) == data
+        response, body = through_middleware('tiny.css', accept_encoding='gzip')
+        assert body == b'a{}' and not response.has_header('Content-Encoding')
+
+    def test_missing(self, collected):
+        for path in ('nothing.css', '../staticfiles.json', '../../etc/passwd'):
+            with pytest.raises(Http404):
+                get(path)
+
+
+class TestStaticFilesApplication:
+    """Test cases for the ASGI static files layer"""
+
+    def call(self, path, headers=(), method='GET'):
+        messages = []
+
+        async def django(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b'django'})
+
+        async def send(message):
+            messages.append(message)
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        scope = {'type': 'http', 'method': method, 'path': path, 'headers': [
+            (name.encode(), value.encode()) for name, value in headers
+        ]}
+        async_to_sync(StaticFilesApplication(django))(scope, receive, send)
+        return messages[0], b''.join(message.get('body', b'') for message in messages[1:])
+
+    def test_serves_static(self, collected, monkeypatch):
+        monkeypatch.setattr('main_app.static_files.STATIC_CHUNK_SIZE', 1000)
+        css = collected.stored_name('site.css')
+        start, body = self.call(f'/static/{css}')
+        headers = dict(start['headers'])
+        assert start['status'] == 200 and body == open(collected.path(css), 'rb').read()
+        assert headers[b'cache-control'] == b'public, max-age=31536000, immutable'
+
+        start, body = self.call(f'/static/{css}', [('Accept-Encoding', 'gzip'), ('Range', 'bytes=0-3')])
+        assert start['status'] == 206 and body == b'body'
+        start, body = self.call(f'/static/{css}', method='HEAD')
+        assert start['status'] == 200 and body == b''
+
+    def test_passes_other_requests_on(self, collected):
+        assert self.call('/static/missing.css')[1] == b'django'
+        assert self.call('/estimate/')[1] == b'django'
+        assert self.call('/static/site.css', method='POST')[1] == b'django'
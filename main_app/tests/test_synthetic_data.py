@@ -0,0 +1,69 @@
+"""
+Tests for the generate_synthetic_data management command.
+"""
+
+import io
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from main_app.models import AIAnalysisLog, COST_CATEGORIES, EstimatePayload, PROJECTION_YEARS, PropertyEstimate, PropertyInquiry, REVENUE_CATEGORIES
+from main_app.utils.geo import geohash_encode
+
+pytest.importorskip('numpy')
+
+
+def generate(**options):
+    call_command('generate_synthetic_data', stdout=io.StringIO(), **options)
+
+
+@pytest.mark.django_db
+class TestGenerateSyntheticData:
+    """Test cases for synthetic data generation"""
+
+    def test_generates_requested_rows_in_chunks(self):
+        generate(inquiries=250, chunk_size=100, estimate_ratio=0.5)
+        assert PropertyInquiry.objects.count() == 250
+        estimates = PropertyEstimate.objects.count()
+        assert 75 < estimates < 175
+        # Every estimate has at least its successful analysis log, and its raw response
+        assert AIAnalysisLog.objects.filter(success=True).values('inquiry').distinct().count() >= estimates
+        assert EstimatePayload.objects.count() == estimates
+
+    def test_estimates_have_valid_series(self):
+        generate(inquiries=50, estimate_ratio=1)
+        for estimate in PropertyEstimate.objects.all():
+            assert len(estimate.cash_flow_projection) == PROJECTION_YEARS
+            assert tuple(estimate.revenue_breakdown) == REVENUE_CATEGORIES
+            assert tuple(estimate.cost_breakdown) == COST_CATEGORIES
+            assert all(len(series) == PROJECTION_YEARS for series in estimate.revenue_breakdown.values())
+            revenue = sum(series[0] for series in estimate.revenue_breakdown.values())
+            costs = sum(series[0] for series in estimate.cost_breakdown.values())
+            assert estimate.cash_flow_projection[0] == pytest.approx(revenue - costs, abs=0.05)
+            assert 0 <= estimate.confidence_score <= 1
+            assert estimate.created_at >= estimate.inquiry.created_at
+
+    def test_same_seed_same_data(self):
+        generate(inquiries=30, seed=7)
+        first = list(PropertyInquiry.objects.order_by('id').values_list('address', 'lot_size', 'region'))
+        PropertyInquiry.objects.all().delete()
+        generate(inquiries=30, seed=7)
+        assert list(PropertyInquiry.objects.order_by('id').values_list('address', 'lot_size', 'region')) == first
+
+    def test_coordinates_and_geohashes(self):
+        generate(inquiries=200)
+        for latitude, longitude, geohash in PropertyInquiry.objects.values_list('latitude', 'longitude', 'geohash'):
+            assert -90 <= latitude <= 90 and -180 <= longitude <= 180
+            assert geohash == geohash_encode(latitude, longitude)
+
+    def test_region_skew(self):
+        generate(inquiries=1000, regions=20, region_skew=1.5)
+        regions = PropertyInquiry.objects.values_list('region', flat=True)
+        top = max(regions, key=list(regions).count)
+        assert list(regions).count(top) > 1000 / 20 * 3
+
+    def test_rejects_invalid_options(self):
+        with pytest.raises(CommandError):
+            generate(inquiries=0)
+        with pytest.raises(CommandError):
+            generate(estimate_ratio=1.5)
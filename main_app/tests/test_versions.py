@@ -0,0 +1,157 @@
+"""
+Tests for the delta-encoded estimate version history.
+"""
+
+from unittest.mock import patch
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import DatabaseError
+from django.test import Client
+from django.urls import reverse
+
+from main_app.estimates import inquiry_request_for, persist_estimate
+from main_app.management.commands.benchmark_estimate_flow import canned_analysis_result
+from main_app.models import EstimateVersion, PropertyEstimate, PropertyInquiry
+from main_app.utils.query_instrumentation import assert_query_budget, record_queries
+from main_app.versions import SNAPSHOT_INTERVAL, load_versions, version_json
+
+API_KEY = 'partner-test-key'
+
+
+@pytest.fixture(autouse=True)
+def partner_keys(settings):
+    settings.PARTNER_API_KEYS = [API_KEY]
+
+
+@pytest.fixture
+def client():
+    return Client(HTTP_AUTHORIZATION=f'Bearer {API_KEY}')
+
+
+@pytest.fixture
+def inquiry():
+    return PropertyInquiry.objects.create(
+        address="1 Version Road", lot_size=10, lot_size_unit='acres', current_property="Pasture",
+        property_goals="Trees", investment_capacity="$10,000", preferences_concerns="None", region="Oregon",
+    )
+
+
+def generation(n):
+    """Fields of the n-th generation: the name and one cost series change every time"""
+    return {
+        'project_name': f"Project v{n}",
+        'cash_flow_projection': [1000.0 * year + n for year in range(10)],
+        'revenue_breakdown': {'agricultural_sales': [500.25] * 10},
+        'cost_breakdown': {'maintenance': [100.0 + n / 3] * 10},
+        'recommendations': ["Plant trees"] if n < 3 else ["Plant trees", "Add ponds"],
+    }
+
+
+def generate(inquiry, n):
+    request = inquiry_request_for(inquiry)
+    result = canned_analysis_result(request)
+    for name, value in generation(n).items():
+        setattr(result.estimate, name, value)
+    estimate, _ = async_to_sync(persist_estimate)(inquiry, request, result)
+    return estimate
+
+
+def subset(version):
+    return {name: version[name] for name in generation(1)}
+
+
+@pytest.mark.django_db
+class TestVersionHistory:
+    """Test cases for recording and rebuilding versions"""
+
+    def test_first_generation_has_no_rows(self, inquiry):
+        estimate = generate(inquiry, 1)
+        assert not EstimateVersion.objects.exists()
+        estimate = PropertyEstimate.objects.with_details().get(id=estimate.id)
+        assert subset(version_json(load_versions(estimate, [1])[1])) == generation(1)
+
+    def test_regenerations_rebuild_exactly(self, inquiry):
+        for n in range(1, 15):
+            estimate = generate(inquiry, n)
+        versions = list(EstimateVersion.objects.filter(estimate=estimate))
+        assert [version.number for version in versions] == list(range(1, 15))
+        assert [version.number for version in versions if version.snapshot] == [1, 1 + SNAPSHOT_INTERVAL]
+
+        states = load_versions(estimate, range(1, 15))
+        for n in range(1, 15):
+            assert subset(version_json(states[n])) == generation(n)
+        # Deltas only carry what changed
+        assert len(versions[2].data) < len(versions[0].data) / 2
+
+    def test_rebuild_reads_one_query(self, inquiry):
+        for n in range(1, 14):
+            estimate = generate(inquiry, n)
+        with record_queries() as recorder:
+            state = load_versions(estimate, [13])[13]
+        assert recorder.count == 1
+        assert state['project_name'] == "Project v13"
+
+    def test_regeneration_adds_two_queries(self, inquiry):
+        generate(inquiry, 1)
+        generate(inquiry, 2)
+        with record_queries() as recorder:
+            generate(inquiry, 3)
+        # The chain since the last snapshot, and the new row
+        assert sum('main_app_estimateversion' in query.sql for query in recorder.queries) == 2
+
+    def test_failed_version_rolls_back_the_regeneration(self, inquiry):
+        generate(inquiry, 1)
+        with patch.object(EstimateVersion.objects, 'bulk_create', side_effect=DatabaseError('version failed')):
+            with pytest.raises(Exception, match='version failed'):
+                generate(inquiry, 2)
+        # The estimate and the version chain still agree
+        assert PropertyEstimate.objects.get(inquiry=inquiry).project_name == "Project v1"
+        assert not EstimateVersion.objects.exists()
+        estimate = generate(inquiry, 2)
+        assert load_versions(estimate, [1])[1]['project_name'] == "Project v1"
+
+    def test_deleting_estimate_deletes_versions(self, inquiry):
+        generate(inquiry, 1)
+        generate(inquiry, 2).delete()
+        assert not EstimateVersion.objects.exists()
+
+
+@pytest.mark.django_db
+class TestVersionAPI:
+    """Test cases for the version list, version and diff endpoints"""
+
+    def test_versions(self, client, inquiry):
+        estimate = generate(inquiry, 1)
+        response = client.get(reverse('main_app:estimate_versions', args=[estimate.id]))
+        assert [version['number'] for version in response.json()['versions']] == [1]
+
+        generate(inquiry, 2)
+        response = client.get(reverse('main_app:estimate_versions', args=[estimate.id]))
+        assert [version['number'] for version in response.json()['versions']] == [1, 2]
+        assert Client().get(reverse('main_app:estimate_versions', args=[estimate.id])).status_code == 401
+        assert client.get(reverse('main_app:estimate_versions', args=[10 ** 6])).status_code == 404
+
+    def test_version(self, client, inquiry):
+        for n in range(1, 4):
+            estimate = generate(inquiry, n)
+        with assert_query_budget(settings.QUERY_BUDGETS['main_app:estimate_version']):
+            response = client.get(reverse('main_app:estimate_version', args=[estimate.id, 2]))
+        assert subset(response.json()['version']) == generation(2)
+        assert client.get(reverse('main_app:estimate_version', args=[estimate.id, 4])).status_code == 404
+
+    def test_diff(self, client, inquiry):
+        for n in range(1, 4):
+            estimate = generate(inquiry, n)
+        url = reverse('main_app:estimate_version_diff', args=[estimate.id])
+        with assert_query_budget(settings.QUERY_BUDGETS['main_app:estimate_version_diff']):
+            body = client.get(url, {'from': 1}).json()
+        assert (body['from'], body['to']) == (1, 3)
+        assert body['fields']['project_name'] == {'from': "Project v1", 'to': "Project v3"}
+        assert body['fields']['recommendations']['to'] == ["Plant trees", "Add ponds"]
+        assert set(body['series']) == {'cash_flow_projection', 'cost_breakdown.maintenance'}
+        assert body['series']['cash_flow_projection']['change'] == [2.0] * 10
+
+        assert client.get(url, {'from': 'x'}).status_code == 400
+        assert client.get(url, {'from': 1, 'to': 9}).status_code == 404
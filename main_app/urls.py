@@ -7,9 +7,21 @@ app_name = 'main_app'
 urlpatterns = [
     path('', views.index, name='index'),
     path('estimate/', views.estimate_questionnaire, name='estimate_questionnaire'),
+    path('api/questionnaire/', views.submit_questionnaire, name='submit_questionnaire'),
     path('loading-estimate/', views.loading_screen, name='loading_screen'),
     path('estimate-results/<int:inquiry_id>/', views.estimate_results, name='estimate_results'),
     path('api/generate-estimate/<int:inquiry_id>/', views.generate_ai_estimate, name='generate_ai_estimate'),
+    path('api/inquiries/<int:inquiry_id>/status/', views.estimate_status, name='estimate_status'),
+    path('api/inquiries/<int:inquiry_id>/chart/', views.chart_data_api, name='chart_data'),
+    path('export/<str:dataset>/', views.export_data, name='export_data'),
+    path('api/search/', views.search_api, name='search_api'),
+    path('api/estimates/', views.estimates_api, name='estimates_api'),
+    path('api/estimates/<int:estimate_id>/comparables/', views.comparables_api, name='comparables'),
+    path('api/estimates/<int:estimate_id>/versions/', views.estimate_versions_api, name='estimate_versions'),
+    path('api/estimates/<int:estimate_id>/versions/<int:number>/', views.estimate_version_api, name='estimate_version'),
+    path('api/estimates/<int:estimate_id>/versions/diff/', views.estimate_version_diff_api, name='estimate_version_diff'),
+    path('api/regional-statistics/', views.regional_statistics_api, name='regional_statistics'),
+    path('api/import-inquiries/', views.import_inquiries_api, name='import_inquiries'),
 ]
 
 # Only include debug endpoints when DEBUG is True
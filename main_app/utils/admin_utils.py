@@ -0,0 +1,165 @@
+"""
+Admin changelist helpers for large tables in Valora Earth Django application.
+
+- ``EstimatedCountPaginator`` answers ``count`` for unfiltered changelists from
+  the database's own row estimate instead of a full ``COUNT(*)`` scan.
+- ``KeysetChangeList`` pages the default ``(-created_at, -pk)`` ordering with a
+  ``cursor`` parameter (``WHERE (created_at, id) < (...)``) instead of
+  ``OFFSET``, so page 5000 costs the same as page 1, and defers heavy columns
+  listed in ``changelist_defer``.
+- ``LargeTableAdminMixin`` wires both into a ModelAdmin.
+"""
+
+import logging
+from typing import Optional, Tuple
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+CURSOR_VAR = 'cursor'
+
+# Below this many rows an exact COUNT(*) is cheap enough
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+def estimated_row_count(model, using: str = 'default') -> Optional[int]:
+    """Planner's row estimate for a model's table, or None if unavailable"""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            elif connection.vendor == 'sqlite':
+                # Rowids only grow, so the largest one is an O(log n) upper bound on the row count
+                cursor.execute(f"SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}")
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError as e:
+        logger.error(f"Error estimating row count for {table}: {str(e)}")
+        return None
+    # PostgreSQL reports -1 for tables that were never analyzed
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator using the planner estimate for large unfiltered querysets"""
+
+    estimate_threshold = ESTIMATED_COUNT_THRESHOLD
+
+    @cached_property
+    def count_is_estimate(self) -> bool:
+        return self.estimated_count is not None
+
+    @cached_property
+    def count(self) -> int:
+        if self.estimated_count is not None:
+            return self.estimated_count
+        return super().count
+
+    @cached_property
+    def estimated_count(self) -> Optional[int]:
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet) or queryset.query.where:
+            return None
+        estimate = estimated_row_count(queryset.model, using=queryset.db)
+        if estimate is None or estimate < self.estimate_threshold:
+            return None
+        return estimate
+
+
+def encode_cursor(created_at, pk) -> str:
+    return f"{created_at.isoformat()}_{pk}"
+
+
+def decode_cursor(value: str) -> Tuple:
+    """Parse a cursor produced by encode_cursor; raises IncorrectLookupParameters if malformed"""
+    created_at, _, pk = value.rpartition('_')
+    parsed = parse_datetime(created_at) if created_at else None
+    if parsed is None or not pk.isdigit():
+        raise IncorrectLookupParameters(f"Invalid {CURSOR_VAR} '{value}'")
+    return parsed, int(pk)
+
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList with keyset pagination on the model's default ordering
+
+    Explicit column sorting (``?o=``) and "Show all" fall back to regular
+    offset pagination.
+    """
+
+    keyset_field = 'created_at'
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Changing filters or sorting starts again from the first page
+        return super().get_query_string(new_params, [*(remove or []), CURSOR_VAR])
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        defer = getattr(self.model_admin, 'changelist_defer', ())
+        return queryset.defer(*defer) if defer else queryset
+
+    @property
+    def uses_keyset(self) -> bool:
+        return ORDER_VAR not in self.params and ALL_VAR not in self.params
+
+    def get_results(self, request):
+        self.keyset = self.uses_keyset
+        self.next_page_url = None
+        self.first_page_url = None
+        if not self.keyset:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        queryset = self.queryset
+        cursor = request.GET.get(CURSOR_VAR)
+        if cursor:
+            value, pk = decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(**{f'{self.keyset_field}__lt': value}) | Q(**{self.keyset_field: value, 'pk__lt': pk})
+            )
+            self.first_page_url = self.get_query_string()
+
+        rows = list(queryset.order_by(f'-{self.keyset_field}', '-pk')[:self.list_per_page + 1])
+        result_list = rows[:self.list_per_page]
+        if len(rows) > self.list_per_page:
+            last = result_list[-1]
+            self.next_page_url = self.get_query_string({CURSOR_VAR: encode_cursor(getattr(last, self.keyset_field), last.pk)})
+
+        self.result_count = paginator.count
+        self.count_is_estimate = getattr(paginator, 'count_is_estimate', False)
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.full_result_count = self.root_queryset.count() if self.show_full_result_count else None
+        self.show_admin_actions = not self.show_full_result_count or bool(self.full_result_count)
+        self.result_list = result_list
+        self.can_show_all = False
+        # The numbered page links don't apply; pagination.html renders next/first links instead
+        self.multi_page = False
+        self.paginator = paginator
+
+
+class LargeTableAdminMixin:
+    """ModelAdmin defaults for tables that grow without bound"""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    changelist_defer = ()
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -4,10 +4,15 @@ This module provides truly async database operations that can run concurrently.
 """
 
 import asyncio
+import json
+import operator
+from functools import reduce
 from typing import Any, List, Optional, Type, TypeVar, Dict
 from django.db import models, transaction
-from django.db.models import QuerySet
+from django.db.models import Q, QuerySet
+from django.utils import timezone
 from asgiref.sync import sync_to_async
+from .db_utils import auto_now_fields
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,6 +20,9 @@ logger = logging.getLogger(__name__)
 # Type variable for model classes
 T = TypeVar('T', bound=models.Model)
 
+# Rows per statement for set-based bulk operations (keeps SQLite under its variable limit)
+DEFAULT_BATCH_SIZE = 500
+
 
 class ConcurrentAsyncDBManager:
     """Manager class for concurrent async database operations"""
@@ -150,38 +158,173 @@ class AsyncQueryOptimizer:
             raise
     
     @staticmethod
-    async def bulk_operations_async(model_class: Type[T], operations: List[Dict]) -> List[Any]:
-        """Execute bulk operations asynchronously"""
+    async def bulk_operations_async(model_class: Type[T], operations: List[Dict], batch_size: int = DEFAULT_BATCH_SIZE) -> List[Any]:
+        """
+        Execute bulk operations asynchronously using set-based statements
+
+        Operations are grouped by type and executed inside a single transaction:
+
+        - ``create``: one ``bulk_create`` per batch
+        - ``upsert``: ``bulk_create(update_conflicts=True)`` grouped by conflict target,
+          i.e. a native ``INSERT ... ON CONFLICT DO UPDATE``. Each operation must provide
+          ``unique_fields`` and may provide ``update_fields`` (defaults to the data keys
+          that are not part of the conflict target)
+        - ``update``: grouped by identical payload. Primary key addressed updates sharing a
+          payload become ``UPDATE ... WHERE pk IN (...)`` per batch, single primary key
+          updates with distinct payloads are sent through ``bulk_update`` and everything
+          else becomes one ``UPDATE`` over the OR of the filters per batch
+        - ``delete``: primary key filters are merged into ``pk__in`` batches, other filters
+          are OR-ed together per batch
+
+        Returns the created/upserted objects followed by the row count of each update
+        statement and the ``delete()`` result of each delete statement.
+        """
         try:
-            # Group operations by type for efficiency
-            creates = [op['data'] for op in operations if op['type'] == 'create']
-            updates = [op for op in operations if op['type'] == 'update']
-            deletes = [op['filters'] for op in operations if op['type'] == 'delete']
-            
-            results = []
-            
-            # Execute bulk operations
-            if creates:
-                created = await sync_to_async(model_class.objects.bulk_create)(
-                    [model_class(**data) for data in creates]
-                )
-                results.extend(created)
-            
-            if updates:
-                for update_op in updates:
-                    updated = await sync_to_async(model_class.objects.filter(**update_op['filters']).update)(**update_op['data'])
-                    results.append(updated)
-            
-            if deletes:
-                for delete_filter in deletes:
-                    deleted = await sync_to_async(model_class.objects.filter(**delete_filter).delete)()
-                    results.append(deleted)
-            
-            return results
+            return await sync_to_async(AsyncQueryOptimizer._execute_bulk_operations)(
+                model_class, operations, batch_size
+            )
         except Exception as e:
             logger.error(f"Error in bulk_operations_async: {str(e)}")
             raise
 
+    @staticmethod
+    def _execute_bulk_operations(model_class: Type[T], operations: List[Dict], batch_size: int) -> List[Any]:
+        """Synchronous body of bulk_operations_async, run in a single worker thread hop"""
+        creates = [op['data'] for op in operations if op['type'] == 'create']
+        upserts = [op for op in operations if op['type'] == 'upsert']
+        updates = [op for op in operations if op['type'] == 'update']
+        deletes = [op['filters'] for op in operations if op['type'] == 'delete']
+
+        unknown = {op['type'] for op in operations} - {'create', 'upsert', 'update', 'delete'}
+        if unknown:
+            raise ValueError(f"Unknown operation type: {', '.join(sorted(unknown))}")
+
+        results = []
+
+        with transaction.atomic():
+            if creates:
+                results.extend(model_class.objects.bulk_create(
+                    [model_class(**data) for data in creates], batch_size=batch_size
+                ))
+
+            if upserts:
+                results.extend(AsyncQueryOptimizer._bulk_upsert(model_class, upserts, batch_size))
+
+            if updates:
+                results.extend(AsyncQueryOptimizer._bulk_update(model_class, updates, batch_size))
+
+            if deletes:
+                results.extend(AsyncQueryOptimizer._bulk_delete(model_class, deletes, batch_size))
+
+        return results
+
+    @staticmethod
+    def _bulk_upsert(model_class: Type[T], upserts: List[Dict], batch_size: int) -> List[T]:
+        """Run upserts as INSERT ... ON CONFLICT DO UPDATE grouped by conflict target"""
+        groups: Dict[tuple, List[T]] = {}
+        for op in upserts:
+            unique_fields = tuple(op['unique_fields'])
+            update_fields = tuple(op.get('update_fields') or [
+                name for name in op['data'] if name not in unique_fields
+            ])
+            update_fields += tuple(name for name in auto_now_fields(model_class) if name not in update_fields)
+            groups.setdefault((unique_fields, update_fields), []).append(model_class(**op['data']))
+
+        upserted = []
+        for (unique_fields, update_fields), objs in groups.items():
+            upserted.extend(model_class.objects.bulk_create(
+                objs,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=list(unique_fields),
+                update_fields=list(update_fields),
+            ))
+        return upserted
+
+    @staticmethod
+    def _bulk_update(model_class: Type[T], updates: List[Dict], batch_size: int) -> List[int]:
+        """Run updates grouped by identical payload instead of one statement per operation
+
+        Updates of the same primary key are merged first, in the order given,
+        so a later value of a field wins.
+        """
+        groups: Dict[str, Dict[str, Any]] = {}
+        by_pk: Dict[Any, Dict[str, Any]] = {}
+        for op in updates:
+            pk = _pk_from_filters(model_class, op['filters'])
+            if pk is None:
+                group = groups.setdefault(_payload_key(op['data']), {'data': op['data'], 'pks': [], 'filters': []})
+                group['filters'].append(op['filters'])
+            else:
+                by_pk[pk] = {**by_pk.get(pk, {}), **op['data']}
+        for pk, data in by_pk.items():
+            groups.setdefault(_payload_key(data), {'data': data, 'pks': [], 'filters': []})['pks'].append(pk)
+
+        counts = []
+        singles: Dict[tuple, List[T]] = {}
+        # update() and bulk_update() skip pre_save, so refresh auto_now fields explicitly
+        touched = {name: timezone.now() for name in auto_now_fields(model_class)}
+        for group in groups.values():
+            data = {**touched, **group['data']}
+            if len(group['pks']) == 1:
+                # A payload used by a single row is batched with rows touching the same columns
+                singles.setdefault(tuple(sorted(data)), []).append(model_class(pk=group['pks'][0], **data))
+            else:
+                for chunk in _chunks(group['pks'], batch_size):
+                    counts.append(model_class.objects.filter(pk__in=chunk).update(**data))
+            for chunk in _chunks(group['filters'], batch_size):
+                counts.append(model_class.objects.filter(_or_filters(chunk)).update(**data))
+
+        for fields, objs in singles.items():
+            counts.append(model_class.objects.bulk_update(objs, list(fields), batch_size=batch_size))
+        return counts
+
+    @staticmethod
+    def _bulk_delete(model_class: Type[T], deletes: List[Dict], batch_size: int) -> List[tuple]:
+        """Run deletes as pk__in batches plus OR-ed batches for non primary key filters"""
+        pks = []
+        filters = []
+        for delete_filter in deletes:
+            pk = _pk_from_filters(model_class, delete_filter)
+            if pk is None:
+                filters.append(delete_filter)
+            else:
+                pks.append(pk)
+
+        deleted = []
+        for chunk in _chunks(pks, batch_size):
+            deleted.append(model_class.objects.filter(pk__in=chunk).delete())
+        for chunk in _chunks(filters, batch_size):
+            deleted.append(model_class.objects.filter(_or_filters(chunk)).delete())
+        return deleted
+
+
+def _chunks(items: List[Any], size: int):
+    """Yield successive slices of at most ``size`` items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _payload_key(data: Dict) -> str:
+    """Hashable key for grouping operations with identical update payloads"""
+    return json.dumps(data, sort_keys=True, default=str)
+
+
+def _pk_from_filters(model_class: Type[T], filters: Dict) -> Optional[Any]:
+    """Return the primary key value if the filters address exactly one row by pk"""
+    if len(filters) != 1:
+        return None
+    (lookup, value), = filters.items()
+    pk_name = model_class._meta.pk.name
+    if lookup in ('pk', 'pk__exact', pk_name, f'{pk_name}__exact'):
+        return value
+    return None
+
+
+def _or_filters(filters: List[Dict]) -> Q:
+    """Combine filter dicts into a single OR-ed Q object"""
+    return reduce(operator.or_, (Q(**f) for f in filters))
+
 
 # Convenience functions for concurrent operations
 async def concurrent_create(model_class: Type[T], objects_data: List[Dict]) -> List[T]:
@@ -224,6 +367,6 @@ async def select_related_async(queryset: QuerySet, *related_fields) -> List[T]:
     return await AsyncQueryOptimizer.select_related_async(queryset, *related_fields)
 
 
-async def bulk_operations_async(model_class: Type[T], operations: List[Dict]) -> List[Any]:
-    """Execute bulk operations asynchronously"""
-    return await AsyncQueryOptimizer.bulk_operations_async(model_class, operations)
+async def bulk_operations_async(model_class: Type[T], operations: List[Dict], batch_size: int = DEFAULT_BATCH_SIZE) -> List[Any]:
+    """Execute bulk operations asynchronously using set-based statements"""
+    return await AsyncQueryOptimizer.bulk_operations_async(model_class, operations, batch_size)
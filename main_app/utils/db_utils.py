@@ -3,8 +3,12 @@ Database utilities for async operations in Valora Earth Django application.
 This module provides async-compatible database operations and utilities.
 """
 
-from typing import Any, List, Optional, Type, TypeVar
-from django.db import models, transaction
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Type, TypeVar
+from django.conf import settings
+from django.db import connections, models, transaction
 from django.db.models import QuerySet
 from asgiref.sync import sync_to_async
 import logging
@@ -15,6 +19,23 @@ logger = logging.getLogger(__name__)
 T = TypeVar('T', bound=models.Model)
 
 
+def auto_now_fields(model_class: Type[models.Model]) -> List[str]:
+    """Fields with auto_now=True, which bulk_create conflicts and update() don't refresh themselves"""
+    return [field.name for field in model_class._meta.concrete_fields if getattr(field, 'auto_now', False)]
+
+
+def upsert(model_class: Type[T], unique_fields: List[str], defaults: dict = None, **kwargs) -> T:
+    """INSERT ... ON CONFLICT DO UPDATE; ``unique_fields`` must be covered by a unique constraint"""
+    defaults = defaults or {}
+    objs = model_class.objects.bulk_create(
+        [model_class(**kwargs, **defaults)],
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=list({*defaults, *auto_now_fields(model_class)}),
+    )
+    return objs[0]
+
+
 class AsyncDBManager:
     """Manager class for async database operations"""
     
@@ -49,15 +70,35 @@ class AsyncDBManager:
             raise
     
     @staticmethod
-    async def update_or_create(model_class: Type[T], defaults: dict = None, **kwargs) -> tuple[T, bool]:
-        """Async update_or_create operation for any model"""
+    async def update_or_create(model_class: Type[T], defaults: dict = None, upsert: bool = False, **kwargs) -> tuple[T, Optional[bool]]:
+        """
+        Async update_or_create operation for any model
+
+        With ``upsert=True`` the lookup kwargs are used as the conflict target of a single
+        ``INSERT ... ON CONFLICT DO UPDATE`` statement instead of SELECT-then-write. The
+        lookups must therefore be plain fields covered by a unique constraint. A single
+        statement cannot tell whether the row was inserted or updated, so ``created`` is
+        ``None`` in that mode.
+        """
         try:
+            if upsert:
+                obj = await AsyncDBManager.upsert(model_class, list(kwargs), defaults, **kwargs)
+                return obj, None
             return await sync_to_async(model_class.objects.update_or_create)(
                 defaults=defaults or {}, **kwargs
             )
         except Exception as e:
             logger.error(f"Error in update_or_create for {model_class.__name__}: {str(e)}")
             raise
+
+    @staticmethod
+    async def upsert(model_class: Type[T], unique_fields: List[str], defaults: dict = None, **kwargs) -> T:
+        """Async INSERT ... ON CONFLICT DO UPDATE for any model (one round-trip)"""
+        try:
+            return await sync_to_async(upsert)(model_class, unique_fields, defaults, **kwargs)
+        except Exception as e:
+            logger.error(f"Error in upsert for {model_class.__name__}: {str(e)}")
+            raise
     
     @staticmethod
     async def bulk_create(model_class: Type[T], objects: List[T], **kwargs) -> List[T]:
@@ -134,9 +175,14 @@ async def async_filter(model_class: Type[T], **kwargs) -> List[T]:
     return await AsyncDBManager.filter(model_class, **kwargs)
 
 
-async def async_update_or_create(model_class: Type[T], defaults: dict = None, **kwargs) -> tuple[T, bool]:
+async def async_update_or_create(model_class: Type[T], defaults: dict = None, upsert: bool = False, **kwargs) -> tuple[T, Optional[bool]]:
     """Convenience function for async update_or_create"""
-    return await AsyncDBManager.update_or_create(model_class, defaults, **kwargs)
+    return await AsyncDBManager.update_or_create(model_class, defaults, upsert, **kwargs)
+
+
+async def async_upsert(model_class: Type[T], unique_fields: List[str], defaults: dict = None, **kwargs) -> T:
+    """Convenience function for async upsert"""
+    return await AsyncDBManager.upsert(model_class, unique_fields, defaults, **kwargs)
 
 
 async def async_bulk_create(model_class: Type[T], objects: List[T], **kwargs) -> List[T]:
@@ -157,3 +203,53 @@ async def async_exists(model_class: Type[T], **kwargs) -> bool:
 async def async_count(model_class: Type[T], **kwargs) -> int:
     """Convenience function for async count"""
     return await AsyncDBManager.count(model_class, **kwargs)
+
+
+def close_thread_connections(func):
+    """
+    Decorator closing the calling thread's database connections when ``func`` returns
+
+    Django only releases connections at the end of a request. Work submitted to an
+    ad-hoc thread pool runs outside the request cycle, so without this each worker
+    thread would keep its own connection (or pooled slot) open until it exits.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            connections.close_all()
+    return wrapper
+
+
+# Shared by everything submit_background() runs, created on first use
+_background_executor: Optional[ThreadPoolExecutor] = None
+_background_executor_lock = threading.Lock()
+
+
+def background_executor() -> ThreadPoolExecutor:
+    """Process-wide thread pool (BACKGROUND_WORKERS threads) for work that outlives its request"""
+    global _background_executor
+    with _background_executor_lock:
+        if _background_executor is None:
+            _background_executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS, thread_name_prefix='valora-background'
+            )
+        return _background_executor
+
+
+def _log_background_failure(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Background task failed", exc_info=future.exception())
+
+
+def submit_background(func: Callable[..., Any], *args, **kwargs) -> Future:
+    """
+    Run ``func`` on the background thread pool and close the worker's connections when it returns
+
+    Unlike a task on the request's event loop, the work survives the request (asgiref's
+    ``asyncio.run`` under WSGI cancels leftover tasks when the view returns). Failures are logged.
+    """
+    future = background_executor().submit(close_thread_connections(func), *args, **kwargs)
+    future.add_done_callback(_log_background_failure)
+    return future
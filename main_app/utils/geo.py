@@ -0,0 +1,86 @@
+"""
+Geographic helpers for Valora Earth Django application: geohash cells,
+great-circle distances and search boxes. Pure functions, no database access.
+"""
+
+import math
+from typing import List, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LATITUDE = math.pi * EARTH_RADIUS_KM / 180
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# 12 characters is ~3.7 cm x 1.9 cm; shorter prefixes are the coarser grid cells
+GEOHASH_PRECISION = 12
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Geohash of a point; every prefix is the enclosing, coarser cell"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def geohash_decode(geohash: str) -> Tuple[float, float]:
+    """Centre (latitude, longitude) of a geohash cell"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_boxes(latitude: float, longitude: float, radius_km: float) -> List[Tuple[float, float, float, float]]:
+    """
+    (min_lat, max_lat, min_lon, max_lon) boxes covering every point within
+    ``radius_km``; two boxes when the circle crosses the antimeridian
+    """
+    d_lat = radius_km / KM_PER_DEGREE_LATITUDE
+    min_lat, max_lat = latitude - d_lat, latitude + d_lat
+    if min_lat <= -90 or max_lat >= 90:
+        # The circle contains a pole: every longitude qualifies
+        return [(max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0)]
+    # Widest longitude span of the circle, at the latitude nearest the pole
+    cos_lat = min(math.cos(math.radians(min_lat)), math.cos(math.radians(max_lat)))
+    d_lon = radius_km / (KM_PER_DEGREE_LATITUDE * cos_lat)
+    if d_lon >= 180:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    min_lon, max_lon = longitude - d_lon, longitude + d_lon
+    if min_lon < -180:
+        return [(min_lat, max_lat, min_lon + 360, 180.0), (min_lat, max_lat, -180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lat, max_lat, min_lon, 180.0), (min_lat, max_lat, -180.0, max_lon - 360)]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+
+def valid_coordinates(latitude, longitude) -> bool:
+    return latitude is not None and longitude is not None and -90 <= latitude <= 90 and -180 <= longitude <= 180
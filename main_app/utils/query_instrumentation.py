@@ -0,0 +1,150 @@
+"""
+SQL query instrumentation for Valora Earth Django application.
+
+Every database connection gets an execute wrapper (installed on
+``connection_created``) that reports queries to the recorders active in the
+current context. Because recorders live in a context variable they follow a
+request into ``sync_to_async`` worker threads, so async views are measured too,
+and recording costs nothing when no recorder is active.
+
+Queries slower than ``SLOW_QUERY_THRESHOLD_MS`` are written to the
+``main_app.slow_queries`` logger together with the database's query plan.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+from django.conf import settings
+
+slow_query_logger = logging.getLogger('main_app.slow_queries')
+
+# Plan statement prefix per database vendor; other vendors are logged without a plan
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+}
+
+_active_recorders: ContextVar[Tuple['QueryRecorder', ...]] = ContextVar('query_recorders', default=())
+_explaining: ContextVar[bool] = ContextVar('query_explaining', default=False)
+
+
+@dataclass
+class QueryRecord:
+    """A single executed SQL statement"""
+    sql: str
+    params: Any
+    duration: float
+    alias: str
+
+
+@dataclass
+class QueryRecorder:
+    """Collects the queries executed while it is active"""
+    queries: List[QueryRecord] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_time(self) -> float:
+        """Total SQL time in seconds"""
+        return sum(query.duration for query in self.queries)
+
+    def slowest(self, limit: int = 5) -> List[QueryRecord]:
+        return sorted(self.queries, key=lambda query: query.duration, reverse=True)[:limit]
+
+    def report(self, limit: int = 5) -> str:
+        """Human readable summary used in budget failures and warnings"""
+        lines = [f"{self.count} queries in {self.total_time * 1000:.1f} ms; slowest:"]
+        for query in self.slowest(limit):
+            lines.append(f"  {query.duration * 1000:8.2f} ms  {query.sql}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def record_queries():
+    """Record every query executed in this context (including sync_to_async threads)"""
+    recorder = QueryRecorder()
+    token = _active_recorders.set(_active_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _active_recorders.reset(token)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by assert_query_budget when a block runs more queries than allowed"""
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, label: str = 'block'):
+    """Test helper: fail if the block executes more than ``max_queries`` queries"""
+    with record_queries() as recorder:
+        yield recorder
+    if recorder.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{label} exceeded its query budget of {max_queries}: {recorder.report()}"
+        )
+
+
+def slow_query_threshold() -> float:
+    """Slow query threshold in seconds"""
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100) / 1000
+
+
+def explain(connection, sql: str, params: Any) -> Optional[str]:
+    """Return the query plan for a SELECT, or None if it cannot be explained"""
+    prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+    if prefix is None or not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(' | '.join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f"<plan unavailable: {e}>"
+    finally:
+        _explaining.reset(token)
+
+
+def log_slow_query(connection, record: QueryRecord) -> None:
+    plan = explain(connection, record.sql, record.params)
+    slow_query_logger.warning(
+        "Slow query (%.1f ms) on %s: %s\nParams: %r\nPlan:\n%s",
+        record.duration * 1000, record.alias, record.sql, record.params, plan or '<none>',
+    )
+
+
+def instrumented_execute(execute, sql, params, many, context):
+    """Execute wrapper timing queries for the active recorders and the slow query log"""
+    if _explaining.get():
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    succeeded = False
+    try:
+        result = execute(sql, params, many, context)
+        succeeded = True
+        return result
+    finally:
+        duration = time.perf_counter() - start
+        connection = context['connection']
+        record = QueryRecord(sql=sql, params=params, duration=duration, alias=connection.alias)
+        for recorder in _active_recorders.get():
+            recorder.queries.append(record)
+        # A failed statement may have aborted the transaction, so don't try to explain it
+        if succeeded and not many and duration >= slow_query_threshold():
+            log_slow_query(connection, record)
+
+
+def install_instrumentation(sender, connection, **kwargs):
+    """connection_created receiver adding the execute wrapper once per connection wrapper"""
+    if instrumented_execute not in connection.execute_wrappers:
+        # Insert first so execute_wrapper() blocks that pop() their own wrapper are unaffected
+        connection.execute_wrappers.insert(0, instrumented_execute)
@@ -0,0 +1,213 @@
+"""
+Version history of regenerated estimates.
+
+Regenerating an estimate replaces its PropertyEstimate row in place, so
+``record_version`` keeps the history in EstimateVersion rows, numbered from 1
+per estimate. Every SNAPSHOT_INTERVAL-th version (1, 11, 21, ...) holds the
+whole estimate; the others hold a delta against the version before: the
+fields whose value changed and, for each projection series that changed, the
+XOR of its float64 bit patterns with the previous ones. The XOR is exact and
+mostly zero bytes where values are close, which the zlib compression of the
+row squeezes out. Rebuilding any version reads at most SNAPSHOT_INTERVAL rows,
+in one query.
+
+An estimate generated once has no rows (its only version is the estimate
+itself); its first regeneration records the replaced estimate as version 1.
+Admin edits are not versions: the next delta is taken against the last
+recorded version, so they show up as part of the next regeneration.
+"""
+
+import json
+import math
+import struct
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Subquery
+
+from .models import EstimateVersion, PropertyEstimate, PropertyInquiry
+from .projections import BLOCK_FORMAT, PROJECTION_YEARS, SERIES_COUNT, SERIES_LAYOUT, ProjectionSeries
+
+SNAPSHOT_INTERVAL = 10
+
+# Compared and stored as JSON values; the packed series are delta-encoded separately
+VERSIONED_FIELDS = (
+    'project_name', 'project_description', 'confidence_score', 'factors_considered', 'recommendations',
+    'timeline', 'risk_assessment', 'projection_overflow', 'processing_time',
+)
+SERIES_FIELD = 'projection_series'
+STATE_FIELDS = VERSIONED_FIELDS + (SERIES_FIELD,)
+
+SERIES_BYTES = PROJECTION_YEARS * struct.calcsize('<d')
+# An estimate without series, as a block (ProjectionSeries.pack never produces an all-NaN block)
+EMPTY_BLOCK = struct.pack(BLOCK_FORMAT, *([math.nan] * SERIES_COUNT * PROJECTION_YEARS))
+_HEADER = struct.Struct('<I')
+
+State = Dict[str, Any]
+
+
+def _block(series: Optional[ProjectionSeries]) -> bytes:
+    return series.data if series is not None and series.data else EMPTY_BLOCK
+
+
+def _series_bytes(block: bytes, index: int) -> bytes:
+    return block[index * SERIES_BYTES:(index + 1) * SERIES_BYTES]
+
+
+def _xor(a: bytes, b: bytes) -> bytes:
+    return (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+
+def _encode(fields: dict, series: Dict[int, bytes]) -> bytes:
+    header = json.dumps({'fields': fields, 'series': sorted(series)}, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(_HEADER.pack(len(header)) + header + b''.join(series[index] for index in sorted(series)))
+
+
+def _decode(data) -> Tuple[dict, Dict[int, bytes]]:
+    raw = zlib.decompress(bytes(data))
+    (length,) = _HEADER.unpack_from(raw)
+    header = json.loads(raw[_HEADER.size:_HEADER.size + length])
+    body = raw[_HEADER.size + length:]
+    return header['fields'], {index: _series_bytes(body, n) for n, index in enumerate(header['series'])}
+
+
+def snapshot_data(state: State) -> bytes:
+    block = _block(state[SERIES_FIELD])
+    return _encode(
+        {name: state[name] for name in VERSIONED_FIELDS},
+        {index: _series_bytes(block, index) for index in range(SERIES_COUNT)},
+    )
+
+
+def delta_data(old: State, new: State) -> bytes:
+    """The changed fields, and the XOR of each changed series with the old one"""
+    old_block, new_block = _block(old[SERIES_FIELD]), _block(new[SERIES_FIELD])
+    series = {}
+    for index in range(SERIES_COUNT):
+        before, after = _series_bytes(old_block, index), _series_bytes(new_block, index)
+        if before != after:
+            series[index] = _xor(before, after)
+    return _encode({name: new[name] for name in VERSIONED_FIELDS if new[name] != old[name]}, series)
+
+
+def apply_version(state: Optional[State], version: EstimateVersion) -> State:
+    """The state ``version`` describes, given the state of the version before (ignored for snapshots)"""
+    fields, series = _decode(version.data)
+    if version.snapshot:
+        block = b''.join(series[index] for index in range(SERIES_COUNT))
+        state = dict(fields)
+    else:
+        merged = bytearray(_block(state[SERIES_FIELD]))
+        for index, change in series.items():
+            start = index * SERIES_BYTES
+            merged[start:start + SERIES_BYTES] = _xor(bytes(merged[start:start + SERIES_BYTES]), change)
+        block = bytes(merged)
+        state = {**state, **fields}
+    state[SERIES_FIELD] = ProjectionSeries(b'' if block == EMPTY_BLOCK else block)
+    return state
+
+
+def state_of(estimate: PropertyEstimate) -> State:
+    return {name: getattr(estimate, name) for name in STATE_FIELDS}
+
+
+def stored_state(inquiry: PropertyInquiry) -> Optional[dict]:
+    """The versioned fields of the inquiry's current estimate (plus its id and updated_at), if it has one"""
+    return PropertyEstimate.objects.filter(inquiry=inquiry).values('id', 'updated_at', *STATE_FIELDS).first()
+
+
+def _chain(estimate_id: int, low: Optional[int] = None, high: Optional[int] = None) -> List[EstimateVersion]:
+    """Rows from the last snapshot at or before ``low`` (default: the latest) up to ``high``, in order"""
+    versions = EstimateVersion.objects.filter(estimate_id=estimate_id)
+    snapshots = versions.filter(snapshot=True)
+    if low is not None:
+        snapshots = snapshots.filter(number__lte=low)
+    rows = versions.filter(number__gte=Subquery(snapshots.order_by('-number').values('number')[:1]))
+    if high is not None:
+        rows = rows.filter(number__lte=high)
+    return list(rows.order_by('number'))
+
+
+def record_version(estimate_id: int, previous: dict, new: State) -> EstimateVersion:
+    """
+    Record a regeneration replacing ``previous`` (see stored_state) with ``new``
+
+    Called in the transaction that replaces the estimate, with the inquiry row
+    locked (see estimates.replace_estimate), so concurrent regenerations read
+    and extend the chain in turn; an error rolls the replacement back.
+    """
+    chain = _chain(estimate_id)
+    versions = []
+    if chain:
+        number, base = chain[-1].number + 1, None
+        for version in chain:
+            base = apply_version(base, version)
+    else:
+        # First regeneration: the replaced estimate becomes version 1
+        versions.append(EstimateVersion(
+            estimate_id=estimate_id, number=1, snapshot=True, data=snapshot_data(previous),
+            created_at=previous['updated_at'],
+        ))
+        number, base = 2, previous
+    snapshot = (number - 1) % SNAPSHOT_INTERVAL == 0
+    versions.append(EstimateVersion(
+        estimate_id=estimate_id, number=number, snapshot=snapshot,
+        data=snapshot_data(new) if snapshot else delta_data(base, new),
+    ))
+    EstimateVersion.objects.bulk_create(versions)
+    return versions[-1]
+
+
+def load_versions(estimate: PropertyEstimate, numbers: Iterable[int]) -> Dict[int, State]:
+    """States of some versions of an estimate (missing numbers are left out), from one query"""
+    numbers = set(numbers)
+    if not numbers:
+        return {}
+    chain = _chain(estimate.id, min(numbers), max(numbers))
+    if not chain:
+        # Never regenerated: the estimate is version 1
+        return {1: state_of(estimate)} if 1 in numbers else {}
+    states = {}
+    state = None
+    for version in chain:
+        state = apply_version(state, version)
+        if version.number in numbers:
+            states[version.number] = state
+    return states
+
+
+def version_list(estimate: PropertyEstimate) -> List[dict]:
+    """Number, kind and date of every version, newest last"""
+    versions = list(EstimateVersion.objects.filter(estimate=estimate).order_by('number').values(
+        'number', 'snapshot', 'created_at',
+    ))
+    return versions or [{'number': 1, 'snapshot': True, 'created_at': estimate.updated_at}]
+
+
+def _series_label(index: int) -> str:
+    group, category = SERIES_LAYOUT[index]
+    return group if category is None else f'{group}.{category}'
+
+
+def version_json(state: State) -> dict:
+    """A version's fields with its projections decoded as on PropertyEstimate"""
+    result = {name: state[name] for name in VERSIONED_FIELDS if name != 'projection_overflow'}
+    result.update((state[SERIES_FIELD] or ProjectionSeries()).to_json(state['projection_overflow']))
+    return result
+
+
+def diff_versions(old: State, new: State) -> dict:
+    """Changed fields as {from, to}, and changed series with their yearly change"""
+    fields = {
+        name: {'from': old[name], 'to': new[name]} for name in VERSIONED_FIELDS if old[name] != new[name]
+    }
+    series = {}
+    for index in range(SERIES_COUNT):
+        before, after = old[SERIES_FIELD].series(index), new[SERIES_FIELD].series(index)
+        if before == after:
+            continue
+        change = None
+        if before is not None and after is not None:
+            change = [None if a is None or b is None else b - a for a, b in zip(before, after)]
+        series[_series_label(index)] = {'from': before, 'to': after, 'change': change}
+    return {'fields': fields, 'series': series}
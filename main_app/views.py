@@ -1,22 +1,96 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.urls import reverse
+from django.utils.http import http_date, urlencode
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
 from django.utils import timezone
 from django.db import transaction
 from asgiref.sync import sync_to_async
-from .models import PropertyInquiry, PropertyEstimate, AIAnalysisLog
+from pydantic import ValidationError
+from valora_earth.session_config import session_fits
+from .models import ESTIMATE_DETAIL_FIELDS, PropertyInquiry, PropertyEstimate
 from .ai_service import ValoraEarthAIService
 from .ai_models import PropertyInquiryRequest
-from .utils.db_utils import async_create, async_get, async_update_or_create
+from .utils.db_utils import async_get
+from .utils.async_db_utils import select_related_async
+from .db_router import read_from_replica
+from .estimates import enqueue_estimates, generate_estimate, log_failure
+from .importers import ImportFormatError, describe_validation_error, detect_format, import_file
+from .exports import FORMATS, ExportError, aiterate, export_filename, export_stream, get_export
+from .search import DEFAULT_LIMIT, search_inquiries
+from .regional_stats import DEFAULT_PERCENTILES, regional_statistics
+from .spatial import DEFAULT_BAND, DEFAULT_K, find_comparables
+from .charts import CHART_FIELDS, chart_data
+from .versions import diff_versions, load_versions, version_json, version_list
+from .results_pages import encoded_page, page_context, read_page, results_url, store_page
+from .compression import negotiate
+from .generation_status import DONE, FAILED, MAX_WAIT, QUEUED, arecord_stage, record_stage, wait_for_change
+from .api import (
+    APIError, EstimatePageRequest, encode_payload, estimates_queryset, has_api_access,
+    page_keys, page_payload, page_rows, page_validators,
+)
+import gzip
+import hashlib
 import json
 import logging
-import asyncio
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Session keys of the questionnaire flow, cleared once the estimate exists
+QUESTIONNAIRE_SESSION_KEYS = ('initial_data', 'questionnaire_answers', 'current_inquiry_id')
+
+# Inquiries started in this session, whose generation status it may read; kept
+# after the questionnaire keys are cleared, newest last
+STATUS_SESSION_KEY = 'status_inquiry_ids'
+STATUS_SESSION_MAX_INQUIRIES = 20
+
+# Shown instead of the exception, which stays in the logs and the AIAnalysisLog
+ESTIMATE_FAILED_MESSAGE = 'The estimate could not be generated. Please try again.'
+
+# Landing page fields the questionnaire carries over in the session
+INITIAL_FIELDS = ('lot_size', 'lot_size_unit', 'region')
+
+# The questionnaire's steps, in order: the inquiry field each one answers
+QUESTIONNAIRE_STEPS = (
+    {
+        'field': 'current_property',
+        'question': "What's currently on your property?",
+        'placeholder': "Describe what’s on your land today—crops, livestock, forest, or unused space...",
+    },
+    {
+        'field': 'property_goals',
+        'question': "What's your goal with your property?",
+        'placeholder': "Do you want to maximize profit, improve soil health, grow specific crops, or something else?",
+    },
+    {
+        'field': 'investment_capacity',
+        'question': "How much time and money are you willing to invest?",
+        'placeholder': "Are you hands-on, hiring help, or looking for low-maintenance options?",
+    },
+    {
+        'field': 'preferences_concerns',
+        'question': "Almost ready! Anything you're really excited about? Or even not excited about?",
+        'placeholder': "Share what interests you—like adding trees or growing coffee—and what you’d rather avoid...",
+    },
+)
+
+# Longest answer, in characters; between steps the answers must also fit the
+# session cookie (session_fits, see valora_earth/session_config.py)
+QUESTIONNAIRE_ANSWER_MAX_LENGTH = 1000
+
+# Questionnaire answers and estimate details the results page does not render
+RESULTS_PAGE_DEFER = (
+    'current_property', 'property_goals', 'investment_capacity', 'preferences_concerns',
+    *(f'estimate__{name}' for name in ESTIMATE_DETAIL_FIELDS),
+)
+
 
 def index(request):
     """Display the property estimate form (landing page)"""
@@ -73,7 +147,12 @@ def index(request):
 
 
 def estimate_questionnaire(request):
-    """Display the multi-step estimate questionnaire flow"""
+    """Display the multi-step estimate questionnaire flow
+
+    With JavaScript the page switches steps itself and sends every answer to
+    submit_questionnaire at once; this per-step POST/redirect flow is the
+    fallback.
+    """
     # Get initial data from session
     initial_data = request.session.get('initial_data', {})
     
@@ -98,54 +177,26 @@ def estimate_questionnaire(request):
             # Get the answer for current step
             answer = request.POST.get('answer', '').strip()
             
-            if not answer:
-                messages.error(request, 'Please provide an answer before continuing.')
-                return render(request, 'main_app/estimate_questionnaire.html', {
-                    'step': step,
-                    'initial_data': initial_data,
-                    'questionnaire_answers': questionnaire_answers
-                })
-            
-            # Map step to field name
-            field_mapping = {
-                1: 'current_property',
-                2: 'property_goals', 
-                3: 'investment_capacity',
-                4: 'preferences_concerns'
-            }
+            if not answer or len(answer) > QUESTIONNAIRE_ANSWER_MAX_LENGTH:
+                messages.error(request, 'Please provide an answer before continuing.' if not answer else
+                               f'Please keep your answer under {QUESTIONNAIRE_ANSWER_MAX_LENGTH} characters.')
+                return render_questionnaire(request, step, questionnaire_answers)
             
             # Store answer in session
-            questionnaire_answers[field_mapping[step]] = answer
+            previous_answers = dict(questionnaire_answers)
+            questionnaire_answers[QUESTIONNAIRE_STEPS[step - 1]['field']] = answer
             request.session['questionnaire_answers'] = questionnaire_answers
+            # The last step stores the inquiry instead, so only earlier steps must fit the cookie
+            if step < 4 and not session_fits(request.session):
+                request.session['questionnaire_answers'] = previous_answers
+                messages.error(request, 'Your answers are too long to keep between steps. Please shorten them.')
+                return render_questionnaire(request, step, previous_answers)
             
             # If this is the last step, process the complete estimate
             if step == 4:
                 try:
-                    # Combine all data
-                    inquiry_data = {
-                        **initial_data,
-                        'address': f"Property in {initial_data.get('region', 'Unknown Region')}",
-                        **questionnaire_answers
-                    }
-                    
-                    # Create PropertyInquiry object in database using sync operation
-                    inquiry = PropertyInquiry.objects.create(
-                        address=inquiry_data['address'],
-                        lot_size=inquiry_data['lot_size'],
-                        lot_size_unit=inquiry_data['lot_size_unit'],
-                        current_property=inquiry_data['current_property'],
-                        property_goals=inquiry_data['property_goals'],
-                        investment_capacity=inquiry_data['investment_capacity'],
-                        preferences_concerns=inquiry_data['preferences_concerns'],
-                        region=inquiry_data['region']
-                    )
-                    
-                    # Store inquiry ID in session for loading screen
-                    request.session['current_inquiry_id'] = inquiry.id
-                    request.session['questionnaire_data'] = inquiry_data
-                    
+                    inquiry = start_inquiry(request, questionnaire_request(initial_data, questionnaire_answers))
                     print(f"DEBUG: Created PropertyInquiry with ID: {inquiry.id}")
-                    print(f"DEBUG: Inquiry data: {inquiry_data}")
                     
                     # Redirect to loading screen
                     return redirect('main_app:loading_screen')
@@ -153,30 +204,92 @@ def estimate_questionnaire(request):
                 except Exception as e:
                     print(f"DEBUG: Error creating PropertyInquiry: {str(e)}")
                     messages.error(request, f'Error processing estimate: {str(e)}')
-                    return render(request, 'main_app/estimate_questionnaire.html', {
-                        'step': step,
-                        'initial_data': initial_data,
-                        'questionnaire_answers': questionnaire_answers
-                    })
+                    return render_questionnaire(request, step, questionnaire_answers)
             else:
                 # Go to next step
                 return redirect(f"{request.path}?step={step + 1}")
                 
         except Exception as e:
             messages.error(request, f'An error occurred: {str(e)}')
-            return render(request, 'main_app/estimate_questionnaire.html', {
-                'step': step,
-                'initial_data': initial_data,
-                'questionnaire_answers': questionnaire_answers
-            })
+            return render_questionnaire(request, step, questionnaire_answers)
     
+    return render_questionnaire(request, step, questionnaire_answers)
+
+
+def render_questionnaire(request, step, questionnaire_answers):
     return render(request, 'main_app/estimate_questionnaire.html', {
         'step': step,
-        'initial_data': initial_data,
-        'questionnaire_answers': questionnaire_answers
+        'question': QUESTIONNAIRE_STEPS[step - 1],
+        'steps': QUESTIONNAIRE_STEPS,
+        'questionnaire_answers': questionnaire_answers,
+        'answer_max_length': QUESTIONNAIRE_ANSWER_MAX_LENGTH,
+    })
+
+
+def questionnaire_request(initial_data, answers):
+    """Validated inquiry for the landing page data and the four answers; raises pydantic's ValidationError"""
+    return PropertyInquiryRequest.model_validate({
+        **initial_data,
+        'address': f"Property in {initial_data.get('region', 'Unknown Region')}",
+        **answers,
     })
 
 
+def start_inquiry(request, inquiry_request):
+    """Create the inquiry and remember it in the session for the loading screen
+
+    The answers are stored with the inquiry, so the session drops them.
+    """
+    inquiry = PropertyInquiry.objects.create(**inquiry_request.model_dump())
+    request.session['current_inquiry_id'] = inquiry.id
+    request.session.pop('questionnaire_answers', None)
+    started = request.session.get(STATUS_SESSION_KEY, [])
+    request.session[STATUS_SESSION_KEY] = (started + [inquiry.id])[-STATUS_SESSION_MAX_INQUIRIES:]
+    record_stage(inquiry.id, QUEUED)
+    return inquiry
+
+
+@require_http_methods(["POST"])
+def submit_questionnaire(request):
+    """Create the inquiry from all four answers at once (JSON or form body) and return the loading screen URL
+
+    Lot size, unit and region come from the landing page's session data unless
+    the body gives them.
+    """
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({'success': False, 'error': 'Body must be a JSON object'}, status=400)
+    else:
+        data = request.POST.dict()
+
+    initial_data = dict(request.session.get('initial_data', {}))
+    initial_data.update((name, data[name]) for name in INITIAL_FIELDS if data.get(name) not in (None, ''))
+    answers = {}
+    for question in QUESTIONNAIRE_STEPS:
+        answer = data.get(question['field'])
+        answers[question['field']] = answer.strip() if isinstance(answer, str) else answer
+        if isinstance(answer, str) and len(answers[question['field']]) > QUESTIONNAIRE_ANSWER_MAX_LENGTH:
+            return JsonResponse({
+                'success': False,
+                'error': f"{question['field']}: keep answers under {QUESTIONNAIRE_ANSWER_MAX_LENGTH} characters",
+            }, status=400)
+    try:
+        inquiry_request = questionnaire_request(initial_data, answers)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': describe_validation_error(e)}, status=400)
+
+    inquiry = start_inquiry(request, inquiry_request)
+    return JsonResponse({
+        'success': True,
+        'inquiry_id': inquiry.id,
+        'loading_url': reverse('main_app:loading_screen'),
+    }, status=201)
+
+
 def loading_screen(request):
     """Display the loading screen while calculating estimates"""
     # Get the current inquiry ID from session
@@ -193,27 +306,34 @@ def loading_screen(request):
     return render(request, 'main_app/loading_screen.html', context)
 
 
+@read_from_replica
 async def estimate_results(request, inquiry_id):
-    """Display property estimate results"""
+    """Display property estimate results (from the pre-rendered page once the estimate exists)"""
+    page = await sync_to_async(read_page, thread_sensitive=False)(inquiry_id)
+    if page is not None:
+        return await sync_to_async(results_page_response, thread_sensitive=False)(request, inquiry_id, page)
     try:
-        # Use async database operation
-        inquiry = await async_get(PropertyInquiry, id=inquiry_id)
+        # Fetch the inquiry and its estimate in one query, without the columns the page never shows
+        inquiries = await select_related_async(
+            PropertyInquiry.objects.filter(id=inquiry_id).defer(*RESULTS_PAGE_DEFER), 'estimate'
+        )
+        if not inquiries:
+            raise PropertyInquiry.DoesNotExist
+        inquiry = inquiries[0]
         
-        # Check if estimate exists
+        # Check if estimate exists (already loaded, no extra query)
         try:
-            estimate = await sync_to_async(lambda: inquiry.estimate)()
-            has_estimate = True
+            estimate = inquiry.estimate
         except PropertyEstimate.DoesNotExist:
             estimate = None
-            has_estimate = False
         
-        context = {
-            'inquiry': inquiry,
-            'estimate': estimate,
-            'has_estimate': has_estimate,
-        }
+        # Stored for the next views, unless a regeneration stored a newer page meanwhile
+        if estimate is not None:
+            page = await sync_to_async(store_page)(inquiry, estimate, replace=False)
+            if page is not None:
+                return await sync_to_async(results_page_response, thread_sensitive=False)(request, inquiry_id, page)
         
-        return render(request, 'main_app/estimate_results.html', context)
+        return render(request, 'main_app/estimate_results.html', page_context(inquiry, estimate))
         
     except PropertyInquiry.DoesNotExist:
         # Use sync_to_async for messages and redirect in async view
@@ -221,6 +341,53 @@ async def estimate_results(request, inquiry_id):
         return await sync_to_async(redirect)('main_app:index')
 
 
+@require_http_methods(["GET"])
+async def estimate_status(request, inquiry_id):
+    """Generation stage of an inquiry's estimate with stage timings (?since=<version>&wait=<seconds> to long-poll)
+
+    Only for inquiries started in the requesting session; any other inquiry is
+    reported as not being generated.
+    """
+    if inquiry_id not in await request.session.aget(STATUS_SESSION_KEY, []):
+        return JsonResponse({'success': False, 'error': 'No estimate is being generated for this inquiry'}, status=404)
+    try:
+        since = int(request.GET['since']) if request.GET.get('since') else None
+        wait = float(request.GET.get('wait', 0))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'since and wait must be numbers'}, status=400)
+    if not 0 <= wait <= MAX_WAIT:
+        return JsonResponse({'success': False, 'error': f'wait must be between 0 and {MAX_WAIT} seconds'}, status=400)
+
+    # Waits until the status moves past the version the client has seen
+    status = await wait_for_change(inquiry_id, since, wait)
+    if status is None:
+        return JsonResponse({'success': False, 'error': 'No estimate is being generated for this inquiry'}, status=404)
+    response = JsonResponse({'success': True, 'inquiry_id': inquiry_id, **status.as_json()})
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+def results_page_response(request, inquiry_id, page):
+    """A stored results page, brotli- or gzip-encoded as the client accepts, honoring If-None-Match/If-Modified-Since"""
+    encoding = negotiate(request.headers.get('Accept-Encoding', ''))
+    etag = page.encoded_etag(encoding)
+    response = get_conditional_response(request, etag=etag, last_modified=int(page.last_modified))
+    if response is None:
+        # Stored compressed: CompressionMiddleware leaves encoded responses alone
+        response = HttpResponse(encoded_page(inquiry_id, page, encoding))
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(page.last_modified)
+    # A URL pinned to this page (?v=) never changes; the plain URL is revalidated on every use
+    if request.GET.get('v') == page.version:
+        patch_cache_control(response, private=True, max_age=settings.RESULTS_PAGE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 async def generate_ai_estimate(request, inquiry_id):
@@ -229,79 +396,16 @@ async def generate_ai_estimate(request, inquiry_id):
         # Use async database operation
         inquiry = await async_get(PropertyInquiry, id=inquiry_id)
         
-        # Initialize AI service
-        ai_service = ValoraEarthAIService()
-        
-        # Create inquiry request object
-        inquiry_request = PropertyInquiryRequest(
-            address=inquiry.address,
-            lot_size=float(inquiry.lot_size),
-            lot_size_unit=inquiry.lot_size_unit,
-            current_property=inquiry.current_property,
-            property_goals=inquiry.property_goals,
-            investment_capacity=inquiry.investment_capacity,
-            preferences_concerns=inquiry.preferences_concerns,
-            region=inquiry.region
-        )
+        # Run the AI analysis and store the estimate and its log, reporting each stage to estimate_status
+        estimate, ai_log = await generate_estimate(inquiry, ValoraEarthAIService(), report_progress=True)
         
-        # Generate AI estimate using async method
-        ai_result = await ai_service.generate_property_estimate_async(inquiry_request)
+        logger.info(f"Estimate {estimate.id} and AI log {ai_log.id} saved for inquiry {inquiry.id}")
         
-        # Create or update the estimate and log the analysis concurrently
-        from .utils.async_db_utils import concurrent_create, batch_operations
-        
-        # Execute both operations concurrently
-        try:
-            estimate_result, ai_log = await asyncio.gather(
-                async_update_or_create(PropertyEstimate,
-                    inquiry=inquiry,
-                    defaults={
-                        'project_name': ai_result.estimate.project_name,
-                        'project_description': ai_result.estimate.project_description,
-                        'confidence_score': ai_result.estimate.confidence_score,
-                        'factors_considered': ai_result.estimate.factors_considered,
-                        'recommendations': ai_result.estimate.recommendations,
-                        'timeline': ai_result.estimate.timeline,
-                        'risk_assessment': ai_result.estimate.risk_assessment,
-                        'cash_flow_projection': ai_result.estimate.cash_flow_projection,
-                        'revenue_breakdown': ai_result.estimate.revenue_breakdown,
-                        'cost_breakdown': ai_result.estimate.cost_breakdown,
-                        'ai_response_raw': ai_result.openai_response.model_dump(mode='json'),
-                        'processing_time': ai_result.processing_time,
-                    }
-                ),
-                async_create(AIAnalysisLog,
-                    inquiry=inquiry,
-                    request_data=inquiry_request.model_dump(mode='json'),
-                    response_data=ai_result.openai_response.model_dump(mode='json'),
-                    model_used=ai_result.openai_response.model,
-                    tokens_used=ai_result.openai_response.usage.get('total_tokens', 0),
-                    processing_time=ai_result.processing_time,
-                    success=True
-                )
-            )
-        except Exception as e:
-            print(f"DEBUG: Error in concurrent database operations: {str(e)}")
-            raise Exception(f"Database operation failed: {str(e)}")
-        
-        # Unpack the estimate result (update_or_create returns (object, created))
-        estimate, created = estimate_result
-        
-        # Validate the estimate object
-        if not estimate or not hasattr(estimate, 'id'):
-            raise Exception("Invalid estimate object returned from database")
-        
-        print(f"DEBUG: Estimate {'created' if created else 'updated'} with ID: {estimate.id}")
-        print(f"DEBUG: AI log created with ID: {ai_log.id}")
-        
-        # Clear session data after successful estimate generation
-        from asgiref.sync import sync_to_async
-        
-        # Use sync_to_async for session operations
-        await sync_to_async(request.session.pop)('questionnaire_data', None)
-        await sync_to_async(request.session.pop)('initial_data', None)
-        await sync_to_async(request.session.pop)('questionnaire_answers', None)
-        await sync_to_async(request.session.pop)('current_inquiry_id', None)
+        # Clear session data after successful estimate generation (saved once, after the view)
+        for key in QUESTIONNAIRE_SESSION_KEYS:
+            await request.session.apop(key, None)
+        results_page_url = await sync_to_async(results_url, thread_sensitive=False)(inquiry.id)
+        await arecord_stage(inquiry.id, DONE, results_url=results_page_url)
         
         return JsonResponse({
             'success': True,
@@ -317,7 +421,8 @@ async def generate_ai_estimate(request, inquiry_id):
                 'cash_flow_projection': estimate.cash_flow_projection,
                 'revenue_breakdown': estimate.revenue_breakdown,
                 'cost_breakdown': estimate.cost_breakdown,
-            }
+            },
+            'results_url': results_page_url,
         })
         
     except PropertyInquiry.DoesNotExist:
@@ -326,42 +431,270 @@ async def generate_ai_estimate(request, inquiry_id):
             'error': 'Property inquiry not found'
         }, status=404)
     except Exception as e:
-        logger.error(f"AI estimate generation failed: {str(e)}")
+        logger.exception(f"AI estimate generation failed for inquiry {inquiry_id}")
         
         # Log the error using async database operation
         if 'inquiry' in locals():
-            await async_create(AIAnalysisLog,
-                inquiry=inquiry,
-                request_data={},
-                response_data={},
-                model_used='unknown',
-                tokens_used=0,
-                processing_time=0,
-                success=False,
-                error_message=str(e)
-            )
+            await arecord_stage(inquiry.id, FAILED, error=ESTIMATE_FAILED_MESSAGE)
+            await log_failure(inquiry, e)
         
         return JsonResponse({
             'success': False,
-            'error': str(e)
+            'error': ESTIMATE_FAILED_MESSAGE
         }, status=500)
 
 
+@staff_member_required
+@require_http_methods(["GET"])
+@read_from_replica
+def export_data(request, dataset):
+    """Stream a dataset as CSV or JSONL (?format=csv|jsonl, ?gzip=1 to compress)"""
+    fmt = request.GET.get('format', 'csv')
+    compress = request.GET.get('gzip') in ('1', 'true')
+    try:
+        spec = get_export(dataset, fmt)
+    except ExportError as e:
+        raise Http404(str(e))
+
+    # Bind the queryset to its database now: rows are read after the view has
+    # returned, outside the read_from_replica scope
+    queryset = spec.queryset()
+    queryset = queryset.using(queryset.db)
+    chunks = export_stream(dataset, fmt, compress=compress, queryset=queryset)
+
+    # Under ASGI a synchronous iterator would be read into memory before sending
+    response = StreamingHttpResponse(
+        aiterate(chunks) if isinstance(request, ASGIRequest) else chunks,
+        content_type='application/gzip' if compress else f'{FORMATS[fmt]}; charset=utf-8',
+    )
+    filename = export_filename(dataset, fmt, compress, timezone.now().strftime('%Y%m%d-%H%M%S'))
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+@read_from_replica
+def search_api(request):
+    """Ranked full-text search over inquiries and their estimates (?q=...&limit=20)"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'limit must be an integer'}, status=400)
+
+    results, backend, took_ms = search_inquiries(query, limit)
+    return JsonResponse({
+        'success': True,
+        'query': query,
+        'backend': backend,
+        'took_ms': round(took_ms, 2),
+        'results': results,
+    })
+
+
+@require_http_methods(["GET"])
+@read_from_replica
+def estimates_api(request):
+    """Keyset-paginated list of estimates (?fields=...&limit=50&order=desc&cursor=...)"""
+    if not has_api_access(request):
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+    try:
+        page = EstimatePageRequest.from_query(request.GET)
+    except APIError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    # Read keys and rows from the same database even when replicas are configured
+    queryset = estimates_queryset()
+    queryset = queryset.using(queryset.db)
+    keys = page_keys(queryset, page)
+    etag, last_modified = page_validators(keys, page)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        ids = [pk for pk, _, _ in keys[:page.limit]]
+        payload = page_payload(page_rows(queryset, ids, page.fields), keys, page)
+        response = HttpResponse(encode_payload(payload), content_type='application/json')
+        if payload['next_cursor']:
+            query = urlencode({'cursor': payload['next_cursor'], 'limit': page.limit, 'fields': ','.join(page.fields)})
+            response['Link'] = f'<{request.path}?{query}>; rel="next"'
+
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization', 'Cookie'])
+    return response
+
+
+@require_http_methods(["GET"])
+@read_from_replica
+def regional_statistics_api(request):
+    """Percentiles of revenue/cost per acre, confidence and processing time per region (?region=...&percentiles=50,90)"""
+    if not has_api_access(request):
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+    try:
+        percentiles = [int(value) for value in request.GET.get('percentiles', '').split(',') if value.strip()]
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'percentiles must be integers'}, status=400)
+    if any(not 0 <= value <= 100 for value in percentiles):
+        return JsonResponse({'success': False, 'error': 'percentiles must be between 0 and 100'}, status=400)
+
+    results = regional_statistics(request.GET.get('region'), percentiles or DEFAULT_PERCENTILES)
+    response = JsonResponse({'success': True, 'results': results})
+    patch_cache_control(response, private=True, max_age=60)
+    patch_vary_headers(response, ['Authorization', 'Cookie'])
+    return response
+
+
+@require_http_methods(["GET"])
+@read_from_replica
+def comparables_api(request, estimate_id):
+    """The nearest estimated properties of similar lot size (?k=10&band=2; band=0 ignores lot size)"""
+    if not has_api_access(request):
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+    try:
+        k = int(request.GET.get('k', DEFAULT_K))
+        band = float(request.GET.get('band', DEFAULT_BAND))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'k must be an integer and band a number'}, status=400)
+    if band != 0 and not 1 <= band < float('inf'):
+        return JsonResponse({'success': False, 'error': 'band must be 0 or at least 1'}, status=400)
+
+    estimate = PropertyEstimate.objects.select_related('inquiry').filter(id=estimate_id).first()
+    if estimate is None:
+        return JsonResponse({'success': False, 'error': 'Estimate not found'}, status=404)
+
+    results, backend, took_ms = find_comparables(estimate.inquiry, k, band or None)
+    response = JsonResponse({
+        'success': True,
+        'estimate_id': estimate.id,
+        'latitude': estimate.inquiry.latitude,
+        'longitude': estimate.inquiry.longitude,
+        'backend': backend,
+        'took_ms': round(took_ms, 2),
+        'results': results,
+    })
+    patch_cache_control(response, private=True, max_age=60)
+    patch_vary_headers(response, ['Authorization', 'Cookie'])
+    return response
+
+
+@require_http_methods(["GET"])
+@read_from_replica
+def chart_data_api(request, inquiry_id):
+    """Chart series and totals of an inquiry's estimate, as embedded in its results page"""
+    estimate = PropertyEstimate.objects.filter(inquiry_id=inquiry_id).only(*CHART_FIELDS).first()
+    if estimate is None:
+        return JsonResponse({'success': False, 'error': 'Estimate not found'}, status=404)
+
+    # The chart only changes when the estimate does
+    etag = '"%s"' % hashlib.sha1(f'chart:{estimate.id}:{estimate.updated_at.isoformat()}'.encode()).hexdigest()
+    last_modified = int(estimate.updated_at.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse({'success': True, 'inquiry_id': inquiry_id, 'chart': chart_data(estimate)})
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def versioned_estimate(request, estimate_id):
+    """(estimate, None) for an authorized request, else (None, error response)"""
+    if not has_api_access(request):
+        return None, JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+    # Every column: an estimate that was never regenerated is its own version 1
+    estimate = PropertyEstimate.objects.with_details().filter(id=estimate_id).first()
+    if estimate is None:
+        return None, JsonResponse({'success': False, 'error': 'Estimate not found'}, status=404)
+    return estimate, None
+
+
+@require_http_methods(["GET"])
+@read_from_replica
+def estimate_versions_api(request, estimate_id):
+    """Versions of an estimate, oldest first"""
+    estimate, error = versioned_estimate(request, estimate_id)
+    if error:
+        return error
+    response = JsonResponse({'success': True, 'estimate_id': estimate.id, 'versions': version_list(estimate)})
+    patch_vary_headers(response, ['Authorization', 'Cookie'])
+    return response
+
+
+@require_http_methods(["GET"])
+@read_from_replica
+def estimate_version_api(request, estimate_id, number):
+    """One version of an estimate, rebuilt from its last snapshot"""
+    estimate, error = versioned_estimate(request, estimate_id)
+    if error:
+        return error
+    state = load_versions(estimate, [number]).get(number)
+    if state is None:
+        return JsonResponse({'success': False, 'error': 'Version not found'}, status=404)
+    response = JsonResponse({'success': True, 'estimate_id': estimate.id, 'number': number, 'version': version_json(state)})
+    patch_vary_headers(response, ['Authorization', 'Cookie'])
+    return response
+
+
+@require_http_methods(["GET"])
+@read_from_replica
+def estimate_version_diff_api(request, estimate_id):
+    """Differences between two versions of an estimate (?from=1&to=3; to defaults to the latest)"""
+    estimate, error = versioned_estimate(request, estimate_id)
+    if error:
+        return error
+    try:
+        old = int(request.GET['from'])
+        new = int(request.GET['to']) if request.GET.get('to') else version_list(estimate)[-1]['number']
+    except (KeyError, ValueError):
+        return JsonResponse({'success': False, 'error': 'from (and to) must be version numbers'}, status=400)
+    states = load_versions(estimate, [old, new])
+    missing = [number for number in (old, new) if number not in states]
+    if missing:
+        return JsonResponse({'success': False, 'error': f'Version {missing[0]} not found'}, status=404)
+    response = JsonResponse({
+        'success': True, 'estimate_id': estimate.id, 'from': old, 'to': new,
+        **diff_versions(states[old], states[new]),
+    })
+    patch_vary_headers(response, ['Authorization', 'Cookie'])
+    return response
+
+
+@staff_member_required
+@require_http_methods(["POST"])
+async def import_inquiries_api(request):
+    """Bulk import inquiries from an uploaded CSV/JSONL file (optionally .gz)"""
+    files = await sync_to_async(lambda: request.FILES)()
+    upload = files.get('file')
+    if upload is None:
+        return JsonResponse({'success': False, 'error': 'Upload a CSV or JSONL file as "file"'}, status=400)
+    try:
+        fmt = request.POST.get('format') or detect_format(upload.name)
+        stream = gzip.GzipFile(fileobj=upload.file) if upload.name.lower().endswith('.gz') else upload.file
+        report = await sync_to_async(import_file)(stream, fmt)
+    except (ImportFormatError, OSError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    result = {'success': True, **report.as_dict(), 'estimates_queued': 0}
+    if request.POST.get('generate_estimates') in ('1', 'true') and report.inquiry_ids:
+        enqueue_estimates(report.inquiry_ids)
+        result['estimates_queued'] = len(report.inquiry_ids)
+        return JsonResponse(result, status=202)
+    return JsonResponse(result)
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 async def debug_session(request):
     """Debug endpoint to check session data"""
-    from asgiref.sync import sync_to_async
-    
-    # Use sync_to_async for session operations
-    session_data = await sync_to_async(dict)(request.session)
-    initial_data = await sync_to_async(request.session.get)('initial_data', {})
-    estimate_answers = await sync_to_async(request.session.get)('questionnaire_answers', {})
-    estimate_data = await sync_to_async(request.session.get)('questionnaire_data', {})
+    session_data = dict(await request.session.aitems())
+    initial_data = session_data.get('initial_data', {})
+    estimate_answers = session_data.get('questionnaire_answers', {})
     
     return JsonResponse({
         'session_data': session_data,
         'initial_data': initial_data,
         'estimate_answers': estimate_answers,
-        'estimate_data': estimate_data
     })
@@ -9,8 +9,17 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "valora_earth.settings")
+# Tell the database profile not to keep per-thread persistent connections
+os.environ.setdefault("DJANGO_ASGI", "1")
 
 application = get_asgi_application()
+
+if not settings.DEBUG:
+    from main_app.static_files import StaticFilesApplication
+
+    # Static files are answered from STATIC_ROOT without going through Django
+    application = StaticFilesApplication(application)
@@ -0,0 +1,138 @@
+"""
+Environment-driven database profiles for valora_earth.
+
+``DB_ENGINE`` selects the profile:
+
+- ``sqlite`` (default): file database with WAL journaling, persistent connections
+  and health checks
+- ``postgres``: PostgreSQL through psycopg 3, using psycopg's built-in connection
+  pool by default
+
+Persistent connections (``CONN_MAX_AGE``) are only safe when every request runs
+on a long-lived thread, i.e. under WSGI. Under ASGI Django runs each request's
+sync code on a fresh thread, so connections kept open per thread are never
+reused and leak until garbage collection. ``asgi.py`` therefore sets
+``DJANGO_ASGI=1`` and the profile switches to ``CONN_MAX_AGE = 0`` there, relying
+on the pool (PostgreSQL) or cheap reconnects (SQLite) instead.
+
+``DB_REPLICAS`` adds read replicas as ``replica_1``, ``replica_2``, ...: a
+comma-separated list of database files for SQLite or of hosts for PostgreSQL.
+Replicas mirror ``default`` under test so the suite needs a single database.
+"""
+
+import os
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+
+# Defaults shared by every profile
+DEFAULT_CONN_MAX_AGE = 600  # 10 minutes
+DEFAULT_SQLITE_TIMEOUT = 20  # seconds to wait on a locked database
+DEFAULT_POOL_MIN_SIZE = 2
+DEFAULT_POOL_MAX_SIZE = 10
+DEFAULT_POOL_TIMEOUT = 10  # seconds to wait for a free pooled connection
+
+
+def env_bool(environ: Mapping[str, str], name: str, default: bool) -> bool:
+    """Read a boolean flag from the environment"""
+    value = environ.get(name)
+    if value is None or value == '':
+        return default
+    return value.strip().lower() in TRUE_VALUES
+
+
+def env_int(environ: Mapping[str, str], name: str, default: int) -> int:
+    """Read an integer from the environment"""
+    value = environ.get(name)
+    if value is None or value == '':
+        return default
+    return int(value)
+
+
+def is_asgi(environ: Mapping[str, str]) -> bool:
+    """Whether the process is being served through valora_earth.asgi"""
+    return env_bool(environ, 'DJANGO_ASGI', False)
+
+
+def conn_max_age(environ: Mapping[str, str], pooled: bool = False) -> int:
+    """Persistent connection lifetime honouring ``DB_CONN_MAX_AGE`` where it is safe"""
+    if pooled or is_asgi(environ):
+        return 0
+    return env_int(environ, 'DB_CONN_MAX_AGE', DEFAULT_CONN_MAX_AGE)
+
+
+def sqlite_database(environ: Mapping[str, str], base_dir: Path, name: Optional[str] = None) -> Dict[str, Any]:
+    """SQLite profile: WAL journaling, IMMEDIATE write transactions and persistent connections"""
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name or environ.get('SQLITE_PATH') or base_dir / 'db.sqlite3',
+        'CONN_MAX_AGE': conn_max_age(environ),
+        'CONN_HEALTH_CHECKS': env_bool(environ, 'DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {
+            'timeout': env_int(environ, 'SQLITE_TIMEOUT', DEFAULT_SQLITE_TIMEOUT),
+            # Take the write lock up front so concurrent writers queue on the busy
+            # timeout instead of failing with "database is locked" on upgrade
+            'transaction_mode': 'IMMEDIATE',
+            # WAL lets readers proceed while a writer commits
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
+    }
+
+
+def postgres_database(environ: Mapping[str, str]) -> Dict[str, Any]:
+    """PostgreSQL profile using psycopg's connection pool unless ``DB_POOL`` is off"""
+    pooled = env_bool(environ, 'DB_POOL', True)
+    options: Dict[str, Any] = {}
+    if pooled:
+        options['pool'] = {
+            'min_size': env_int(environ, 'DB_POOL_MIN_SIZE', DEFAULT_POOL_MIN_SIZE),
+            'max_size': env_int(environ, 'DB_POOL_MAX_SIZE', DEFAULT_POOL_MAX_SIZE),
+            'timeout': env_int(environ, 'DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+        }
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('DB_NAME', 'valora_earth'),
+        'USER': environ.get('DB_USER', 'valora_earth'),
+        'PASSWORD': environ.get('DB_PASSWORD', ''),
+        'HOST': environ.get('DB_HOST', 'localhost'),
+        'PORT': environ.get('DB_PORT', '5432'),
+        # Pooled connections are returned to the pool at the end of each request;
+        # Django refuses persistent connections on top of a pool
+        'CONN_MAX_AGE': conn_max_age(environ, pooled=pooled),
+        'CONN_HEALTH_CHECKS': env_bool(environ, 'DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': options,
+    }
+
+
+def database_config(environ: Optional[Mapping[str, str]] = None, base_dir: Optional[Path] = None) -> Dict[str, Dict[str, Any]]:
+    """Build ``settings.DATABASES`` from the environment"""
+    environ = os.environ if environ is None else environ
+    engine = environ.get('DB_ENGINE', 'sqlite').strip().lower()
+
+    if engine in ('postgres', 'postgresql'):
+        default = postgres_database(environ)
+    elif engine in ('sqlite', 'sqlite3'):
+        default = sqlite_database(environ, base_dir or Path.cwd())
+    else:
+        raise ValueError(f"Unsupported DB_ENGINE '{engine}'. Use 'sqlite' or 'postgres'.")
+
+    databases = {'default': default}
+    databases.update(replica_databases(environ, default))
+    return databases
+
+
+def replica_databases(environ: Mapping[str, str], default: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Replica aliases derived from ``DB_REPLICAS`` and the primary's settings"""
+    targets = [target.strip() for target in environ.get('DB_REPLICAS', '').split(',') if target.strip()]
+    replicas = {}
+    for index, target in enumerate(targets, start=1):
+        replica = {**default, 'OPTIONS': dict(default['OPTIONS']), 'TEST': {'MIRROR': 'default'}}
+        if default['ENGINE'].endswith('sqlite3'):
+            replica['NAME'] = target
+        else:
+            host, _, port = target.partition(':')
+            replica['HOST'] = host
+            replica['PORT'] = port or default['PORT']
+        replicas[f'replica_{index}'] = replica
+    return replicas
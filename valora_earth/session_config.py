@@ -0,0 +1,69 @@
+"""
+Environment-driven session storage for valora_earth.
+
+``SESSION_STORE`` selects where sessions live:
+
+- ``cookie`` (default): a signed, compressed cookie, so the landing page and
+  questionnaire steps never touch the database. The session cannot be revoked
+  server-side before it expires (logging out clears only that browser's
+  cookie), and browsers silently drop cookies over 4 KB. Questionnaire answers
+  only live in the session between the steps of the no-JavaScript flow, which
+  refuses answers that would take it past SESSION_COOKIE_MAX_BYTES
+  (``session_fits``); they are cleared once the inquiry exists.
+- ``cache``: the ``sessions`` cache, Redis at ``SESSION_CACHE_URL``
+  (``redis://host:6379/1``, needs the ``redis`` package) or process memory
+  without it, which only suits a single process.
+- ``db``: Django's database sessions.
+
+With any of them SessionMiddleware saves a session at most once per request,
+after the view, however many keys the view changed.
+"""
+
+import os
+from typing import Any, Dict, Mapping, Optional
+
+SESSION_ENGINES = {
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_CACHE_ALIAS = 'sessions'
+# Encoded size a cookie session may reach, leaving room under the browsers' 4096
+# bytes for the cookie's name and attributes
+SESSION_COOKIE_MAX_BYTES = 3800
+
+
+def session_engine(environ: Optional[Mapping[str, str]] = None) -> str:
+    """``settings.SESSION_ENGINE`` for ``SESSION_STORE``"""
+    environ = os.environ if environ is None else environ
+    store = environ.get('SESSION_STORE', 'cookie').strip().lower()
+    if store not in SESSION_ENGINES:
+        raise ValueError(f"Unsupported SESSION_STORE '{store}'. Use 'cookie', 'cache' or 'db'.")
+    return SESSION_ENGINES[store]
+
+
+def cache_config(environ: Optional[Mapping[str, str]] = None) -> Dict[str, Dict[str, Any]]:
+    """``settings.CACHES`` with the ``sessions`` cache used by ``SESSION_STORE=cache``"""
+    environ = os.environ if environ is None else environ
+    url = environ.get('SESSION_CACHE_URL', '').strip()
+    if url:
+        sessions = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    else:
+        sessions = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessions'}
+    return {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        SESSION_CACHE_ALIAS: sessions,
+    }
+
+
+def session_cookie_size(session) -> int:
+    """Bytes of the session's cookie value: the signed data for ``cookie``, the session key otherwise"""
+    if type(session).__module__ == SESSION_ENGINES['cookie']:
+        # The value the signed-cookie store would send for the current data
+        return len(session._get_session_key())
+    return len(session.session_key or '')
+
+
+def session_fits(session) -> bool:
+    """Whether the session still fits in a browser cookie"""
+    return session_cookie_size(session) <= SESSION_COOKIE_MAX_BYTES
@@ -10,11 +10,20 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+from .db_config import database_config
+from .session_config import SESSION_CACHE_ALIAS, cache_config, session_engine
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Load .env before reading any environment-driven settings
+load_dotenv(BASE_DIR / ".env")
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -23,7 +32,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = "django-insecure-qwsce@w*dz$07-)^2!4grj_yss(6*a=s2!10*&zbwsp616bpn^"
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DEBUG", "True").strip().lower() in ("1", "true", "yes")
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', 'testserver']
 
@@ -41,11 +50,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "main_app.middleware.QueryInstrumentationMiddleware",
+    # Compresses the final body, so it sits above everything that writes it
+    "main_app.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "main_app.middleware.ReplicaStickinessMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -73,27 +86,120 @@ WSGI_APPLICATION = "valora_earth.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+#
+# Selected through the environment (see valora_earth/db_config.py):
+#   DB_ENGINE=sqlite|postgres, DB_CONN_MAX_AGE, DB_CONN_HEALTH_CHECKS,
+#   DB_NAME/DB_USER/DB_PASSWORD/DB_HOST/DB_PORT and DB_POOL* for PostgreSQL,
+#   DB_REPLICAS for read replicas
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-        "OPTIONS": {
-            "timeout": 20,  # Database connection timeout for async operations
-        }
-    }
-}
+DATABASES = database_config(base_dir=BASE_DIR)
+
+# Sessions and caches
+# Selected through the environment (see valora_earth/session_config.py):
+#   SESSION_STORE=cookie|cache|db, SESSION_CACHE_URL for the cache store
+
+SESSION_ENGINE = session_engine()
+CACHES = cache_config()
+# SESSION_CACHE_ALIAS ("sessions") is imported from session_config
+
+# Read replicas used by read-only views (see main_app/db_router.py)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["main_app.db_router.ReadReplicaRouter"]
+
+# Seconds a client keeps reading from the primary after its own write, so it
+# sees its fresh estimate even if the replicas lag behind
+READ_YOUR_WRITES_WINDOW = int(os.environ.get("READ_YOUR_WRITES_WINDOW", 10))
 
 # Async and Performance Settings
 ASGI_APPLICATION = "valora_earth.asgi.application"
 
-# Database connection pooling for async operations
-DB_CONN_MAX_AGE = 600  # 10 minutes
-
 # Async view settings
 DJANGO_ASYNC_VIEWS = True
 
 
+# Query instrumentation (main_app/middleware.py, main_app/utils/query_instrumentation.py)
+
+# Queries slower than this are logged with their plan to SLOW_QUERY_LOG
+SLOW_QUERY_THRESHOLD_MS = int(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 100))
+SLOW_QUERY_LOG = os.environ.get("SLOW_QUERY_LOG", str(BASE_DIR / "slow_queries.log"))
+
+# Expose X-DB-Query-Count and Server-Timing headers on every response
+QUERY_INSTRUMENTATION_HEADERS = DEBUG
+
+# Maximum queries per request by view name; enforced in tests, logged in production
+QUERY_BUDGETS = {
+    "main_app:index": 0,
+    # Session read + write; the write runs in a savepoint under test transactions
+    "main_app:estimate_questionnaire": 4,
+    # The inquiry insert + the region tables on a process's first geocode (the db session store adds 2)
+    "main_app:submit_questionnaire": 3,
+    "main_app:loading_screen": 2,
+    "main_app:estimate_results": 3,
+    # +4 for regional statistics: locked inquiry row, replaced estimate's values, locked stats row,
+    # its insert/update; +2 for the payload blobs (one insert for both) and the EstimatePayload upsert
+    "main_app:generate_ai_estimate": 14,
+    # Page keys + page rows (a 304 skips the second); staff sessions add session + user
+    "main_app:estimates_api": 4,
+    "main_app:regional_statistics": 1,
+    "main_app:chart_data": 1,
+    # Read from status files
+    "main_app:estimate_status": 0,
+    # Estimate + index check + one box query per search radius tried (at most spatial.MAX_SEARCHES = 6) + result rows
+    "main_app:comparables": 9,
+    # Estimate + version rows (the diff without ?to= adds the version list)
+    "main_app:estimate_versions": 2,
+    "main_app:estimate_version": 2,
+    "main_app:estimate_version_diff": 3,
+}
+
+# AI estimates generated at once for bulk imports
+ESTIMATE_GENERATION_CONCURRENCY = int(os.environ.get("ESTIMATE_GENERATION_CONCURRENCY", "4"))
+
+# Threads running work that outlives its request (main_app.utils.db_utils.submit_background)
+BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS", "2"))
+
+# Bearer tokens accepted by the partner estimates API (comma-separated)
+PARTNER_API_KEYS = [key.strip() for key in os.environ.get("PARTNER_API_KEYS", "").split(",") if key.strip()]
+
+# AIAnalysisLog retention (python manage.py archive_ai_logs, see main_app/log_archive.py):
+# logs older than this many days move to compressed segment files in LOG_ARCHIVE_DIR
+LOG_RETENTION_DAYS = int(os.environ.get("LOG_RETENTION_DAYS", 90))
+LOG_ARCHIVE_DIR = os.environ.get("LOG_ARCHIVE_DIR", str(BASE_DIR / "log_archive"))
+
+# Pre-rendered estimate results pages (main_app/results_pages.py); results URLs pinned
+# to a page version (?v=) are cached by browsers for RESULTS_PAGE_MAX_AGE seconds
+RESULTS_PAGE_DIR = os.environ.get("RESULTS_PAGE_DIR", str(BASE_DIR / "results_pages"))
+RESULTS_PAGE_MAX_AGE = int(os.environ.get("RESULTS_PAGE_MAX_AGE", 365 * 24 * 60 * 60))
+
+# Responses shorter than this are sent uncompressed (they fit in a packet either way)
+COMPRESSION_MIN_LENGTH = int(os.environ.get("COMPRESSION_MIN_LENGTH", 1024))
+
+# Estimate generation status files read by the loading screen (main_app/generation_status.py);
+# shared by every worker process, like RESULTS_PAGE_DIR
+ESTIMATE_STATUS_DIR = os.environ.get("ESTIMATE_STATUS_DIR", str(BASE_DIR / "estimate_status"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "slow_query_file": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": SLOW_QUERY_LOG,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "delay": True,  # don't create the file until the first slow query
+        },
+    },
+    "loggers": {
+        "main_app.slow_queries": {
+            "handlers": ["slow_query_file"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -134,6 +240,18 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Outside DEBUG, collectstatic writes content-hashed copies and their brotli/gzip
+# variants, and the application serves STATIC_ROOT itself (main_app/static_files.py)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage" if DEBUG
+        else "main_app.static_files.CompressedManifestStaticFilesStorage",
+    },
+}
+# Browser cache lifetime of content-hashed static files (served as immutable)
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", 365 * 24 * 60 * 60))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
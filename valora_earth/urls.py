@@ -14,11 +14,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from main_app.static_files import serve, static_prefix
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include('main_app.urls')),
@@ -27,3 +31,6 @@ urlpatterns = [
 # Serve static files during development
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATICFILES_DIRS[0])
+else:
+    # collectstatic output; under ASGI StaticFilesApplication answers these before Django
+    urlpatterns += [re_path(r'^%s(?P<path>.*)$' % re.escape(static_prefix().lstrip('/')), serve)]